@@ -1,6 +1,11 @@
 from .helper import *
 from .rules import *
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import argparse
+import json
+import multiprocessing
+import os
 
 # python -m ACMG
 # input file
@@ -12,11 +17,40 @@ MOTHER_VCF = "/data/projects/ACMG/input/proband.mother.preprocessed.vcf"
 # database
 CLINVAR_DB = "/data/projects/ACMG/database/clinvar_parsed_single.txt"
 DISEASE_DB = "/data/projects/ACMG/database/disease.txt"
-GNOMAD_DB = "/data/projects/ACMG/database/gnomad.exomes.r2.1.1.sites.vcf.gz"
-REVEL_DB = "/data/projects/ACMG/database/revel_with_transcript_ids"
 SPLICEAI_DB = "/data/projects/ACMG/database/proband.spliceai.vcf"
 REPEAT_DB = "/data/projects/ACMG/database/hg19.fa.out"
 
+# --config 파일의 "paths" 또는 --path NAME=FILE 로 바꿀 수 있는 파일 경로. {이름: (module namespace, 변수 이름)}
+# gnomad, REVEL 경로는 rule 모듈(pm2ba1bs1, pp3bp4bp7)의 변수 하나만 사용한다.
+PATH_CONFIG_DIC = {
+    "proband_vep": (globals(), "PROBAND_VEP"),
+    "proband_vcf": (globals(), "PROBAND_VCF"),
+    "father_vcf": (globals(), "FATHER_VCF"),
+    "mother_vcf": (globals(), "MOTHER_VCF"),
+    "clinvar_db": (globals(), "CLINVAR_DB"),
+    "disease_db": (globals(), "DISEASE_DB"),
+    "spliceai_db": (globals(), "SPLICEAI_DB"),
+    "repeat_db": (globals(), "REPEAT_DB"),
+    "gnomad_db": (vars(pm2ba1bs1), "GNOMAD_DB"),
+    "gnomad_store": (vars(pm2ba1bs1), "GNOMAD_STORE"),
+    "revel_db": (vars(pp3bp4bp7), "REVEL_DB"),
+    "revel_store": (vars(pp3bp4bp7), "REVEL_STORE"),
+}
+
+# VariantDF.collapse_transcripts()
+TRANSCRIPT_COLLAPSE_MODES = ["canonical", "dedupe"]
+# rule 모듈이 읽는 transcript 별 var_infos column. 한 변이에서 이 값이 모두 같은 transcript는 같은 rule을 받는다.
+# (chrom, location, gnomad 값은 변이 별로 같다)
+DEDUPE_KEY_COLUMNS = [
+    "consequence",
+    "protein_pos",
+    "AA_change",
+    "codon_change",
+    "symbol",
+    "strand",
+    "revel",
+]
+
 
 class VariantDF:
     """_summary_
@@ -66,8 +100,14 @@ class VariantDF:
             "gnomad_ac": 14,
             "gnomad_an": 15,
             "gnomad_af": 16,
+            "impact": 17,  # VEP IMPACT (HIGH, MODERATE, LOW, MODIFIER)
+            "hgnc_id": 18,
+            "canonical": 19,  # "MANE" (MANE Select), "YES" (VEP CANONICAL) or ""
         }
         self.variant_dic: dict = None
+        # collapse_transcripts("dedupe")로 합친 transcript
+        # {var_id: ({feature: variant_info_dic} (원래 순서), {합쳐진 feature: 남긴 feature})}
+        self.collapsed_feature_dic: dict = None
 
     def parse_variant_file(self, vep_file: str):
         """_summary_
@@ -75,10 +115,13 @@ class VariantDF:
             VEP로 annocation된 vcf 파일의 변환값을 읽은 뒤, 각 라인을 파징하여 variant들의 정보
             (ID-transcipt(feature)-infos) 가 담긴 딕셔너리를 VariantDF class의
             변수(self.variant_dic)에 저장한다. 저장된 정보(list)에 대한 index 값은 VariantDF
-            class 의 내부 변수 (self.df_col2idx)에 내재되어 있다.
+            class 의 내부 변수 (self.df_col2idx)에 내재되어 있다. VEP 결과 파일은 tab 형식 또는
+            CSQ INFO field가 있는 VCF 형식을 plain 또는 gz(bgzip) 압축 파일로 사용할 수 있으며, 파일 전체를
+            읽지 않고 한 줄씩 처리한다(dbparser.parse_vep_file()). VCF로 주어지면 VEP를 tab 형식으로 다시
+            실행할 필요가 없다.
 
         Args:
-            vep_file (str): VEP_file address
+            vep_file (str): VEP_file address (.txt, .txt.gz, .vcf, .vcf.gz)
 
         Examples:
         >>> variant_dic = {
@@ -92,38 +135,136 @@ class VariantDF:
                 }
             }"""
 
-        with open(vep_file) as infile:
-            # {id : {feature : { [var_infos], {evidence_score} }}}
-            variant_dic = defaultdict(dict)
-            for line in infile:
-                if line.startswith("#") and (not line.startswith("##")):
-                    f_col2idx = {
-                        val: idx
-                        for idx, val in enumerate(
-                            line.strip("#").strip().split("\t")
-                        )
+        # {id : {feature : { [var_infos], {evidence_score} }}}
+        variant_dic = defaultdict(dict)
+        var_id_idx = self.df_col2idx["var_id"]
+        feature_idx = self.df_col2idx["feature"]
+        # gz (bgzip) 압축 파일도 그대로 읽으며, 한 줄씩 처리한다.
+        for var_infos in dbparser.parse_vep_file(vep_file):
+            # "1-69270-A-G", "ENST00000335137"
+            var_key_id = var_infos[var_id_idx]
+            var_key_feature = var_infos[feature_idx]
+            variant_dic[var_key_id][var_key_feature] = {
+                "var_infos": var_infos,
+                "evidence_score_dic": dict(),
+            }
+
+        self.variant_dic = variant_dic
+
+    def collapse_transcripts(self, mode: str = "dedupe"):
+        """_summary_
+        Note:
+            rule을 할당하기 전에, 변이 별 transcript 수를 줄인다. 한 변이가 여러 transcript와 겹치면 모든
+            rule이 transcript 마다 반복되므로, 같은 결과를 받을 transcript는 한 번만 계산한다.
+            - "dedupe": rule이 읽는 값(DEDUPE_KEY_COLUMNS)이 모두 같은 transcript는 처음 나온 transcript
+              하나만 남긴다. rule 할당 후 expand_transcripts()로 합쳐진 transcript를 되살리므로, 결과 파일은
+              줄이지 않은 경우와 같다.
+            - "canonical": 변이의 유전자 별로 MANE Select transcript만 남기고, 없으면 VEP canonical
+              transcript만 남긴다. 둘 다 없는 유전자는 모든 transcript를 남긴다. 나머지 transcript는
+              결과 파일에서도 제외된다. (VEP --mane, --canonical 옵션이 필요하다)
+            revel 값은 transcript 별로 다르므로, revel, gnomad 값을 variant_infos에 추가한 뒤에 사용한다.
+
+        Args:
+            mode (str): "dedupe" or "canonical"
+
+        Raises:
+            ValueError: mode가 TRANSCRIPT_COLLAPSE_MODES에 없는 경우
+
+        Examples:
+        >>> variant_df.collapse_transcripts("dedupe")
+            variant_df = execute_acmg_rules(variant_df, db_dic, annotate=False)
+            variant_df.expand_transcripts()
+        """
+
+        if mode not in TRANSCRIPT_COLLAPSE_MODES:
+            raise ValueError(
+                f"unknown transcript collapse mode: {mode} (use {TRANSCRIPT_COLLAPSE_MODES})"
+            )
+
+        variant_dic = self.variant_dic
+        key_idxs = [self.df_col2idx[col] for col in DEDUPE_KEY_COLUMNS]
+        gene_idx = self.df_col2idx["gene"]
+        canonical_idx = self.df_col2idx["canonical"]
+        canonical_rank_dic = {"MANE": 2, "YES": 1}  # 그 외 0
+        collapsed_feature_dic = dict()
+
+        for var_id, feature_dic in variant_dic.items():
+            if len(feature_dic) < 2:
+                continue
+
+            if mode == "dedupe":
+                key2feature = dict()  # {rule에 사용하는 값: 남긴 feature}
+                dup2feature = dict()  # {합쳐진 feature: 남긴 feature}
+                for var_feature, variant_info_dic in feature_dic.items():
+                    var_infos = variant_info_dic["var_infos"]
+                    key = tuple(var_infos[idx] for idx in key_idxs)
+                    if key in key2feature:
+                        dup2feature[var_feature] = key2feature[key]
+                    else:
+                        key2feature[key] = var_feature
+                if dup2feature:
+                    collapsed_feature_dic[var_id] = (feature_dic, dup2feature)
+                    variant_dic[var_id] = {
+                        var_feature: variant_info_dic
+                        for var_feature, variant_info_dic in feature_dic.items()
+                        if var_feature not in dup2feature
                     }
-                if not line.startswith("#"):  # variation info
-                    row = line.strip().split("\t")
-                    # "1-69270-A-G", "ENST00000335137"
-                    var_key_id = row[f_col2idx["Uploaded_variation"]]
-                    var_key_feature = row[f_col2idx["Feature"]]
-                    variant_info_dic = self.make_variant_info_dic(
-                        row, f_col2idx
-                    )
-                    variant_dic[var_key_id].update(
-                        {var_key_feature: variant_info_dic}
-                    )
 
-            self.variant_dic = variant_dic
+            else:  # canonical
+                # {gene: 가장 높은 canonical 순위}
+                gene_rank_dic = defaultdict(int)
+                feature_ranks = []
+                for var_feature, variant_info_dic in feature_dic.items():
+                    var_infos = variant_info_dic["var_infos"]
+                    rank = canonical_rank_dic.get(var_infos[canonical_idx], 0)
+                    gene = var_infos[gene_idx]
+                    gene_rank_dic[gene] = max(gene_rank_dic[gene], rank)
+                    feature_ranks.append((var_feature, gene, rank))
+                variant_dic[var_id] = {
+                    var_feature: feature_dic[var_feature]
+                    for var_feature, gene, rank in feature_ranks
+                    if rank == gene_rank_dic[gene]
+                }
+
+        self.variant_dic = variant_dic
+        self.collapsed_feature_dic = collapsed_feature_dic
+
+    def expand_transcripts(self):
+        """_summary_
+        Note:
+            collapse_transcripts("dedupe")로 합친 transcript를 원래 순서대로 되살리고, 남긴 transcript에
+            할당된 evidence_score_dic을 복사한다. ("canonical"로 제외한 transcript는 되살리지 않는다)
+        """
+
+        if not self.collapsed_feature_dic:
+            return
+
+        variant_dic = self.variant_dic
+        for var_id, (feature_dic, dup2feature) in self.collapsed_feature_dic.items():
+            # 병렬 실행 시에는 rule이 할당된 variant_info_dic이 새로 만들어지므로, 현재 값을 사용한다.
+            kept_feature_dic = variant_dic[var_id]
+            variant_dic[var_id] = {
+                var_feature: kept_feature_dic[var_feature]
+                if var_feature not in dup2feature
+                else {
+                    "var_infos": feature_dic[var_feature]["var_infos"],
+                    "evidence_score_dic": dict(
+                        kept_feature_dic[dup2feature[var_feature]]["evidence_score_dic"]
+                    ),
+                }
+                for var_feature in feature_dic
+            }
+
+        self.variant_dic = variant_dic
+        self.collapsed_feature_dic = None
 
     def make_variant_info_dic(self, var_row: list, file_col2idx: dict) -> dict:
         """_summary_
         Note:
             ID-feature로 특정지어지는 variant에 대해 {"var_infos": [], "evidence_score_dict": {}}
-            로 구성된 <variant_info_dic> 을 만들어 반환한다. "symbol" 의 경우, vep 옵션에서
-            추가한 것으로, "Extra" column에 해당하여 따로 추출하였음. Revel의 경우, 추후 revel
-            score를 저장하기 위한 용도.
+            로 구성된 <variant_info_dic> 을 만들어 반환한다. "symbol", "strand", "impact", "hgnc_id",
+            "canonical"의 경우, vep 옵션에서 추가한 것으로, "Extra" column에서 필요한 key만 찾아 추출하였음
+            (dbparser.parse_vep_extra()). Revel의 경우, 추후 revel score를 저장하기 위한 용도.
 
         Args:
             var_row (list): splitted each file line
@@ -136,52 +277,15 @@ class VariantDF:
         >>> {
                 - "var_infos": ["1-21929260-A-G", "1", ["1234"], "5909", "NR_170901.1",
                             "intron_variant,non_coding_transcript_variant",
-                            "-", "-", "-", "-", "-", "-1", "RAP1GAP"]
+                            "-", "-", "-", "-", "-", "RAP1GAP", "-1", None, 0, 0, None,
+                            "MODIFIER", "9858", ""]
                 - "evidence_score_dic": dict(bool)
             }"""
 
-        # variable initialization
         variant_info_dic = {"var_infos": None, "evidence_score_dic": dict()}
-        gene_symbol = ""
-        strand = ""
-        revel = None
-        gnomad_ac = 0
-        gnomad_an = 0
-        gnomad_af = None
-
-        # variable assignment
-        chrom, location = var_row[file_col2idx["Location"]].split(":")
-        location = list(map(int, location.split("-")))  # [1234] or [1234, 1236]
-
-        if "SYMBOL=" in var_row[file_col2idx["Extra"]]:
-            gene_symbol = (
-                var_row[file_col2idx["Extra"]].split("SYMBOL=")[1].split(";")[0]
-            )
-        if "STRAND=" in var_row[file_col2idx["Extra"]]:
-            strand = (
-                var_row[file_col2idx["Extra"]].split("STRAND=")[1].split(";")[0]
-            )
-
-        var_infos = [
-            var_row[file_col2idx["Uploaded_variation"]],
-            chrom,
-            location,
-            var_row[file_col2idx["Gene"]],
-            var_row[file_col2idx["Feature"]],
-            var_row[file_col2idx["Consequence"]],
-            var_row[file_col2idx["cDNA_position"]],
-            var_row[file_col2idx["CDS_position"]],
-            var_row[file_col2idx["Protein_position"]],
-            var_row[file_col2idx["Amino_acids"]],
-            var_row[file_col2idx["Codons"]],
-            gene_symbol,
-            strand,
-            revel,
-            gnomad_ac,
-            gnomad_an,
-            gnomad_af,
-        ]
-        variant_info_dic["var_infos"] = var_infos
+        variant_info_dic["var_infos"] = dbparser.make_vep_var_infos(
+            var_row, [file_col2idx[col] for col in dbparser.VEP_COLUMNS]
+        )
 
         return variant_info_dic
 
@@ -226,65 +330,907 @@ def parse_vcf_genotype(vcf_file: str, family="") -> dict:
     return vcf_genotype_dic
 
 
-def main():
+def execute_acmg_rules(
+    proband_var_df: VariantDF, db_dic: dict, annotate: bool = True
+) -> VariantDF:
     """_summary_
-    : 환자와 부모의 VCF 파일을 VEP로 annotation한 파일을 parsing 하여, 각각의 변이 정보가 담긴 data
-    frame을 구성한다. 또한, 필요에 따라 다양한 데이터베이스(clinvar, spliceai 등..)를 파징하여 dictionary
-    형식으로 저장하거나 VariantDF.variant_dic에 정보를 추가한다. ACMG rule을 구현한 모듈들에서 각 변이를
-    분석하여 rule들을 할당한 뒤, update 된 VariantDF object 를 반환한다.
-
-    최종적으로, 각각의 변이에 할당된 evidence rule 수를 바탕으로 bayesian framework를 이용하여 pathogenicity
-    를 판별한 뒤, 이를 내림차순으로 출력한다.
-    """
-
-    # VEP annotated VCF 파일을 저장하는 과정
-    proband_var_df = VariantDF()
-    proband_var_df.parse_variant_file(PROBAND_VEP)
+    Note:
+        ACMG rule을 구현한 각 모듈을 순서대로 실행하여, 각 변이에 rule을 할당한다. annotate가 False 이면,
+        revel, gnomad 값이 이미 variant_infos에 추가되어 있다고 보고 데이터베이스를 다시 읽지 않는다.
 
-    # de novo 판정을 위한 genotype 정보 저장하는 과정
-    proband_genotype_dic = parse_vcf_genotype(PROBAND_VCF)
-    father_genotype_dic = parse_vcf_genotype(FATHER_VCF, "F")
-    mother_genotype_dic = parse_vcf_genotype(MOTHER_VCF, "M")
+    Args:
+        proband_var_df (VariantDF): 환자의 VariantDF
+        db_dic (dict): main()에서 parsing 한 데이터베이스 및 genotype dictionary
+            { "spliceai_db_dic", "clinvar_db_dic", "clinvar_col2idx", "gene_mechanism_dic",
+              "gene_mechanism_col2idx", "disease_db_dic", "disease_col2idx", "repeat_db_dic",
+              "repeat_index_dic", "proband_genotype_dic", "father_genotype_dic",
+              "mother_genotype_dic", "trio_var2idx", "trio_is_de_novo" }
+        annotate (bool): revel, gnomad 값을 variant_infos에 추가할지 여부
 
-    # 데이터베이스 전처리 과정
-    spliceai_db_dic = dbparser.parse_spliceai_db(SPLICEAI_DB)
-    clinvar_db_dic, clinvar_col2idx = dbparser.parse_clinvar_db(CLINVAR_DB)
-    disease_db_dic, disease_col2idx = dbparser.parse_disease_db(DISEASE_DB)
-    repeat_db_dic = dbparser.parse_repeatmasker_db(REPEAT_DB)
+    Returns:
+        VariantDF: evidence_score_dic 이 update 된 VariantDF
+    """
 
     # ACMG module
     # revel-5분. pp3 4210, bp4 728559, bp7 70829
-    proband_var_df = pp3bp4bp7.execute(proband_var_df, spliceai_db_dic)
+    proband_var_df = pp3bp4bp7.execute(
+        proband_var_df, db_dic["spliceai_db_dic"], annotate
+    )
     # pp2 2335, bp1 7766
     proband_var_df = pp2bp1.execute(
-        proband_var_df, clinvar_db_dic, clinvar_col2idx
+        proband_var_df,
+        db_dic["clinvar_db_dic"],
+        db_dic["clinvar_col2idx"],
+        db_dic["gene_mechanism_dic"],
+        db_dic["gene_mechanism_col2idx"],
     )
     # pvs1 176.
     proband_var_df = pvs1.execute(
         proband_var_df,
-        clinvar_db_dic,
-        clinvar_col2idx,
-        disease_db_dic,
-        disease_col2idx,
+        db_dic["clinvar_db_dic"],
+        db_dic["clinvar_col2idx"],
+        db_dic["disease_db_dic"],
+        db_dic["disease_col2idx"],
+        db_dic["gene_mechanism_dic"],
+        db_dic["gene_mechanism_col2idx"],
     )
     # gnomad-1시간. pm2 1894, ba1 525127, bs1 12380
     proband_var_df = pm2ba1bs1.execute(
-        proband_var_df, disease_db_dic, disease_col2idx
+        proband_var_df,
+        db_dic["disease_db_dic"],
+        db_dic["disease_col2idx"],
+        annotate,
     )
     # 약 14초. ps1 = 77, pm5 = 310(ps1 과 중복상태), pp5 =  88, bp6 =  170850
     proband_var_df = ps1pm5pp5bp6.execute(
-        proband_var_df, clinvar_db_dic, clinvar_col2idx
+        proband_var_df, db_dic["clinvar_db_dic"], db_dic["clinvar_col2idx"]
     )
     # 8초. ps2 33492(vcf = 2851개) de novo
-    proband_var_df = ps2.execute(
-        proband_var_df,
-        proband_genotype_dic,
-        father_genotype_dic,
-        mother_genotype_dic,
-    )
+    # (염색체 별로 나눈 경우, 해당 shard에 있는 변이의 genotype만 사용)
+    variant_dic = proband_var_df.variant_dic
+    if db_dic.get("trio_is_de_novo") is not None:  # joint-call trio VCF, quality filter 적용
+        proband_var_df = ps2.execute_trio(
+            proband_var_df, db_dic["trio_var2idx"], db_dic["trio_is_de_novo"]
+        )
+    else:
+        proband_var_df = ps2.execute(
+            proband_var_df,
+            {
+                var_id: gt
+                for var_id, gt in db_dic["proband_genotype_dic"].items()
+                if var_id in variant_dic
+            },
+            db_dic["father_genotype_dic"],
+            db_dic["mother_genotype_dic"],
+        )
     # 약 20초. pm4 = 1261, bp3 = 766
-    proband_var_df = pm4bp3.execute(proband_var_df, repeat_db_dic)
-    bayesframe.calculate_acmg(proband_var_df, disease_db_dic)
+    proband_var_df = pm4bp3.execute(
+        proband_var_df, db_dic["repeat_db_dic"], db_dic["repeat_index_dic"]
+    )
+
+    return proband_var_df
+
+
+def split_variant_df(proband_var_df: VariantDF, n_shards: int) -> list:
+    """_summary_
+    Note:
+        병렬 실행을 위해, VariantDF를 염색체 별로 나눈다. 각 rule은 변이마다 독립적으로 계산되므로
+        어떤 방식으로 나누어도 결과는 같다. 1번 염색체처럼 변이가 많은 염색체는 작업량이 비슷하도록
+        변이 순서를 유지한 채로 여러 조각(genomic chunk)으로 다시 나눈다.
+
+    Args:
+        proband_var_df (VariantDF): 환자의 VariantDF
+        n_shards (int): 목표 shard 수 (대략적인 값)
+
+    Returns:
+        list: [VariantDF, ..] 각 shard의 VariantDF
+    """
+
+    variant_dic = proband_var_df.variant_dic
+
+    # {chrom: [var_id, ..]}, 1-69270-A-G -> "1"
+    chrom_var_ids = defaultdict(list)
+    for var_id in variant_dic:
+        chrom_var_ids[var_id.split("-")[0]].append(var_id)
+
+    max_shard_size = max(1, -(-len(variant_dic) // max(1, n_shards)))
+
+    shard_dfs = []
+    for var_ids in chrom_var_ids.values():
+        for i in range(0, len(var_ids), max_shard_size):
+            shard_df = VariantDF()
+            shard_df.df_col2idx = proband_var_df.df_col2idx
+            shard_df.variant_dic = {
+                var_id: variant_dic[var_id]
+                for var_id in var_ids[i : i + max_shard_size]
+            }
+            shard_dfs.append(shard_df)
+
+    return shard_dfs
+
+
+def merge_variant_dfs(proband_var_df: VariantDF, shard_dfs: list) -> VariantDF:
+    """_summary_
+    Note:
+        각 shard에서 rule이 할당된 결과를 하나의 VariantDF로 합친다. 결과 파일의 순서가 순차 실행과
+        같도록, 원래 variant_dic의 변이 순서대로 다시 저장한다.
+
+    Args:
+        proband_var_df (VariantDF): 나누기 전의 VariantDF
+        shard_dfs (list): [VariantDF, ..] rule이 할당된 각 shard의 VariantDF
+
+    Returns:
+        VariantDF: 모든 shard의 결과가 합쳐진 VariantDF
+    """
+
+    shard_variant_dic = dict()
+    for shard_df in shard_dfs:
+        shard_variant_dic.update(shard_df.variant_dic)
+
+    variant_dic = defaultdict(dict)
+    for var_id in proband_var_df.variant_dic:
+        variant_dic[var_id] = shard_variant_dic[var_id]
+    proband_var_df.variant_dic = variant_dic
+
+    return proband_var_df
+
+
+# 병렬 실행 시, fork 된 각 process가 복사하지 않고 공유하는(copy-on-write) 데이터베이스
+SHARED_DB_DIC: dict = None
+
+
+def execute_acmg_rules_shard(shard_df: VariantDF) -> VariantDF:
+    """ProcessPoolExecutor의 각 process에서 실행되는 함수. 데이터베이스는 SHARED_DB_DIC을 사용한다."""
+
+    return execute_acmg_rules(shard_df, SHARED_DB_DIC, annotate=False)
+
+
+def execute_acmg_rules_parallel(
+    proband_var_df: VariantDF, db_dic: dict, jobs: int, annotate: bool = True
+) -> VariantDF:
+    """_summary_
+    Note:
+        VariantDF를 염색체(또는 genomic chunk) 별로 나누어, 각 shard의 ACMG rule 할당을 여러 process에서
+        동시에 실행한다. revel, gnomad 값은 파일을 한 번만 읽도록 나누기 전에 미리 추가한다.
+
+        데이터베이스는 process를 만들기 전에 module 변수(SHARED_DB_DIC)에 저장하여, fork 된 process들이
+        복사 없이 공유하도록(copy-on-write) 하였다. 각 process에는 shard의 variant_dic 만 전달된다.
+
+        다른 thread가 lock을 가진 상태에서 fork 하면 process가 멈출 수 있으므로, 다른 thread가 실행 중이지
+        않은 thread에서 호출해야 한다 (pipeline에서는 rules 단계를 main_thread로 실행한다).
+
+    Args:
+        proband_var_df (VariantDF): 환자의 VariantDF
+        db_dic (dict): main()에서 parsing 한 데이터베이스 및 genotype dictionary
+        jobs (int): 동시에 실행할 process 수
+        annotate (bool): revel, gnomad 값을 variant_infos에 추가할지 여부
+
+    Returns:
+        VariantDF: evidence_score_dic 이 update 된 VariantDF
+    """
+
+    global SHARED_DB_DIC
+
+    # 데이터베이스 파일(revel, gnomad)은 전체 변이에 대해 한 번만 읽는다.
+    if annotate:
+        add_gnomad_revel_into_var_infos(proband_var_df)
+
+    SHARED_DB_DIC = db_dic
+    shard_dfs = split_variant_df(proband_var_df, jobs * 4)
+    with ProcessPoolExecutor(
+        max_workers=jobs, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        shard_dfs = list(executor.map(execute_acmg_rules_shard, shard_dfs))
+    SHARED_DB_DIC = None
+
+    return merge_variant_dfs(proband_var_df, shard_dfs)
+
+
+def add_gnomad_revel_into_var_infos(proband_var_df: VariantDF) -> VariantDF:
+    """_summary_
+    Note:
+        gnomad 파일(압축 해제)과 REVEL 파일(text 읽기)을 두 thread에서 동시에 읽는다. 각 thread는
+        variant_dic을 수정하지 않고 찾은 값을 각자의 list에 모으며 (pm2ba1bs1.scan_gnomad(),
+        pp3bp4bp7.scan_revel()), 두 검색이 끝난 뒤 variant_infos에 차례로 합친다. 따라서 var_infos를
+        동시에 수정하지 않으며, 결과는 두 파일을 차례로 읽는 것과 같다.
+
+    Args:
+        proband_var_df (VariantDF): 환자의 VariantDF
+
+    Returns:
+        VariantDF: revel, gnomad 값이 추가된 VariantDF
+    """
+
+    variant_dic = proband_var_df.variant_dic
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        gnomad_future = executor.submit(pm2ba1bs1.scan_gnomad, variant_dic)
+        revel_future = executor.submit(pp3bp4bp7.scan_revel, variant_dic)
+        gnomad_records = gnomad_future.result()
+        revel_records = revel_future.result()
+
+    pm2ba1bs1.merge_gnomad_records(
+        variant_dic, gnomad_records, proband_var_df.df_col2idx
+    )
+    pp3bp4bp7.merge_revel_records(variant_dic, revel_records, proband_var_df.df_col2idx)
+
+    return proband_var_df
+
+
+def annotate_variant_df(proband_var_df: VariantDF) -> dict:
+    """_summary_
+    Note:
+        gnomad, REVEL, SpliceAI 데이터베이스를 환자 변이와 함께 위치 순으로 한 번에 읽어서(merge-join),
+        revel, gnomad 값을 variant_infos에 추가하고 환자 변이의 SpliceAI dictionary를 만든다.
+        각 데이터베이스를 따로 전체 탐색하지 않으며, tabix index가 있는 파일은 필요한 구간만 읽는다.
+        (annotator.annotate_variants())
+
+        ClinVar 데이터베이스는 위치가 아닌 gene_symbol 기준으로 정리되어 있으므로 포함하지 않았다.
+
+    Args:
+        proband_var_df (VariantDF): 환자의 VariantDF
+
+    Returns:
+        dict: spliceai_db_dic (dbparser.parse_spliceai_db()와 같은 형식)
+    """
+
+    variant_dic = proband_var_df.variant_dic
+    df_col2idx = proband_var_df.df_col2idx
+    spliceai_db_dic = dict()
+
+    def update_gnomad(var_id: str, row: list):
+        # CHROM POS ID REF ALT QUAL FILTER INFO
+        pm2ba1bs1.update_gnomad_var_infos(
+            variant_dic, var_id, pm2ba1bs1.parse_gnomad_info(row[7]), df_col2idx
+        )
+
+    def update_revel(var_id: str, row: list):
+        # column 위치는 REVEL header (chr,hg19_pos,..,REVEL,Ensembl_transcriptid)에서 찾는다.
+        col2idx = revel_source.col2idx
+        pp3bp4bp7.update_revel_var_infos(
+            variant_dic,
+            var_id,
+            float(row[col2idx["REVEL"]]),
+            row[col2idx["Ensembl_transcriptid"]].split(";"),
+            df_col2idx,
+        )
+
+    def update_spliceai(var_id: str, row: list):
+        spliceai_db_dic[var_id] = dbparser.make_spliceai_var_info_dic(
+            row, {"INFO": 7}
+        )
+
+    revel_source = annotator.AnnotationSource(
+        "revel", pp3bp4bp7.REVEL_DB, update_revel, sep=",", header="chr"
+    )
+    annotator.annotate_variants(
+        variant_dic,
+        [
+            revel_source,
+            annotator.AnnotationSource("gnomad", pm2ba1bs1.GNOMAD_DB, update_gnomad),
+            annotator.AnnotationSource("spliceai", SPLICEAI_DB, update_spliceai),
+        ],
+    )
+
+    return spliceai_db_dic
+
+
+def load_pipeline_config(config_file: str) -> dict:
+    """_summary_
+    Note:
+        실행 설정 파일(JSON)을 읽는다. "paths"는 PATH_CONFIG_DIC의 이름 별 파일 경로, "options"는
+        명령행 옵션의 기본값 (argparse dest 이름, e.g. "jobs", "single_pass")이다. 상대 경로는 설정 파일이
+        있는 directory를 기준으로 바꾼다.
+
+    Args:
+        config_file (str): config file address
+
+    Raises:
+        ValueError: 설정 파일에 알 수 없는 항목이 있는 경우
+
+    Returns:
+        dict: {"paths": {이름: 경로}, "options": {dest: 값}}
+
+    Examples:
+        >>> {
+                "paths": {"proband_vep": "input/proband.txt", "gnomad_db": "/db/gnomad.vcf.gz"},
+                "options": {"jobs": 8, "output": "result.txt.gz"}
+            }
+    """
+
+    with open(config_file) as infile:
+        config_dic = json.load(infile)
+
+    unknown_keys = set(config_dic) - {"paths", "options"}
+    if unknown_keys:
+        raise ValueError(f"unknown config sections: {sorted(unknown_keys)}")
+
+    config_dir = os.path.dirname(os.path.abspath(config_file))
+    path_dic = {
+        name: os.path.join(config_dir, filename)
+        for name, filename in config_dic.get("paths", {}).items()
+    }
+
+    return {"paths": path_dic, "options": config_dic.get("options", {})}
+
+
+def check_config_options(actions: list, option_dic: dict):
+    """_summary_
+    Note:
+        설정 파일의 options는 parser.set_defaults()로 기본값이 되므로 argparse의 choices 검사를 거치지
+        않는다. 명령행 옵션과 같이 dest 이름과 choices를 확인한다 (None은 기본값으로 둔다).
+
+    Args:
+        actions (list): argparse parser의 action (parser._actions)
+        option_dic (dict): load_pipeline_config()의 "options"
+
+    Raises:
+        ValueError: 알 수 없는 option 이거나, choices에 없는 값인 경우
+    """
+
+    action_dic = {action.dest: action for action in actions}
+    unknown_options = set(option_dic) - set(action_dic)
+    if unknown_options:
+        raise ValueError(f"unknown options: {sorted(unknown_options)}")
+
+    for dest, value in option_dic.items():
+        choices = action_dic[dest].choices
+        if choices is not None and value is not None and value not in choices:
+            raise ValueError(f"invalid choice for {dest}: {value!r} (choose from {list(choices)})")
+
+
+def apply_path_config(path_dic: dict):
+    """_summary_
+    Note:
+        {이름: 경로}로 받은 파일 경로를 PATH_CONFIG_DIC의 module 변수에 저장한다. rule 모듈은 실행할 때
+        module 변수를 읽으므로, pipeline을 만들기 전에 호출한다.
+
+    Args:
+        path_dic (dict): {"proband_vep": "/data/proband.txt", "gnomad_db": ..}
+
+    Raises:
+        ValueError: PATH_CONFIG_DIC에 없는 이름인 경우
+    """
+
+    for name, filename in path_dic.items():
+        if name not in PATH_CONFIG_DIC:
+            raise ValueError(
+                f"unknown path name: {name} (use {', '.join(PATH_CONFIG_DIC)})"
+            )
+        namespace, attr = PATH_CONFIG_DIC[name]
+        namespace[attr] = filename
+
+
+def build_pipeline_stages(args: argparse.Namespace, parse_db: object) -> dict:
+    """_summary_
+    Note:
+        main()의 분석 과정을 단계(pipeline.Stage) 별로 나눈 dependency graph를 만든다.
+
+        load_vep ──┬─ annotate_gnomad ─┐
+                   └─ annotate_revel ──┴─ annotate ─┐
+        load_spliceai ──────────────────────────────┤
+        load_genotype, load_clinvar, load_repeat ───┴─ rules ─ write
+        load_disease ──────────────────────────────────┴────────┘
+
+        서로 의존하지 않는 단계(gnomad, REVEL 검색, 데이터베이스 parsing)는 동시에 실행된다. gnomad, REVEL
+        검색 단계는 찾은 값만 반환하고, annotate 단계에서 variant_infos에 합친다.
+        --single-pass 이면 annotate 단계에서 gnomad, REVEL, SpliceAI를 한 번에 읽는다.
+        rule들은 evidence_score_dic에 저장되는 순서가 결과 파일의 rule 순서가 되므로, 한 단계(rules)에서
+        정해진 순서대로 실행한다 (--jobs, --columnar 는 이 단계 안에서 적용된다). --jobs 이면 process를
+        fork 하므로, rules 단계는 다른 단계의 thread가 모두 끝난 뒤 main thread에서 실행한다.
+        load_vep, annotate, rules 단계는 --checkpoint-dir 에 결과를 저장하여 다음 실행에서 다시 사용한다.
+
+    Args:
+        args (argparse.Namespace): main()의 명령행 옵션
+        parse_db (object): cache를 사용하는 database parser (main())
+
+    Returns:
+        dict: {stage 이름: pipeline.Stage}
+    """
+
+    def load_vep(results: dict) -> object:
+        # VEP annotated VCF 파일을 저장하는 과정
+        if args.columnar:
+            proband_var_df = columnar.ColumnarVariantDF()
+        else:
+            proband_var_df = VariantDF()
+        proband_var_df.parse_variant_file(PROBAND_VEP)
+        return proband_var_df
+
+    def load_genotype(results: dict) -> dict:
+        # de novo 판정을 위한 genotype 정보 저장하는 과정
+        if not args.trio_vcf:
+            return {
+                "proband_genotype_dic": parse_vcf_genotype(PROBAND_VCF),
+                "father_genotype_dic": parse_vcf_genotype(FATHER_VCF, "F"),
+                "mother_genotype_dic": parse_vcf_genotype(MOTHER_VCF, "M"),
+                "trio_var2idx": None,
+                "trio_is_de_novo": None,
+            }
+
+        # joint-call VCF 하나에서 환자와 부모의 GT를 한 번에 읽는다.
+        if args.samples:
+            trio_samples = args.samples.split(",")
+        else:
+            trio_samples = genotype.parse_ped_file(args.ped, args.proband)
+        trio_var2idx, trio_array_dic = genotype.parse_trio_vcf(
+            args.trio_vcf, trio_samples
+        )
+        genotype_dic = {
+            f"{member}_genotype_dic": genotype.make_genotype_dic(
+                trio_var2idx, trio_array_dic["gt"], member
+            )
+            for member in genotype.TRIO_MEMBERS
+        }
+        genotype_dic["trio_var2idx"] = trio_var2idx
+        # 모든 변이의 de novo 여부를 한 번에 계산 (ps2)
+        genotype_dic["trio_is_de_novo"] = ps2.call_de_novo(
+            trio_array_dic, args.min_dp, args.min_gq, args.min_ab, args.max_parent_ab
+        )
+        return genotype_dic
+
+    def load_clinvar(results: dict) -> dict:
+        clinvar_db_dic, clinvar_col2idx = parse_db(
+            CLINVAR_DB, dbparser.parse_clinvar_db
+        )
+        # 유전자 별 질병 원인 메커니즘 (pp2bp1, pvs1). ClinVar 파일과 함께 cache 된다.
+        gene_mechanism_dic, gene_mechanism_col2idx = parse_db(
+            CLINVAR_DB,
+            lambda filename: dbparser.make_gene_mechanism_dic(
+                clinvar_db_dic, clinvar_col2idx
+            ),
+            "ACMG.helper.dbparser.make_gene_mechanism_dic",
+        )
+        return {
+            "clinvar_db_dic": clinvar_db_dic,
+            "clinvar_col2idx": clinvar_col2idx,
+            "gene_mechanism_dic": gene_mechanism_dic,
+            "gene_mechanism_col2idx": gene_mechanism_col2idx,
+        }
+
+    def load_disease(results: dict) -> dict:
+        disease_db_dic, disease_col2idx = parse_db(
+            DISEASE_DB, dbparser.parse_disease_db
+        )
+        return {"disease_db_dic": disease_db_dic, "disease_col2idx": disease_col2idx}
+
+    def load_repeat(results: dict) -> dict:
+        repeat_db_dic = parse_db(REPEAT_DB, dbparser.parse_repeatmasker_db)
+        # 반복서열 구간 검색용 index (pm4bp3). RepeatMasker 파일과 함께 cache 된다.
+        repeat_index_dic = parse_db(
+            REPEAT_DB,
+            lambda filename: pm4bp3.make_repeat_index_dic(repeat_db_dic),
+            "ACMG.rules.pm4bp3.make_repeat_index_dic",
+        )
+        return {"repeat_db_dic": repeat_db_dic, "repeat_index_dic": repeat_index_dic}
+
+    def load_spliceai(results: dict) -> dict:
+        return parse_db(SPLICEAI_DB, dbparser.parse_spliceai_db)
+
+    # gnomad, REVEL 검색은 variant_dic을 수정하지 않고 각자의 list에 결과를 모으므로 동시에 실행할 수 있다.
+    # 두 검색이 끝나면 annotate 단계에서 variant_infos에 합친다 (add_gnomad_revel_into_var_infos()).
+    def annotate_gnomad(results: dict) -> list:
+        return pm2ba1bs1.scan_gnomad(results["load_vep"].variant_dic)
+
+    def annotate_revel(results: dict) -> list:
+        return pp3bp4bp7.scan_revel(results["load_vep"].variant_dic)
+
+    def annotate(results: dict) -> dict:
+        proband_var_df = results["load_vep"]
+        if args.single_pass:  # gnomad, REVEL, SpliceAI를 위치 순으로 한 번에 읽어서 추가
+            spliceai_db_dic = annotate_variant_df(proband_var_df)
+        else:
+            pm2ba1bs1.merge_gnomad_records(
+                proband_var_df.variant_dic,
+                results["annotate_gnomad"],
+                proband_var_df.df_col2idx,
+            )
+            pp3bp4bp7.merge_revel_records(
+                proband_var_df.variant_dic,
+                results["annotate_revel"],
+                proband_var_df.df_col2idx,
+            )
+            spliceai_db_dic = results["load_spliceai"]
+        return {"proband_var_df": proband_var_df, "spliceai_db_dic": spliceai_db_dic}
+
+    def rules(results: dict) -> object:
+        proband_var_df = results["annotate"]["proband_var_df"]
+        db_dic = {"spliceai_db_dic": results["annotate"]["spliceai_db_dic"]}
+        for name in ["load_genotype", "load_clinvar", "load_disease", "load_repeat"]:
+            db_dic.update(results[name])
+
+        # transcript 줄이기. revel 값은 transcript 별로 다르므로, annotate 단계 뒤에 줄인다.
+        if args.collapse_transcripts:
+            proband_var_df.collapse_transcripts(args.collapse_transcripts)
+
+        # ACMG module (revel, gnomad 값은 annotate 단계에서 추가되었다)
+        if args.columnar:  # column 전체에 대한 numpy 연산으로 rule 할당
+            proband_var_df = vectorized.execute(proband_var_df, db_dic, annotate=False)
+        elif args.jobs > 1:
+            proband_var_df = execute_acmg_rules_parallel(
+                proband_var_df, db_dic, args.jobs, annotate=False
+            )
+        else:
+            proband_var_df = execute_acmg_rules(proband_var_df, db_dic, annotate=False)
+
+        if args.collapse_transcripts:  # 합친 transcript를 되살린다 (dedupe)
+            proband_var_df.expand_transcripts()
+        if args.memo_stats:
+            print(memo.format_memo_stats())
+        return proband_var_df
+
+    def write(results: dict):
+        bayesframe.calculate_acmg(
+            results["rules"],
+            results["load_disease"]["disease_db_dic"],
+            args.output,
+            results["load_disease"]["disease_col2idx"],
+            prior_p=args.prior_p,
+            Opvs=args.opvs,
+            top_k=args.top_k,
+            min_class=args.min_class,
+            group_by=args.best_per,
+        )
+
+    if args.trio_vcf:
+        genotype_files = [args.trio_vcf] + ([args.ped] if args.ped else [])
+    else:
+        genotype_files = [PROBAND_VCF, FATHER_VCF, MOTHER_VCF]
+
+    stages = [
+        pipeline.Stage(
+            "load_vep",
+            load_vep,
+            input_files=[PROBAND_VEP],
+            params=(args.columnar,),
+            checkpoint=True,
+        ),
+        pipeline.Stage(
+            "load_genotype",
+            load_genotype,
+            input_files=genotype_files,
+            params=(
+                args.samples,
+                args.proband,
+                args.min_dp,
+                args.min_gq,
+                args.min_ab,
+                args.max_parent_ab,
+            ),
+        ),
+        pipeline.Stage("load_clinvar", load_clinvar, input_files=[CLINVAR_DB]),
+        pipeline.Stage("load_disease", load_disease, input_files=[DISEASE_DB]),
+        pipeline.Stage("load_repeat", load_repeat, input_files=[REPEAT_DB]),
+    ]
+    if args.single_pass:
+        stages.append(
+            pipeline.Stage(
+                "annotate",
+                annotate,
+                deps=["load_vep"],
+                input_files=[pp3bp4bp7.REVEL_DB, pm2ba1bs1.GNOMAD_DB, SPLICEAI_DB],
+                params=(args.single_pass,),
+                checkpoint=True,
+            )
+        )
+    else:
+        stages += [
+            pipeline.Stage("load_spliceai", load_spliceai, input_files=[SPLICEAI_DB]),
+            # store는 directory가 아닌 meta.json (마지막에 다시 쓰며, 원본 파일의 key 포함)으로 확인한다.
+            # directory의 수정 시간은 안의 파일을 덮어써도 바뀌지 않는다.
+            pipeline.Stage(
+                "annotate_gnomad",
+                annotate_gnomad,
+                deps=["load_vep"],
+                input_files=[
+                    pm2ba1bs1.GNOMAD_DB,
+                    os.path.join(pm2ba1bs1.GNOMAD_STORE, "meta.json"),
+                ],
+            ),
+            pipeline.Stage(
+                "annotate_revel",
+                annotate_revel,
+                deps=["load_vep"],
+                input_files=[
+                    pp3bp4bp7.REVEL_DB,
+                    os.path.join(pp3bp4bp7.REVEL_STORE, "meta.json"),
+                ],
+            ),
+            pipeline.Stage(
+                "annotate",
+                annotate,
+                deps=["load_vep", "annotate_gnomad", "annotate_revel", "load_spliceai"],
+                params=(args.single_pass,),
+                checkpoint=True,
+            ),
+        ]
+    stages += [
+        pipeline.Stage(
+            "rules",
+            rules,
+            deps=[
+                "annotate",
+                "load_genotype",
+                "load_clinvar",
+                "load_disease",
+                "load_repeat",
+            ],
+            params=(args.collapse_transcripts,),
+            checkpoint=True,
+            # --jobs: 다른 thread가 없는 main thread에서 process를 fork 한다.
+            main_thread=args.jobs > 1,
+        ),
+        pipeline.Stage("write", write, deps=["rules", "load_disease"]),
+    ]
+
+    return {stage.name: stage for stage in stages}
+
+
+def main():
+    """_summary_
+    : 환자와 부모의 VCF 파일을 VEP로 annotation한 파일을 parsing 하여, 각각의 변이 정보가 담긴 data
+    frame을 구성한다. 또한, 필요에 따라 다양한 데이터베이스(clinvar, spliceai 등..)를 파징하여 dictionary
+    형식으로 저장하거나 VariantDF.variant_dic에 정보를 추가한다. ACMG rule을 구현한 모듈들에서 각 변이를
+    분석하여 rule들을 할당한 뒤, update 된 VariantDF object 를 반환한다.
+
+    최종적으로, 각각의 변이에 할당된 evidence rule 수를 바탕으로 bayesian framework를 이용하여 pathogenicity
+    를 판별한 뒤, 이를 내림차순으로 출력한다.
+
+    --jobs N 옵션을 주면, 변이들을 염색체 별로 나누어 N개의 process에서 동시에 rule을 할당한다.
+    (python -m ACMG --jobs 32)
+    --single-pass 옵션을 주면, gnomad, REVEL, SpliceAI 데이터베이스를 위치 순으로 한 번에 읽어서 추가한다.
+    파싱한 데이터베이스(ClinVar, disease, RepeatMasker, SpliceAI)는 cache 파일로 저장되어, 다음 실행부터는
+    다시 파싱하지 않는다. (--no-db-cache, --db-cache-dir)
+    --columnar 옵션을 주면, 변이 정보를 column array (columnar.ColumnarVariantDF)로 저장하여 메모리를 줄이고,
+    rule들을 column 전체에 대한 numpy 연산으로 계산한다(rules.vectorized).
+    --trio-vcf 옵션을 주면, 환자와 부모의 GT를 joint-call 된 VCF 하나에서 한 번에 읽는다. 환자와 부모의
+    sample 이름은 --ped (PED 파일, 필요하면 --proband) 또는 --samples PROBAND,FATHER,MOTHER 로 지정한다.
+    이 때 ps2는 부모가 0/0 으로 불렸는지와 DP, GQ, allele balance filter를 함께 확인한다.
+    (--min-dp, --min-gq, --min-ab, --max-parent-ab)
+    --output 으로 결과 파일의 위치와 형식을 정한다 (.txt: tab 형식, .txt.gz: bgzip 압축, .parquet: Parquet).
+    --prior-p, --opvs 로 bayesian framework의 prior probability와 Opvs를 바꿀 수 있다.
+    --collapse-transcripts 옵션을 주면, rule을 할당하기 전에 변이 별 transcript 수를 줄인다.
+    (dedupe: rule이 읽는 값이 같은 transcript는 한 번만 계산한 뒤 결과를 복사, canonical: MANE/canonical
+    transcript만 사용. VariantDF.collapse_transcripts())
+    pm2/bs1, pp2/bp1, ps1/pm5, pp5/bp6 rule의 결과는 입력값 별로 LRU cache (memo.LruMemo)에 저장해 두고
+    다시 사용한다. --memo-size 로 cache 크기를 정하며 (0 이면 사용하지 않음), --memo-stats 옵션을 주면
+    rule 별 cache 사용 횟수를 출력한다. (--jobs 로 나누어 실행하면 각 process의 횟수는 합쳐지지 않는다)
+    --min-class, --best-per, --top-k 로 결과를 줄일 수 있다. 해당 class 이상인 row만, 변이 또는 유전자 별로
+    posterior가 가장 높은 row만, posterior가 가장 높은 k개 row만 (내림차순) 저장한다.
+
+    분석은 단계(load, annotate_gnomad, annotate_revel, rules, write 등) 별 dependency graph로 실행되며
+    (build_pipeline_stages()), 서로 의존하지 않는 단계는 --stage-threads 개까지 동시에 실행된다.
+    --config 로 입력 및 데이터베이스 경로("paths")와 옵션 기본값("options")을 JSON 파일에서 읽고,
+    --path NAME=FILE 로 경로 하나를 바꿀 수 있다. --stage 로 일부 단계만 실행하고 (--list-stages),
+    --checkpoint-dir 을 주면 입력 파일과 옵션이 바뀌지 않은 단계는 다음 실행에서 다시 실행하지 않는다.
+    (python -m ACMG --config trio.json --checkpoint-dir ckpt --prior-p 0.2)
+    bgzip (BGZF) 압축 데이터베이스를 처음부터 끝까지 읽을 때는 --gz-threads 개의 thread에서 block 압축을 해제한다.
+    """
+
+    parser = argparse.ArgumentParser(prog="ACMG")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of processes for chromosome-sharded rule execution",
+    )
+    parser.add_argument(
+        "--single-pass",
+        action="store_true",
+        help="annotate gnomAD, REVEL and SpliceAI in one sorted merge pass",
+    )
+    parser.add_argument(
+        "--no-db-cache",
+        action="store_true",
+        help="always re-parse the databases instead of using the on-disk cache",
+    )
+    parser.add_argument(
+        "--db-cache-dir",
+        default=None,
+        help="directory for the parsed database cache (default: next to each database)",
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="store variants in a compact struct-of-arrays table instead of nested dicts",
+    )
+    parser.add_argument(
+        "--trio-vcf",
+        default=None,
+        help="joint-called VCF with the proband and both parents (plain or bgzipped)",
+    )
+    parser.add_argument(
+        "--ped",
+        default=None,
+        help="PED file naming the proband and parents in --trio-vcf",
+    )
+    parser.add_argument(
+        "--proband",
+        default=None,
+        help="proband sample in --ped (default: the only sample with both parents)",
+    )
+    parser.add_argument(
+        "--samples",
+        default=None,
+        help="PROBAND,FATHER,MOTHER sample names in --trio-vcf (instead of --ped)",
+    )
+    parser.add_argument(
+        "--min-dp",
+        type=int,
+        default=ps2.DE_NOVO_FILTER_DIC["min_dp"],
+        help="minimum trio read depth for de novo (PS2) calls with --trio-vcf",
+    )
+    parser.add_argument(
+        "--min-gq",
+        type=int,
+        default=ps2.DE_NOVO_FILTER_DIC["min_gq"],
+        help="minimum trio genotype quality for de novo (PS2) calls with --trio-vcf",
+    )
+    parser.add_argument(
+        "--min-ab",
+        type=float,
+        default=ps2.DE_NOVO_FILTER_DIC["min_ab"],
+        help="minimum proband allele balance for de novo (PS2) calls with --trio-vcf",
+    )
+    parser.add_argument(
+        "--max-parent-ab",
+        type=float,
+        default=ps2.DE_NOVO_FILTER_DIC["max_parent_ab"],
+        help="maximum parental allele balance for de novo (PS2) calls with --trio-vcf",
+    )
+    parser.add_argument(
+        "--output",
+        default=bayesframe.ACMG_RESULT_FILE,
+        help="result file; .gz/.bgz writes bgzipped TSV, .parquet writes Parquet (needs pyarrow)",
+    )
+    parser.add_argument(
+        "--prior-p",
+        type=float,
+        default=bayesframe.PRIOR_P,
+        help="prior probability of pathogenicity for the Bayesian score",
+    )
+    parser.add_argument(
+        "--opvs",
+        type=float,
+        default=bayesframe.OPVS,
+        help="odds of pathogenicity for very strong evidence",
+    )
+    parser.add_argument(
+        "--collapse-transcripts",
+        default=None,
+        choices=TRANSCRIPT_COLLAPSE_MODES,
+        help="evaluate rules once per group of equivalent transcripts (dedupe) "
+        "or only on MANE/canonical transcripts (canonical)",
+    )
+    parser.add_argument(
+        "--memo-size",
+        type=int,
+        default=memo.MEMO_MAXSIZE,
+        help="entries kept per rule predicate LRU cache (0 disables caching)",
+    )
+    parser.add_argument(
+        "--memo-stats",
+        action="store_true",
+        help="print hit/miss counts of the rule predicate caches",
+    )
+    parser.add_argument(
+        "--min-class",
+        default=None,
+        choices=bayesframe.PATHOGENICITY_CLASSES,
+        help="write only rows at or above this pathogenicity class",
+    )
+    parser.add_argument(
+        "--best-per",
+        default=None,
+        choices=["variant", "gene"],
+        help="write only the highest-posterior transcript row per variant or per gene",
+    )
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=None,
+        help="write only the K highest-posterior rows, sorted by posterior",
+    )
+    parser.add_argument(
+        "--config",
+        default=None,
+        help="JSON file with input/database \"paths\" and default \"options\"",
+    )
+    parser.add_argument(
+        "--path",
+        action="append",
+        default=[],
+        metavar="NAME=FILE",
+        help=f"override one input or database path ({', '.join(PATH_CONFIG_DIC)})",
+    )
+    parser.add_argument(
+        "--stage",
+        action="append",
+        default=None,
+        help="run only this stage and the stages it needs (repeatable, see --list-stages)",
+    )
+    parser.add_argument(
+        "--list-stages",
+        action="store_true",
+        help="print the pipeline stages and their dependencies, then exit",
+    )
+    parser.add_argument(
+        "--stage-threads",
+        type=int,
+        default=4,
+        help="number of independent stages run at the same time",
+    )
+    parser.add_argument(
+        "--gz-threads",
+        type=int,
+        default=dbparser.GZ_READ_THREADS,
+        help="threads used to decompress bgzip (BGZF) databases in full-file scans",
+    )
+    parser.add_argument(
+        "--checkpoint-dir",
+        default=None,
+        help="save stage results here and skip stages whose inputs and options are "
+        "unchanged on the next run (clear it after upgrading ACMG)",
+    )
+    args = parser.parse_args()
+
+    # 설정 파일의 options는 명령행 옵션의 기본값이 된다 (명령행에 준 옵션이 우선).
+    path_dic = dict()
+    if args.config:
+        try:
+            config_dic = load_pipeline_config(args.config)
+            check_config_options(parser._actions, config_dic["options"])
+        except (OSError, ValueError) as error:
+            parser.error(f"--config: {error}")
+        parser.set_defaults(**config_dic["options"])
+        args = parser.parse_args()
+        path_dic.update(config_dic["paths"])
+    for path_arg in args.path:
+        name, sep, filename = path_arg.partition("=")
+        if not sep:
+            parser.error("--path takes NAME=FILE")
+        path_dic[name] = filename
+    try:
+        apply_path_config(path_dic)
+    except ValueError as error:
+        parser.error(str(error))
+
+    if args.columnar and args.jobs > 1:
+        parser.error("--columnar cannot be combined with --jobs")
+    if args.columnar and args.collapse_transcripts:
+        parser.error("--columnar cannot be combined with --collapse-transcripts")
+    if args.trio_vcf and not (args.ped or args.samples):
+        parser.error("--trio-vcf requires --ped or --samples")
+    if args.samples and len(args.samples.split(",")) != 3:
+        parser.error("--samples takes PROBAND,FATHER,MOTHER")
+    if args.top_k is not None and args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+    if args.memo_size < 0:
+        parser.error("--memo-size must not be negative")
+    if args.stage_threads < 1:
+        parser.error("--stage-threads must be at least 1")
+    if args.gz_threads < 1:
+        parser.error("--gz-threads must be at least 1")
+    memo.MEMO_MAXSIZE = args.memo_size
+    dbparser.GZ_READ_THREADS = args.gz_threads
+
+    # 파싱한 데이터베이스는 cache에 저장해두고, 원본이 바뀌지 않았으면 다음 실행부터 cache를 읽는다.
+    def parse_db(filename: str, parse_func: object, tag: str = None) -> object:
+        if args.no_db_cache:
+            return parse_func(filename)
+        return dbcache.load_or_parse(
+            filename, parse_func, args.db_cache_dir, tag
+        )
+
+    stage_dic = build_pipeline_stages(args, parse_db)
+    if args.list_stages:
+        for name in pipeline.sort_stages(stage_dic):
+            print(f"{name}\t{','.join(stage_dic[name].deps)}")
+        return
+
+    unknown_stages = [name for name in args.stage or [] if name not in stage_dic]
+    if unknown_stages:
+        parser.error(f"unknown stage: {','.join(unknown_stages)} (see --list-stages)")
+    pipeline.run_stages(stage_dic, args.stage, args.stage_threads, args.checkpoint_dir)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
 # /data/projects/ACMG/calcultor/__init__.py
 
-__all__ = ["bayesframe", "dbparser"]
+__all__ = ["annotator", "bayesframe", "columnar", "dbcache", "dbparser", "genotype", "memo", "npstore", "pipeline", "resultwriter", "tabix"]
 
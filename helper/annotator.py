@@ -0,0 +1,293 @@
+# module for single-pass annotation (merge-join of position-sorted databases)
+
+from . import dbparser
+from . import tabix
+import heapq
+import itertools
+
+# 염색체 정렬 순서 (gnomad, REVEL 등 hg19 데이터베이스의 정렬 순서)
+CHROM_ORDER = {
+    chrom: rank
+    for rank, chrom in enumerate(
+        [str(i) for i in range(1, 23)] + ["X", "Y", "MT"]
+    )
+}
+# tabix index가 있는 경우, 다음 변이까지의 거리가 이보다 멀면 index로 건너뛴다.
+TABIX_SKIP_DISTANCE = 1 << 16
+
+
+def make_chrom_key(chrom: str) -> tuple:
+    """염색체 이름을 정렬 key로 변환한다. ("1" -> (0, "1"), "chrX" -> (22, "X"))"""
+
+    if chrom.startswith("chr"):
+        chrom = chrom[3:]
+
+    return (CHROM_ORDER.get(chrom, len(CHROM_ORDER)), chrom)
+
+
+def sort_variant_positions(var_ids: list) -> list:
+    """_summary_
+    Note:
+        환자 변이의 var_id 들을 (염색체, 위치) 순서로 정렬하고, 같은 위치의 var_id 들을 하나로 묶는다.
+        위치가 숫자가 아닌 var_id 는 데이터베이스와 비교할 수 없으므로 제외한다.
+
+    Args:
+        var_ids (list): ["1-985445-G-GT", "1-69270-A-G", ..]
+
+    Returns:
+        list: [(chrom_key, pos, {var_id, ..}), ..]
+
+    Examples:
+        >>> ["1-985445-G-GT", "1-69270-A-G", "1-69270-A-T"]
+            -> [((0, "1"), 69270, {"1-69270-A-G", "1-69270-A-T"}),
+                ((0, "1"), 985445, {"1-985445-G-GT"})]
+    """
+
+    position_dic = dict()  # {(chrom_key, pos): {var_id}}
+    for var_id in var_ids:
+        chrom, pos = var_id.split("-")[:2]
+        if not pos.isdigit():
+            continue
+        position_dic.setdefault((make_chrom_key(chrom), int(pos)), set()).add(
+            var_id
+        )
+
+    return [
+        (chrom_key, pos, position_dic[(chrom_key, pos)])
+        for chrom_key, pos in sorted(position_dic)
+    ]
+
+
+class AnnotationSource:
+    """_summary_
+    Note:
+        위치 순으로 정렬된 데이터베이스 파일 하나를 나타내는 class. 각 record를 (chrom, pos, ref, alt)
+        column으로 읽으며, 환자의 변이와 일치하는 record가 있으면 update_func(var_id, row)를 호출한다.
+
+        - bgzip 압축 및 tabix index가 있는 파일: 환자 변이가 있는 구간만 index로 찾아 읽는다.
+        - 그 외의 파일(plain, gz): 처음부터 끝까지 한 번 읽는다.
+
+        header (e.g. REVEL의 "chr")를 주면, 읽기 전에 파일 앞부분의 header line에서 column 이름 별 위치를
+        col2idx에 저장한다. update_func는 column 위치를 고정하지 않고 source.col2idx로 찾는다.
+
+    Examples:
+        >>> revel_source = AnnotationSource(
+                "revel", REVEL_DB, update_revel_func, sep=",", header="chr"
+            )
+            revel_source.col2idx["REVEL"] -> 7
+            gnomad_source = AnnotationSource(
+                "gnomad", GNOMAD_DB, update_gnomad_func
+            )
+    """
+
+    def __init__(
+        self,
+        name: str,
+        filename: str,
+        update_func: object,
+        sep: str = "\t",
+        col_idxs: tuple = (0, 1, 3, 4),  # CHROM, POS, REF, ALT
+        header: str = None,
+    ):
+        self.name = name
+        self.filename = filename
+        self.update_func = update_func
+        self.sep = sep
+        self.col_idxs = col_idxs
+        self.header = header
+        self.col2idx = None
+
+    def parse_line(self, line: str) -> tuple:
+        """header 또는 위치가 숫자가 아닌 줄은 None, 그 외에는 (chrom_key, pos, ref, alt, row)를 반환한다."""
+
+        if line.startswith("#"):
+            return None
+        row = line.rstrip("\n").split(self.sep)
+        chrom_idx, pos_idx, ref_idx, alt_idx = self.col_idxs
+        pos = row[pos_idx]
+        if not pos.isdigit():  # csv header (chr,hg19_pos,..) 또는 "."
+            return None
+
+        return (
+            make_chrom_key(row[chrom_idx]),
+            int(pos),
+            row[ref_idx],
+            row[alt_idx],
+            row,
+        )
+
+    def read_lines(self):
+        """파일의 각 line을 처음부터 반환한다. (plain, gz)"""
+
+        if self.filename.endswith(".gz"):
+            return dbparser.read_big_gz_file(self.filename)
+
+        return dbparser.read_big_file(self.filename)
+
+    def read_col2idx(self) -> dict:
+        """_summary_
+        Note:
+            파일 앞부분에서 self.header로 시작하는 첫 line을 찾아 column 이름 별 위치를 반환한다.
+            (앞뒤의 "#"과 공백은 제거) tabix index로 읽는 경우에도 header는 구간에 포함되지 않으므로
+            파일 처음에서 읽는다. header line이 없으면 ValueError.
+
+        Returns:
+            dict: {"chr": 0, "hg19_pos": 1, .., "REVEL": 7, "Ensembl_transcriptid": 8}
+        """
+
+        lines = self.read_lines()
+        for line in lines:
+            if line.startswith(self.header):
+                lines.close()
+                columns = line.strip().strip("#").strip().split(self.sep)
+                return {col: idx for idx, col in enumerate(columns)}
+
+        raise ValueError(f"{self.name} header line not found: {self.filename}")
+
+    def read_all_records(self):
+        """파일 전체를 처음부터 읽으며 record를 반환한다."""
+
+        for line in self.read_lines():
+            record = self.parse_line(line)
+            if record is not None:
+                yield record
+
+    def read_indexed_records(self, positions: list):
+        """_summary_
+        Note:
+            tabix index를 이용하여, 환자 변이 위치들이 포함된 구간만 읽는다. 가까운 변이들은
+            (TABIX_SKIP_DISTANCE 이내) 하나의 구간으로 묶어서 순차적으로 읽고, 멀리 떨어진 변이로는
+            index를 이용해 바로 건너뛴다.
+
+        Args:
+            positions (list): sort_variant_positions()의 결과
+
+        Yields:
+            record (tuple): (chrom_key, pos, ref, alt, row)
+        """
+
+        tabix_file = tabix.TabixFile(self.filename)
+        # 파일의 염색체 이름 ("1" 또는 "chr1")
+        ref_names = {
+            make_chrom_key(ref_name): ref_name
+            for ref_name in tabix_file.index["refs"]
+        }
+
+        regions = []  # [[chrom_key, start, end]]
+        for chrom_key, pos, _ in positions:
+            if (
+                regions
+                and regions[-1][0] == chrom_key
+                and pos - regions[-1][2] <= TABIX_SKIP_DISTANCE
+            ):
+                regions[-1][2] = pos
+            else:
+                regions.append([chrom_key, pos, pos])
+
+        for chrom_key, start, end in regions:
+            if chrom_key not in ref_names:
+                continue
+            for line in tabix_file.fetch(ref_names[chrom_key], start, end):
+                record = self.parse_line(line)
+                if record is not None:
+                    yield record
+        tabix_file.close()
+
+    def read_records(self, positions: list):
+        """tabix index가 있으면 index로 필요한 구간만, 없으면 전체 파일을 읽는다."""
+
+        if self.header is not None:
+            self.col2idx = self.read_col2idx()
+        if self.filename.endswith(".gz") and tabix.find_tabix_index(
+            self.filename
+        ):
+            return self.read_indexed_records(positions)
+
+        return self.read_all_records()
+
+
+def merge_join(positions: list, records: object, source_name: str = ""):
+    """_summary_
+    Note:
+        (염색체, 위치) 순으로 정렬된 환자 변이 목록과 데이터베이스 record를 동시에 한 번씩만 읽으며,
+        var_id (chrom-pos-ref-alt)가 일치하는 record를 찾는다. hash 검색 없이, 두 목록의 현재 위치를
+        비교하여 작은 쪽을 앞으로 이동시킨다. 데이터베이스가 정렬되어 있지 않으면 ValueError.
+
+    Args:
+        positions (list): sort_variant_positions()의 결과. [(chrom_key, pos, {var_id}), ..]
+        records (object): 정렬된 record iterator. (chrom_key, pos, ref, alt, row)
+        source_name (str): error message에 사용할 데이터베이스 이름
+
+    Yields:
+        tuple: (chrom_key, pos, var_id, row)
+
+    Examples:
+        >>> positions = [((0, "1"), 100, {"1-100-A-G"}), ((0, "1"), 200, {"1-200-C-T"})]
+            records = [((0, "1"), 100, "A", "C", row1), ((0, "1"), 100, "A", "G", row2),
+                       ((0, "1"), 150, "G", "T", row3), ((0, "1"), 200, "C", "T", row4)]
+            -> ((0, "1"), 100, "1-100-A-G", row2), ((0, "1"), 200, "1-200-C-T", row4)
+    """
+
+    position_idx = 0
+    prev_record_key = None
+    for chrom_key, pos, ref, alt, row in records:
+        record_key = (chrom_key, pos)
+        if prev_record_key is not None and record_key < prev_record_key:
+            raise ValueError(
+                f"{source_name} is not sorted by (chrom, pos): "
+                f"{chrom_key[1]}:{pos} after {prev_record_key[0][1]}:{prev_record_key[1]}"
+            )
+        prev_record_key = record_key
+
+        # 현재 record 보다 앞에 있는 환자 변이는 더 이상 일치하는 record가 없음.
+        while (
+            position_idx < len(positions)
+            and positions[position_idx][:2] < record_key
+        ):
+            position_idx += 1
+        if position_idx == len(positions):
+            break
+
+        if positions[position_idx][:2] == record_key:
+            var_id = f"{chrom_key[1]}-{pos}-{ref}-{alt}"
+            if var_id in positions[position_idx][2]:
+                yield (chrom_key, pos, var_id, row)
+
+
+def annotate_variants(var_ids: list, sources: list):
+    """_summary_
+    Note:
+        환자의 변이를 (염색체, 위치) 순으로 한 번 정렬한 뒤, 여러 데이터베이스(gnomad, REVEL, SpliceAI)를
+        하나의 stream으로 merge-join 하여 일치하는 record마다 각 source의 update_func를 호출한다.
+        모든 source를 같은 환자 변이 위치 순서로 동시에 읽으므로, 각 데이터베이스 파일은 한 번씩만
+        순차적으로 읽히며(index가 있으면 필요한 구간만), 같은 위치의 결과는 source 순서대로 적용된다.
+
+    Args:
+        var_ids (list): 환자 변이 var_id 목록 (variant_dic)
+        sources (list): [AnnotationSource, ..]
+
+    Examples:
+        >>> annotate_variants(
+                variant_dic,
+                [
+                    AnnotationSource("gnomad", GNOMAD_DB, update_gnomad_func),
+                    AnnotationSource("revel", REVEL_DB, update_revel_func, sep=","),
+                ],
+            )
+    """
+
+    positions = sort_variant_positions(var_ids)
+
+    # 각 source의 merge-join 결과를 위치 순으로 합쳐서, 모든 파일을 동시에 앞으로 읽어 나간다.
+    # 같은 위치에서는 sources 순서대로 적용된다. (heapq.merge는 stable)
+    streams = [
+        zip(
+            itertools.repeat(source_idx),
+            merge_join(positions, source.read_records(positions), source.name),
+        )
+        for source_idx, source in enumerate(sources)
+    ]
+    for source_idx, (_, _, var_id, row) in heapq.merge(
+        *streams, key=lambda match: match[1][:2]
+    ):
+        sources[source_idx].update_func(var_id, row)
@@ -1,117 +1,349 @@
 # module for calculating the possibility of pathogenicity
 # Based on bayesian rule
 
+import heapq
+import itertools
 
-def calculate_acmg(proband_var_df: object, disease_db_dic: dict):
+import numpy as np
 
+from . import resultwriter
+
+ACMG_RESULT_FILE = "/data/projects/ACMG/output/ACMG_result_0520_2.txt"
+# dbparser.parse_disease_db()의 disease_col2idx
+DISEASE_COL2IDX = {"title": 0, "inheritance": 1}
+
+# Bayesian framework 기본값
+OPVS = 350
+PRIOR_P = 0.1
+
+# evidence count matrix의 column 순서
+EVIDENCE_CATEGORIES = ["pvs", "ps", "pm", "pp", "bs", "bp"]
+
+# 결과 row (resultwriter.RESULT_COLUMNS) 에서 사용하는 column index
+RESULT_COL2IDX = {
+    col: idx for idx, col in enumerate(resultwriter.RESULT_COLUMNS)
+}
+
+# score_evidence_counts()의 class code 순서
+PATHOGENICITY_CLASSES = [
+    "Benign",
+    "Likely benign",
+    "VUS",
+    "Likely pathogenic",
+    "Pathogenic",
+]
+
+
+def get_evidence_category(key: str) -> str:
     """_summary_
     Note:
-        각 환자의 variant의 판별된 ACMG rule을 bayesian score로 환산한 뒤, 
-        별도의 outfile을 제작한다. 
+        evidence key의 종류 (EVIDENCE_CATEGORIES 또는 "ba")를 반환한다. 해당하지 않으면 None.
+
+    Examples:
+        >>> "pvs1" -> "pvs", "ps2" -> "ps", "bp4" -> "bp", "ba1" -> "ba"
+    """
 
-        이 때, BA1 만을 가진 경우는 제외하였다. 
+    for category in EVIDENCE_CATEGORIES + ["ba"]:
+        if key.startswith(category):
+            return category
+
+    return None
+
+
+def count_evidence(evidence_score_dic: dict) -> tuple:
+    """_summary_
+    Note:
+        한 transcript의 evidence_score_dic에서 값이 있는 evidence를 종류 별로 세고, 결과 파일에 적을
+        ACMG rule 목록을 만든다. pvs1은 강도 (PVS1_S, PVS1_M)를 rule 이름으로 사용한다.
+
+    Args:
+        evidence_score_dic (dict): {"pp3": 1, "pvs1": "PVS1_S", ...}
+
+    Returns:
+        tuple(list, list): (EVIDENCE_CATEGORIES 순서의 count, ACMG rule 목록)
+
+    Examples:
+        >>> {"pvs1": "PVS1_S", "pm2": 1, "pp3": 1, "bp4": 0} -> ([1, 0, 1, 1, 0, 0], ["PVS1_S", "PM2", "PP3"])
+    """
+
+    evidence_counts = [0] * len(EVIDENCE_CATEGORIES)
+    ACMG_rules = []
+
+    for key, value in evidence_score_dic.items():
+        if not value:
+            continue
+        category = get_evidence_category(key)
+        if category is None:
+            continue
+        if category != "ba":
+            evidence_counts[EVIDENCE_CATEGORIES.index(category)] += 1
+        ACMG_rules.append(value if category == "pvs" else key.upper())  # flag_type
+
+    return evidence_counts, ACMG_rules
+
+
+def score_evidence_counts(
+    evidence_counts: np.ndarray, prior_p: float = PRIOR_P, Opvs: float = OPVS
+) -> tuple:
+    """_summary_
+    Note:
+        (transcript 수, 6) 크기의 evidence count matrix (EVIDENCE_CATEGORIES 순서)로 모든 transcript의
+        Bayesian posterior와 pathogenicity class를 한 번에 계산한다.
+
+            OP = Opvs ** (pp / 8 + pm / 4 + ps / 2 + pvs / 1 - bp / 8 - bs / 2)
+            post_p = OP * prior_p / ((OP - 1) * prior_p + 1)
+
+        post_p >= 0.99: Pathogenic, >= 0.9: Likely pathogenic, <= 0.01: Benign, <= 0.1: Likely benign,
+        그 외: VUS
+
+    Args:
+        evidence_counts (np.ndarray): evidence count matrix
+        prior_p (float): prior probability of pathogenicity
+        Opvs (float): very strong evidence의 odds of pathogenicity
+
+    Returns:
+        tuple(np.ndarray, np.ndarray): (post_p (float64), PATHOGENICITY_CLASSES의 class code (int8))
+
+    Examples:
+        >>> score_evidence_counts(np.array([[1, 0, 1, 1, 0, 0], [0, 0, 0, 1, 0, 1]]))
+            -> (array([0.9994.., 0.1]), array([4, 1], dtype=int8))
+    """
+
+    pvs, ps, pm, pp, bs, bp = np.asarray(evidence_counts, dtype=np.float64).T
+
+    # row 별 계산과 같은 순서로 더하고, 지수의 종류는 많지 않으므로 종류 별로 한 번씩 Opvs ** 지수를 계산한다.
+    # (np.power는 python의 ** 와 마지막 자리가 다를 수 있다)
+    exponents, exponent_idxs = np.unique(
+        pp / 8 + pm / 4 + ps / 2 + pvs / 1 - bp / 8 - bs / 2, return_inverse=True
+    )
+    OP = np.array([Opvs ** exponent for exponent in exponents.tolist()])[
+        exponent_idxs.reshape(-1)
+    ]
+    post_p = (OP * prior_p) / ((OP - 1) * prior_p + 1)
+
+    class_codes = np.select(
+        [post_p >= 0.99, post_p >= 0.9, post_p <= 0.01, post_p <= 0.1],
+        [4, 3, 0, 1],
+        default=2,
+    ).astype(np.int8)
+
+    return post_p, class_codes
+
+
+def iter_acmg_results(
+    proband_var_df: object,
+    disease_db_dic: dict,
+    disease_col2idx: dict = DISEASE_COL2IDX,
+    batch_size: int = resultwriter.RESULT_BATCH_SIZE,
+    prior_p: float = PRIOR_P,
+    Opvs: float = OPVS,
+) -> list:
+    """_summary_
+    Note:
+        각 환자의 variant의 판별된 ACMG rule을 bayesian score로 환산하여, 결과 row
+        (resultwriter.RESULT_COLUMNS)를 variant_dic 순서대로 반환한다. BA1 만을 가진 경우는 제외한다.
+        posterior는 batch_size 개 정도씩 모아서 evidence count matrix로 한 번에 계산하며
+        (score_evidence_counts()), 한 변이의 transcript들은 항상 같은 batch에서 계산된다.
 
     Args:
         proband_var_df (object): Class VariantDF <- VEP file
         disease_db_dic (dict): Disease에 대한 정보를 유전자 별로 정리한 dict.
+        disease_col2idx (dict): disease_db_dic column index dictionary
+        batch_size (int): 한 번에 계산하는 row 수
+        prior_p (float): prior probability of pathogenicity
+        Opvs (float): very strong evidence의 odds of pathogenicity
+
+    Yields:
+        list: [var_id, feature, consequence, symbol, ACMG_rule, post_p, pathogenicity, disease_info]
     """
 
     df_col2idx = proband_var_df.df_col2idx
     variant_dic = proband_var_df.variant_dic
 
-    Opvs = 350
-    prior_p = 0.1
-
-    with open(
-        "/data/projects/ACMG/output/ACMG_result_0520_2.txt", "w"
-    ) as outfile:
-        # contents
-        print(
-            "#Variant_ID",
-            "Feature",
-            "Consequence",
-            "Symbol",
-            "ACMG_rule",
-            "ACMG_bayesian",
-            "Pathogenicity",
-            "Related disease_info",
-            sep="\t",
-            file=outfile,
+    batch_rows = []  # [var_id, feature, consequence, symbol, ACMG_rule, disease_info]
+    batch_counts = []
+    disease_info_dic = dict()  # {gene_symbol: disease_info}. 유전자 별로 한 번만 만든다.
+
+    # Bayesian framework: batch 마다 모아서 한 번에 계산
+    def score_batch() -> list:
+        post_ps, class_codes = score_evidence_counts(
+            np.array(batch_counts).reshape(-1, len(EVIDENCE_CATEGORIES)),
+            prior_p,
+            Opvs,
+        )
+        result_rows = [
+            row[:5] + [post_p, PATHOGENICITY_CLASSES[class_code], row[5]]
+            for row, post_p, class_code in zip(
+                batch_rows, post_ps.tolist(), class_codes.tolist()
+            )
+        ]
+        batch_rows.clear()
+        batch_counts.clear()
+
+        return result_rows
+
+    # counting
+    for var_id in variant_dic:
+        for var_feature in variant_dic[var_id]:
+
+            # 각각의 항목에 대한 rule의 수를 counting
+            evidence_counts, ACMG_rules = count_evidence(
+                variant_dic[var_id][var_feature]["evidence_score_dic"]
+            )
+            ACMG_rule = "||".join(ACMG_rules)
+
+            if ACMG_rule == "BA1":
+                continue
+
+            var_infos = variant_dic[var_id][var_feature]["var_infos"]
+            consequence = var_infos[df_col2idx["consequence"]]
+            gene_symbol = var_infos[df_col2idx["symbol"]]
+
+            # 질병 정보.
+            diseases = ""
+            if gene_symbol != "-":
+                if gene_symbol not in disease_info_dic:
+                    disease_info_dic[gene_symbol] = resultwriter.format_disease_info(
+                        disease_db_dic.get(gene_symbol, []), disease_col2idx
+                    )
+                diseases = disease_info_dic[gene_symbol]
+
+            batch_rows.append(
+                [var_id, var_feature, consequence, gene_symbol, ACMG_rule, diseases]
+            )
+            batch_counts.append(evidence_counts)
+
+        # 변이 단위로 batch를 나눈다 (select_best_rows()의 "variant")
+        if len(batch_rows) >= batch_size:
+            yield from score_batch()
+
+    yield from score_batch()
+
+
+def filter_min_class(result_rows: object, min_class: str) -> object:
+    """_summary_
+    Note:
+        pathogenicity class가 min_class 이상 (PATHOGENICITY_CLASSES 순서)인 결과 row만 반환한다.
+
+    Examples:
+        >>> min_class = "Likely pathogenic" -> "Likely pathogenic", "Pathogenic" row만 반환
+    """
+
+    min_class_code = PATHOGENICITY_CLASSES.index(min_class)
+    class2code = {
+        pathogenicity: code for code, pathogenicity in enumerate(PATHOGENICITY_CLASSES)
+    }
+    pathogenicity_idx = RESULT_COL2IDX["Pathogenicity"]
+
+    return (
+        row
+        for row in result_rows
+        if class2code[row[pathogenicity_idx]] >= min_class_code
+    )
+
+
+def select_best_rows(result_rows: object, group_by: str) -> object:
+    """_summary_
+    Note:
+        변이 ("variant") 또는 유전자 ("gene") 별로 posterior가 가장 높은 결과 row 하나만 반환한다.
+        posterior가 같으면 먼저 나온 row를 사용한다.
+        - variant: 한 변이의 transcript들은 연속해서 나오므로, 변이 하나씩 처리한다.
+        - gene: 유전자 별 가장 높은 row만 저장한다 (유전자 수 만큼의 메모리).
+          gene_symbol이 없는 ("-") 변이는 변이 별로 고른다.
+
+    Args:
+        result_rows (object): iter_acmg_results()의 결과 row
+        group_by (str): "variant" or "gene"
+
+    Raises:
+        ValueError: group_by가 "variant", "gene"이 아닌 경우
+
+    Returns:
+        object: 결과 row
+    """
+
+    if group_by not in ("variant", "gene"):
+        raise ValueError(f"unknown group_by: {group_by} (use ['variant', 'gene'])")
+
+    var_id_idx = RESULT_COL2IDX["Variant_ID"]
+    symbol_idx = RESULT_COL2IDX["Symbol"]
+    post_p_idx = RESULT_COL2IDX["ACMG_bayesian"]
+
+    if group_by == "variant":
+        return (
+            max(rows, key=lambda row: row[post_p_idx])
+            for _, rows in itertools.groupby(result_rows, key=lambda row: row[var_id_idx])
+        )
+
+    best_row_dic = dict()  # {gene_symbol: row}
+    for row in result_rows:
+        group_key = row[symbol_idx] if row[symbol_idx] != "-" else row[var_id_idx]
+        best_row = best_row_dic.get(group_key)
+        if best_row is None or row[post_p_idx] > best_row[post_p_idx]:
+            best_row_dic[group_key] = row
+
+    return iter(best_row_dic.values())
+
+
+def calculate_acmg(
+    proband_var_df: object,
+    disease_db_dic: dict,
+    output_file: str = ACMG_RESULT_FILE,
+    disease_col2idx: dict = DISEASE_COL2IDX,
+    batch_size: int = resultwriter.RESULT_BATCH_SIZE,
+    prior_p: float = PRIOR_P,
+    Opvs: float = OPVS,
+    top_k: int = None,
+    min_class: str = None,
+    group_by: str = None,
+):
+
+    """_summary_
+    Note:
+        각 환자의 variant의 판별된 ACMG rule을 bayesian score로 환산한 뒤,
+        별도의 outfile을 제작한다 (iter_acmg_results()).
+
+        이 때, BA1 만을 가진 경우는 제외하였다.
+
+        결과는 batch_size 개씩 모아서 저장하며, 파일 이름에 따라 tab 형식 (.txt), bgzip 압축 (.gz),
+        Parquet (.parquet) 으로 저장한다 (resultwriter.open_result_writer()). 질병 정보는
+        "title (inheritance)||.." 형식으로 줄여서 저장한다 (resultwriter.format_disease_info()).
+
+        저장할 결과를 다음 순서로 줄일 수 있다. 모든 row를 메모리에 올리지 않는다.
+        - min_class: 해당 class 이상인 row만 저장 (filter_min_class())
+        - group_by: 변이 ("variant") 또는 유전자 ("gene") 별로 posterior가 가장 높은 row만 저장
+          (select_best_rows())
+        - top_k: posterior가 가장 높은 k개 row를 내림차순으로 저장 (크기 k의 heap)
+        top_k가 없으면 variant_dic 순서대로 저장한다.
+
+    Args:
+        proband_var_df (object): Class VariantDF <- VEP file
+        disease_db_dic (dict): Disease에 대한 정보를 유전자 별로 정리한 dict.
+        output_file (str): output file address (.txt, .txt.gz, .parquet)
+        disease_col2idx (dict): disease_db_dic column index dictionary
+        batch_size (int): 한 번에 저장하는 row 수
+        prior_p (float): prior probability of pathogenicity
+        Opvs (float): very strong evidence의 odds of pathogenicity
+        top_k (int): 저장할 row 수
+        min_class (str): 저장할 최소 pathogenicity class (PATHOGENICITY_CLASSES)
+        group_by (str): "variant" or "gene"
+    """
+
+    result_rows = iter_acmg_results(
+        proband_var_df, disease_db_dic, disease_col2idx, batch_size, prior_p, Opvs
+    )
+    if min_class is not None:
+        result_rows = filter_min_class(result_rows, min_class)
+    if group_by is not None:
+        result_rows = select_best_rows(result_rows, group_by)
+    if top_k is not None:
+        # posterior 내림차순 (같으면 먼저 나온 row 먼저)
+        post_p_idx = RESULT_COL2IDX["ACMG_bayesian"]
+        result_rows = heapq.nlargest(
+            top_k, result_rows, key=lambda row: row[post_p_idx]
         )
 
-        # counting
-        for var_id in variant_dic:
-            for var_feature in variant_dic[var_id]:
-
-                pp, pm, ps, pvs = 0, 0, 0, 0
-                bp, bs = 0, 0
-                ACMG_rules = []
-                diseases = []
-
-                # 각각의 항목에 대한 rule의 수를 counting
-                for k, v in variant_dic[var_id][var_feature][
-                    "evidence_score_dic"
-                ].items():
-                    if k.startswith("pvs") and v:
-                        pvs += 1
-                        ACMG_rules.append(v)  # flag_type
-                    elif k.startswith("ps") and v:
-                        ps += 1
-                        ACMG_rules.append(k.upper())
-                    elif k.startswith("pm") and v:
-                        pm += 1
-                        ACMG_rules.append(k.upper())
-                    elif k.startswith("pp") and v:
-                        pp += 1
-                        ACMG_rules.append(k.upper())
-                    elif k.startswith("bs") and v:
-                        bs += 1
-                        ACMG_rules.append(k.upper())
-                    elif k.startswith("bp") and v:
-                        bp += 1
-                        ACMG_rules.append(k.upper())
-                    elif k.startswith("ba") and v:
-                        ACMG_rules.append(k.upper())
-
-                ACMG_rule = "||".join(ACMG_rules)
-
-                if ACMG_rule == "BA1":
-                    continue
-
-                var_infos = variant_dic[var_id][var_feature]["var_infos"]
-                consequence = var_infos[df_col2idx["consequence"]]
-                gene_symbol = var_infos[df_col2idx["symbol"]]
-
-                # Bayesian framework
-                OP = Opvs ** (
-                    pp / 8 + pm / 4 + ps / 2 + pvs / 1 - bp / 8 - bs / 2
-                )
-                post_p = (OP * prior_p) / ((OP - 1) * prior_p + 1)
-
-                if post_p >= 0.99:
-                    pathogenicity = "Pathogenic"
-                elif post_p >= 0.9:
-                    pathogenicity = "Likely pathogenic"
-                elif post_p <= 0.01:
-                    pathogenicity = "Benign"
-                elif post_p <= 0.1:
-                    pathogenicity = "Likely benign"
-                else:
-                    pathogenicity = "VUS"
-
-                # 질병 정보.
-                if gene_symbol != "-":
-                    diseases = disease_db_dic[gene_symbol]
-
-                print(
-                    var_id,
-                    var_feature,
-                    consequence,
-                    gene_symbol,
-                    ACMG_rule,
-                    post_p,
-                    pathogenicity,
-                    diseases,
-                    sep="\t",
-                    file=outfile,
-                )
+    # header: resultwriter.RESULT_COLUMNS
+    with resultwriter.open_result_writer(output_file, batch_size) as writer:
+        for row in result_rows:
+            writer.write_row(row)
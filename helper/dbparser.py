@@ -1,7 +1,82 @@
 # module for dasebase parsing
 
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import gc
 import gzip
+import io
+import os
+import sys
+import threading
+
+from . import tabix
+
+# VEP tab 형식 파일에서 사용하는 column (VariantDF.df_col2idx 순서)
+VEP_COLUMNS = [
+    "Uploaded_variation",
+    "Location",
+    "Gene",
+    "Feature",
+    "Consequence",
+    "cDNA_position",
+    "CDS_position",
+    "Protein_position",
+    "Amino_acids",
+    "Codons",
+    "Extra",
+]
+# VEP Extra column 에서 사용하는 key
+VEP_EXTRA_KEYS = ["SYMBOL", "STRAND", "IMPACT", "HGNC_ID", "CANONICAL", "MANE_SELECT"]
+# VEP VCF 파일의 CSQ (INFO) field 에서 사용하는 column (Extra에 해당하는 key는 VEP_EXTRA_KEYS)
+VEP_CSQ_COLUMNS = [
+    "Allele",
+    "Gene",
+    "Feature",
+    "Consequence",
+    "cDNA_position",
+    "CDS_position",
+    "Protein_position",
+    "Amino_acids",
+    "Codons",
+]
+# gz 파일의 압축 해제에 사용하는 thread 수 (BGZF 파일만 나누어 해제할 수 있다)
+GZ_READ_THREADS = min(4, os.cpu_count() or 1)
+# 한 번에 (thread 하나가) 압축을 해제하는 BGZF block 수. block 당 최대 64kb 이므로 약 1mb
+GZ_CHUNK_BLOCKS = 16
+# 압축되지 않은 파일을 chunk 단위로 읽을 때, 한 번에 읽는 크기 (byte). chunk의 record를 한꺼번에
+# 만들어 두므로, CPU cache를 크게 벗어나지 않는 크기가 더 빠르다.
+READ_CHUNK_SIZE = 1 << 20
+
+# gc_paused() 가 GC를 멈춘 횟수와, 처음 멈추기 전의 GC 상태 (여러 thread가 함께 사용한다)
+_GC_PAUSE_LOCK = threading.Lock()
+_gc_pause_count = 0
+_gc_was_enabled = False
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """_summary_
+    Note:
+        수백만 개의 객체를 한꺼번에 만드는 동안 순환 참조 GC를 멈춘다.
+        GC 상태는 process 전체에서 하나이므로, 여러 thread (pipeline stage)가 동시에 사용해도
+        처음 들어올 때만 GC를 멈추고 마지막으로 나갈 때 원래 상태로 되돌린다.
+    """
+
+    global _gc_pause_count, _gc_was_enabled
+
+    with _GC_PAUSE_LOCK:
+        if _gc_pause_count == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pause_count += 1
+    try:
+        yield
+    finally:
+        with _GC_PAUSE_LOCK:
+            _gc_pause_count -= 1
+            if _gc_pause_count == 0 and _gc_was_enabled:
+                gc.enable()
 
 
 def read_big_file(filename: str) -> str:
@@ -27,6 +102,7 @@ def read_big_gz_file(filename: str) -> str:
     """_summary_
     Note:
         input gz 압축 file의 각 line 정보를 generator 형식으로, 매 호출시 반환한다.
+        압축 해제는 read_gz_chunks()로 chunk 단위로 하고, line 으로 나눈 뒤 line 마다 decode 한다.
 
     Args:
         filename (str): file address
@@ -35,13 +111,249 @@ def read_big_gz_file(filename: str) -> str:
         line (str): 각 line의 정보를 매 호출 시 string으로 반환
     """
 
-    with gzip.open(filename, "rb") as infile:
-        for line in infile:
-            if not line:
-                break
+    for chunk in read_gz_chunks(filename):
+        for line in io.BytesIO(chunk):
             yield line.decode(encoding="utf-8")
 
 
+def inflate_bgzf_blocks(blocks: list) -> bytes:
+    """BGZF block 들의 압축을 해제하여 하나의 bytes로 반환한다. (thread pool 작업 단위)"""
+
+    return b"".join([tabix.inflate_bgzf_block(block) for block in blocks])
+
+
+def read_gz_data(filename: str, threads: int) -> bytes:
+    """_summary_
+    Note:
+        gz 파일의 압축을 해제한 data를 파일 순서대로 반환한다. line 경계와는 맞지 않는다.
+
+        BGZF (bgzip) 파일은 block 마다 독립적으로 압축되어 있으므로, 압축된 block을 GZ_CHUNK_BLOCKS 개씩
+        순서대로 읽어서 thread pool 에서 압축을 해제한다. 메모리를 제한하기 위해 thread 수의 2배 까지만
+        미리 해제하며, 결과는 제출한 순서대로 반환한다. 일반 gzip 파일은 나눌 수 없으므로 gzip 으로
+        한 번에 크게 읽는다.
+
+    Args:
+        filename (str): gz file address
+        threads (int): 압축 해제 thread 수
+
+    Yields:
+        bytes: 압축을 해제한 data
+    """
+
+    if not tabix.is_bgzf_file(filename):
+        with gzip.open(filename, "rb") as infile:
+            while True:
+                data = infile.read(GZ_CHUNK_BLOCKS * tabix.BGZF_BLOCK_SIZE)
+                if not data:
+                    break
+                yield data
+        return
+
+    with open(filename, "rb") as infile, ThreadPoolExecutor(
+        max_workers=threads
+    ) as executor:
+        pending = deque()
+        while True:
+            blocks = []
+            while len(blocks) < GZ_CHUNK_BLOCKS:
+                block = tabix.read_raw_bgzf_block(infile)
+                if not block:
+                    break
+                blocks.append(block)
+            if blocks:
+                pending.append(executor.submit(inflate_bgzf_blocks, blocks))
+            if pending and (not blocks or len(pending) >= threads * 2):
+                yield pending.popleft().result()
+            elif not blocks:
+                break
+
+
+def read_gz_chunks(filename: str, threads: int = None) -> bytes:
+    """_summary_
+    Note:
+        gz 압축 file을 line 경계로 나눈 chunk (bytes, 여러 line) 단위로 반환한다. BGZF 파일은 여러 thread에서
+        block의 압축을 해제한다 (read_gz_data()). chunk는 파일 순서대로 반환하며, 마지막 chunk를 제외하면
+        항상 줄바꿈으로 끝난다.
+
+    Args:
+        filename (str): gz file address
+        threads (int): 압축 해제 thread 수. None 이면 GZ_READ_THREADS
+
+    Yields:
+        chunk (bytes): 완전한 line 들로 이루어진 data
+    """
+
+    threads = max(1, GZ_READ_THREADS if threads is None else threads)
+
+    return split_line_chunks(read_gz_data(filename, threads))
+
+
+def split_line_chunks(data_iter: object) -> bytes:
+    """_summary_
+    Note:
+        순서대로 주어지는 data를 line 경계에서 다시 나눈다. 각 data의 마지막 줄바꿈 뒤에 남은 부분은
+        다음 data 앞에 붙인다.
+
+    Args:
+        data_iter (object): bytes data iterator (e.g. read_gz_data())
+
+    Yields:
+        chunk (bytes): 완전한 line 들로 이루어진 data. 마지막 chunk는 줄바꿈으로 끝나지 않을 수 있다.
+    """
+
+    rest = b""
+    for data in data_iter:
+        end = data.rfind(b"\n") + 1
+        if not end:  # line이 chunk 보다 긴 경우
+            rest += data
+            continue
+        if rest or end < len(data):
+            yield b"".join([rest, memoryview(data)[:end]])
+        else:
+            yield data
+        rest = data[end:]
+    if rest:
+        yield rest
+
+
+def read_chunks(filename: str) -> bytes:
+    """_summary_
+    Note:
+        file을 line 경계로 나눈 chunk (bytes, 여러 line) 단위로 반환한다. gz (gzip, bgzip) 파일은
+        read_gz_chunks()로 압축을 해제하고, 그 외에는 READ_CHUNK_SIZE 씩 읽는다.
+
+    Args:
+        filename (str): file address
+
+    Yields:
+        chunk (bytes): 완전한 line 들로 이루어진 data
+    """
+
+    if filename.endswith((".gz", ".bgz")):
+        yield from read_gz_chunks(filename)
+        return
+
+    with open(filename, "rb") as infile:
+        yield from split_line_chunks(iter(lambda: infile.read(READ_CHUNK_SIZE), b""))
+
+
+class RecordBatchReader:
+    """_summary_
+    Note:
+        file을 chunk (read_chunks(), 약 1mb) 단위로 읽어서, 각 line을 delimiter로 나눈 record의 list (batch)를
+        반환하는 reader. 호출하는 쪽에서 line 마다 decode, strip, split, startswith 확인을 반복하지 않고,
+        chunk 마다 list comprehension 한 번으로 record를 만든다. 빈 line은 반환하지 않는다.
+
+        comment로 시작하는 line은 건너뛰고, header로 시작하는 line은 column 이름으로 읽어서 columns,
+        col2idx에 저장한다 (앞뒤의 "#"과 공백은 제거). comment, header line이 있는지는 chunk 마다 한 번에
+        검색하므로, 파일의 앞에만 있는 경우 (VCF, ClinVar 등) 나머지 chunk는 line 별로 확인하지 않는다.
+        파일 중간에 header가 다시 나오면, 그 전까지의 batch를 먼저 반환한 뒤 col2idx를 바꾼다.
+
+    Args:
+        filename (str): file address (.gz, .bgz 는 압축 해제)
+        delimiter (str): column 구분자. None 이면 공백 (str.split())
+        header (str): header line의 시작 문자열. None 이면 header 없음
+        comment (str): 건너뛸 line의 시작 문자열 (header 보다 먼저 확인). None 이면 없음
+        skip_lines (int): 파일의 처음에 건너뛸 line 수
+        max_split (int): record 마다 나눌 최대 횟수 (-1: 모두). 앞의 column만 필요한 경우, 나머지는 마지막
+            값에 남는다.
+        encoding (str): file의 encoding. None 이면 decode 하지 않고 bytes record를 반환한다.
+
+    Examples:
+        >>> reader = RecordBatchReader(SPLICEAI_DB, comment="##")
+            for batch in reader:
+                id_idx = reader.col2idx["ID"]
+                for row in batch:
+                    var_id = row[id_idx]  # 1-985445-G-GT
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        delimiter: str = "\t",
+        header: str = "#",
+        comment: str = None,
+        skip_lines: int = 0,
+        max_split: int = -1,
+        encoding: str = "utf-8",
+    ):
+        self.filename = filename
+        self.delimiter = delimiter
+        self.header = None if header is None else header.encode()
+        self.comment = None if comment is None else comment.encode()
+        self.skip_lines = skip_lines
+        self.max_split = max_split
+        self.encoding = encoding
+        self.columns: list = None
+        self.col2idx: dict = dict()
+
+    def set_header(self, line: bytes):
+        header_line = line.decode(self.encoding or "utf-8").strip().strip("#").strip()
+        self.columns = header_line.split(self.delimiter)
+        self.col2idx = {val: idx for idx, val in enumerate(self.columns)}
+
+    def split_lines(self, lines: object) -> list:
+        """line (bytes) 들을 record로 나눈다. 앞뒤의 공백 (줄바꿈 문자 포함)은 제거한다."""
+
+        encoding, max_split = self.encoding, self.max_split
+        if self.delimiter is None:  # 공백으로 나누면 앞뒤 공백은 자동으로 제거된다.
+            if encoding:
+                rows = [line.decode(encoding).split(None, max_split) for line in lines]
+            else:
+                rows = [line.split(None, max_split) for line in lines]
+            return [row for row in rows if row] if [] in rows else rows
+
+        if encoding:
+            texts = (line.decode(encoding).strip() for line in lines)
+            delimiter = self.delimiter
+        else:
+            texts = (line.strip() for line in lines)
+            delimiter = self.delimiter.encode()
+        return [text.split(delimiter, max_split) for text in texts if text]
+
+    def __iter__(self) -> list:
+        # batch 마다 수만 개의 record (list)가 한꺼번에 만들어지므로, parse_vep_file() 처럼 읽는 동안에는
+        # 순환 참조 GC를 멈추고, 끝나면 원래 상태로 되돌린다.
+        with gc_paused():
+            yield from self.read_batches()
+
+    def read_batches(self) -> list:
+        markers = [marker for marker in (self.comment, self.header) if marker]
+        skip_lines = self.skip_lines
+
+        for chunk in read_chunks(self.filename):
+            # chunk 전체를 line list로 먼저 나누지 않고, line을 하나씩 꺼내 바로 record로 나눈다.
+            # (긴 line은 cache에 남아 있는 동안 나누는 편이 빠르다)
+            lines = io.BytesIO(chunk)
+            while skip_lines and lines.readline():
+                skip_lines -= 1
+            start = lines.tell()
+
+            # comment, header line이 있는 chunk만 line 별로 확인. 첫 글자 (한 글자 검색은 빠름)가 없는
+            # chunk는 줄바꿈 + 시작 문자열을 다시 검색하지 않는다.
+            if any(
+                chunk.startswith(marker, start)
+                or (marker[:1] in chunk and b"\n" + marker in chunk)
+                for marker in markers
+            ):
+                batch_lines = []
+                for line in lines:
+                    if self.comment and line.startswith(self.comment):
+                        continue
+                    if self.header and line.startswith(self.header):
+                        if batch_lines:
+                            yield self.split_lines(batch_lines)
+                            batch_lines = []
+                        self.set_header(line)
+                        continue
+                    batch_lines.append(line)
+                lines = batch_lines
+
+            batch = self.split_lines(lines)
+            if batch:
+                yield batch
+
+
 def parse_spliceai_db(filename: str) -> dict:
     """_summary_
     Note:
@@ -67,23 +379,17 @@ def parse_spliceai_db(filename: str) -> dict:
             }
     """
 
-    with open(filename) as infile:
+    # "##" meta line은 건너뛰고, "#CHROM" line을 header로 읽는다.
+    reader = RecordBatchReader(filename, comment="##")
 
-        spliceai_db_dic = dict()
-        # {id : { gene_symbol : [predict score]}}
-        for line in infile:
-            if line.startswith("#") and (not line.startswith("##")):
-                f_col2idx = {
-                    val: idx
-                    for idx, val in enumerate(
-                        line.strip("#").strip().split("\t")
-                    )
-                }
-            if not line.startswith("#"):  # variation info
-                row = line.strip().split("\t")
-                var_id = row[f_col2idx["ID"]]  # 1-985445-G-GT
-                predict_info_dic = make_spliceai_var_info_dic(row, f_col2idx)
-                spliceai_db_dic[var_id] = predict_info_dic
+    spliceai_db_dic = dict()
+    # {id : { gene_symbol : [predict score]}}
+    for batch in reader:  # variation info
+        f_col2idx = reader.col2idx
+        id_idx = f_col2idx["ID"]
+        for row in batch:
+            var_id = row[id_idx]  # 1-985445-G-GT
+            spliceai_db_dic[var_id] = make_spliceai_var_info_dic(row, f_col2idx)
 
     return spliceai_db_dic
 
@@ -168,25 +474,21 @@ def parse_revel_db(filename: str) -> tuple():  # ok
         "enst_id": 3,
     }
 
-    with open(filename) as infile:
+    reader = RecordBatchReader(filename, delimiter=",", header="chr")
 
-        revel_db_dic = dict()
-        # {id : [proedict score]}
-        for line in infile:
-            if line.startswith("chr"):
-                f_col2idx = {
-                    val: idx for idx, val in enumerate(line.strip().split(","))
-                }
-            else:  # new info
-                row = line.strip().split(",")
-                chr = row[f_col2idx["chr"]]
-                pos = row[f_col2idx["hg19_pos"]]
-                ref = row[f_col2idx["ref"]]
-                alt = row[f_col2idx["alt"]]
-                var_id = f"{chr}-{pos}-{ref}-{alt}"  # 1-985445-G-GT
+    revel_db_dic = dict()
+    # {id : [proedict score]}
+    for batch in reader:  # new info
+        f_col2idx = reader.col2idx
+        for row in batch:
+            chr = row[f_col2idx["chr"]]
+            pos = row[f_col2idx["hg19_pos"]]
+            ref = row[f_col2idx["ref"]]
+            alt = row[f_col2idx["alt"]]
+            var_id = f"{chr}-{pos}-{ref}-{alt}"  # 1-985445-G-GT
 
-                predict_infos: list = make_revel_predict_infos(row, f_col2idx)
-                revel_db_dic[var_id] = predict_infos
+            predict_infos: list = make_revel_predict_infos(row, f_col2idx)
+            revel_db_dic[var_id] = predict_infos
 
     return revel_db_dic, revel_col2idx
 
@@ -257,27 +559,18 @@ def parse_clinvar_db(filename: str) -> tuple:
         "aa_change": 2,
     }
 
-    with open(filename) as infile:
+    reader = RecordBatchReader(filename)
 
-        clinvar_db_dic = defaultdict(dict)
-        # { symbol: {var_id: [var_infos]}}
-        for line in infile:
-            if line.startswith("#"):
-                f_col2idx = {
-                    val: idx
-                    for idx, val in enumerate(
-                        line.strip("#").strip().split("\t")
-                    )
-                }
-            else:  # clinvar info
-                row = line.strip().split("\t")
-                gene_symbol = row[f_col2idx["variant:gene:symbol"]]
-                gene_symbols = gene_symbol.split("::")
-                clinvar_var_info_dic = make_clinvar_gene_info_dic(
-                    row, f_col2idx
-                )
-                for g_symbol in gene_symbols:
-                    clinvar_db_dic[g_symbol].update(clinvar_var_info_dic)
+    clinvar_db_dic = defaultdict(dict)
+    # { symbol: {var_id: [var_infos]}}
+    for batch in reader:  # clinvar info
+        f_col2idx = reader.col2idx
+        symbol_idx = f_col2idx["variant:gene:symbol"]
+        for row in batch:
+            gene_symbols = row[symbol_idx].split("::")
+            clinvar_var_info_dic = make_clinvar_gene_info_dic(row, f_col2idx)
+            for g_symbol in gene_symbols:
+                clinvar_db_dic[g_symbol].update(clinvar_var_info_dic)
 
     return clinvar_db_dic, clinvar_col2idx
 
@@ -323,6 +616,93 @@ def make_clinvar_gene_info_dic(var_row: list, file_col2idx: dict) -> dict:
     return clinvar_var_info_dic
 
 
+def make_gene_mechanism_dic(clinvar_db_dic: dict, clinvar_col2idx: dict) -> tuple:
+    """_summary_
+    Note:
+        gene_symbol을 기준으로 정리된 ClinVar dictionary에서, 각 유전자에 보고된 pathogenic 변이의 수와
+        그 중 missense, null variant가 주된 결과인 변이의 수를 세어, 유전자의 질병 원인 메커니즘을 미리
+        계산해둔다. pp2bp1, pvs1 에서 변이(transcript)마다 같은 유전자의 ClinVar 변이를 다시 세지 않고,
+        이 table에서 바로 찾는다. (기준: pp2bp1.check_gene_pathogenic_mechanism())
+
+        <병의 원인 판단 기준>
+        - Missense: pathogenic missense variant 2개 이상, pathogenic variant 중 50% 초과
+        - Null variant: pathogenic null variant 2개 이상, pathogenic variant 중 50% 초과
+        {nonsense, frameshift variant, splice donor variant, splice acceptor variant, initiatior codon variant}
+
+    Args:
+        clinvar_db_dic (dict): parse_clinvar_db()의 결과
+        clinvar_col2idx (dict): ClinVar_column index dictionary
+
+    Returns:
+        dict: { "gene symbol": [pathogenic_count, missense_count, null_count, mechanism] }
+        gene_mechanism_col2idx: dict = {"pathogenic_count": 0, "missense_count": 1, "null_count": 2,
+                                        "mechanism": 3}
+
+    Examples:
+        >>> {
+                "BRCA2": [2, 0, 2, "null variant"],
+                "OAT": [1, 1, 0, ""],
+            }
+    """
+
+    gene_mechanism_col2idx: dict = {
+        "pathogenic_count": 0,
+        "missense_count": 1,
+        "null_count": 2,
+        "mechanism": 3,
+    }
+
+    gene_mechanism_dic = dict()
+    for gene_symbol, gene_variant_dic in clinvar_db_dic.items():
+
+        pathogenic_missense_count = 0
+        pathogenic_null_count = 0
+        pathogenic_count = 0
+
+        # 각 variant_id의 pathogenicity와 variant의 종류 counting
+        for var_infos in gene_variant_dic.values():
+            var_patho = var_infos[clinvar_col2idx["pathogenicity"]]
+            var_cons_dic = var_infos[clinvar_col2idx["consequence_dic"]]
+
+            if "Pathogenic" in var_patho or "Likely pathogenic" in var_patho:
+                pathogenic_count += 1
+
+                cons_count = sum(var_cons_dic.values())
+                missense_count = var_cons_dic.get("missense variant", 0)
+                null_count = (
+                    var_cons_dic.get("nonsense", 0)
+                    + var_cons_dic.get("frameshift variant", 0)
+                    + var_cons_dic.get("splice donor variant", 0)
+                    + var_cons_dic.get("splice acceptor variant", 0)
+                    + var_cons_dic.get("initiatior codon variant", 0)
+                )
+                if missense_count > cons_count * 0.5:
+                    pathogenic_missense_count += 1
+                elif null_count > cons_count * 0.5:
+                    pathogenic_null_count += 1
+
+        # 기준에 따라 병의 원인 메커니즘 부여.
+        if (pathogenic_missense_count >= 2) and (
+            pathogenic_missense_count / pathogenic_count
+        ) > 0.5:
+            mechanism = "missense variant"
+        elif (pathogenic_null_count >= 2) and (
+            pathogenic_null_count / pathogenic_count
+        ) > 0.5:
+            mechanism = "null variant"
+        else:
+            mechanism = ""
+
+        gene_mechanism_dic[gene_symbol] = [
+            pathogenic_count,
+            pathogenic_missense_count,
+            pathogenic_null_count,
+            mechanism,
+        ]
+
+    return gene_mechanism_dic, gene_mechanism_col2idx
+
+
 def parse_disease_db(filename: str) -> tuple:
     """_summary_
     Note:
@@ -359,26 +739,19 @@ def parse_disease_db(filename: str) -> tuple:
         "symtoms": 4,
     }
 
-    with open(filename) as infile:
+    reader = RecordBatchReader(filename)
 
-        disease_db_dic = defaultdict(list)
-        # { symbol: [ [disease_infos] ] }
-        for line in infile:
-            if line.startswith("#"):
-                f_col2idx = {
-                    val: idx
-                    for idx, val in enumerate(
-                        line.strip("#").strip().split("\t")
-                    )
-                }
-            else:  # disease info
-                row = line.strip().split("\t")
-                gene_symbol = row[f_col2idx["geneSymbol"]]
-                gene_symbols = gene_symbol.split("::")
-                disease_infos: list = make_disease_info_list(row, f_col2idx)
+    disease_db_dic = defaultdict(list)
+    # { symbol: [ [disease_infos] ] }
+    for batch in reader:  # disease info
+        f_col2idx = reader.col2idx
+        symbol_idx = f_col2idx["geneSymbol"]
+        for row in batch:
+            gene_symbols = row[symbol_idx].split("::")
+            disease_infos: list = make_disease_info_list(row, f_col2idx)
 
-                for g_symbol in gene_symbols:
-                    disease_db_dic[g_symbol].append(disease_infos)
+            for g_symbol in gene_symbols:
+                disease_db_dic[g_symbol].append(disease_infos)
 
     return disease_db_dic, disease_col2idx
 
@@ -451,19 +824,17 @@ def parse_repeatmasker_db(filename: str) -> dict:
             } (start, end)는 오름차순 정렬되어 있음.
     """
 
-    with open(filename) as infile:
-
-        repeatmasker_db_dic = defaultdict(list)
-        # { chr# : [(start, end), ..]}
+    # 첫 세줄이 column 명 관련. 따로 파징하기 어려워서 3줄 건너뜀. 공백으로 나누며, 7번째 column 까지만 사용.
+    reader = RecordBatchReader(
+        filename, delimiter=None, header=None, skip_lines=3, max_split=7
+    )
 
-        # 첫 세줄이 column 명 관련. 따로 파징하기 어려워서 3줄 readline.
-        a = infile.readline()
-        b = infile.readline()
-        c = infile.readline()
+    repeatmasker_db_dic = defaultdict(list)
+    # { chr# : [(start, end), ..]}
 
-        # append position infos
-        for line in infile:
-            row = line.strip().split()
+    # append position infos
+    for batch in reader:
+        for row in batch:
             chrom = row[4]  # chr1
             start_pos = int(row[5])
             end_pos = int(row[6])
@@ -471,3 +842,312 @@ def parse_repeatmasker_db(filename: str) -> dict:
             repeatmasker_db_dic[chrom[3:]].append((start_pos, end_pos))
 
     return repeatmasker_db_dic
+
+
+def open_text_file(filename: str) -> object:
+    """gz (gzip, bgzip) 압축 파일이면 압축을 풀면서, 그 외에는 그대로 읽는 text file object를 반환한다."""
+
+    if filename.endswith((".gz", ".bgz")):
+        return gzip.open(filename, "rt")
+
+    return open(filename)
+
+
+def parse_vep_extra(extra: str, keys: list = VEP_EXTRA_KEYS) -> dict:
+    """_summary_
+    Note:
+        VEP 결과의 Extra column ("KEY=VALUE;KEY=VALUE;..")을 모든 field로 나누지 않고, 필요한 key의
+        위치만 찾아 값을 dictionary로 반환한다. 값이 없는 key는 ""로 반환한다.
+
+    Args:
+        extra (str): Extra column. e.g. IMPACT=MODIFIER;STRAND=1;SYMBOL=SAMD11;HGNC_ID=28706
+        keys (list): 필요한 key 목록
+
+    Returns:
+        dict: {key: value}
+
+    Examples:
+        >>> "REF_ALLELE=G;IMPACT=MODIFIER;STRAND=1;SYMBOL=SAMD11;SYMBOL_SOURCE=HGNC;HGNC_ID=28706"
+            -> {"SYMBOL": "SAMD11", "STRAND": "1", "IMPACT": "MODIFIER", "HGNC_ID": "28706"}
+    """
+
+    # 앞뒤에 ";"를 붙여서, 다른 key의 일부(e.g. "SYMBOL_SOURCE=")와 혼동하지 않고 값의 끝을 항상 찾는다.
+    extra = ";" + extra + ";"
+    extra_dic = dict()
+    for key in keys:
+        start = extra.find(";" + key + "=")
+        if start == -1:
+            extra_dic[key] = ""
+        else:
+            start += len(key) + 2
+            extra_dic[key] = extra[start : extra.find(";", start)]
+
+    return extra_dic
+
+
+def get_canonical_flag(canonical: str, mane_select: str) -> str:
+    """_summary_
+    Note:
+        VEP의 CANONICAL (--canonical), MANE_SELECT (--mane) 값으로 transcript의 canonical 표시를 반환한다.
+        MANE Select transcript는 "MANE", 그 외 canonical transcript는 "YES", 나머지는 "".
+
+    Examples:
+        >>> ("YES", "NM_000350.3") -> "MANE", ("YES", "") -> "YES", ("", "") -> ""
+    """
+
+    if mane_select and mane_select != "-":
+        return "MANE"
+
+    return "YES" if canonical == "YES" else ""
+
+
+def make_vep_var_infos(var_row: list, vep_col_idxs: list) -> list:
+    """_summary_
+    Note:
+        VEP 결과 파일의 한 줄로 var_infos (VariantDF.df_col2idx 순서)를 만든다. column 위치는 header에서
+        한 번만 찾아서(vep_col_idxs) 사용한다. 변이마다 반복되는 값(염색체, 유전자, consequence 등)은
+        sys.intern()으로 하나의 문자열 객체를 공유하여 메모리를 줄인다.
+
+    Args:
+        var_row (list): splitted each file line
+        vep_col_idxs (list): VEP_COLUMNS 순서의 column index
+
+    Returns:
+        list: var_infos
+
+    Examples:
+        >>> ["1-866319-G-A", "1", [866319], "ENSG00000187634", "ENST00000341065", "intron_variant",
+             "-", "-", "-", "-", "-", "SAMD11", "1", None, 0, 0, None, "MODIFIER", "28706", ""]
+    """
+
+    (
+        var_id,
+        location,
+        gene,
+        feature,
+        consequence,
+        cDNA_pos,
+        CDS_pos,
+        protein_pos,
+        AA_change,
+        codon_change,
+        extra,
+    ) = [var_row[idx] for idx in vep_col_idxs]
+
+    chrom, location = location.split(":")
+    extra_dic = parse_vep_extra(extra)
+
+    return [
+        var_id,
+        sys.intern(chrom),
+        list(map(int, location.split("-"))),  # [1234] or [1234, 1236]
+        sys.intern(gene),
+        feature,
+        sys.intern(consequence),
+        cDNA_pos,
+        CDS_pos,
+        protein_pos,
+        AA_change,
+        codon_change,
+        sys.intern(extra_dic["SYMBOL"]),
+        sys.intern(extra_dic["STRAND"]),
+        None,  # revel
+        0,  # gnomad_ac
+        0,  # gnomad_an
+        None,  # gnomad_af
+        sys.intern(extra_dic["IMPACT"]),
+        extra_dic["HGNC_ID"],
+        get_canonical_flag(extra_dic["CANONICAL"], extra_dic["MANE_SELECT"]),
+    ]
+
+
+def parse_vep_file(filename: str) -> list:
+    """_summary_
+    Note:
+        VEP 결과 파일(tab 형식, plain 또는 gz/bgzip 압축)을 한 줄씩 읽으며 각 변이-transcript의 var_infos를
+        반환한다. header에서 column 위치를 한 번만 찾으며, 파일 전체를 메모리에 올리지 않는다.
+        VEP로 annotation된 VCF 파일(CSQ INFO field)이면 parse_vep_vcf_file()로 읽는다.
+        읽는 동안에는 순환 참조 GC를 멈추고, 끝나면 원래 상태로 되돌린다.
+
+    Args:
+        filename (str): VEP_file address (.txt, .txt.gz, .vcf, .vcf.gz)
+
+    Yields:
+        list: var_infos (make_vep_var_infos())
+    """
+
+    # 수백만 개의 list/dict가 한꺼번에 만들어지는 동안 순환 참조 GC가 반복해서 전체 객체를 훑지 않도록,
+    # 파일을 읽는 동안에는 GC를 멈춘다(만들어지는 객체에는 순환 참조가 없다).
+    with gc_paused():
+        if is_vcf_file(filename):
+            yield from parse_vep_vcf_file(filename)
+            return
+
+        with open_text_file(filename) as infile:
+            for line in infile:
+                if line.startswith("##"):
+                    continue
+                elif line.startswith("#"):
+                    header = line.strip("#").strip().split("\t")
+                    vep_col_idxs = [header.index(col) for col in VEP_COLUMNS]
+                else:  # variation info
+                    yield make_vep_var_infos(line.strip().split("\t"), vep_col_idxs)
+
+
+def is_vcf_file(filename: str) -> bool:
+    """파일의 첫 줄이 "##fileformat=VCF" 이면 (plain 또는 gz) VCF 파일로 판단한다."""
+
+    with open_text_file(filename) as infile:
+        return infile.readline().startswith("##fileformat=VCF")
+
+
+def parse_vep_csq_header(line: str) -> list:
+    """_summary_
+    Note:
+        VEP VCF header의 CSQ INFO 설명에서 "Format: " 뒤의 field 이름들을 순서대로 반환한다.
+
+    Args:
+        line (str): ##INFO=<ID=CSQ,...> header line
+
+    Returns:
+        list: CSQ field 이름
+
+    Examples:
+        >>> '##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence annotations from Ensembl VEP.
+            Format: Allele|Consequence|IMPACT|SYMBOL">' -> ["Allele", "Consequence", "IMPACT", "SYMBOL"]
+    """
+
+    csq_format = line.split("Format: ")[1]
+    csq_format = csq_format[: csq_format.index('"')]
+
+    return csq_format.strip().split("|")
+
+
+def make_vep_allele_dic(pos: int, ref: str, alts: list) -> dict:
+    """_summary_
+    Note:
+        VCF record의 각 ALT를 VEP가 CSQ의 Allele로 쓰는 형식으로 바꾸고, tab 형식의 Location과 같은 위치를
+        함께 반환한다. VEP와 같이, 모든 allele의 첫 염기가 같고 길이가 다른 allele이 있으면 첫 염기를 떼어낸다.
+        (빈 allele은 "-", insertion의 위치는 [삽입 위치 앞, 뒤])
+
+    Args:
+        pos (int): VCF POS
+        ref (str): VCF REF
+        alts (list): VCF ALT 목록
+
+    Returns:
+        dict: {VEP allele: (ALT, location)}
+
+    Examples:
+        >>> (44202890, "G", ["GC"]) -> {"C": ("GC", [44202890, 44202891])}
+            (32921028, "CTTTCGG", ["C"]) -> {"-": ("C", [32921029, 32921034])}
+            (866319, "G", ["A"]) -> {"A": ("A", [866319])}
+    """
+
+    start = pos
+    vep_ref = ref
+    vep_alts = alts
+    if len({allele[0] for allele in alts + [ref]}) == 1 and any(
+        len(alt) != len(ref) for alt in alts
+    ):
+        start += 1
+        vep_ref = ref[1:]
+        vep_alts = [alt[1:] for alt in alts]
+
+    end = start + len(vep_ref) - 1
+    if end < start:  # insertion
+        location = [end, start]
+    elif end == start:
+        location = [start]
+    else:
+        location = [start, end]
+
+    return {
+        (vep_alt or "-"): (alt, location) for vep_alt, alt in zip(vep_alts, alts)
+    }
+
+
+def parse_vep_vcf_file(filename: str) -> list:
+    """_summary_
+    Note:
+        VEP로 annotation된 VCF 파일(plain 또는 gz/bgzip 압축)을 한 줄씩 읽으며, CSQ INFO field의
+        transcript 별 정보를 tab 형식 파일과 같은 var_infos로 반환한다. CSQ의 field 순서는 header에서
+        한 번만 찾는다.
+        CSQ header가 없는 VCF (VEP로 annotation되지 않은 파일)는 ValueError를 낸다.
+        - var_id: VCF의 ID (없으면 "chrom-pos-ref-alt")
+        - location: tab 형식의 Location과 같은 위치 (make_vep_allele_dic())
+        - consequence: "&"로 이어진 값은 tab 형식과 같이 ","로 바꾼다.
+        - 비어있는 값은 tab 형식과 같이 "-" 로 바꾼다 (SYMBOL, STRAND, IMPACT, HGNC_ID,
+          CANONICAL, MANE_SELECT는 "").
+
+    Args:
+        filename (str): VEP annotated VCF address (.vcf, .vcf.gz)
+
+    Yields:
+        list: var_infos (make_vep_var_infos() 와 같은 형식)
+    """
+
+    intern = sys.intern
+    csq_col_idxs = None
+    with open_text_file(filename) as infile:
+        for line in infile:
+            if line.startswith("##INFO=<ID=CSQ,"):
+                csq_fields = parse_vep_csq_header(line)
+                csq_col_idxs = [csq_fields.index(col) for col in VEP_CSQ_COLUMNS]
+                extra_idxs = [
+                    csq_fields.index(key) if key in csq_fields else None
+                    for key in VEP_EXTRA_KEYS
+                ]
+            if line.startswith("#"):
+                if line.startswith("#CHROM") and csq_col_idxs is None:
+                    raise ValueError(f"no VEP CSQ header (##INFO=<ID=CSQ>): {filename}")
+                continue
+
+            # CHROM POS ID REF ALT QUAL FILTER INFO (FORMAT, samples)
+            chrom, pos, var_id, ref, alt, _, _, info = line.rstrip("\n").split("\t")[:8]
+            csq = parse_vep_extra(info, ["CSQ"])["CSQ"]
+            if not csq:
+                continue
+            chrom = intern(chrom)
+            allele_dic = make_vep_allele_dic(int(pos), ref, alt.split(","))
+
+            for csq_entry in csq.split(","):
+                csq_values = csq_entry.split("|")
+                (
+                    allele,
+                    gene,
+                    feature,
+                    consequence,
+                    cDNA_pos,
+                    CDS_pos,
+                    protein_pos,
+                    AA_change,
+                    codon_change,
+                ) = [csq_values[idx] or "-" for idx in csq_col_idxs]
+                symbol, strand, impact, hgnc_id, canonical, mane_select = [
+                    "" if idx is None else csq_values[idx] for idx in extra_idxs
+                ]
+                var_alt, location = allele_dic.get(allele, (allele, [int(pos)]))
+
+                yield [
+                    var_id if var_id != "." else f"{chrom}-{pos}-{ref}-{var_alt}",
+                    chrom,
+                    list(location),
+                    intern(gene),
+                    feature,
+                    intern(consequence.replace("&", ",")),
+                    cDNA_pos,
+                    CDS_pos,
+                    protein_pos,
+                    AA_change,
+                    codon_change,
+                    intern(symbol),
+                    intern(strand),
+                    None,  # revel
+                    0,  # gnomad_ac
+                    0,  # gnomad_an
+                    None,  # gnomad_af
+                    intern(impact),
+                    hgnc_id,
+                    get_canonical_flag(canonical, mane_select),
+                ]
@@ -0,0 +1,228 @@
+# module for trio (proband, father, mother) genotypes from one joint-called VCF
+
+from array import array
+import numpy as np
+
+from . import dbparser
+
+# trio genotype array의 column 순서
+TRIO_MEMBERS = ["proband", "father", "mother"]
+
+# genotype code: GT에서 reference가 아닌 allele의 수 (최대 2), 불린 allele이 없으면 GT_MISSING
+GT_MISSING = -1
+GT_HOM_REF = 0
+GT_HET = 1
+GT_HOM_ALT = 2
+
+
+def parse_ped_file(ped_file: str, proband: str = None) -> list:
+    """_summary_
+    Note:
+        PED 파일(family, individual, father, mother, sex, phenotype)에서 부모가 모두 기록된 환자를 찾아
+        [환자, 아버지, 어머니]의 sample 이름을 반환한다. 부모가 모두 기록된 sample이 여러 명이면,
+        proband로 지정한 sample 또는 affected(phenotype = 2)인 sample을 환자로 사용한다.
+
+    Args:
+        ped_file (str): PED file address
+        proband (str): 환자 sample 이름 (없으면 PED 파일에서 찾는다)
+
+    Raises:
+        ValueError: 환자를 하나로 정할 수 없는 경우
+
+    Returns:
+        list: [proband, father, mother]
+
+    Examples:
+        >>> "FAM1  ETD21-RWNY  ETD21-RWNYF  ETD21-RWNYM  1  2"
+            -> ["ETD21-RWNY", "ETD21-RWNYF", "ETD21-RWNYM"]
+    """
+
+    trios = []  # [(individual, father, mother, phenotype)]
+    with open(ped_file) as infile:
+        for line in infile:
+            if line.startswith("#") or not line.strip():
+                continue
+            _, individual, father, mother, _, phenotype = line.split()[:6]
+            if father != "0" and mother != "0":
+                trios.append((individual, father, mother, phenotype))
+
+    if proband is not None:
+        trios = [trio for trio in trios if trio[0] == proband]
+    elif len(trios) > 1:
+        trios = [trio for trio in trios if trio[3] == "2"]
+
+    if len(trios) != 1:
+        raise ValueError(
+            f"{ped_file}: cannot find a single proband with both parents (found {len(trios)})"
+        )
+
+    return list(trios[0][:3])
+
+
+def encode_genotype(gt: str) -> int:
+    """_summary_
+    Note:
+        VCF의 GT 값을 reference가 아닌 allele의 수 (0, 1, 2)로 바꾼다. 불린 allele이 없으면 GT_MISSING.
+
+    Args:
+        gt (str): GT (e.g. "0/1", "1|1", "./1", "./.")
+
+    Returns:
+        int: genotype code
+
+    Examples:
+        >>> "0/0" -> 0, "0|1" -> 1, "./1" -> 1, "1/2" -> 2, "./." -> -1
+    """
+
+    alleles = [allele for allele in gt.replace("|", "/").split("/") if allele != "."]
+    if not alleles:
+        return GT_MISSING
+
+    return min(GT_HOM_ALT, sum(allele != "0" for allele in alleles))
+
+
+def parse_format_int(value: str) -> int:
+    """FORMAT 의 정수 값 (DP, GQ)을 반환한다. 값이 없으면 (".", "") -1."""
+
+    if value in (".", ""):
+        return -1
+
+    return int(value)
+
+
+def parse_allele_depth(ad: str) -> tuple:
+    """_summary_
+    Note:
+        FORMAT 의 AD ("ref,alt1,alt2..")를 (reference read 수, alternative read 수 합)으로 반환한다.
+        값이 없으면 (-1, -1).
+
+    Examples:
+        >>> "10,5" -> (10, 5), "3,4,2" -> (3, 6), "." -> (-1, -1)
+    """
+
+    depths = [parse_format_int(depth) for depth in ad.split(",")]
+    if depths[0] == -1:
+        return (-1, -1)
+
+    return (depths[0], sum(depth for depth in depths[1:] if depth > 0))
+
+
+def parse_trio_vcf(vcf_file: str, trio_samples: list) -> tuple:
+    """_summary_
+    Note:
+        joint-call 된 VCF 파일(plain 또는 gz/bgzip) 하나를 한 번만 읽으며, 환자와 부모의 GT를
+        genotype code (encode_genotype())로 바꾸어 (변이 수, 3) 크기의 int8 array에 저장한다.
+        de novo 판정의 quality filter를 위해 FORMAT의 DP, GQ, AD도 같은 모양의 array로 저장한다.
+        (FORMAT에 없거나 값이 없으면 -1)
+        var_id는 VCF의 ID를 사용한다 (없으면 "chrom-pos-ref-alt").
+
+    Args:
+        vcf_file (str): joint-called VCF address
+        trio_samples (list): [proband, father, mother] sample 이름
+
+    Returns:
+        tuple(dict, dict): ({var_id: row}, trio_array_dic (column 순서 TRIO_MEMBERS))
+
+    Examples:
+        >>> ({"1-866319-G-A": 0, "1-897325-G-C": 1},
+             {
+                "gt": array([[2, 1, 1], [1, 0, 0]], dtype=int8),
+                "dp": array([[12, 9, 10], [30, 25, 28]], dtype=int32),
+                "gq": ..., "ad_ref": ..., "ad_alt": ...
+             })
+    """
+
+    var2idx = dict()
+    trio_arrays = {
+        "gt": array("b"),
+        "dp": array("i"),
+        "gq": array("i"),
+        "ad_ref": array("i"),
+        "ad_alt": array("i"),
+    }
+    gt_code_dic = dict()  # {GT: code}. GT의 종류는 많지 않으므로 한 번만 계산한다.
+    format_idx_dic = dict()  # {FORMAT: (GT, DP, GQ, AD index)}
+
+    with dbparser.open_text_file(vcf_file) as infile:
+        for line in infile:
+            if line.startswith("##"):
+                continue
+            elif line.startswith("#"):
+                header = line.strip("#").strip().split("\t")
+                sample_idxs = [header.index(sample) for sample in trio_samples]
+                continue
+
+            row = line.rstrip("\n").split("\t")
+            var_id = row[2]
+            if var_id == ".":
+                var_id = f"{row[0]}-{row[1]}-{row[3]}-{row[4]}"
+
+            format_idxs = format_idx_dic.get(row[8])
+            if format_idxs is None:
+                format_keys = row[8].split(":")
+                format_idxs = format_idx_dic[row[8]] = [
+                    format_keys.index(key) if key in format_keys else None
+                    for key in ("GT", "DP", "GQ", "AD")
+                ]
+            gt_idx, dp_idx, gq_idx, ad_idx = format_idxs
+
+            if var_id in var2idx:  # 같은 변이가 다시 나오면 덮어쓴다.
+                row_idx = var2idx[var_id]
+            else:
+                row_idx = var2idx[var_id] = len(var2idx)
+                for values in trio_arrays.values():
+                    values.extend((-1, -1, -1))
+
+            for member_idx, sample_idx in enumerate(sample_idxs):
+                # 뒤쪽 FORMAT 값은 생략될 수 있다 (e.g. "./.")
+                sample_values = row[sample_idx].split(":") + [".", ".", ".", "."]
+                array_idx = row_idx * 3 + member_idx
+
+                gt = sample_values[gt_idx]
+                code = gt_code_dic.get(gt)
+                if code is None:
+                    code = gt_code_dic[gt] = encode_genotype(gt)
+                trio_arrays["gt"][array_idx] = code
+                if dp_idx is not None:
+                    trio_arrays["dp"][array_idx] = parse_format_int(sample_values[dp_idx])
+                if gq_idx is not None:
+                    trio_arrays["gq"][array_idx] = parse_format_int(sample_values[gq_idx])
+                if ad_idx is not None:
+                    (
+                        trio_arrays["ad_ref"][array_idx],
+                        trio_arrays["ad_alt"][array_idx],
+                    ) = parse_allele_depth(sample_values[ad_idx])
+
+    trio_array_dic = {
+        col: np.frombuffer(values, dtype=np.int8 if col == "gt" else np.int32)
+        .reshape(-1, 3)
+        .copy()
+        for col, values in trio_arrays.items()
+    }
+
+    return var2idx, trio_array_dic
+
+
+def make_genotype_dic(var2idx: dict, gt_codes: np.ndarray, member: str) -> dict:
+    """_summary_
+    Note:
+        trio genotype array에서 한 사람이 해당 변이를 가진 경우만 모아서, ps2.execute()가 사용하는
+        {var_id: genotype code} dictionary로 반환한다. (joint-call VCF에는 변이가 없는 sample도 0/0 으로
+        기록되므로, 변이를 가진 경우만 남겨야 sample 별 VCF와 같이 동작한다.)
+
+    Args:
+        var2idx (dict): {var_id: row}
+        gt_codes (np.ndarray): parse_trio_vcf()의 genotype codes (trio_array_dic["gt"])
+        member (str): "proband", "father" or "mother"
+
+    Returns:
+        dict: {var_id: genotype code}
+    """
+
+    member_codes = gt_codes[:, TRIO_MEMBERS.index(member)].tolist()
+
+    return {
+        var_id: member_codes[row_idx]
+        for var_id, row_idx in var2idx.items()
+        if member_codes[row_idx] > GT_HOM_REF
+    }
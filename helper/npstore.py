@@ -0,0 +1,549 @@
+# module for compact, memory-mapped database stores (numpy columns)
+
+import argparse
+import array
+import json
+import os
+import warnings
+
+import numpy as np
+
+from . import dbcache, dbparser
+
+STORE_VERSION = 1
+# scan_vcf_position_keys()에서 CHROM, POS를 찾는 line 앞부분의 크기 (byte)
+VCF_KEY_WINDOW = 16
+
+
+def save_store(out_dir: str, columns: dict, meta: dict):
+    """_summary_
+    Note:
+        column 별 numpy array를 out_dir 에 각각 .npy 파일로 저장하고, 염색체 이름 등 부가 정보는
+        meta.json 에 저장한다. 저장된 store는 load_store()로 memory-map 하여 읽는다.
+
+    Args:
+        out_dir (str): store directory address
+        columns (dict): {"column_name": np.ndarray}
+        meta (dict): {"chroms": ["1", "2", ..], ...}
+    """
+
+    os.makedirs(out_dir, exist_ok=True)
+    for col_name, values in columns.items():
+        np.save(os.path.join(out_dir, f"{col_name}.npy"), values)
+
+    meta = dict(meta, version=STORE_VERSION, columns=list(columns))
+    with open(os.path.join(out_dir, "meta.json"), "w") as outfile:
+        json.dump(meta, outfile)
+
+
+def load_store(store_dir: str) -> dict:
+    """_summary_
+    Note:
+        save_store()로 저장된 store를 memory-map 으로 읽는다. 실제 data는 검색 시에 필요한 부분만
+        disk에서 읽히며, 여러 process가 동시에 읽더라도 page cache를 공유한다.
+
+    Args:
+        store_dir (str): store directory address
+
+    Returns:
+        dict: {"meta": {..}, "chrom2code": {"1": 0, ..}, "column_name": np.memmap, ..}
+    """
+
+    with open(os.path.join(store_dir, "meta.json")) as infile:
+        meta = json.load(infile)
+    if meta.get("version") != STORE_VERSION:
+        raise ValueError(f"unsupported store version: {store_dir}")
+
+    store = {
+        "meta": meta,
+        "chrom2code": {chrom: idx for idx, chrom in enumerate(meta["chroms"])},
+    }
+    for col_name in meta["columns"]:
+        store[col_name] = np.load(
+            os.path.join(store_dir, f"{col_name}.npy"), mmap_mode="r"
+        )
+
+    return store
+
+
+def make_source_key(source_file: str, db: str) -> list:
+    """_summary_
+    Note:
+        store를 만든 원본 파일의 key. dbcache.make_cache_key()와 같이 절대 경로, 수정 시간(mtime), 크기로
+        만들며, meta.json 에 "source_key"로 저장한다 (json 이므로 list).
+
+    Returns:
+        list: [cache_version, abs_path, mtime_ns, size, "npstore.gnomad"]
+    """
+
+    return list(dbcache.make_cache_key(source_file, f"npstore.{db}"))
+
+
+def is_store_current(store_dir: str, source_file: str, db: str) -> bool:
+    """_summary_
+    Note:
+        store_dir에 source_file로 만든 store가 있으면 True를 반환한다. meta.json 에 저장된 원본 파일의 key
+        (make_source_key())가 현재 source_file의 key와 다르면 (다른 파일, 또는 store를 만든 뒤 바뀐 파일)
+        경고를 출력하고 False를 반환하므로, 오래된 store의 값을 사용하지 않고 원본 파일을 검색한다.
+        원본 파일 없이 store만 있는 경우에는, 같은 경로의 파일로 만든 store 이면 사용한다.
+
+    Args:
+        store_dir (str): store directory address
+        source_file (str): 원본 database file address (GNOMAD_DB 등)
+        db (str): "gnomad" or "revel"
+
+    Returns:
+        bool: store를 사용할 수 있으면 True
+    """
+
+    if not os.path.isdir(store_dir):
+        return False
+
+    try:
+        with open(os.path.join(store_dir, "meta.json")) as infile:
+            meta = json.load(infile)
+    except (OSError, ValueError):
+        meta = dict()
+
+    source_key = meta.get("source_key")
+    if meta.get("version") != STORE_VERSION or meta.get("db") != db or not source_key:
+        is_current = False
+    elif os.path.exists(source_file):
+        is_current = source_key == make_source_key(source_file, db)
+    else:
+        is_current = source_key[1] == os.path.abspath(source_file)
+
+    if not is_current:
+        warnings.warn(
+            f"{db} store {store_dir} was not built from the current {source_file}; "
+            "ignoring the store (rebuild it with python -m ACMG.helper.npstore "
+            f"build-{db})"
+        )
+
+    return is_current
+
+
+def make_position_key(chrom_codes, positions):
+    """(염색체 code, 위치)를 하나의 정렬 가능한 int64 key로 변환한다. code << 32 | pos"""
+
+    return (np.asarray(chrom_codes, dtype=np.int64) << 32) | np.asarray(
+        positions, dtype=np.int64
+    )
+
+
+def reorder_varlen_column(offsets, values, order) -> tuple:
+    """_summary_
+    Note:
+        가변 길이 문자열 column (이어붙인 bytes 와 각 record의 시작 위치 offsets)을 order 순으로
+        재배열한다.
+
+    Returns:
+        tuple: (new_offsets, new_values)
+    """
+
+    lengths = np.diff(offsets)[order]
+    new_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    gather_idx = np.repeat(
+        offsets[:-1][order] - new_offsets[:-1], lengths
+    ) + np.arange(new_offsets[-1], dtype=np.int64)
+
+    return (new_offsets, values[gather_idx])
+
+
+def sort_store_columns(keys, columns: dict, varlen_columns: dict) -> dict:
+    """_summary_
+    Note:
+        key 순으로 모든 column을 정렬한다. 가변 길이 문자열 column ("alleles" 등)도 같은 순서로
+        재배열하여 "{name}_offsets", "{name}" column으로 저장한다. 같은 key 안에서는 원래 파일의
+        순서를 유지한다(stable sort).
+
+    Args:
+        keys (np.ndarray): make_position_key()로 만든 위치 key
+        columns (dict): {"column_name": np.ndarray}
+        varlen_columns (dict): {"column_name": (offsets(np.ndarray), values(np.ndarray))}
+
+    Returns:
+        dict: {"key": sorted keys, "column_name": sorted values, ..}
+    """
+
+    order = np.argsort(keys, kind="stable")
+    sorted_columns = {"key": keys[order]}
+    for col_name, values in columns.items():
+        sorted_columns[col_name] = values[order]
+    for col_name, (offsets, values) in varlen_columns.items():
+        (
+            sorted_columns[f"{col_name}_offsets"],
+            sorted_columns[col_name],
+        ) = reorder_varlen_column(offsets, values, order)
+
+    return sorted_columns
+
+
+def get_varlen_value(store: dict, col_name: str, record_idx: int) -> str:
+    """가변 길이 문자열 column에서 record_idx 번째 값을 str로 반환한다."""
+
+    offsets = store[f"{col_name}_offsets"]
+    start, end = offsets[record_idx], offsets[record_idx + 1]
+
+    return store[col_name][start:end].tobytes().decode()
+
+
+def search_store(store: dict, var_ids: list) -> dict:
+    """_summary_
+    Note:
+        var_id (chrom-pos-ref-alt) 목록을 store에서 한 번에 검색한다. 위치 key는 정렬되어 있으므로
+        np.searchsorted로 각 변이 위치에 해당하는 record 범위를 찾고, 범위 안에서 ref-alt가 같은 record를
+        찾는다(한 위치에 보통 1~3개의 allele만 존재).
+
+    Args:
+        store (dict): load_store()로 읽은 store
+        var_ids (list): ["1-985445-G-GT", ..]
+
+    Returns:
+        dict: {var_id: [record index, ..]} (store에 있는 변이만 포함, 파일 순서)
+    """
+
+    chrom2code = store["chrom2code"]
+    query_ids, chrom_codes, positions = [], [], []
+    for var_id in var_ids:
+        chrom, pos = var_id.split("-")[:2]
+        if chrom in chrom2code and pos.isdigit():
+            query_ids.append(var_id)
+            chrom_codes.append(chrom2code[chrom])
+            positions.append(int(pos))
+
+    hit_dic = dict()
+    if not query_ids:
+        return hit_dic
+
+    query_keys = make_position_key(chrom_codes, positions)
+    lefts = np.searchsorted(store["key"], query_keys, side="left")
+    rights = np.searchsorted(store["key"], query_keys, side="right")
+
+    for i in np.flatnonzero(rights > lefts):
+        var_id = query_ids[i]
+        # "ref-alt" 부분. 1-985445-G-GT -> "G-GT"
+        query_allele = var_id.split("-", 2)[2]
+        for record_idx in range(lefts[i], rights[i]):
+            if get_varlen_value(store, "alleles", record_idx) == query_allele:
+                hit_dic.setdefault(var_id, []).append(int(record_idx))
+
+    return hit_dic
+
+
+def make_raw_chrom_code(chrom: bytes) -> int:
+    """_summary_
+    Note:
+        염색체 이름 (bytes)의 길이와 마지막 두 글자로 code를 만든다 (scan_vcf_position_keys()와 같은 방식).
+        e.g. b"1" -> (1, 0, "1"), b"chr11" -> (5, "1", "1"). 서로 다른 이름이 같은 code를 가질 수 있으므로
+        (e.g. GL000192.1, GL000202.1), code로 찾은 record는 var_id로 다시 확인해야 한다.
+    """
+
+    prev = chrom[-2] if len(chrom) > 1 else 0
+
+    return (len(chrom) << 16) | (prev << 8) | chrom[-1]
+
+
+def scan_vcf_position_keys(chunk: bytes) -> tuple:
+    """_summary_
+    Note:
+        VCF chunk (완전한 line 들, dbparser.read_chunks())의 각 line에서 CHROM, POS만 읽어, line 마다
+        make_position_key() 형식의 위치 key (make_raw_chrom_code() << 32 | pos)를 numpy로 한 번에 만든다.
+        line을 나누거나 decode 하지 않고, line의 앞 VCF_KEY_WINDOW byte 에서 두 tab의 위치를 찾으므로,
+        환자 변이 위치가 아닌 대부분의 line은 몇 번의 정수 연산만으로 건너뛸 수 있다. CHROM, POS가 이보다
+        긴 line은 따로 나누어 읽는다. header ("#"), 빈 line, POS가 숫자가 아닌 line의 key는 -1 이다.
+
+    Args:
+        chunk (bytes): VCF data
+
+    Returns:
+        tuple: (line_starts, line_ends, keys) (np.ndarray). line i = chunk[line_starts[i]:line_ends[i]]
+    """
+
+    data = np.frombuffer(chunk, dtype=np.uint8)
+    line_ends = np.flatnonzero(data == 10)
+    if not chunk.endswith(b"\n"):
+        line_ends = np.append(line_ends, len(data))
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1)).astype(np.int64)
+    keys = np.full(len(line_starts), -1, dtype=np.int64)
+
+    # line 마다 앞 VCF_KEY_WINDOW byte (line 밖은 줄바꿈으로 채움)
+    offsets = line_starts[:, None] + np.arange(VCF_KEY_WINDOW)
+    window = np.where(
+        offsets < line_ends[:, None], data[np.minimum(offsets, len(data) - 1)], 10
+    )
+    is_tab = window == 9
+    tab1 = is_tab.argmax(axis=1)
+    is_tab[np.arange(len(tab1)), tab1] = False
+    tab2 = is_tab.argmax(axis=1)
+
+    # CHROM \t POS \t 가 window 안에 있는 line
+    found = (tab2 > tab1) & (window[:, 0] != ord("#"))
+    pos_lengths = tab2 - tab1 - 1
+    positions = np.zeros(len(line_starts), dtype=np.int64)
+    is_digit = found & (tab1 > 0) & (pos_lengths > 0)
+    for k in range(int(pos_lengths[found].max()) if found.any() else 0):
+        has_digit = k < pos_lengths
+        digits = window[np.arange(len(tab1)), np.minimum(tab1 + 1 + k, VCF_KEY_WINDOW - 1)]
+        digits = digits.astype(np.int64) - 48
+        is_digit &= ~has_digit | ((digits >= 0) & (digits <= 9))
+        positions = np.where(has_digit, positions * 10 + digits, positions)
+
+    # CHROM: make_raw_chrom_code()
+    rows = np.arange(len(tab1))
+    prev = np.where(tab1 > 1, window[rows, np.maximum(tab1 - 2, 0)], 0).astype(np.int64)
+    last = window[rows, np.maximum(tab1 - 1, 0)].astype(np.int64)
+    chrom_codes = (tab1.astype(np.int64) << 16) | (prev << 8) | last
+    keys[is_digit] = make_position_key(chrom_codes[is_digit], positions[is_digit])
+
+    # window 보다 긴 CHROM, POS (드묾)
+    for i in np.flatnonzero(~found & (window[:, 0] != ord("#")) & (window[:, 0] != 10)):
+        row = chunk[line_starts[i] : line_ends[i]].split(b"\t", 2)
+        if len(row) > 2 and row[0] and row[1].isdigit():
+            keys[i] = (make_raw_chrom_code(row[0]) << 32) | int(row[1])
+
+    return (line_starts, line_ends, keys)
+
+
+def build_gnomad_store(gnomad_file: str, out_dir: str):
+    """_summary_
+    Note:
+        gnomad sites vcf (약 60~70gb)를 한 번 읽어서, 변이 위치와 AC, AN, AF 값만 column 별 numpy array로
+        저장한다. INFO 란의 나머지 정보는 저장하지 않으므로, 매 실행마다 큰 INFO 문자열을 parsing 할 필요가 없다.
+        AN 값이 0 이어서 AF 값이 없는 경우에는 NaN을 저장한다.
+        meta.json 에는 원본 파일의 key (make_source_key())를 저장하여, 원본 파일이 바뀌면 store를 사용하지
+        않는다 (is_store_current()).
+
+        - key (int64): 염색체 code << 32 | pos, 오름차순 정렬
+        - ac, an (int32), af (float64)
+        - alleles (uint8), alleles_offsets (int64): "ref-alt" 문자열을 이어붙인 bytes 와 각 record의 시작 위치
+
+    Args:
+        gnomad_file (str): gnomad vcf.gz file address
+        out_dir (str): store directory address
+    """
+
+    chroms: list = []
+    chrom2code: dict = dict()
+    keys, acs, ans = array.array("q"), array.array("i"), array.array("i")
+    afs = array.array("d")
+    allele_offsets = array.array("q", [0])
+    alleles = bytearray()
+
+    # CHROM POS ID REF ALT QUAL FILTER INFO
+    for batch in dbparser.RecordBatchReader(
+        gnomad_file, header=None, comment="#", max_split=8
+    ):
+        for row in batch:
+            chrom, pos, ref, alt, info = row[0], row[1], row[3], row[4], row[7]
+            if chrom not in chrom2code:
+                chrom2code[chrom] = len(chroms)
+                chroms.append(chrom)
+
+            keys.append((chrom2code[chrom] << 32) | int(pos))
+            acs.append(int(info.split("AC=")[1].split(";")[0]))
+            ans.append(int(info.split("AN=")[1].split(";")[0]))
+            if "AF=" in info:
+                gnomad_af = info.split("AF=")[1].split(";")[0]
+                afs.append(float(gnomad_af) if gnomad_af else np.nan)
+            else:
+                afs.append(np.nan)
+
+            alleles += f"{ref}-{alt}".encode()
+            allele_offsets.append(len(alleles))
+
+    columns = sort_store_columns(
+        np.frombuffer(keys, dtype=np.int64),
+        {
+            "ac": np.frombuffer(acs, dtype=np.int32),
+            "an": np.frombuffer(ans, dtype=np.int32),
+            "af": np.frombuffer(afs, dtype=np.float64),
+        },
+        {
+            "alleles": (
+                np.frombuffer(allele_offsets, dtype=np.int64),
+                np.frombuffer(bytes(alleles), dtype=np.uint8),
+            )
+        },
+    )
+
+    save_store(
+        out_dir,
+        columns,
+        {
+            "source": os.path.abspath(gnomad_file),
+            "source_key": make_source_key(gnomad_file, "gnomad"),
+            "chroms": chroms,
+            "db": "gnomad",
+        },
+    )
+
+
+def query_gnomad_store(store: dict, var_ids: list) -> dict:
+    """_summary_
+    Note:
+        gnomad store에서 환자의 변이 목록에 해당하는 AC, AN, AF 값을 한 번에 검색한다. 같은 변이가
+        여러 번 있는 경우, 원래 파일을 순서대로 읽을 때와 같이 마지막 record의 값을 사용한다.
+
+    Args:
+        store (dict): load_store()로 읽은 gnomad store
+        var_ids (list): ["1-985445-G-GT", ..]
+
+    Returns:
+        dict: {var_id: (ac, an, af)}. af 값이 없으면 None
+
+    Examples:
+        >>> {"1-138980-G-C": (2, 134554, 1.48639e-05), "1-970680-C-T": (0, 0, None)}
+    """
+
+    gnomad_dic = dict()
+    for var_id, record_idxs in search_store(store, var_ids).items():
+        record_idx = record_idxs[-1]
+        gnomad_af = float(store["af"][record_idx])
+        gnomad_dic[var_id] = (
+            int(store["ac"][record_idx]),
+            int(store["an"][record_idx]),
+            None if np.isnan(gnomad_af) else gnomad_af,
+        )
+
+    return gnomad_dic
+
+
+def build_revel_store(revel_file: str, out_dir: str):
+    """_summary_
+    Note:
+        REVEL database (revel_with_transcript_ids, 약 7gb csv)를 한 번 읽어서, 위치 순으로 정렬된
+        column 별 numpy array로 저장한다. hg19 위치가 없는 변이(".")는 저장하지 않는다.
+        gnomad store와 같이 meta.json 에 원본 파일의 key를 저장한다 (is_store_current()).
+
+        ##chr,hg19_pos,grch38_pos,ref,alt,aaref,aaalt,REVEL,Ensembl_transcriptid
+        # 1,35142,35142,G,A,T,M,0.027,ENST00000417324
+
+        - key (int64): 염색체 code << 32 | hg19_pos, 오름차순 정렬
+        - score (float64): REVEL score
+        - alleles, alleles_offsets: "ref-alt" 문자열
+        - transcripts, transcripts_offsets: "ENST00000417324;ENST00000335137" 문자열
+
+    Args:
+        revel_file (str): REVEL csv file address
+        out_dir (str): store directory address
+    """
+
+    chroms: list = []
+    chrom2code: dict = dict()
+    keys, scores = array.array("q"), array.array("d")
+    allele_offsets, transcript_offsets = array.array("q", [0]), array.array("q", [0])
+    alleles, transcripts = bytearray(), bytearray()
+
+    reader = dbparser.RecordBatchReader(revel_file, delimiter=",", header="chr")
+    for batch in reader:
+        f_col2idx = reader.col2idx
+        chrom_idx, pos_idx, ref_idx, alt_idx, score_idx, enst_idx = [
+            f_col2idx[col]
+            for col in ["chr", "hg19_pos", "ref", "alt", "REVEL", "Ensembl_transcriptid"]
+        ]
+        for row in batch:
+            chrom, pos = row[chrom_idx], row[pos_idx]
+            if not pos.isdigit():  # hg19 위치가 없는 변이
+                continue
+            if chrom not in chrom2code:
+                chrom2code[chrom] = len(chroms)
+                chroms.append(chrom)
+
+            keys.append((chrom2code[chrom] << 32) | int(pos))
+            scores.append(float(row[score_idx]))
+            alleles += f"{row[ref_idx]}-{row[alt_idx]}".encode()
+            allele_offsets.append(len(alleles))
+            transcripts += row[enst_idx].encode()
+            transcript_offsets.append(len(transcripts))
+
+    columns = sort_store_columns(
+        np.frombuffer(keys, dtype=np.int64),
+        {"score": np.frombuffer(scores, dtype=np.float64)},
+        {
+            "alleles": (
+                np.frombuffer(allele_offsets, dtype=np.int64),
+                np.frombuffer(bytes(alleles), dtype=np.uint8),
+            ),
+            "transcripts": (
+                np.frombuffer(transcript_offsets, dtype=np.int64),
+                np.frombuffer(bytes(transcripts), dtype=np.uint8),
+            ),
+        },
+    )
+
+    save_store(
+        out_dir,
+        columns,
+        {
+            "source": os.path.abspath(revel_file),
+            "source_key": make_source_key(revel_file, "revel"),
+            "chroms": chroms,
+            "db": "revel",
+        },
+    )
+
+
+def query_revel_store(store: dict, var_ids: list) -> dict:
+    """_summary_
+    Note:
+        REVEL store에서 환자의 변이 목록에 해당하는 REVEL score와 Ensembl transcript id 목록을
+        한 번에 검색한다. 같은 변이에 대해 여러 record가 있을 수 있으므로 파일 순서대로 모두 반환한다.
+
+    Args:
+        store (dict): load_store()로 읽은 REVEL store
+        var_ids (list): ["1-35142-G-A", ..]
+
+    Returns:
+        dict: {var_id: [(revel_score, [enst_ids]), ..]}
+
+    Examples:
+        >>> {"1-69728-T-C": [(0.035, ["ENST00000534990", "ENST00000335137"])]}
+    """
+
+    revel_dic = dict()
+    for var_id, record_idxs in search_store(store, var_ids).items():
+        revel_dic[var_id] = [
+            (
+                float(store["score"][record_idx]),
+                get_varlen_value(store, "transcripts", record_idx).split(";"),
+            )
+            for record_idx in record_idxs
+        ]
+
+    return revel_dic
+
+
+def main():
+    """_summary_
+    Note:
+        database 파일을 memory-map 가능한 store로 변환하는 command.
+
+        python -m ACMG.helper.npstore build-gnomad gnomad.exomes.r2.1.1.sites.vcf.gz gnomad_store/
+        python -m ACMG.helper.npstore build-revel revel_with_transcript_ids revel_store/
+    """
+
+    parser = argparse.ArgumentParser(prog="npstore")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    gnomad_parser = subparsers.add_parser(
+        "build-gnomad", help="gnomad sites vcf -> AC/AN/AF store"
+    )
+    gnomad_parser.add_argument("gnomad_file")
+    gnomad_parser.add_argument("out_dir")
+    revel_parser = subparsers.add_parser(
+        "build-revel", help="REVEL csv -> score/transcript store"
+    )
+    revel_parser.add_argument("revel_file")
+    revel_parser.add_argument("out_dir")
+    args = parser.parse_args()
+
+    if args.command == "build-gnomad":
+        build_gnomad_store(args.gnomad_file, args.out_dir)
+    elif args.command == "build-revel":
+        build_revel_store(args.revel_file, args.out_dir)
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,237 @@
+# module for running pipeline stages as a dependency graph
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import hashlib
+import os
+
+from . import dbcache
+
+# checkpoint 파일 이름: {stage}.checkpoint
+CHECKPOINT_SUFFIX = ".checkpoint"
+
+
+class Stage:
+    """_summary_
+    Note:
+        pipeline의 한 단계. func는 앞 단계들의 결과 dictionary ({stage 이름: 결과})를 받아서 이 단계의 결과를
+        반환한다. deps에 적힌 단계가 모두 끝난 뒤에 실행된다.
+
+        checkpoint가 True이면, 결과를 checkpoint 파일로 저장해 두고 다음 실행에서 입력 파일(input_files),
+        설정값(params), 앞 단계들의 key가 모두 같으면 다시 실행하지 않고 파일을 읽는다. 뒤 단계가 결과를 직접
+        수정하는 경우에도, checkpoint는 뒤 단계를 시작하기 전에 저장된다.
+
+        main_thread가 True 이면, 다른 단계가 모두 끝나고 thread pool을 닫은 뒤에 run_stages()를 호출한
+        thread에서 실행한다. 다른 thread가 없는 상태에서 process를 fork 해야 하는 단계(e.g. --jobs의
+        ProcessPoolExecutor)에 사용한다.
+
+    Examples:
+        >>> Stage("load_vep", lambda results: parse_vep(PROBAND_VEP), input_files=[PROBAND_VEP], checkpoint=True)
+            Stage("rules", execute_rules, deps=["load_vep", "load_clinvar"], params=("dedupe",))
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: object,
+        deps: list = (),
+        input_files: list = (),
+        params: tuple = (),
+        checkpoint: bool = False,
+        main_thread: bool = False,
+    ):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.input_files = list(input_files)
+        self.params = tuple(params)
+        self.checkpoint = checkpoint
+        self.main_thread = main_thread
+
+
+def sort_stages(stage_dic: dict) -> list:
+    """_summary_
+    Note:
+        단계들을 의존 관계 순서(topological order)로 정렬한다. 순서가 정해지지 않는 단계들은 stage_dic 순서를
+        따른다.
+
+    Args:
+        stage_dic (dict): {stage 이름: Stage}
+
+    Raises:
+        ValueError: 없는 단계에 의존하거나, 의존 관계에 순환이 있는 경우
+
+    Returns:
+        list: [stage 이름, ..]
+    """
+
+    for stage in stage_dic.values():
+        for dep in stage.deps:
+            if dep not in stage_dic:
+                raise ValueError(f"stage {stage.name} depends on unknown stage {dep}")
+
+    sorted_names = []
+    done = set()
+    while len(sorted_names) < len(stage_dic):
+        ready_names = [
+            name
+            for name, stage in stage_dic.items()
+            if name not in done and all(dep in done for dep in stage.deps)
+        ]
+        if not ready_names:
+            raise ValueError(
+                f"stage dependency cycle: {sorted(set(stage_dic) - done)}"
+            )
+        sorted_names.extend(ready_names)
+        done.update(ready_names)
+
+    return sorted_names
+
+
+def make_stage_keys(stage_dic: dict) -> dict:
+    """_summary_
+    Note:
+        단계 별 key를 만든다. 입력 파일의 경로, 수정 시간, 크기 (dbcache.make_cache_key()), 설정값과 앞 단계들의
+        key로 만들므로, 입력이나 설정이 바뀌면 그 단계와 뒤 단계들의 key가 모두 바뀐다.
+
+    Returns:
+        dict: {stage 이름: key (hex string)}
+    """
+
+    stage_keys = dict()
+    for name in sort_stages(stage_dic):
+        stage = stage_dic[name]
+        file_keys = [
+            dbcache.make_cache_key(filename, name)
+            if os.path.exists(filename)
+            else (filename, None)
+            for filename in stage.input_files
+        ]
+        key_text = repr(
+            (name, file_keys, stage.params, [stage_keys[dep] for dep in stage.deps])
+        )
+        stage_keys[name] = hashlib.sha1(key_text.encode()).hexdigest()
+
+    return stage_keys
+
+
+def get_checkpoint_file(checkpoint_dir: str, name: str) -> str:
+    """checkpoint 파일 주소를 반환한다. e.g. {checkpoint_dir}/rules.checkpoint"""
+
+    return os.path.join(checkpoint_dir, f"{name}{CHECKPOINT_SUFFIX}")
+
+
+def select_stages(
+    stage_dic: dict, targets: list, stage_keys: dict, checkpoint_dir: str = None
+) -> tuple:
+    """_summary_
+    Note:
+        targets를 만들기 위해 실행할 단계와 checkpoint에서 읽을 단계를 고른다. checkpoint가 유효한 단계는
+        읽기만 하므로, 그 단계의 앞 단계들은 (다른 단계에서 필요하지 않으면) 실행하지 않는다.
+
+    Returns:
+        tuple(list, dict): ([실행할 stage 이름, ..] (실행 순서), {읽을 stage 이름: checkpoint 결과})
+    """
+
+    run_names = set()
+    loaded_dic = dict()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name in run_names or name in loaded_dic:
+            continue
+        stage = stage_dic[name]
+        if stage.checkpoint and checkpoint_dir is not None:
+            hit, data = dbcache.load_cache(
+                get_checkpoint_file(checkpoint_dir, name), stage_keys[name]
+            )
+            if hit:
+                loaded_dic[name] = data
+                continue
+        run_names.add(name)
+        pending.extend(stage.deps)
+
+    return [name for name in sort_stages(stage_dic) if name in run_names], loaded_dic
+
+
+def run_stages(
+    stage_dic: dict,
+    targets: list = None,
+    max_workers: int = 4,
+    checkpoint_dir: str = None,
+) -> dict:
+    """_summary_
+    Note:
+        targets 단계와 그 앞 단계들을 의존 관계에 따라 실행한다. 앞 단계가 모두 끝난 단계는
+        바로 시작하므로, 서로 의존하지 않는 단계들(e.g. gnomAD, REVEL annotation)은 thread pool에서 동시에
+        실행된다. checkpoint_dir이 주어지면 checkpoint 단계의 결과를 저장하고, 다음 실행에서 입력과 설정이
+        같으면 다시 실행하지 않는다 (select_stages()). main_thread 단계는 실행 중인 단계가 없을 때 thread
+        pool을 닫고 (worker thread 종료) 이 함수를 호출한 thread에서 실행한다.
+
+    Args:
+        stage_dic (dict): {stage 이름: Stage}
+        targets (list): 결과가 필요한 stage 이름. None 이면 다른 단계가 사용하지 않는 마지막 단계들
+        max_workers (int): 동시에 실행할 단계 수
+        checkpoint_dir (str): checkpoint directory. None 이면 checkpoint를 사용하지 않는다.
+
+    Raises:
+        ValueError: 없는 단계를 targets로 지정한 경우
+
+    Returns:
+        dict: {stage 이름: 결과} (실행하거나 checkpoint에서 읽은 단계)
+    """
+
+    if targets is None:  # 다른 단계가 사용하지 않는 마지막 단계들 (e.g. write)
+        dep_names = {dep for stage in stage_dic.values() for dep in stage.deps}
+        targets = [name for name in stage_dic if name not in dep_names]
+    for name in targets:
+        if name not in stage_dic:
+            raise ValueError(f"unknown stage: {name} (use {list(stage_dic)})")
+
+    stage_keys = make_stage_keys(stage_dic)
+    run_names, results = select_stages(stage_dic, targets, stage_keys, checkpoint_dir)
+    if checkpoint_dir is not None:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def save_result(name: str, stage_result: object):
+        if stage_dic[name].checkpoint and checkpoint_dir is not None:
+            dbcache.save_cache(
+                get_checkpoint_file(checkpoint_dir, name), stage_keys[name], stage_result
+            )
+        results[name] = stage_result
+
+    running = dict()  # {future: stage 이름}
+    executor = None
+    try:
+        while run_names or running:
+            ready_names = [
+                name
+                for name in run_names
+                if all(dep in results for dep in stage_dic[name].deps)
+            ]
+            # 앞 단계가 모두 끝난 단계를 시작한다.
+            for name in ready_names:
+                if not stage_dic[name].main_thread:
+                    if executor is None:
+                        executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+                    run_names.remove(name)
+                    running[executor.submit(stage_dic[name].func, results)] = name
+
+            if not running:  # main_thread 단계만 남은 경우, worker thread를 모두 종료한 뒤 실행
+                name = ready_names[0]
+                if executor is not None:
+                    executor.shutdown()
+                    executor = None
+                run_names.remove(name)
+                save_result(name, stage_dic[name].func(results))
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                # 실패한 단계의 exception은 그대로 전달
+                save_result(name, future.result())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return results
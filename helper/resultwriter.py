@@ -0,0 +1,152 @@
+# module for writing ACMG results (TSV, bgzipped TSV, Parquet) in batches
+
+from . import tabix
+
+# 결과 파일의 column
+RESULT_COLUMNS = [
+    "Variant_ID",
+    "Feature",
+    "Consequence",
+    "Symbol",
+    "ACMG_rule",
+    "ACMG_bayesian",
+    "Pathogenicity",
+    "Related disease_info",
+]
+# 한 번에 저장하는 row 수
+RESULT_BATCH_SIZE = 10000
+
+
+def format_disease_info(diseases: list, disease_col2idx: dict) -> str:
+    """_summary_
+    Note:
+        유전자에 관련된 질병 정보 (dbparser.parse_disease_db()의 disease_infos list)를 "title (inheritance)"
+        형식으로 줄여서 "||"로 이어 반환한다. 같은 질병은 한 번만 적고, 증상 목록은 제외한다.
+
+    Args:
+        diseases (list): [ ["title", ["inheritance"], ["onsetAges"], symtoms_id, symtoms] ]
+        disease_col2idx (dict): disease_db_dic column index dictionary
+
+    Returns:
+        str: 질병 정보
+
+    Examples:
+        >>> [["Ciliary dyskinesia, primary, 14", ["Autosomal recessive"], ["Pediatric"], [""], [""]]]
+            -> "Ciliary dyskinesia, primary, 14 (Autosomal recessive)"
+    """
+
+    disease_infos = []
+    for disease in diseases:
+        title = disease[disease_col2idx["title"]]
+        inheritances = "/".join(
+            inheritance
+            for inheritance in disease[disease_col2idx["inheritance"]]
+            if inheritance
+        )
+        disease_infos.append(f"{title} ({inheritances})" if inheritances else title)
+
+    return "||".join(dict.fromkeys(disease_infos))
+
+
+class TsvResultWriter:
+    """_summary_
+    Note:
+        결과 row를 모아두었다가 batch_size 마다 한 번에 tab 형식으로 저장하는 writer.
+        파일 이름이 .gz, .bgz 로 끝나면 BGZF (bgzip) 형식으로 압축하여 저장한다.
+
+    Examples:
+        >>> with TsvResultWriter("ACMG_result.txt.gz") as writer:
+                writer.write_row(["1-69270-A-G", "ENST00000335137", ..])
+    """
+
+    def __init__(self, filename: str, batch_size: int = RESULT_BATCH_SIZE):
+        if filename.endswith((".gz", ".bgz")):
+            self.outfile = tabix.BgzfWriter(filename)
+        else:
+            self.outfile = open(filename, "wb")
+        self.batch_size = batch_size
+        self.rows: list = []
+        self.outfile.write(("#" + "\t".join(RESULT_COLUMNS) + "\n").encode())
+
+    def write_row(self, row: list):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        lines = ["\t".join(map(str, row)) + "\n" for row in self.rows]
+        self.outfile.write("".join(lines).encode())
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.outfile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ParquetResultWriter(TsvResultWriter):
+    """_summary_
+    Note:
+        결과 row를 모아두었다가 batch_size 마다 Parquet row group 하나로 저장하는 writer.
+        pyarrow가 필요하다. ACMG_bayesian은 float, 나머지 column은 문자열로 저장한다.
+    """
+
+    def __init__(self, filename: str, batch_size: int = RESULT_BATCH_SIZE):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as error:
+            raise ImportError("Parquet output requires pyarrow") from error
+
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema(
+            [
+                (col, pyarrow.float64() if col == "ACMG_bayesian" else pyarrow.string())
+                for col in RESULT_COLUMNS
+            ]
+        )
+        self.outfile = pyarrow.parquet.ParquetWriter(filename, self.schema)
+        self.batch_size = batch_size
+        self.rows: list = []
+
+    def flush(self):
+        if not self.rows:
+            return
+        columns = [list(values) for values in zip(*self.rows)]
+        self.outfile.write_table(
+            self.pyarrow.Table.from_arrays(
+                [
+                    self.pyarrow.array(values, type=field.type)
+                    for values, field in zip(columns, self.schema)
+                ],
+                schema=self.schema,
+            )
+        )
+        self.rows = []
+
+
+def open_result_writer(filename: str, batch_size: int = RESULT_BATCH_SIZE) -> object:
+    """_summary_
+    Note:
+        파일 이름에 따라 결과 writer를 반환한다.
+        - .parquet: ParquetResultWriter
+        - .gz, .bgz: BGZF 압축 TsvResultWriter
+        - 그 외: TsvResultWriter
+
+    Args:
+        filename (str): output file address
+        batch_size (int): 한 번에 저장하는 row 수
+
+    Returns:
+        object: write_row(), close()를 가진 writer
+    """
+
+    if filename.endswith(".parquet"):
+        return ParquetResultWriter(filename, batch_size)
+
+    return TsvResultWriter(filename, batch_size)
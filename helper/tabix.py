@@ -0,0 +1,470 @@
+# module for BGZF random access (tabix .tbi / .csi index) and BGZF writing
+
+import gzip
+import os
+import struct
+import zlib
+
+TABIX_INDEX_SUFFIXES = (".tbi", ".csi")
+# BGZF block 하나에 저장하는 최대 data 크기 (bgzip과 같음)
+BGZF_BLOCK_SIZE = 0xFF00
+# BGZF 파일의 끝을 나타내는 빈 block
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+def find_tabix_index(filename: str) -> str:
+    """_summary_
+    Note:
+        bgzip으로 압축된 파일과 같은 위치에 있는 tabix index (.tbi 또는 .csi) 파일의 주소를 반환한다.
+        index 파일이 없는 경우에는 None을 반환한다.
+
+    Args:
+        filename (str): bgzip 압축 file address
+
+    Returns:
+        str: index file address or None
+    """
+
+    for suffix in TABIX_INDEX_SUFFIXES:
+        if os.path.exists(filename + suffix):
+            return filename + suffix
+
+    return None
+
+
+def read_bgzf_block(infile: object, coffset: int) -> tuple:
+    """_summary_
+    Note:
+        BGZF 파일에서 coffset 위치의 block 하나를 읽어, 압축을 해제한 data와 다음 block의 위치를 반환한다.
+        BGZF block은 gzip member 이며, extra field의 "BC" subfield에 block 전체 크기(BSIZE)가 저장되어 있다.
+
+        ID1 ID2 CM FLG MTIME(4) XFL OS XLEN(2) | extra subfields | CDATA | CRC32(4) ISIZE(4)
+
+    Args:
+        infile (object): "rb"로 열린 BGZF file object
+        coffset (int): block이 시작하는 file offset
+
+    Returns:
+        tuple: (data(bytes), next_coffset(int)). 파일의 끝인 경우 (b"", coffset)
+    """
+
+    infile.seek(coffset)
+    header = infile.read(12)
+    if len(header) < 12:
+        return (b"", coffset)
+    if header[:2] != b"\x1f\x8b":
+        raise ValueError(f"invalid BGZF block at offset {coffset}")
+
+    xlen = struct.unpack("<H", header[10:12])[0]
+    extra = infile.read(xlen)
+    block_size = get_bgzf_block_size(extra)
+    if block_size is None:
+        raise ValueError(f"not a BGZF block (no BC field) at offset {coffset}")
+
+    cdata = infile.read(block_size - xlen - 19)
+    infile.read(8)  # CRC32, ISIZE
+
+    return (zlib.decompress(cdata, -15), coffset + block_size)
+
+
+def get_bgzf_block_size(extra: bytes) -> int:
+    """gzip extra field의 "BC" subfield 에서 block 전체 크기(BSIZE + 1)를 반환한다. 없으면 None."""
+
+    i = 0
+    while i + 4 <= len(extra):
+        si1, si2, slen = extra[i], extra[i + 1], struct.unpack(
+            "<H", extra[i + 2 : i + 4]
+        )[0]
+        if si1 == 66 and si2 == 67:  # B, C
+            return struct.unpack("<H", extra[i + 4 : i + 6])[0] + 1
+        i += 4 + slen
+
+    return None
+
+
+def is_bgzf_file(filename: str) -> bool:
+    """첫 block이 "BC" subfield를 가진 gzip member 이면 (bgzip 압축) True를 반환한다."""
+
+    with open(filename, "rb") as infile:
+        header = infile.read(12)
+        if len(header) < 12 or header[:3] != b"\x1f\x8b\x08" or not header[3] & 4:
+            return False
+        extra = infile.read(struct.unpack("<H", header[10:12])[0])
+
+    return get_bgzf_block_size(extra) is not None
+
+
+def read_raw_bgzf_block(infile: object) -> bytes:
+    """_summary_
+    Note:
+        BGZF 파일의 현재 위치에서 block 하나를 압축된 상태 그대로 읽는다. 압축 해제는 inflate_bgzf_block()으로
+        따로 하므로, 파일은 순서대로 읽으면서 압축 해제는 여러 thread에서 나누어 할 수 있다.
+
+    Args:
+        infile (object): "rb"로 열린 BGZF file object
+
+    Returns:
+        bytes: header 부터 ISIZE 까지 block 전체. 파일의 끝인 경우 b""
+    """
+
+    header = infile.read(12)
+    if not header:
+        return b""
+    if len(header) < 12 or header[:2] != b"\x1f\x8b":
+        raise ValueError(f"invalid BGZF block at offset {infile.tell() - len(header)}")
+
+    extra = infile.read(struct.unpack("<H", header[10:12])[0])
+    block_size = get_bgzf_block_size(extra)
+    if block_size is None:
+        raise ValueError("not a BGZF block (no BC field)")
+    rest = infile.read(block_size - 12 - len(extra))
+    if len(rest) < block_size - 12 - len(extra):
+        raise ValueError("truncated BGZF block")
+
+    return b"".join([header, extra, rest])
+
+
+def inflate_bgzf_block(block: bytes) -> bytes:
+    """_summary_
+    Note:
+        read_raw_bgzf_block()으로 읽은 block의 압축을 해제하고, CRC32와 ISIZE를 확인한다.
+        zlib은 압축 해제 중에 GIL을 놓으므로, 여러 thread에서 동시에 실행할 수 있다.
+
+    Raises:
+        ValueError: CRC32 또는 ISIZE가 맞지 않는 경우
+
+    Returns:
+        bytes: 압축을 해제한 data
+    """
+
+    xlen = struct.unpack("<H", block[10:12])[0]
+    data = zlib.decompress(block[12 + xlen : -8], -15)
+    crc32, isize = struct.unpack("<II", block[-8:])
+    if zlib.crc32(data) & 0xFFFFFFFF != crc32 or len(data) != isize:
+        raise ValueError("BGZF block CRC32/ISIZE mismatch")
+
+    return data
+
+
+class BgzfReader:
+    """_summary_
+    Note:
+        BGZF 파일을 virtual offset (coffset << 16 | uoffset) 으로 seek 하여 line 단위로 읽는 reader.
+        같은 block을 반복해서 읽는 경우가 많으므로(인접한 변이 위치), 최근에 압축 해제한 block을 저장해둔다.
+    """
+
+    def __init__(self, filename: str, cache_size: int = 64):
+        self.infile = open(filename, "rb")
+        self.cache_size = cache_size
+        self.block_cache: dict = dict()  # {coffset: (data, next_coffset)}
+        self.data = b""
+        self.coffset = 0
+        self.next_coffset = 0
+        self.uoffset = 0
+
+    def load_block(self, coffset: int):
+        if coffset not in self.block_cache:
+            if len(self.block_cache) >= self.cache_size:
+                self.block_cache.pop(next(iter(self.block_cache)))
+            self.block_cache[coffset] = read_bgzf_block(self.infile, coffset)
+        self.data, self.next_coffset = self.block_cache[coffset]
+        self.coffset = coffset
+
+    def seek(self, virtual_offset: int):
+        self.load_block(virtual_offset >> 16)
+        self.uoffset = virtual_offset & 0xFFFF
+
+    def readline(self) -> bytes:
+        """block 경계에 걸친 line 까지 포함하여, 한 줄을 bytes로 반환한다. 파일의 끝이면 b""."""
+
+        line_parts = []
+        while True:
+            if self.uoffset >= len(self.data):
+                if self.next_coffset == self.coffset:  # EOF
+                    break
+                self.load_block(self.next_coffset)
+                self.uoffset = 0
+                if not self.data:  # EOF marker block
+                    if self.next_coffset == self.coffset:
+                        break
+                    continue
+            newline_idx = self.data.find(b"\n", self.uoffset)
+            if newline_idx == -1:
+                line_parts.append(self.data[self.uoffset :])
+                self.uoffset = len(self.data)
+            else:
+                line_parts.append(self.data[self.uoffset : newline_idx + 1])
+                self.uoffset = newline_idx + 1
+                break
+
+        return b"".join(line_parts)
+
+    def close(self):
+        self.infile.close()
+
+
+def make_bgzf_block(data: bytes, level: int = 6) -> bytes:
+    """_summary_
+    Note:
+        data (BGZF_BLOCK_SIZE 이하)를 압축하여 BGZF block 하나를 만든다. read_bgzf_block()이 읽는 형식과 같다.
+
+    Args:
+        data (bytes): 압축할 data
+        level (int): zlib 압축 level
+
+    Returns:
+        bytes: BGZF block
+    """
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    block_size = 18 + len(cdata) + 8  # header, extra field(BC) + CDATA + CRC32, ISIZE
+
+    return b"".join(
+        [
+            struct.pack("<BBBBIBBH", 31, 139, 8, 4, 0, 0, 255, 6),
+            struct.pack("<BBHH", 66, 67, 2, block_size - 1),
+            cdata,
+            struct.pack("<II", zlib.crc32(data) & 0xFFFFFFFF, len(data)),
+        ]
+    )
+
+
+class BgzfWriter:
+    """_summary_
+    Note:
+        data를 BGZF_BLOCK_SIZE 크기의 block으로 나누어 BGZF (bgzip) 형식으로 저장하는 writer.
+        gzip으로도 읽을 수 있으며, tabix index를 만들 수 있다. close() 할 때 EOF block을 추가한다.
+    """
+
+    def __init__(self, filename: str, level: int = 6):
+        self.outfile = open(filename, "wb")
+        self.level = level
+        self.buffer = bytearray()
+
+    def write(self, data: bytes):
+        self.buffer += data
+        while len(self.buffer) >= BGZF_BLOCK_SIZE:
+            self.outfile.write(
+                make_bgzf_block(bytes(self.buffer[:BGZF_BLOCK_SIZE]), self.level)
+            )
+            del self.buffer[:BGZF_BLOCK_SIZE]
+
+    def close(self):
+        if self.buffer:
+            self.outfile.write(make_bgzf_block(bytes(self.buffer), self.level))
+            self.buffer = bytearray()
+        self.outfile.write(BGZF_EOF)
+        self.outfile.close()
+
+
+def parse_tabix_index(index_file: str) -> dict:
+    """_summary_
+    Note:
+        tabix index 파일(.tbi, .csi)을 parsing 하여, 염색체 별 bin-chunk 정보를 dictionary 로 반환한다.
+        index 파일 자체도 BGZF로 압축되어 있으므로 gzip 으로 압축을 해제한 뒤 binary를 읽는다.
+
+        - TBI: magic, n_ref, format, col_seq, col_beg, col_end, meta, skip, names,
+               [bins(bin, chunks), linear_index(16kb 단위 최소 offset)] * n_ref
+        - CSI: magic, min_shift, depth, aux(tabix header), n_ref,
+               [bins(bin, loffset, chunks)] * n_ref
+
+    Args:
+        index_file (str): index file address
+
+    Returns:
+        dict: {
+            "min_shift": 14, "depth": 5, "col_seq": 1, "col_beg": 2, "meta": "#",
+            "refs": {"1": {"bins": {bin: [(cnk_beg, cnk_end)]}, "loffsets": {bin: loffset},
+                           "linear_index": [ioff, ...]}}
+        }
+    """
+
+    with gzip.open(index_file, "rb") as infile:
+        data = infile.read()
+
+    offset = 0
+
+    def unpack(fmt: str):
+        nonlocal offset
+        values = struct.unpack_from(fmt, data, offset)
+        offset += struct.calcsize(fmt)
+        return values
+
+    magic = data[:4]
+    offset = 4
+    if magic == b"TBI\x01":
+        is_csi = False
+        min_shift, depth = 14, 5
+        n_ref = unpack("<i")[0]
+        header_offset = offset
+    elif magic == b"CSI\x01":
+        is_csi = True
+        min_shift, depth, l_aux = unpack("<3i")
+        header_offset = offset
+        offset += l_aux
+        n_ref = unpack("<i")[0]
+    else:
+        raise ValueError(f"unknown tabix index format: {index_file}")
+
+    # tabix header (CSI의 경우 aux 영역에 저장되어 있음)
+    fmt, col_seq, col_beg, col_end, meta, skip, l_nm = struct.unpack_from(
+        "<7i", data, header_offset
+    )
+    names_offset = header_offset + 28
+    ref_names = (
+        data[names_offset : names_offset + l_nm].rstrip(b"\x00").split(b"\x00")
+    )
+    if not is_csi:
+        offset = names_offset + l_nm
+
+    refs = dict()
+    for ref_idx in range(n_ref):
+        bins, loffsets = dict(), dict()
+        n_bin = unpack("<i")[0]
+        for _ in range(n_bin):
+            if is_csi:
+                bin_no, loffset, n_chunk = unpack("<IQi")
+                loffsets[bin_no] = loffset
+            else:
+                bin_no, n_chunk = unpack("<Ii")
+            chunks = [unpack("<QQ") for _ in range(n_chunk)]
+            bins[bin_no] = chunks
+        linear_index = []
+        if not is_csi:
+            n_intv = unpack("<i")[0]
+            linear_index = list(unpack(f"<{n_intv}Q")) if n_intv else []
+
+        if ref_idx < len(ref_names):
+            refs[ref_names[ref_idx].decode()] = {
+                "bins": bins,
+                "loffsets": loffsets,
+                "linear_index": linear_index,
+            }
+
+    return {
+        "min_shift": min_shift,
+        "depth": depth,
+        "col_seq": col_seq,
+        "col_beg": col_beg,
+        "meta": chr(meta),
+        "refs": refs,
+    }
+
+
+def reg2bins(beg: int, end: int, min_shift: int, depth: int) -> list:
+    """0-based [beg, end) 구간과 겹치는 모든 bin 번호를 반환한다. (htslib reg2bins)"""
+
+    bins = []
+    if beg >= end:
+        return bins
+    shift = min_shift + depth * 3
+    end = min(end, 1 << shift) - 1
+    level_start = 0
+    for level in range(depth + 1):
+        first = level_start + (beg >> shift)
+        last = level_start + (end >> shift)
+        bins.extend(range(first, last + 1))
+        shift -= 3
+        level_start += 1 << (level * 3)
+
+    return bins
+
+
+class TabixFile:
+    """_summary_
+    Note:
+        tabix index를 이용해 bgzip으로 압축된 파일(gnomad vcf 등)의 특정 위치 record만 읽는 class.
+        전체 파일을 읽지 않고, index에서 해당 위치가 포함된 block의 offset을 찾아 바로 seek 한다.
+
+    Examples:
+        >>> gnomad_file = TabixFile("gnomad.exomes.r2.1.1.sites.vcf.gz")
+            for line in gnomad_file.fetch("1", 138980, 138980):
+                # "1\t138980\trs796175332\tG\tC\t..."
+    """
+
+    def __init__(self, filename: str, index_file: str = None):
+        if index_file is None:
+            index_file = find_tabix_index(filename)
+        if index_file is None:
+            raise FileNotFoundError(f"tabix index not found: {filename}")
+
+        self.index = parse_tabix_index(index_file)
+        self.reader = BgzfReader(filename)
+
+    def min_offset(self, ref_index: dict, beg: int) -> int:
+        """beg 보다 앞에서 끝나는 chunk를 건너뛰기 위한 최소 virtual offset."""
+
+        min_shift = self.index["min_shift"]
+        linear_index = ref_index["linear_index"]
+        if linear_index:  # TBI
+            window = beg >> min_shift
+            if window < len(linear_index):
+                return linear_index[window]
+            return linear_index[-1]
+
+        # CSI: beg를 포함하는 가장 작은 bin부터 부모 bin으로 올라가며 loffset 확인
+        depth = self.index["depth"]
+        level_start = ((1 << (depth * 3)) - 1) // 7
+        bin_no = level_start + (beg >> min_shift)
+        while bin_no > 0:
+            if bin_no in ref_index["loffsets"]:
+                return ref_index["loffsets"][bin_no]
+            bin_no = (bin_no - 1) >> 3
+        return ref_index["loffsets"].get(0, 0)
+
+    def fetch(self, chrom: str, start: int, end: int):
+        """_summary_
+        Note:
+            chrom 염색체에서 시작 위치(1-based)가 [start, end] 구간에 포함되는 record를 순서대로 반환한다.
+            파일은 위치 순으로 정렬되어 있으므로, 시작 위치가 end를 넘어가면 더 읽지 않는다.
+
+        Args:
+            chrom (str): 염색체 ("1", "X", ..)
+            start (int): 1-based 시작 위치
+            end (int): 1-based 끝 위치 (포함)
+
+        Yields:
+            line (str): 해당 구간에 있는 각 record line
+        """
+
+        ref_index = self.index["refs"].get(chrom)
+        if ref_index is None:
+            return
+
+        beg = start - 1  # 0-based
+        min_offset = self.min_offset(ref_index, beg)
+        chunk_begs = [
+            cnk_beg
+            for bin_no in reg2bins(
+                beg, end, self.index["min_shift"], self.index["depth"]
+            )
+            for cnk_beg, cnk_end in ref_index["bins"].get(bin_no, [])
+            if cnk_end > min_offset
+        ]
+        if not chunk_begs:
+            return
+
+        col_seq = self.index["col_seq"] - 1
+        col_beg = self.index["col_beg"] - 1
+        meta = self.index["meta"]
+
+        self.reader.seek(max(min(chunk_begs), min_offset))
+        while True:
+            line = self.reader.readline()
+            if not line:
+                break
+            line = line.decode(encoding="utf-8")
+            if line.startswith(meta):
+                continue
+            row = line.split("\t", max(col_seq, col_beg) + 1)
+            if row[col_seq] != chrom:
+                break
+            pos = int(row[col_beg])
+            if pos > end:
+                break
+            if pos >= start:
+                yield line
+
+    def close(self):
+        self.reader.close()
@@ -8,5 +8,6 @@ __all__ = [
     "pp2bp1",
     "pm4bp3",
     "pm2ba1bs1",
+    "vectorized",
 ]
 
@@ -2,8 +2,12 @@
 # Population data, vs normal people variants
 
 from ..helper import *
+from collections import defaultdict
+import numpy as np
 
 GNOMAD_DB = "/data/projects/ACMG/database/gnomad.exomes.r2.1.1.sites.vcf.gz"
+# python -m ACMG.helper.npstore build-gnomad GNOMAD_DB GNOMAD_STORE
+GNOMAD_STORE = "/data/projects/ACMG/database/gnomad.exomes.r2.1.1.sites.store"
 
 
 def add_gnomad_into_var_infos(variant_dic: dict, df_col2idx: dict) -> dict:
@@ -19,6 +23,11 @@ def add_gnomad_into_var_infos(variant_dic: dict, df_col2idx: dict) -> dict:
         있는지 확인한다. AN 값이 0인 경우, AF 값은 존재하지 않으므로, AF의 여부를 먼저 확인한 뒤, variant_id에
         해당하는 모든 variant_id-feature 에 gnomad_ac, an, af 값을 업데이트 한다. Default 값으로 None을 부여함.
 
+        gnomad 파일에 tabix index(.tbi/.csi)가 있는 경우에는 전체 파일을 읽지 않고, 환자 변이 위치만
+        검색한다(scan_gnomad_by_index()). npstore로 미리 변환한 gnomad store가 있는 경우에는
+        store를 memory-map 하여 검색한다(scan_gnomad_by_store()). 찾은 값은 따로 모은 뒤 한 번에
+        추가한다(scan_gnomad(), merge_gnomad_records()).
+
     Args:
         variant_dic (dict): class VariantDF.variant_dic
         df_col2idx (dict): DF column index dictionary
@@ -36,53 +45,232 @@ def add_gnomad_into_var_infos(variant_dic: dict, df_col2idx: dict) -> dict:
             '25/39', 'V/I', 'Gta/Ata', 'LMBR1L', 0.051, 240, 100000, 0.241109]
     """
 
-    # gnomad 각 라인 파징
-    for line in dbparser.read_big_gz_file(GNOMAD_DB):
-        if line.startswith("#") and (not line.startswith("##")):
-            f_col2idx = {
-                val: idx
-                for idx, val in enumerate(line.strip("#").strip().split("\t"))
-            }
-            continue
-        if not line.startswith("#"):  # new gnomad variation
-            row = line.strip().split("\t")
-            chr = row[f_col2idx["CHROM"]]
-            pos = row[f_col2idx["POS"]]
-            ref = row[f_col2idx["REF"]]
-            alt = row[f_col2idx["ALT"]]
-            var_id = f"{chr}-{pos}-{ref}-{alt}"  # 1-985445-G-GT
+    return merge_gnomad_records(variant_dic, scan_gnomad(variant_dic), df_col2idx)
+
+
+def scan_gnomad(var_ids: object) -> list:
+    """_summary_
+    Note:
+        gnomad 파일에서 환자 변이의 (ac, an, af) 값을 찾아 파일 순서대로 반환한다. variant_dic을 수정하지 않고
+        결과를 따로 모으므로, REVEL 검색(pp3bp4bp7.scan_revel())과 다른 thread에서 동시에 실행한 뒤
+        merge_gnomad_records()로 합칠 수 있다.
+
+        GNOMAD_DB로 미리 만들어둔 store가 있으면 store에서 검색하고(scan_gnomad_by_store()), tabix index가
+        있으면 환자 변이 위치만 검색한다(scan_gnomad_by_index()). 둘 다 없으면 전체 파일을 읽으면서, 환자
+        변이 위치에 해당하는 줄만 parsing 한다(scan_gnomad_by_positions()). store가 다른 파일 (또는 바뀌기
+        전의 GNOMAD_DB)로 만들어진 경우에는 경고를 출력하고 store를 사용하지 않는다.
+
+    Args:
+        var_ids (object): 환자 var_id 목록 (variant_dic, set 등 in 으로 검색할 수 있는 object)
+
+    Returns:
+        list: [(var_id, (ac, an, af)), ..]
+    """
+
+    if npstore.is_store_current(GNOMAD_STORE, GNOMAD_DB, "gnomad"):
+        return scan_gnomad_by_store(var_ids, GNOMAD_STORE)
+    if tabix.find_tabix_index(GNOMAD_DB):
+        return scan_gnomad_by_index(var_ids, GNOMAD_DB)
+
+    return scan_gnomad_by_positions(var_ids, GNOMAD_DB)
+
+
+def scan_gnomad_by_positions(var_ids: object, gnomad_file: str) -> list:
+    """_summary_
+    Note:
+        index 없이 gnomad 파일 전체를 chunk 단위로 읽되, 환자 변이 위치에 해당하는 line만 parsing 한다.
+        환자 변이의 (염색체, 위치)로 정렬된 위치 key 배열을 만들어 두고, chunk의 각 line에서는 CHROM, POS만
+        numpy로 읽어 key를 만든 뒤 (npstore.scan_vcf_position_keys()) np.searchsorted로 한 번에 검색한다.
+        위치가 같은 line만 decode 하여 나누고, var_id (ref, alt 포함)가 같은지 확인한다.
+
+        gnomAD VCF는 고정된 column 순서(CHROM, POS, ID, REF, ALT, ..)를 가지므로, header는 INFO column의
+        위치를 찾는 데만 사용한다.
+
+    Args:
+        var_ids (object): 환자 var_id 목록 (variant_dic, set 등)
+        gnomad_file (str): gnomad vcf(.gz) file address
+
+    Returns:
+        list: [(var_id, (ac, an, af)), ..]
+    """
+
+    query_keys = []
+    for var_id in var_ids:
+        chrom, pos = var_id.split("-")[:2]
+        if chrom and pos.isdigit():
+            query_keys.append(
+                (npstore.make_raw_chrom_code(chrom.encode()) << 32) | int(pos)
+            )
+    query_keys = np.unique(np.array(query_keys, dtype=np.int64))
+
+    gnomad_records = []
+    if not len(query_keys):
+        return gnomad_records
+
+    info_idx = 7
+    for chunk in dbparser.read_chunks(gnomad_file):
+        # header line ("#CHROM ..")이 있는 chunk (파일의 처음)
+        if b"#" in chunk and (chunk.startswith(b"#") or b"\n#" in chunk):
+            for line in chunk.split(b"\n"):
+                if line.startswith(b"#") and not line.startswith(b"##"):
+                    header = line.decode().strip("#").strip().split("\t")
+                    info_idx = header.index("INFO")
+
+        line_starts, line_ends, keys = npstore.scan_vcf_position_keys(chunk)
+        key_idx = np.minimum(np.searchsorted(query_keys, keys), len(query_keys) - 1)
+        for i in np.flatnonzero(query_keys[key_idx] == keys):
+            row = chunk[line_starts[i] : line_ends[i]].decode().strip().split("\t")
+            var_id = f"{row[0]}-{row[1]}-{row[3]}-{row[4]}"
 
             # 환자 변이 정보에 gnomad ratio를 할당
-            if var_id in variant_dic:
-                # ac, an, af 할당하는 과정. AN = 0 인 경우, AF가 없음.
-                gnomad_ac = row[f_col2idx["INFO"]].split("AC=")[1].split(";")[0]
-                gnomad_an = row[f_col2idx["INFO"]].split("AN=")[1].split(";")[0]
-                if "AF=" in row[f_col2idx["INFO"]]:
-                    gnomad_af = (
-                        row[f_col2idx["INFO"]].split("AF=")[1].split(";")[0]
-                    )
-                else:
-                    gnomad_af = None
-                # 각 transcript 정보 리스트에 저장.
-                for var_feature in variant_dic[var_id]:
-                    if gnomad_ac:
-                        variant_dic[var_id][var_feature]["var_infos"][
-                            df_col2idx["gnomad_ac"]
-                        ] = int(gnomad_ac)
-
-                    if gnomad_an:
-                        variant_dic[var_id][var_feature]["var_infos"][
-                            df_col2idx["gnomad_an"]
-                        ] = int(gnomad_an)
-
-                    if gnomad_af:
-                        variant_dic[var_id][var_feature]["var_infos"][
-                            df_col2idx["gnomad_af"]
-                        ] = float(gnomad_af)
+            if var_id in var_ids:
+                gnomad_records.append((var_id, parse_gnomad_info(row[info_idx])))
+
+    return gnomad_records
+
+
+def scan_gnomad_by_index(var_ids: object, gnomad_file: str) -> list:
+    """_summary_
+    Note:
+        gnomad.gz 파일의 tabix index(.tbi/.csi)를 이용하여, 환자의 변이 위치에 해당하는 record만 읽어서
+        gnomad_ac, an, af 값을 찾는다. 전체 파일(약 60~70gb)을 읽는 대신 환자 변이의 수에 비례하는
+        만큼만 읽으므로, 전체 파일 탐색보다 훨씬 빠르다.
+
+        gnomAD VCF는 고정된 column 순서(CHROM, POS, ID, REF, ALT, QUAL, FILTER, INFO)를 가지므로,
+        header를 따로 읽지 않는다. 같은 위치를 여러 번 검색하지 않도록, 염색체-위치 별로 한 번만 검색한다.
+
+    Args:
+        var_ids (object): 환자 var_id 목록 (variant_dic, set 등)
+        gnomad_file (str): bgzip 압축 및 tabix index가 만들어진 gnomad vcf file address
+
+    Returns:
+        list: [(var_id, (ac, an, af)), ..]
+    """
+
+    # {chrom: {pos}}. 1-985445-G-GT -> "1", 985445
+    var_positions = defaultdict(set)
+    for var_id in var_ids:
+        chrom, pos = var_id.split("-")[:2]
+        var_positions[chrom].add(int(pos))
+
+    gnomad_records = []
+    gnomad_file = tabix.TabixFile(gnomad_file)
+    for chrom in var_positions:
+        for pos in sorted(var_positions[chrom]):
+            for line in gnomad_file.fetch(chrom, pos, pos):
+                # CHROM POS ID REF ALT QUAL FILTER INFO
+                row = line.strip().split("\t")
+                var_id = f"{row[0]}-{row[1]}-{row[3]}-{row[4]}"
+                if var_id in var_ids:
+                    gnomad_records.append((var_id, parse_gnomad_info(row[7])))
+    gnomad_file.close()
+
+    return gnomad_records
+
+
+def scan_gnomad_by_store(var_ids: object, gnomad_store_dir: str) -> list:
+    """_summary_
+    Note:
+        npstore.build_gnomad_store()로 미리 만들어 둔 gnomad store (정렬된 위치 key, AC, AN, AF column)를
+        memory-map 으로 읽고, 환자의 모든 변이를 한 번에 검색(np.searchsorted)하여 gnomad_ac, an, af 값을
+        찾는다. INFO 문자열을 parsing 하지 않으므로, 전체 파일을 읽는 것보다 훨씬 빠르다.
+
+    Args:
+        var_ids (object): 환자 var_id 목록 (variant_dic, set 등)
+        gnomad_store_dir (str): gnomad store directory address
+
+    Returns:
+        list: [(var_id, (ac, an, af)), ..]
+    """
+
+    gnomad_store = npstore.load_store(gnomad_store_dir)
+    gnomad_dic = npstore.query_gnomad_store(gnomad_store, list(var_ids))
+
+    return list(gnomad_dic.items())
+
+
+def merge_gnomad_records(
+    variant_dic: dict, gnomad_records: list, df_col2idx: dict
+) -> dict:
+    """_summary_
+    Note:
+        scan_gnomad()로 찾은 값을 순서대로 variant_infos의 gnomad_ac, an, af 항목에 저장한다. 같은 변이의
+        record가 여러 개이면, 파일을 읽으면서 바로 저장하는 것과 같도록 뒤의 값으로 덮어쓴다 (None 제외).
+
+    Args:
+        variant_dic (dict): class VariantDF.variant_dic
+        gnomad_records (list): [(var_id, (ac, an, af)), ..]
+        df_col2idx (dict): DF column index dictionary
+
+    Returns:
+        dict: gnomad 값이 update된 variant_dic
+    """
+
+    for var_id, gnomad_values in gnomad_records:
+        update_gnomad_var_infos(variant_dic, var_id, gnomad_values, df_col2idx)
 
     return variant_dic
 
 
+def parse_gnomad_info(gnomad_info: str) -> tuple:
+    """_summary_
+    Note:
+        gnomad INFO 란에서 AC, AN, AF 값을 찾아 반환한다. AN 값이 0인 경우, AF 값은 존재하지 않으므로
+        AF의 여부를 먼저 확인한다. 값이 없는 항목은 None 으로 반환한다.
+
+    Args:
+        gnomad_info (str): AC=3;AN=2000;AF=0.0015;...
+
+    Returns:
+        tuple: (ac, an, af)
+
+    Examples:
+        >>> "AC=2;AN=134554;AF=1.48639e-05;rf_tp_probability=2.14504e-01;" -> (2, 134554, 1.48639e-05)
+            "AC=0;AN=0;rf_tp_probability=7.78117e-01;" -> (0, 0, None)
+    """
+
+    # ac, an, af 할당하는 과정. AN = 0 인 경우, AF가 없음.
+    gnomad_ac = gnomad_info.split("AC=")[1].split(";")[0]
+    gnomad_an = gnomad_info.split("AN=")[1].split(";")[0]
+    if "AF=" in gnomad_info:
+        gnomad_af = gnomad_info.split("AF=")[1].split(";")[0]
+    else:
+        gnomad_af = None
+
+    return (
+        int(gnomad_ac) if gnomad_ac else None,
+        int(gnomad_an) if gnomad_an else None,
+        float(gnomad_af) if gnomad_af else None,
+    )
+
+
+def update_gnomad_var_infos(
+    variant_dic: dict, var_id: str, gnomad_values: tuple, df_col2idx: dict
+):
+    """_summary_
+    Note:
+        variant_id에 해당하는 모든 variant_id-feature의 var_infos에 gnomad ac, an, af 값을 저장한다.
+        값이 None 인 항목은 default 값을 유지한다.
+
+    Args:
+        variant_dic (dict): class VariantDF.variant_dic
+        var_id (str): 1-985445-G-GT
+        gnomad_values (tuple): (ac, an, af)
+        df_col2idx (dict): DF column index dictionary
+    """
+
+    gnomad_ac, gnomad_an, gnomad_af = gnomad_values
+    # 각 transcript 정보 리스트에 저장.
+    for var_feature in variant_dic[var_id]:
+        var_infos = variant_dic[var_id][var_feature]["var_infos"]
+        if gnomad_ac is not None:
+            var_infos[df_col2idx["gnomad_ac"]] = gnomad_ac
+        if gnomad_an is not None:
+            var_infos[df_col2idx["gnomad_an"]] = gnomad_an
+        if gnomad_af is not None:
+            var_infos[df_col2idx["gnomad_af"]] = gnomad_af
+
+
 def assign_ba1_rule(gnomad_an: int, gnomad_af: float) -> int:
     """_summary_
     Note:
@@ -177,6 +365,71 @@ def compare_with_disease_inheritence(
     return (pm2, bs1)
 
 
+def get_gene_inheritence(
+    gene_symbol: str, disease_db_dic: dict, disease_col2idx: dict
+) -> str:
+    """_summary_
+    Note:
+        Gene_symbol을 키워드로 유전자-질병정보 dictionary의 정보를 확인하여, 해당 유전자의 inheritence를
+        반환한다. 각 유전자에 대한 질병 정보는, 여러 보고들을 포함하기 때문에 inheritence 정보가 다른 경우가 있다.
+        그 경우, 각각의 수를 세어서 dominant인지 recessive인지 비율로 기준을 정한다. 만약, X-linked 질환이
+        있다면, X-linked 질환을 우선으로 판정한다.
+
+    Args:
+        gene_symbol (str): gene_symbol
+        disease_db_dic (dict): 각 gene_symbol에 해당하는 질병들을 정리한 dictionary
+        disease_col2idx (dict): disease_db_dic의 각 column을 index로 변환하는 dictionary
+
+    Returns:
+        str: "AD", "AR", "XD", "XR", "YD" or "" (질병 정보 또는 inheritence 정보가 없는 경우)
+    """
+
+    if not disease_db_dic.get(gene_symbol):
+        return ""
+
+    AD_count, AR_count = 0, 0
+    XD_count, XR_count = 0, 0
+    Y_count = 0
+
+    # 같은 유전자에 여러 질병과, 여러 inheritence가 있는 경우, 모든 AD, AR counting
+    for each_disease_infos in disease_db_dic[gene_symbol]:
+        AD_count += each_disease_infos[disease_col2idx["inheritance"]].count(
+            "Autosomal dominant"
+        )
+
+        AR_count += each_disease_infos[disease_col2idx["inheritance"]].count(
+            "Autosomal recessive"
+        )
+
+        XD_count += each_disease_infos[disease_col2idx["inheritance"]].count(
+            "X-linked dominant"
+        )
+
+        XR_count += each_disease_infos[disease_col2idx["inheritance"]].count(
+            "X-linked recessive"
+        )
+
+        Y_count += each_disease_infos[disease_col2idx["inheritance"]].count(
+            "Y-linked"
+        )
+
+    # 보고된 비율이 더 많은 쪽을 inheritence로 설정.
+    # 같은 수인 경우 dominant로 설정하며, X-linked, Y-linked 우선.
+    if (XD_count + XR_count) > 0:
+        if XD_count >= XR_count:
+            return "XD"
+        else:
+            return "XR"
+    elif Y_count > 0:
+        return "YD"
+    elif AD_count == 0 and AR_count == 0:
+        return ""
+    elif AD_count >= AR_count:
+        return "AD"
+    else:
+        return "AR"
+
+
 def assign_pm2bs1_rule(
     gnomad_an: int,
     gnomad_af: float,
@@ -187,9 +440,7 @@ def assign_pm2bs1_rule(
     """_summary_
     Note:
         Gene_symbol을 키워드로 유전자-질병정보 dictionary의 정보를 확인하여, 해당 유전자의 inheritence를
-        확인한다. 각 유전자에 대한 질병 정보는, 여러 보고들을 포함하기 때문에 inheritence 정보가 다른 경우가 있다.
-        그 경우, 각각의 수를 세어서 dominant인지 recessive인지 비율로 기준을 정한다. 만약, X-linked 질환이
-        있다면, X-linked 질환을 우선으로 판정한다. 이후, inhertence에 따라 기준을 정해서 gnomad의 AF 정보를
+        확인한다(get_gene_inheritence()). 이후, inhertence에 따라 기준을 정해서 gnomad의 AF 정보를
         바탕으로 pm2, bs1 rule을 부여한다(compare_with_disease_inheritence()).
 
         disease_db_dic: {
@@ -203,8 +454,8 @@ def assign_pm2bs1_rule(
         gnomad_an (int): 특정 변이를 검사한 일반인 총 수
         gnomad_af (float): 특정 변이에 대해 일반인에서의 비율 (AC/AN)
         gene_symbol (str): gene_symbol
-        clinvar_db_dic (dict): gene_symbol 기준으로 정리된 clinvar_db
-        clinvar_col2idx (dict): column index dictionary
+        disease_db_dic (dict): 각 gene_symbol에 해당하는 질병들을 정리한 dictionary
+        disease_col2idx (dict): disease_db_dic의 각 column을 index로 변환하는 dictionary
 
     Returns:
         tuple(int, int): (pm2, bs1)
@@ -213,49 +464,8 @@ def assign_pm2bs1_rule(
 
     pm2, bs1 = 0, 0
 
-    if disease_db_dic.get(gene_symbol):
-
-        AD_count, AR_count = 0, 0
-        XD_count, XR_count = 0, 0
-
-        # 같은 유전자에 여러 질병과, 여러 inheritence가 있는 경우, 모든 AD, AR counting
-        for each_disease_infos in disease_db_dic[gene_symbol]:
-            AD_count += each_disease_infos[
-                disease_col2idx["inheritance"]
-            ].count("Autosomal dominant")
-
-            AR_count += each_disease_infos[
-                disease_col2idx["inheritance"]
-            ].count("Autosomal recessive")
-
-            XD_count += each_disease_infos[
-                disease_col2idx["inheritance"]
-            ].count("X-linked dominant")
-
-            XR_count += each_disease_infos[
-                disease_col2idx["inheritance"]
-            ].count("X-linked recessive")
-
-            Y_count += each_disease_infos[disease_col2idx["inheritance"]].count(
-                "Y-linked"
-            )
-
-        # 보고된 비율이 더 많은 쪽을 inheritence로 설정.
-        # 같은 수인 경우 dominant로 설정하며, X-linked, Y-linked 우선.
-        if (XD_count + XR_count) > 0:
-            if XD_count >= XR_count:
-                inheritence = "XD"
-            else:
-                inheritence = "XR"
-        elif Y_count > 0:
-            inheritence = "YD"
-        elif AD_count == 0 and AR_count == 0:
-            return (pm2, bs1)
-        elif AD_count >= AR_count:
-            inheritence = "AD"
-        else:
-            inheritence = "AR"
-
+    inheritence = get_gene_inheritence(gene_symbol, disease_db_dic, disease_col2idx)
+    if inheritence:
         # pm2, bs1 할당
         pm2, bs1 = compare_with_disease_inheritence(
             gnomad_an, gnomad_af, inheritence
@@ -265,7 +475,10 @@ def assign_pm2bs1_rule(
 
 
 def execute(
-    proband_var_df: object, disease_db_dic: dict, disease_col2idx: dict
+    proband_var_df: object,
+    disease_db_dic: dict,
+    disease_col2idx: dict,
+    annotate: bool = True,
 ) -> object:
     """_summary_
     Note: ACMG rule 중에서, pm2/ba1/bs1 에 해당하는 룰을 구현한 모듈이다. 각각의 rule에 대한 설명은 다음과 같다.
@@ -298,11 +511,15 @@ def execute(
         pm2, bs1 rule을 부여한다(assign_pm2bs1_rule()). 이 때, gene symbol이 없으면 해당하는 disease를 확인할 수
         없으므로, gene_symbol이 있는 경우에만 본 함수를 수행한다. 본 함수에 사용한 cut off 값은 여러 레퍼런스를 참고하여
         결정하였다. 이 때, 질환마다 동일한 기준을 적용하였다. (각 함수 설명 참고)
+        같은 유전자의 여러 transcript는 (gnomad_an, gnomad_af, gene_symbol)이 같으므로, 결과를 LRU cache
+        (memo.LruMemo)에 저장해 두고 다시 사용한다.
 
     Args:
         proband_var_df (object): Class VariantDF <- VEP file
         disease_db_dic (dict): 각 gene_symbol에 해당하는 질병들을 정리한 dictionary. 여러개의 질병은 []로 구분.
         disease_col2idx (dict): disease_db_dic의 각 column을 index로 변환하는 dictionary
+        annotate (bool): False 이면 gnomad 값을 variant_infos에 추가하는 과정을 생략한다.
+            (main() 에서 미리 추가한 뒤, 염색체 별로 나누어 병렬 실행하는 경우)
 
     Returns:
         object: proband_variant_DF의 variant_dic["evidnece_score_dic"]이 update된 object.
@@ -316,7 +533,9 @@ def execute(
 
     df_col2idx = proband_var_df.df_col2idx
     variant_dic = proband_var_df.variant_dic
-    variant_dic = add_gnomad_into_var_infos(variant_dic, df_col2idx)
+    if annotate:  # 이미 gnomad 값이 추가된 경우 생략
+        variant_dic = add_gnomad_into_var_infos(variant_dic, df_col2idx)
+    pm2bs1_memo = memo.LruMemo("pm2bs1")  # {(gnomad_an, gnomad_af, gene_symbol): (pm2, bs1)}
 
     for var_id in variant_dic:
         for var_feature in variant_dic[var_id]:
@@ -339,7 +558,9 @@ def execute(
 
                 if gene_symbol != "-":
                     if not ba1:  # ba1이 이미 할당된 경우, pm2, bs1 not assigned
-                        pm2, bs1 = assign_pm2bs1_rule(
+                        pm2, bs1 = pm2bs1_memo.get(
+                            (gnomad_an, gnomad_af, gene_symbol),
+                            assign_pm2bs1_rule,
                             gnomad_an,
                             gnomad_af,
                             gene_symbol,
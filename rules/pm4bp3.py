@@ -1,6 +1,8 @@
 # Module for PM4, BP3
 # repetitive region, in-frame deletion/insertion, stop-loss
 
+import numpy as np
+
 
 def is_inframe_indel_change_var(var_infos_dic: dict, df_col2idx: dict) -> bool:
     """_summary_
@@ -44,8 +46,84 @@ def is_stop_lost_var(var_infos_dic: dict, df_col2idx: dict) -> bool:
         return False
 
 
+def make_repeat_index_dic(repeat_db_dic: dict) -> dict:
+    """_summary_
+    Note:
+        염색체 별 반복서열 구간 목록을, 구간 검색을 위한 index(numpy array)로 변환한다. RepeatMasker의
+        구간은 서로 겹치거나 다른 구간 안에 포함(nested)될 수 있으므로, 시작 위치 순으로 정렬한 뒤
+        끝 위치의 누적 최댓값(max_ends)을 함께 저장한다.
+
+        max_ends[i] = max(ends[0], .., ends[i])
+
+        어떤 위치 pos 가 반복서열에 포함되는지는, 시작 위치가 pos 이하인 구간들 중 가장 큰 끝 위치가
+        pos 이상인지로 판단할 수 있다 (match_with_repeat_regions()).
+
+    Args:
+        repeat_db_dic (dict): {Chr: [(start, end), ..]} 로 정리된 Dictionary
+
+    Returns:
+        dict: {Chr: (starts(np.ndarray), ends(np.ndarray), max_ends(np.ndarray))}
+
+    Examples:
+        >>> {"1": [(10001, 10468), (10100, 10200), (10469, 11470)]}
+            -> {"1": ([10001, 10100, 10469], [10468, 10200, 11470], [10468, 10468, 11470])}
+    """
+
+    repeat_index_dic = dict()
+    for chrom, repetitive_regions in repeat_db_dic.items():
+        regions = np.array(repetitive_regions, dtype=np.int64).reshape(-1, 2)
+        regions = regions[np.argsort(regions[:, 0], kind="stable")]
+        starts, ends = regions[:, 0].copy(), regions[:, 1].copy()
+        repeat_index_dic[chrom] = (starts, ends, np.maximum.accumulate(ends))
+
+    return repeat_index_dic
+
+
+def match_with_repeat_regions(
+    chrom: str, var_starts: list, var_ends: list, repeat_index_dic: dict
+) -> np.ndarray:
+    """_summary_
+    Note:
+        같은 염색체의 여러 inframe indel에 대해, 변이의 중간위치(center_pos)가 반복서열 구간에 포함되는지
+        한 번에 확인한다. 각 center_pos 에 대해, 시작 위치가 center_pos 이하인 마지막 구간을
+        np.searchsorted로 찾고, 그 구간까지의 max_ends가 center_pos 이상이면 반복서열에 포함된다.
+        (겹치거나 포함된(nested) 구간도 정확히 찾는다.)
+
+    Args:
+        chrom (str): 변이들이 속하는 염색체
+        var_starts (list): 변이들의 시작지점
+        var_ends (list): 변이들의 끝지점
+        repeat_index_dic (dict): make_repeat_index_dic()의 결과
+
+    Returns:
+        np.ndarray: 각 변이가 반복서열에 포함되는지 여부 (bool array)
+    """
+
+    var_starts = np.asarray(var_starts, dtype=np.int64)
+    var_ends = np.asarray(var_ends, dtype=np.int64)
+    # round()와 같은 방식(.5 -> 짝수)으로 반올림
+    center_pos = np.rint((var_starts + var_ends) / 2).astype(np.int64)
+
+    if chrom not in repeat_index_dic or len(repeat_index_dic[chrom][0]) == 0:
+        return np.zeros(len(center_pos), dtype=bool)
+    starts, _, max_ends = repeat_index_dic[chrom]
+
+    # center_pos 이하에서 시작하는 구간의 수
+    region_idx = np.searchsorted(starts, center_pos, side="right")
+    is_repeat = region_idx > 0
+    is_repeat[is_repeat] = (
+        max_ends[region_idx[is_repeat] - 1] >= center_pos[is_repeat]
+    )
+
+    return is_repeat
+
+
 def match_with_repeat_region(
-    chrom: str, var_start: int, var_end: int, repeat_db_dic: dict
+    chrom: str,
+    var_start: int,
+    var_end: int,
+    repeat_db_dic: dict,
+    repeat_index_dic: dict = None,
 ) -> tuple:
     """_summary_
     Note:
@@ -55,24 +133,25 @@ def match_with_repeat_region(
         repeat_db_dic = {
                     "1": [(10001, 10467), (10469, 11447), ...]
                     "2": [(444214, 444451), (445112, 445234), ...]
-                } (start, end)은 오름차순 정렬되어 있음.
+                }
 
-        repeat_db_dic의 구간은 오름차순으로 정렬되어 있으므로, 원하는 구간을 빠르게 찾기위해 binary search를
-        이용할 수 있다. '절반이상'이 반복서열 구간에 포함되기 위해서는 변이의 중간위치(center_pos)가 반복서열
-        구간 내에 반드시 포함되어야 한다.
+        '절반이상'이 반복서열 구간에 포함되기 위해서는 변이의 중간위치(center_pos)가 반복서열 구간 내에
+        반드시 포함되어야 한다.
 
                     (  *  ) <- Varirant
         ...|----|....|--------|.........|----|... <- repeat regions
                           (  *  )
 
-        따라서, 반복서열의 start postion을 기준으로 해당 변이의 중간지점이 포함되는 구간을 찾고, center_pos가
-        해당 반복서열의 (start, end)에 속하는지 확인한다. 반복서열에 속하면 bp3를, 아니면 pm4를 부여한다.
+        따라서, 해당 변이의 중간지점이 포함되는 반복서열 구간이 있는지 확인한다. 구간은 서로 겹치거나
+        포함될 수 있으므로, 반복서열 index(make_repeat_index_dic())에서 검색한다
+        (match_with_repeat_regions()). 반복서열에 속하면 bp3를, 아니면 pm4를 부여한다.
 
     Args:
         Chrom (str): 해당 변이가 속하는 염색체
         var_start (int): 변이의 시작지점
         var_end (int): 변이의 끝지점 (insertion의 경우 삽입된 위치 1개가 표시)
         repeat_db_dic (dict): {Chr: [(start, end), ..]} 로 정리된 Dictionary
+        repeat_index_dic (dict): 반복서열 index. 없으면 해당 염색체의 index를 새로 만든다.
 
     Returns:
         tuple: (pm3, bp4)
@@ -80,28 +159,15 @@ def match_with_repeat_region(
 
     pm4, bp3 = 0, 0
 
-    # chrom  -> [ (start,end), (10001, 10467), (10469, 11447), ...]
-    repetitive_regions: list = repeat_db_dic[chrom]
-
-    # Binary search
-    first, last = 0, len(repetitive_regions) - 1
-    center_pos = round((var_start + var_end) / 2)
-
-    while first <= last:
-        mid = (first + last) // 2
-        if (
-            repetitive_regions[mid][0]
-            <= center_pos
-            < repetitive_regions[mid + 1][0]
-        ):
-            break
-        if repetitive_regions[mid][0] < var_start:
-            first = mid + 1
-        else:
-            last = mid - 1
+    if repeat_index_dic is None:
+        repeat_index_dic = make_repeat_index_dic(
+            {chrom: repeat_db_dic.get(chrom, [])}
+        )
 
     # repetitive region에 절반이상 포함되면 bp3 부여
-    if center_pos <= repetitive_regions[mid][1]:
+    if match_with_repeat_regions(
+        chrom, [var_start], [var_end], repeat_index_dic
+    )[0]:
         bp3 = 1
     else:
         pm4 = 1
@@ -109,7 +175,9 @@ def match_with_repeat_region(
     return (pm4, bp3)
 
 
-def execute(proband_var_df: object, repeat_db_dic: dict,) -> object:
+def execute(
+    proband_var_df: object, repeat_db_dic: dict, repeat_index_dic: dict = None
+) -> object:
     """_summary_
     Note:
         ACMG rule 중에서, pm4/bp3 에 해당하는 룰을 구현한 모듈이다. 각각의 rule에 대한 설명은 다음과 같다.
@@ -128,14 +196,16 @@ def execute(proband_var_df: object, repeat_db_dic: dict,) -> object:
         먼저, 각 variant에 대하여 inframe indel인지 stop lost인지 조사한다(is_inframe_indel_change_var(),
         is_stop_lost_var()). 만약 해당 변이가 inframe indel 이라면, 해당 구역이 repetitive region인지 확인
         한 뒤, 반복서열 위치이면 bp3를, 아니면 pm4 rule을 부여하였다(match_with_repeat_region()). 이 때, 반복
-        서열 구간에 범위가 겹칠 수가 있는데, 이 경우 해당 범주에 절반이상 포함되는 것을 기준으로 하였다. 이 때, repeat
-        DB는 구간이 오름차순 정렬되어 있으므로, binary search를 통해 빠르게 구간을 특정할 수 있다.
+        서열 구간에 범위가 겹칠 수가 있는데, 이 경우 해당 범주에 절반이상 포함되는 것을 기준으로 하였다. 반복서열
+        구간은 염색체 별 index(make_repeat_index_dic())로 한 번 만들어두고, 모든 inframe indel을 염색체 별로
+        모아서 한 번에 검색한다(match_with_repeat_regions()).
         Insertion의 경우, 구간의 표현이 (pos, pos+1)과 같이 포현되는데, 반복서열의 바로 옆 서열인 경우도 bp3를
         부여하였다. 만약 해당 변이의 전사체가 Stop_lost라면, pm4 rule 부여하였다.
 
     Args:
         proband_var_df (object): Class VariantDF <- VEP file
         repeat_db_dic (dict): repeatMasker 데이터베이스를 미리 가공한 dictionary
+        repeat_index_dic (dict): 반복서열 index. 없으면 repeat_db_dic으로 새로 만든다.
 
     Returns:
         object: proband_variant_DF의 variant_dic["evidnece_score_dic"]이 update된 object.
@@ -149,6 +219,11 @@ def execute(proband_var_df: object, repeat_db_dic: dict,) -> object:
 
     df_col2idx = proband_var_df.df_col2idx
     variant_dic = proband_var_df.variant_dic
+    if repeat_index_dic is None:
+        repeat_index_dic = make_repeat_index_dic(repeat_db_dic)
+
+    # {chrom: [(var_id, var_feature, var_start, var_end)]}. 염색체 별로 모아서 한 번에 검색.
+    chrom_indel_dic = dict()
 
     for var_id in variant_dic:
         for var_feature in variant_dic[var_id]:
@@ -169,10 +244,10 @@ def execute(proband_var_df: object, repeat_db_dic: dict,) -> object:
                 var_start = location[0]
                 var_end = location[-1]
 
-                # repeat region 검색 및 Rule 할당.
-                pm4, bp3 = match_with_repeat_region(
-                    chrom, var_start, var_end, repeat_db_dic
+                chrom_indel_dic.setdefault(chrom, []).append(
+                    (var_id, var_feature, var_start, var_end)
                 )
+                continue
             elif is_stop_lost_var(variant_dic[var_id][var_feature], df_col2idx):
                 pm4 = 1
             else:
@@ -181,6 +256,21 @@ def execute(proband_var_df: object, repeat_db_dic: dict,) -> object:
             variant_dic[var_id][var_feature]["evidence_score_dic"]["pm4"] = pm4
             variant_dic[var_id][var_feature]["evidence_score_dic"]["bp3"] = bp3
 
+    # repeat region 검색 및 Rule 할당.
+    for chrom, indels in chrom_indel_dic.items():
+        is_repeats = match_with_repeat_regions(
+            chrom,
+            [var_start for _, _, var_start, _ in indels],
+            [var_end for _, _, _, var_end in indels],
+            repeat_index_dic,
+        )
+        for (var_id, var_feature, _, _), is_repeat in zip(indels, is_repeats):
+            evidence_score_dic = variant_dic[var_id][var_feature][
+                "evidence_score_dic"
+            ]
+            evidence_score_dic["pm4"] = 0 if is_repeat else 1
+            evidence_score_dic["bp3"] = 1 if is_repeat else 0
+
     proband_var_df.variant_dic = variant_dic
 
     return proband_var_df
@@ -1,6 +1,8 @@
 # Module for PP2, BP1 rule
 # Disease mechanism, missense mutation
 
+from ..helper import *
+
 
 def is_missense_var(var_infos_dic: dict, df_col2idx: dict) -> bool:
     """_summary_
@@ -96,17 +98,24 @@ def check_gene_pathogenic_mechanism(
 
 
 def assign_pp2bp1_rule(
-    gene_symbol: str, clinvar_db_dic: dict, clinvar_col2idx: dict
+    gene_symbol: str,
+    clinvar_db_dic: dict,
+    clinvar_col2idx: dict,
+    gene_mechanism_dic: dict = None,
+    gene_mechanism_col2idx: dict = None,
 ) -> tuple:
     """_summary_
     Note:
         각 variant가 missense variant인 경우, 관련된 유전자-질병의 원인을 확인하여
-        "missense"면 pp2, 'null variant" 면 bp1을 부여한다.
+        "missense"면 pp2, 'null variant" 면 bp1을 부여한다. 미리 계산된 유전자 별 메커니즘
+        table(dbparser.make_gene_mechanism_dic())이 있으면 ClinVar를 다시 세지 않고 table에서 찾는다.
 
     Args:
         gene_symbol (str): gene_symbol
         clinvar_db_dic (dict): gene_symbol 기준으로 정리된 clinvar_db
         clinvar_col2idx (dict): column index dictionary
+        gene_mechanism_dic (dict): 유전자 별 메커니즘 table
+        gene_mechanism_col2idx (dict): 메커니즘 table column index dictionary
 
     Returns:
         tuple(int, int): (pp2, bp1)
@@ -116,9 +125,14 @@ def assign_pp2bp1_rule(
     pp2, bp1 = 0, 0
     if clinvar_db_dic.get(gene_symbol):
 
-        patho_mechanism: str = check_gene_pathogenic_mechanism(
-            clinvar_db_dic[gene_symbol], clinvar_col2idx
-        )
+        if gene_mechanism_dic is not None:
+            patho_mechanism: str = gene_mechanism_dic[gene_symbol][
+                gene_mechanism_col2idx["mechanism"]
+            ]
+        else:
+            patho_mechanism: str = check_gene_pathogenic_mechanism(
+                clinvar_db_dic[gene_symbol], clinvar_col2idx
+            )
         if patho_mechanism == "missense variant":
             pp2 = 1
         elif patho_mechanism == "null variant":
@@ -130,7 +144,11 @@ def assign_pp2bp1_rule(
 
 
 def execute(
-    proband_var_df: object, clinvar_db_dic: dict, clinvar_col2idx: dict
+    proband_var_df: object,
+    clinvar_db_dic: dict,
+    clinvar_col2idx: dict,
+    gene_mechanism_dic: dict = None,
+    gene_mechanism_col2idx: dict = None,
 ) -> object:
     """_summary_
     Note: ACMG rule 중에서, pp2/bp1 에 해당하는 룰을 구현한 모듈이다. 각각의 rule에 대한 설명은 다음과 같다.
@@ -155,12 +173,17 @@ def execute(
         해당 유전자에서 발생하는 질병의 원인이 missense variant인지, null variant인지 계산한다
         (check_gene_pathogenic_mechanism()). 만약, 해당 유전자에서 주로 pathogenic 한 변이가 보고되고,
         missense 변이가 일반적인 원인이면 pp2를 부여하며, null variant가 질병의 주된 원인이라면 bp1을 부여한다
-        (assign_pp2bp1_rule()).
+        (assign_pp2bp1_rule()). 유전자 별 메커니즘은 ClinVar를 읽을 때 한 번만 계산해둔 table을 사용한다.
+        (dbparser.make_gene_mechanism_dic(). 주어지지 않으면 여기서 한 번 계산한다.)
+        같은 유전자의 transcript들은 결과가 같으므로, gene_symbol 별 결과를 LRU cache(memo.LruMemo)에
+        저장해 두고 다시 사용한다.
 
     Args:
         proband_var_df (object): Class VariantDF <- VEP file
         clinvar_db_dic (dict): ClinVar 데이터베이스를 미리 가공한 dictionary
         clinvar_col2idx (dict): Clinvar_db_dic-index dictionary
+        gene_mechanism_dic (dict): 유전자 별 메커니즘 table
+        gene_mechanism_col2idx (dict): 메커니즘 table column index dictionary
 
     Returns:
         object: proband_variant_DF의 variant_dic["evidnece_score_dic"]이 update된 object.
@@ -168,6 +191,11 @@ def execute(
 
     df_col2idx = proband_var_df.df_col2idx
     variant_dic = proband_var_df.variant_dic
+    if gene_mechanism_dic is None:
+        gene_mechanism_dic, gene_mechanism_col2idx = dbparser.make_gene_mechanism_dic(
+            clinvar_db_dic, clinvar_col2idx
+        )
+    pp2bp1_memo = memo.LruMemo("pp2bp1")  # {gene_symbol: (pp2, bp1)}
 
     for var_id in variant_dic:
         for var_feature in variant_dic[var_id]:
@@ -178,8 +206,14 @@ def execute(
                     df_col2idx["symbol"]
                 ]
                 if gene_symbol != "-":  # gene_symbol이 없는 경우, 비교 불가.
-                    pp2, bp1 = assign_pp2bp1_rule(
-                        gene_symbol, clinvar_db_dic, clinvar_col2idx
+                    pp2, bp1 = pp2bp1_memo.get(
+                        gene_symbol,
+                        assign_pp2bp1_rule,
+                        gene_symbol,
+                        clinvar_db_dic,
+                        clinvar_col2idx,
+                        gene_mechanism_dic,
+                        gene_mechanism_col2idx,
                     )
 
             variant_dic[var_id][var_feature]["evidence_score_dic"]["pp2"] = pp2
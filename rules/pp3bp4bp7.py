@@ -4,6 +4,8 @@
 from ..helper import *
 
 REVEL_DB = "/data/projects/ACMG/database/revel_with_transcript_ids"
+# python -m ACMG.helper.npstore build-revel REVEL_DB REVEL_STORE
+REVEL_STORE = "/data/projects/ACMG/database/revel_with_transcript_ids.store"
 
 
 def add_revel_into_var_infos(variant_dic: dict, df_col2idx: dict) -> dict:
@@ -20,6 +22,11 @@ def add_revel_into_var_infos(variant_dic: dict, df_col2idx: dict) -> dict:
         이때, vep annotation된 variant의 feature는 RefSeq과 Ensembl transcriptID가 모두 존재하지만,
         REVEL은 Ensembl_transcript id만 존재한다. 따라서, 별도의 RefSeq-Ensembl의 대응과정을 거치지 않고,
         Ensembl에 해당하는 Variant 들만 REVEL score를 부여하였다. 그 외에는, default 값으로 None을 부여함.
+        transcript id는 REVEL의 Ensembl_transcriptid 목록과 정확히 일치하는 경우에만 score를 부여한다.
+
+        npstore로 미리 변환한 REVEL store가 있는 경우에는, 전체 파일을 읽지 않고 store를 memory-map 하여
+        환자의 변이를 한 번에 검색한다(scan_revel_by_store()). 찾은 값은 따로 모은 뒤 한 번에
+        추가한다(scan_revel(), merge_revel_records()).
 
     Args:
         variant_dic (dict): class VariantDF.variant_dic
@@ -38,33 +45,126 @@ def add_revel_into_var_infos(variant_dic: dict, df_col2idx: dict) -> dict:
             '25/39', 'V/I', 'Gta/Ata', 'LMBR1L', 0.051]
     """
 
-    for line in dbparser.read_big_file(REVEL_DB):
-        if line.startswith("chr"):
-            f_col2idx = {
-                val: idx for idx, val in enumerate(line.strip().split(","))
-            }
-            continue
-        else:  # new variation
-            row = line.strip().split(",")
-            chr = row[f_col2idx["chr"]]
-            pos = row[f_col2idx["hg19_pos"]]
-            ref = row[f_col2idx["ref"]]
-            alt = row[f_col2idx["alt"]]
-            var_id = f"{chr}-{pos}-{ref}-{alt}"  # 1-985445-G-GT
-
-        if var_id in variant_dic:
-            for var_feature in variant_dic[var_id]:
-                # if has same transcipt_id w/ REVEL
-                if var_feature in row[f_col2idx["Ensembl_transcriptid"]]:
-                    variant_dic[var_id][var_feature]["var_infos"][
-                        df_col2idx["revel"]
-                    ] = float(row[f_col2idx["REVEL"]])
-                else:
-                    pass  # default == None
+    return merge_revel_records(variant_dic, scan_revel(variant_dic), df_col2idx)
+
+
+def scan_revel(var_ids: object) -> list:
+    """_summary_
+    Note:
+        REVEL 파일에서 환자 변이의 (revel score, Ensembl transcript id 목록)을 찾아 파일 순서대로 반환한다.
+        variant_dic을 수정하지 않고 결과를 따로 모으므로, gnomad 검색(pm2ba1bs1.scan_gnomad())과 다른
+        thread에서 동시에 실행한 뒤 merge_revel_records()로 합칠 수 있다. REVEL_DB로 미리 만들어둔 store가
+        있으면 store에서 검색하고(scan_revel_by_store()), 없으면 전체 파일을 chunk 단위로 읽는다
+        (dbparser.RecordBatchReader). store가 다른 파일 (또는 바뀌기 전의 REVEL_DB)로 만들어진 경우에는
+        경고를 출력하고 store를 사용하지 않는다.
+
+    Args:
+        var_ids (object): 환자 var_id 목록 (variant_dic, set 등 in 으로 검색할 수 있는 object)
+
+    Returns:
+        list: [(var_id, revel_score, [enst_id, ..]), ..]
+    """
+
+    if npstore.is_store_current(REVEL_STORE, REVEL_DB, "revel"):
+        return scan_revel_by_store(var_ids, REVEL_STORE)
+
+    reader = dbparser.RecordBatchReader(REVEL_DB, delimiter=",", header="chr")
+
+    revel_records = []
+    for batch in reader:
+        f_col2idx = reader.col2idx
+        chrom_idx, pos_idx, ref_idx, alt_idx, score_idx, enst_idx = [
+            f_col2idx[col]
+            for col in ["chr", "hg19_pos", "ref", "alt", "REVEL", "Ensembl_transcriptid"]
+        ]
+
+        # new variation
+        for row in batch:
+            var_id = f"{row[chrom_idx]}-{row[pos_idx]}-{row[ref_idx]}-{row[alt_idx]}"
+
+            if var_id in var_ids:
+                revel_records.append(
+                    (var_id, float(row[score_idx]), row[enst_idx].split(";"))
+                )
+
+    return revel_records
+
+
+def scan_revel_by_store(var_ids: object, revel_store_dir: str) -> list:
+    """_summary_
+    Note:
+        npstore.build_revel_store()로 미리 만들어 둔 REVEL store (위치 순으로 정렬된 column)를
+        memory-map 으로 읽고, 환자의 모든 변이를 한 번에 검색한다. 같은 변이에 여러 record가 있는 경우,
+        파일 순서대로 반환한다.
+
+    Args:
+        var_ids (object): 환자 var_id 목록 (variant_dic, set 등)
+        revel_store_dir (str): REVEL store directory address
+
+    Returns:
+        list: [(var_id, revel_score, [enst_id, ..]), ..]
+    """
+
+    revel_store = npstore.load_store(revel_store_dir)
+    revel_dic = npstore.query_revel_store(revel_store, list(var_ids))
+
+    return [
+        (var_id, revel_score, enst_ids)
+        for var_id, revel_records in revel_dic.items()
+        for revel_score, enst_ids in revel_records
+    ]
+
+
+def merge_revel_records(
+    variant_dic: dict, revel_records: list, df_col2idx: dict
+) -> dict:
+    """_summary_
+    Note:
+        scan_revel()로 찾은 값을 순서대로 variant_infos의 revel 항목에 저장한다.
+
+    Args:
+        variant_dic (dict): class VariantDF.variant_dic
+        revel_records (list): [(var_id, revel_score, [enst_id, ..]), ..]
+        df_col2idx (dict): DF column index dictionary
+
+    Returns:
+        dict: revel 값이 update된 variant_dic
+    """
+
+    for var_id, revel_score, enst_ids in revel_records:
+        update_revel_var_infos(variant_dic, var_id, revel_score, enst_ids, df_col2idx)
 
     return variant_dic
 
 
+def update_revel_var_infos(
+    variant_dic: dict,
+    var_id: str,
+    revel_score: float,
+    enst_ids: list,
+    df_col2idx: dict,
+):
+    """_summary_
+    Note:
+        var_id의 각 feature 중에서, REVEL의 Ensembl transcript id 목록에 있는 feature에만 revel 값을
+        저장한다. 그 외에는 default 값(None)을 유지한다.
+
+    Args:
+        variant_dic (dict): class VariantDF.variant_dic
+        var_id (str): 1-35142-G-A
+        revel_score (float): REVEL score
+        enst_ids (list): ["ENST00000534990", "ENST00000335137"]
+        df_col2idx (dict): DF column index dictionary
+    """
+
+    for var_feature in variant_dic[var_id]:
+        # if has same transcipt_id w/ REVEL
+        if var_feature in enst_ids:
+            variant_dic[var_id][var_feature]["var_infos"][
+                df_col2idx["revel"]
+            ] = revel_score
+
+
 def is_missense_var(var_infos_dic: dict, df_col2idx: dict) -> bool:
     """_summary_
     Note:
@@ -241,7 +341,9 @@ def is_synonymous_var(var_infos_dic: dict, df_col2idx: dict) -> bool:
         return False
 
 
-def execute(proband_var_df: object, spliceai_db_dic: dict) -> object:
+def execute(
+    proband_var_df: object, spliceai_db_dic: dict, annotate: bool = True
+) -> object:
     """_summary_
     Note: ACMG rule 중에서, pp3/bp4/bp7 에 해당하는 룰을 구현한 모듈이다. 각각의 rule에 대한 설명은 다음과 같다.
 
@@ -283,6 +385,8 @@ def execute(proband_var_df: object, spliceai_db_dic: dict) -> object:
     Args:
         proband_var_df (object): Class VariantDF <- VEP file
         spliceai_db_dic (dict): 환자의 각 variant에 대하여 spliceai로 미리 계산된 예측값 dictionary
+        annotate (bool): False 이면 revel 값을 variant_infos에 추가하는 과정을 생략한다.
+            (main() 에서 미리 추가한 뒤, 염색체 별로 나누어 병렬 실행하는 경우)
 
     Returns:
         object: proband_variant_DF의 variant_dic["evidnece_score_dic"]이 update된 object.
@@ -294,7 +398,8 @@ def execute(proband_var_df: object, spliceai_db_dic: dict) -> object:
 
     df_col2idx = proband_var_df.df_col2idx
     variant_dic = proband_var_df.variant_dic
-    variant_dic = add_revel_into_var_infos(variant_dic, df_col2idx)
+    if annotate:  # 이미 revel 값이 추가된 경우 생략
+        variant_dic = add_revel_into_var_infos(variant_dic, df_col2idx)
 
     for var_id in variant_dic:
         for var_feature in variant_dic[var_id]:
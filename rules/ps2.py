@@ -1,6 +1,17 @@
 # Module for PS2 (,PM6)
 # De novo variants
 
+from ..helper import *
+import numpy as np
+
+# de novo 판정의 기본 quality filter (genotype.parse_trio_vcf()의 DP, GQ, AD 사용)
+DE_NOVO_FILTER_DIC = {
+    "min_dp": 10,  # 환자, 부모 모두의 최소 read depth
+    "min_gq": 20,  # 환자, 부모 모두의 최소 genotype quality
+    "min_ab": 0.2,  # 환자의 최소 allele balance (alt / (ref + alt))
+    "max_parent_ab": 0.05,  # 부모의 최대 allele balance
+}
+
 
 def execute(
     proband_var_df: object,
@@ -20,12 +31,16 @@ def execute(
             - 1-897325-G-C: '0/1'
             - 1-866511-C-CCCCT: './1'
         }
+        joint-call 된 trio VCF를 사용하는 경우(genotype.parse_trio_vcf()), 변이를 가진 경우만 남긴
+        {var_id : genotype code(1, 2)} dictionary를 사용한다(genotype.make_genotype_dic()).
 
         본 모듈의 작동방식은 다음과 같다.
         먼저, 환자의 variant_id를 GT 정보를 확인한다. 다음으로, 아버지또는 어머니의 VCF 정보에서 해당 변이가 존재하는지
         확인한다. 만약 양쪽 부모에게 모두 없다면, ps2 rule을 부여한다.
 
         GT값을 면밀하게 분석하여, 좀 더 엄밀한 기준을 적용할 방법도 있겠지만, 본 모듈에서는 가장 간단한 방법으로 ps2를 부여하였다.
+        joint-call VCF가 주어지면, 부모가 0/0 으로 불렸는지와 DP, GQ, allele balance를 함께 확인하는
+        call_de_novo(), execute_trio()를 사용한다.
 
     Args:
         proband_var_df (object): Class VariantDF <- VEP file
@@ -40,63 +55,16 @@ def execute(
 
     # 부모 정보가 확인된 경우에 수행됨.
     for var_id in proband_gt_dic:
+        # VEP 결과에 없는 변이(e.g. VEP에서 걸러진 변이)는 건너뛴다.
+        if var_id not in variant_dic:
+            continue
 
-        if proband_gt_dic[var_id] == "0/1":
-            # 아버지에게 해당 변이가 있는지 확인.
-            if father_gt_dic.get(var_id):
-                f_flag = 1
-            else:
-                f_flag = 0
-            # 어머니에게 해당 변이가 있는지 확인.
-            if mother_gt_dic.get(var_id):
-                m_flag = 1
-            else:
-                m_flag = 0
-
-            # 부모에게 없으면 de novo rule 부여
-            if (f_flag + m_flag) == 0:
-                ps2 = 1
-            else:
-                ps2 = 0
-
-        elif proband_gt_dic[var_id] == "1/1":
-            # 아버지에게 해당 변이가 있는지 확인.
-            if father_gt_dic.get(var_id):
-                f_flag = 1
-            else:
-                f_flag = 0
-            # 어머니에게 해당 변이가 있는지 확인.
-            if mother_gt_dic.get(var_id):
-                m_flag = 1
-            else:
-                m_flag = 0
-
-            # 부모에게 없으면 de novo rule 부여.
-            if (f_flag + m_flag) == 0:
-                ps2 = 1
-            elif (f_flag + m_flag) == 1:  # 한쪽 부모에게만 발견, 해당 변이가 homozygous인 경우?
-                ps2 = 0
-                pass
-            else:
-                ps2 = 0
-
-        else:  # GT = ./1 ,  1/. or X-chr
-            # 아버지에게 해당 변이가 있는지 확인.
-            if father_gt_dic.get(var_id):
-                f_flag = 1
-            else:
-                f_flag = 0
-            # 어머니에게 해당 변이가 있는지 확인.
-            if mother_gt_dic.get(var_id):
-                m_flag = 1
-            else:
-                m_flag = 0
-
-            # 부모에게 없으면 de novo rule 부여
-            if (f_flag + m_flag) == 0:
-                ps2 = 1
-            else:
-                ps2 = 0
+        # 환자의 GT(0/1, 1/1, ./1, 1/. or X-chr)와 관계없이, 아버지와 어머니 모두에게 해당 변이가 없으면
+        # de novo rule 부여.
+        if father_gt_dic.get(var_id) or mother_gt_dic.get(var_id):
+            ps2 = 0
+        else:
+            ps2 = 1
 
         # ps2 rule을 각 VEP annotated variant에 저장
         for var_feature in variant_dic[var_id]:
@@ -105,3 +73,90 @@ def execute(
     proband_var_df.variant_dic = variant_dic
 
     return proband_var_df
+
+
+def call_de_novo(
+    trio_array_dic: dict,
+    min_dp: int = DE_NOVO_FILTER_DIC["min_dp"],
+    min_gq: int = DE_NOVO_FILTER_DIC["min_gq"],
+    min_ab: float = DE_NOVO_FILTER_DIC["min_ab"],
+    max_parent_ab: float = DE_NOVO_FILTER_DIC["max_parent_ab"],
+) -> np.ndarray:
+    """_summary_
+    Note:
+        joint-call VCF에서 읽은 trio array (genotype.parse_trio_vcf())로, 모든 변이의 de novo 여부를
+        한 번에 계산한다. 아래 조건을 모두 만족하면 de novo로 판정한다.
+            1. 환자는 변이를 가지고 (genotype code > 0), 부모는 모두 0/0 으로 불렸다 (no call 제외).
+            2. 환자와 부모 모두 DP >= min_dp, GQ >= min_gq.
+            3. 환자의 allele balance >= min_ab, 부모의 allele balance <= max_parent_ab.
+        DP, GQ, AD가 VCF에 없는 값(-1)은 해당 filter를 적용하지 않는다. filter 값을 0 (max_parent_ab는 1)
+        으로 주면 해당 filter를 사용하지 않는다.
+
+    Args:
+        trio_array_dic (dict): {"gt", "dp", "gq", "ad_ref", "ad_alt"} (변이 수, 3) array
+        min_dp (int): 최소 read depth
+        min_gq (int): 최소 genotype quality
+        min_ab (float): 환자의 최소 allele balance
+        max_parent_ab (float): 부모의 최대 allele balance
+
+    Returns:
+        np.ndarray: 변이 별 de novo 여부 (bool)
+    """
+
+    gt_codes = trio_array_dic["gt"]
+    dp = trio_array_dic["dp"]
+    gq = trio_array_dic["gq"]
+    ad_ref = trio_array_dic["ad_ref"]
+    ad_alt = trio_array_dic["ad_alt"]
+
+    is_de_novo = (gt_codes[:, 0] > genotype.GT_HOM_REF) & np.all(
+        gt_codes[:, 1:] == genotype.GT_HOM_REF, axis=1
+    )
+    is_de_novo &= np.all((dp == -1) | (dp >= min_dp), axis=1)
+    is_de_novo &= np.all((gq == -1) | (gq >= min_gq), axis=1)
+
+    # allele balance: alt / (ref + alt). AD가 없거나 read가 없으면 filter를 적용하지 않는다.
+    ad_total = ad_ref + ad_alt
+    has_ad = (ad_ref >= 0) & (ad_total > 0)
+    allele_balance = np.divide(
+        ad_alt, ad_total, out=np.zeros(ad_total.shape), where=has_ad
+    )
+    is_de_novo &= ~has_ad[:, 0] | (allele_balance[:, 0] >= min_ab)
+    is_de_novo &= np.all(
+        ~has_ad[:, 1:] | (allele_balance[:, 1:] <= max_parent_ab), axis=1
+    )
+
+    return is_de_novo
+
+
+def execute_trio(
+    proband_var_df: object, var2idx: dict, is_de_novo: np.ndarray
+) -> object:
+    """_summary_
+    Note:
+        call_de_novo()로 계산한 변이 별 de novo 여부를 ps2로 저장한다. joint-call VCF의 변이 중
+        VEP 결과(variant_dic)에 있는 변이의 모든 transcript에 저장한다.
+
+    Args:
+        proband_var_df (object): Class VariantDF <- VEP file
+        var2idx (dict): {var_id: row} (genotype.parse_trio_vcf())
+        is_de_novo (np.ndarray): 변이 별 de novo 여부 (call_de_novo())
+
+    Returns:
+        object: proband_variant_DF의 variant_dic["evidnece_score_dic"]이 update된 object.
+    """
+
+    variant_dic = proband_var_df.variant_dic
+    ps2_values = is_de_novo.astype(int).tolist()
+
+    for var_id, row_idx in var2idx.items():
+        if var_id not in variant_dic:
+            continue
+        for var_feature in variant_dic[var_id]:
+            variant_dic[var_id][var_feature]["evidence_score_dic"]["ps2"] = ps2_values[
+                row_idx
+            ]
+
+    proband_var_df.variant_dic = variant_dic
+
+    return proband_var_df
@@ -1,6 +1,8 @@
 # Module for PVS1
 # 질병의 원인으로 알려진 유전자의 Null variants (nonsense, frameshift, splicing site, exon deletion etc..)
 
+from ..helper import *
+
 
 def is_null_var(var_infos_dic: dict, df_col2idx: dict) -> bool:
     """_summary_
@@ -108,12 +110,40 @@ def check_disease_inheritence(gene_disease_infos: list, disease_col2idx: dict):
         return "Autosomal recessive"
 
 
+def assign_pvs1_strength(protein_pos: str) -> str:
+    """_summary_
+    Note:
+        변이가 protein의 앞쪽 90% 안에서 생긴 경우 PVS1_S(strong), 그 외에는 PVS1_M(moderate)을 반환한다.
+
+    Args:
+        protein_pos (str): Protein_position. e.g. 77/97, 987-988/4911
+
+    Returns:
+        str: "PVS1_S" or "PVS1_M"
+    """
+
+    # e.g. 77/97, 987-988/4911
+    var_pos, protein_len = protein_pos.split("/")
+    var_pos = var_pos.split("-")[0]
+
+    # variant remove 기준: 90%
+    try:
+        if (int(var_pos) / int(protein_len)) < 0.9:
+            return "PVS1_S"
+        else:
+            return "PVS1_M"
+    except TypeError:  # '-'
+        return "PVS1_M"
+
+
 def execute(
     proband_var_df: object,
     clinvar_db_dic: dict,
     clinvar_col2idx: dict,
     disease_db_dic: dict,
     disease_col2idx: dict,
+    gene_mechanism_dic: dict = None,
+    gene_mechanism_col2idx: dict = None,
 ) -> object:
     """_summary_
     Note: ACMG rule 중에서, pvs1 에 해당하는 룰을 구현한 모듈이다. 각각의 rule에 대한 설명은 다음과 같다.
@@ -147,6 +177,8 @@ def execute(
         일치하는 ClinVar 데이터들을 조사하여, 해당 유전자에서 발생하는 질병의 원인이 null variant인지 계산한다
         (check_disease_cause_is_null()). 만약, 해당 유전자에서 주로 pathogenic 한 null 변이가 보고었다면,
         유전형태를 파악하고(반영x), protein에서 변이가 생긴 위치에 따라 (기준 90%) pvs1 을 차등부여한다.
+        유전자 별 메커니즘은 ClinVar를 읽을 때 한 번만 계산해둔 table을 사용한다.
+        (dbparser.make_gene_mechanism_dic(). 주어지지 않으면 여기서 한 번 계산한다.)
 
     Args:
         proband_var_df (object): Class VariantDF <- VEP file
@@ -154,6 +186,8 @@ def execute(
         clinvar_col2idx (dict): Clinvar_db_dic-index dictionary
         disease_db_dic (dict): Disease 데이터베이스를 미리 가공한 dictionary
         disease_col2idx (dict): Disease_db_list-index dictionary
+        gene_mechanism_dic (dict): 유전자 별 메커니즘 table
+        gene_mechanism_col2idx (dict): 메커니즘 table column index dictionary
 
     Returns:
         object: proband_variant_DF의 variant_dic["evidnece_score_dic"]이 update된 object.
@@ -165,6 +199,10 @@ def execute(
 
     df_col2idx = proband_var_df.df_col2idx
     variant_dic = proband_var_df.variant_dic
+    if gene_mechanism_dic is None:
+        gene_mechanism_dic, gene_mechanism_col2idx = dbparser.make_gene_mechanism_dic(
+            clinvar_db_dic, clinvar_col2idx
+        )
 
     for var_id in variant_dic:
         for var_feature in variant_dic[var_id]:
@@ -176,29 +214,23 @@ def execute(
                 ]
                 if gene_symbol != "-":  # gene_symbol이 없는 경우, 비교 불가.
                     if clinvar_db_dic.get(gene_symbol):
-                        if check_disease_cause_is_null(
-                            clinvar_db_dic[gene_symbol], clinvar_col2idx
+                        # check_disease_cause_is_null() 결과와 같음.
+                        if (
+                            gene_mechanism_dic[gene_symbol][
+                                gene_mechanism_col2idx["mechanism"]
+                            ]
+                            == "null variant"
                         ):
                             check_disease_inheritence(  # 추후 필요하면 사용
                                 disease_db_dic[gene_symbol], disease_col2idx
                             )
 
                             # check whether variant remove 10% of protein.
-                            protein_pos = variant_dic[var_id][var_feature][
-                                "var_infos"
-                            ][df_col2idx["protein_pos"]]
-                            # e.g. 77/97, 987-988/4911
-                            var_pos, protein_len = protein_pos.split("/")
-                            var_pos = var_pos.split("-")[0]
-
-                            # variant remove 기준: 90%
-                            try:
-                                if (int(var_pos) / int(protein_len)) < 0.9:
-                                    pvs1 = "PVS1_S"
-                                else:
-                                    pvs1 = "PVS1_M"
-                            except TypeError:  # '-'
-                                pvs1 = "PVS1_M"
+                            pvs1 = assign_pvs1_strength(
+                                variant_dic[var_id][var_feature]["var_infos"][
+                                    df_col2idx["protein_pos"]
+                                ]
+                            )
 
             variant_dic[var_id][var_feature]["evidence_score_dic"][
                 "pvs1"
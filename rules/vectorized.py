@@ -0,0 +1,554 @@
+# Module for vectorized ACMG rule evaluation over ColumnarVariantDF
+# 각 rule을 row 단위 loop 대신 column 전체에 대한 numpy mask 연산으로 계산한다.
+
+from ..helper import *
+from . import pm2ba1bs1
+from . import pm4bp3
+from . import pp3bp4bp7
+from . import ps1pm5pp5bp6
+from . import pvs1
+import numpy as np
+
+DOMINANT_INHERITENCES = ["AD", "XD", "YD"]
+RECESSIVE_INHERITENCES = ["AR", "XR"]
+
+
+def make_category_mask(column: object, predicate: object) -> np.ndarray:
+    """_summary_
+    Note:
+        문자열 column(CategoryColumn)의 서로 다른 값(categories)마다 한 번씩만 predicate를 계산한 뒤,
+        각 row의 category 번호로 펼쳐서 row 단위 bool array를 만든다.
+
+    Args:
+        column (object): columnar.CategoryColumn
+        predicate (object): category 문자열 하나를 받아 bool을 반환하는 함수
+
+    Returns:
+        np.ndarray: row 단위 bool array
+
+    Examples:
+        >>> make_category_mask(
+                columnar_df.category_columns["consequence"],
+                lambda consequence: "missense_variant" in consequence,
+            )
+    """
+
+    category_mask = np.fromiter(
+        (bool(predicate(category)) for category in column.categories),
+        dtype=bool,
+        count=len(column.categories),
+    )
+
+    return category_mask[column.codes]
+
+
+def make_consequence_mask(columnar_df: object, consequences: list) -> np.ndarray:
+    """consequence column에 consequences 중 하나라도 포함된 row (is_missense_var() 등과 같음)."""
+
+    return make_category_mask(
+        columnar_df.category_columns["consequence"],
+        lambda consequence: any(c in consequence for c in consequences),
+    )
+
+
+def make_group_codes(columnar_df: object, cols: list) -> tuple:
+    """_summary_
+    Note:
+        여러 문자열 column의 조합이 같은 row들을 하나의 group으로 묶는다. 같은 입력을 갖는 row에 대해
+        row 단위 함수를 group 당 한 번만 계산하기 위해 사용한다.
+
+    Args:
+        columnar_df (object): ColumnarVariantDF
+        cols (list): ["var_id", "symbol"]
+
+    Returns:
+        tuple: (group 별 첫 row index array, row 별 group 번호 array)
+    """
+
+    codes = np.stack(
+        [columnar_df.category_columns[col].codes for col in cols], axis=1
+    )
+    _, first_rows, group_codes = np.unique(
+        codes, axis=0, return_index=True, return_inverse=True
+    )
+
+    return (first_rows, group_codes.reshape(-1))
+
+
+def make_spliceai_scores(columnar_df: object, spliceai_db_dic: dict) -> np.ndarray:
+    """_summary_
+    Note:
+        각 row의 SpliceAI score (var_id, gene_symbol에 해당하는 값들 중 최대값)를 구한다. 값이 없거나
+        None 이 포함되어 있는 경우(predict_missense_pathogenicity()의 TypeError)에는 NaN.
+
+    Args:
+        columnar_df (object): ColumnarVariantDF
+        spliceai_db_dic (dict): score_dic_of SpliceAI
+
+    Returns:
+        np.ndarray: row 단위 SpliceAI score (np.float64)
+    """
+
+    var_id_column = columnar_df.category_columns["var_id"]
+    symbol_column = columnar_df.category_columns["symbol"]
+    has_spliceai = make_category_mask(var_id_column, spliceai_db_dic.get)
+    spliceai_scores = np.full(columnar_df.n_rows, np.nan)
+    if not has_spliceai.any():
+        return spliceai_scores
+
+    first_rows, group_codes = make_group_codes(columnar_df, ["var_id", "symbol"])
+    group_scores = np.full(len(first_rows), np.nan)
+    for group_idx, row in enumerate(first_rows):
+        if not has_spliceai[row]:
+            continue
+        predict_info_dic = spliceai_db_dic[var_id_column.get(row)]
+        gene_symbol = symbol_column.get(row)
+        if gene_symbol in predict_info_dic:
+            try:
+                group_scores[group_idx] = max(predict_info_dic[gene_symbol])
+            except TypeError:  # when spliceai score is Nonetype
+                pass
+
+    return group_scores[group_codes]
+
+
+def assign_pp3bp4bp7_masks(
+    is_missense: np.ndarray,
+    is_synonymous: np.ndarray,
+    revel_scores: np.ndarray,
+    spliceai_scores: np.ndarray,
+) -> tuple:
+    """_summary_
+    Note:
+        pp3bp4bp7.execute()와 같은 기준으로 pp3, bp4, bp7을 계산한다.
+        - missense: REVEL >= 0.5 이면 pp3. 그 외에는 SpliceAI가 있으면 SpliceAI로 (>= 0.5: pp3, < 0.5: bp4),
+          없으면 REVEL (< 0.5: bp4)로 판단한다.
+        - 그 외: SpliceAI로만 판단하며, bp4 이면서 synonymous variant 이면 bp7.
+        REVEL 값이 없거나 0인 경우(NaN, 0.0)는 REVEL 값이 없는 것으로 본다.
+
+    Args:
+        is_missense (np.ndarray): missense variant 여부
+        is_synonymous (np.ndarray): synonymous variant 여부
+        revel_scores (np.ndarray): REVEL score (없으면 NaN)
+        spliceai_scores (np.ndarray): SpliceAI score (없으면 NaN)
+
+    Returns:
+        tuple: (pp3, bp4, bp7) bool array
+
+    Examples:
+        >>> (missense, revel, spliceAI) = (True, 0.52, 0.1) -> pp3
+            (missense, revel, spliceAI) = (True, 0.12, NaN) -> bp4
+            (missense, revel, spliceAI) = (True, 0.1, 0.6) -> pp3
+            (synonymous, revel, spliceAI) = (False, NaN, 0.1) -> bp4, bp7
+    """
+
+    has_revel = ~np.isnan(revel_scores) & (revel_scores != 0)
+    has_spliceai = ~np.isnan(spliceai_scores)
+
+    revel_pp3 = is_missense & has_revel & (revel_scores >= 0.5)
+    pp3 = revel_pp3 | (has_spliceai & (spliceai_scores >= 0.5))
+    bp4 = ~revel_pp3 & np.where(
+        has_spliceai, spliceai_scores < 0.5, is_missense & has_revel
+    )
+    bp7 = ~is_missense & bp4 & is_synonymous
+
+    return (pp3, bp4, bp7)
+
+
+def assign_pm2ba1bs1_masks(
+    gnomad_ans: np.ndarray, gnomad_afs: np.ndarray, inheritences: np.ndarray
+) -> tuple:
+    """_summary_
+    Note:
+        pm2ba1bs1.execute()와 같은 기준으로 ba1, pm2, bs1을 계산한다. (AF 값이 있는 row에만 의미가 있음)
+        - ba1: AN >= 1000, AF >= 5%
+        - pm2/bs1: ba1이 아니고, AN >= 1000 이며, inheritence에 따라
+            - dominant (AD, XD, YD): pm2 = AF < 0.002%, bs1 = AF > 0.02%
+            - recessive (AR, XR): pm2 = AF < 0.01%, bs1 = AF > 0.1%
+
+    Args:
+        gnomad_ans (np.ndarray): gnomad AN
+        gnomad_afs (np.ndarray): gnomad AF (없으면 NaN)
+        inheritences (np.ndarray): row 별 inheritence ("AD", "AR", .., "": 질병 정보 없음)
+
+    Returns:
+        tuple: (pm2, ba1, bs1) bool array
+    """
+
+    is_enough_an = gnomad_ans >= 1000
+    ba1 = is_enough_an & (gnomad_afs >= 0.05)
+
+    is_dominant = np.isin(inheritences, DOMINANT_INHERITENCES)
+    is_recessive = np.isin(inheritences, RECESSIVE_INHERITENCES)
+    pm2_cutoffs = np.where(is_dominant, 0.00002, 0.0001)
+    bs1_cutoffs = np.where(is_dominant, 0.0002, 0.001)
+
+    is_target = is_enough_an & ~ba1 & (is_dominant | is_recessive)
+    pm2 = is_target & (gnomad_afs < pm2_cutoffs)
+    bs1 = is_target & ~pm2 & (gnomad_afs > bs1_cutoffs)
+
+    return (pm2, ba1, bs1)
+
+
+def execute_pp3bp4bp7(
+    columnar_df: object, spliceai_db_dic: dict, annotate: bool = True
+) -> object:
+    """pp3bp4bp7.execute()의 vectorized 버전."""
+
+    if annotate:  # 이미 revel 값이 추가된 경우 생략
+        pp3bp4bp7.add_revel_into_var_infos(
+            columnar_df.variant_dic, columnar_df.df_col2idx
+        )
+
+    pp3, bp4, bp7 = assign_pp3bp4bp7_masks(
+        make_consequence_mask(columnar_df, ["missense_variant"]),
+        make_consequence_mask(columnar_df, ["synonymous_variant"]),
+        columnar_df.float_columns["revel"],
+        make_spliceai_scores(columnar_df, spliceai_db_dic),
+    )
+    columnar_df.set_evidence_array("pp3", pp3)
+    columnar_df.set_evidence_array("bp4", bp4)
+    columnar_df.set_evidence_array("bp7", bp7)
+
+    return columnar_df
+
+
+def execute_pp2bp1_pvs1(
+    columnar_df: object,
+    clinvar_db_dic: dict,
+    clinvar_col2idx: dict,
+    disease_db_dic: dict,
+    disease_col2idx: dict,
+    gene_mechanism_dic: dict = None,
+    gene_mechanism_col2idx: dict = None,
+) -> object:
+    """_summary_
+    Note:
+        pp2bp1.execute(), pvs1.execute()의 vectorized 버전. 두 rule 모두 유전자 별 질병 원인 메커니즘
+        (dbparser.make_gene_mechanism_dic())을 사용하므로, gene_symbol category 별로 한 번씩만 찾아서
+        row에 펼친다(gene-level join).
+        - pp2/bp1: missense 변이이며, 유전자의 메커니즘이 "missense variant" 이면 pp2, "null variant" 이면 bp1
+        - pvs1: null 변이(stop_gained, start_lost, frameshift)이며, 유전자의 메커니즘이 "null variant" 이면
+          protein 위치에 따라 PVS1_S 또는 PVS1_M (pvs1.assign_pvs1_strength())
+    """
+
+    if gene_mechanism_dic is None:
+        gene_mechanism_dic, gene_mechanism_col2idx = dbparser.make_gene_mechanism_dic(
+            clinvar_db_dic, clinvar_col2idx
+        )
+
+    # gene_symbol category 별 메커니즘
+    symbol_column = columnar_df.category_columns["symbol"]
+    mechanisms = np.array(
+        [
+            gene_mechanism_dic[gene_symbol][gene_mechanism_col2idx["mechanism"]]
+            if (gene_symbol != "-") and clinvar_db_dic.get(gene_symbol)
+            else ""
+            for gene_symbol in symbol_column.categories
+        ],
+        dtype=object,
+    )
+    is_missense_gene = (mechanisms == "missense variant")[symbol_column.codes]
+    is_null_gene = (mechanisms == "null variant")[symbol_column.codes]
+
+    # pp2, bp1
+    is_missense = make_consequence_mask(columnar_df, ["missense_variant"])
+    columnar_df.set_evidence_array("pp2", is_missense & is_missense_gene)
+    columnar_df.set_evidence_array("bp1", is_missense & is_null_gene)
+
+    # pvs1
+    is_pvs1 = is_null_gene & make_consequence_mask(
+        columnar_df, ["stop_gained", "start_lost", "frameshift_variant"]
+    )
+    for symbol_code in np.unique(symbol_column.codes[is_pvs1]):
+        pvs1.check_disease_inheritence(  # 추후 필요하면 사용
+            disease_db_dic[symbol_column.categories[symbol_code]],
+            disease_col2idx,
+        )
+
+    pvs1_labels = ["", "PVS1_S", "PVS1_M"]
+    protein_pos_column = columnar_df.category_columns["protein_pos"]
+    protein_pos_labels = np.zeros(len(protein_pos_column.categories), dtype=np.int64)
+    for protein_pos_code in np.unique(protein_pos_column.codes[is_pvs1]):
+        protein_pos_labels[protein_pos_code] = pvs1_labels.index(
+            pvs1.assign_pvs1_strength(
+                protein_pos_column.categories[protein_pos_code]
+            )
+        )
+    columnar_df.set_evidence_labels(
+        "pvs1",
+        pvs1_labels,
+        np.where(is_pvs1, protein_pos_labels[protein_pos_column.codes], 0),
+    )
+
+    return columnar_df
+
+
+def execute_pm2ba1bs1(
+    columnar_df: object,
+    disease_db_dic: dict,
+    disease_col2idx: dict,
+    annotate: bool = True,
+) -> object:
+    """pm2ba1bs1.execute()의 vectorized 버전. gnomad AF 값이 있는 row에만 pm2, ba1, bs1을 저장한다."""
+
+    if annotate:  # 이미 gnomad 값이 추가된 경우 생략
+        pm2ba1bs1.add_gnomad_into_var_infos(
+            columnar_df.variant_dic, columnar_df.df_col2idx
+        )
+
+    gnomad_afs = columnar_df.float_columns["gnomad_af"]
+    has_af = ~np.isnan(gnomad_afs) & (gnomad_afs != 0)
+
+    # gene_symbol category 별 inheritence
+    symbol_column = columnar_df.category_columns["symbol"]
+    inheritences = np.array(
+        [
+            pm2ba1bs1.get_gene_inheritence(
+                gene_symbol, disease_db_dic, disease_col2idx
+            )
+            if gene_symbol != "-"
+            else ""
+            for gene_symbol in symbol_column.categories
+        ],
+        dtype=object,
+    )
+
+    pm2, ba1, bs1 = assign_pm2ba1bs1_masks(
+        columnar_df.int_columns["gnomad_an"],
+        gnomad_afs,
+        inheritences[symbol_column.codes],
+    )
+    columnar_df.set_evidence_array("pm2", pm2, has_af)
+    columnar_df.set_evidence_array("ba1", ba1, has_af)
+    columnar_df.set_evidence_array("bs1", bs1, has_af)
+
+    return columnar_df
+
+
+def execute_ps1pm5pp5bp6(
+    columnar_df: object, clinvar_db_dic: dict, clinvar_col2idx: dict
+) -> object:
+    """_summary_
+    Note:
+        ps1pm5pp5bp6.execute()의 vectorized 버전. codon 치환 비교는 문자열 연산이므로, 같은 입력
+        (var_id, codon_change, AA_change, strand, gene_symbol)을 갖는 transcript들을 묶어서 group 당 한 번만
+        계산한 뒤 row에 펼친다. pp5/bp6 도 (var_id, gene_symbol) group 당 한 번만 계산한다.
+    """
+
+    df_col2idx = columnar_df.df_col2idx
+    symbol_column = columnar_df.category_columns["symbol"]
+    is_missense = make_consequence_mask(columnar_df, ["missense_variant"])
+    is_clinvar_gene = make_category_mask(
+        symbol_column,
+        lambda gene_symbol: (gene_symbol != "-") and clinvar_db_dic.get(gene_symbol),
+    )
+
+    # ps1, pm5
+    ps1 = np.zeros(columnar_df.n_rows, dtype=bool)
+    pm5 = np.zeros(columnar_df.n_rows, dtype=bool)
+    is_ps1pm5_target = is_missense & is_clinvar_gene
+    if is_ps1pm5_target.any():
+        clinvar_index_dic = dict()
+        first_rows, group_codes = make_group_codes(
+            columnar_df, ["var_id", "codon_change", "AA_change", "strand", "symbol"]
+        )
+        group_ps1 = np.zeros(len(first_rows), dtype=bool)
+        group_pm5 = np.zeros(len(first_rows), dtype=bool)
+        for group_idx in np.unique(group_codes[is_ps1pm5_target]):
+            row = first_rows[group_idx]
+            var_infos = columnar.VarInfosView(columnar_df, row)
+            gene_symbol = symbol_column.get(row)
+            if gene_symbol not in clinvar_index_dic:
+                clinvar_index_dic[
+                    gene_symbol
+                ] = ps1pm5pp5bp6.build_clinvar_position_index(
+                    clinvar_db_dic[gene_symbol], clinvar_col2idx
+                )
+            group_ps1[group_idx], group_pm5[
+                group_idx
+            ] = ps1pm5pp5bp6.check_amino_acid_change_in_clinvar(
+                var_infos,
+                df_col2idx,
+                clinvar_db_dic[gene_symbol],
+                clinvar_col2idx,
+                clinvar_index_dic[gene_symbol],
+            )
+        ps1 = is_ps1pm5_target & group_ps1[group_codes]
+        pm5 = is_ps1pm5_target & group_pm5[group_codes]
+
+    # pp5, bp6 (missense가 아닌 변이). gene_symbol 과 무관하게 ClinVar에 같은 변이가 있는지만 확인.
+    pp5 = np.zeros(columnar_df.n_rows, dtype=bool)
+    bp6 = np.zeros(columnar_df.n_rows, dtype=bool)
+    is_pp5bp6_target = ~is_missense & make_category_mask(
+        symbol_column, clinvar_db_dic.get
+    )
+    if is_pp5bp6_target.any():
+        first_rows, group_codes = make_group_codes(columnar_df, ["var_id", "symbol"])
+        group_pp5 = np.zeros(len(first_rows), dtype=bool)
+        group_bp6 = np.zeros(len(first_rows), dtype=bool)
+        for group_idx in np.unique(group_codes[is_pp5bp6_target]):
+            row = first_rows[group_idx]
+            group_pp5[group_idx], group_bp6[
+                group_idx
+            ] = ps1pm5pp5bp6.check_same_variant_in_clinvar(
+                columnar_df.category_columns["var_id"].get(row),
+                symbol_column.get(row),
+                clinvar_db_dic,
+                clinvar_col2idx,
+            )
+        pp5 = is_pp5bp6_target & group_pp5[group_codes]
+        bp6 = is_pp5bp6_target & group_bp6[group_codes]
+
+    columnar_df.set_evidence_array("ps1", ps1)
+    columnar_df.set_evidence_array("pm5", pm5)
+    columnar_df.set_evidence_array("pp5", pp5)
+    columnar_df.set_evidence_array("bp6", bp6)
+
+    return columnar_df
+
+
+def execute_ps2(
+    columnar_df: object,
+    proband_gt_dic: dict,
+    father_gt_dic: dict,
+    mother_gt_dic: dict,
+) -> object:
+    """_summary_
+    Note:
+        ps2.execute()의 vectorized 버전. 환자의 genotype이 있는 변이 중, 부모 모두에게서 발견되지 않은 변이에
+        ps2를 부여한다. 변이(var_id) 단위로 계산한 뒤, 해당 변이의 모든 transcript에 저장한다.
+    """
+
+    var_id_column = columnar_df.category_columns["var_id"]
+    has_gt = make_category_mask(
+        var_id_column, lambda var_id: var_id in proband_gt_dic
+    )
+    is_de_novo = make_category_mask(
+        var_id_column,
+        lambda var_id: not (father_gt_dic.get(var_id) or mother_gt_dic.get(var_id)),
+    )
+    columnar_df.set_evidence_array("ps2", is_de_novo, has_gt)
+
+    return columnar_df
+
+
+def execute_ps2_trio(
+    columnar_df: object, var2idx: dict, is_de_novo: np.ndarray
+) -> object:
+    """_summary_
+    Note:
+        ps2.execute_trio()의 vectorized 버전. ps2.call_de_novo()로 계산한 변이 별 de novo 여부를,
+        joint-call VCF에 있는 변이의 모든 transcript에 저장한다.
+    """
+
+    var_id_column = columnar_df.category_columns["var_id"]
+    has_gt = make_category_mask(var_id_column, lambda var_id: var_id in var2idx)
+    is_de_novo_row = make_category_mask(
+        var_id_column,
+        lambda var_id: var_id in var2idx and bool(is_de_novo[var2idx[var_id]]),
+    )
+    columnar_df.set_evidence_array("ps2", is_de_novo_row, has_gt)
+
+    return columnar_df
+
+
+def execute_pm4bp3(
+    columnar_df: object, repeat_db_dic: dict, repeat_index_dic: dict = None
+) -> object:
+    """_summary_
+    Note:
+        pm4bp3.execute()의 vectorized 버전. inframe indel은 반복서열 구간 index에서 염색체 별로 한 번에
+        검색하여 반복서열이 아니면 pm4, 반복서열이면 bp3을 부여하며, stop_lost 변이에는 pm4를 부여한다.
+    """
+
+    if repeat_index_dic is None:
+        repeat_index_dic = pm4bp3.make_repeat_index_dic(repeat_db_dic)
+
+    is_inframe = make_consequence_mask(columnar_df, ["inframe"])
+    is_stop_lost = ~is_inframe & make_consequence_mask(columnar_df, ["stop_lost"])
+
+    # location이 하나인 경우 ([1234]), 끝 위치 = 시작 위치
+    var_starts = columnar_df.loc_start
+    var_ends = np.where(columnar_df.loc_end < 0, var_starts, columnar_df.loc_end)
+
+    is_repeat = np.zeros(columnar_df.n_rows, dtype=bool)
+    chrom_column = columnar_df.category_columns["chrom"]
+    for chrom_code in np.unique(chrom_column.codes[is_inframe]):
+        rows = is_inframe & (chrom_column.codes == chrom_code)
+        is_repeat[rows] = pm4bp3.match_with_repeat_regions(
+            chrom_column.categories[chrom_code],
+            var_starts[rows],
+            var_ends[rows],
+            repeat_index_dic,
+        )
+
+    is_target = is_inframe | is_stop_lost
+    columnar_df.set_evidence_array(
+        "pm4", (is_inframe & ~is_repeat) | is_stop_lost, is_target
+    )
+    columnar_df.set_evidence_array("bp3", is_inframe & is_repeat, is_target)
+
+    return columnar_df
+
+
+def execute(columnar_df: object, db_dic: dict, annotate: bool = True) -> object:
+    """_summary_
+    Note: ColumnarVariantDF에 대해, 각 ACMG rule을 row 단위 loop 대신 column 전체에 대한 numpy mask 연산으로
+        계산한다. __main__.execute_acmg_rules()와 같은 순서로 실행하며, 같은 evidence 값을 저장한다.
+
+        - 변이 종류 (is_missense_var() 등): consequence category 별로 한 번만 문자열 검사
+        - REVEL, SpliceAI, gnomad AF: column threshold 비교
+        - pp2/bp1/pvs1 (ClinVar 메커니즘), pm2/bs1 (질병 inheritence): gene_symbol category 별로 한 번만 계산
+        - ps1/pm5, pp5/bp6: 입력이 같은 transcript들을 묶어서 group 당 한 번만 계산
+        - ps2: 변이 별로 계산 (joint-call trio VCF는 ps2.call_de_novo() 결과 사용) / pm4/bp3: 염색체 별로 반복서열 index 한 번에 검색
+
+    Args:
+        columnar_df (object): columnar.ColumnarVariantDF
+        db_dic (dict): main()에서 parsing 한 데이터베이스 및 genotype dictionary
+            (__main__.execute_acmg_rules() 참고)
+        annotate (bool): revel, gnomad 값을 variant_infos에 추가할지 여부
+
+    Returns:
+        object: evidence 값이 저장된 ColumnarVariantDF
+
+    Examples:
+        >>> proband_var_df = columnar.ColumnarVariantDF()
+            proband_var_df.parse_variant_file(PROBAND_VEP)
+            proband_var_df = vectorized.execute(proband_var_df, db_dic)
+    """
+
+    columnar_df = execute_pp3bp4bp7(
+        columnar_df, db_dic["spliceai_db_dic"], annotate
+    )
+    columnar_df = execute_pp2bp1_pvs1(
+        columnar_df,
+        db_dic["clinvar_db_dic"],
+        db_dic["clinvar_col2idx"],
+        db_dic["disease_db_dic"],
+        db_dic["disease_col2idx"],
+        db_dic["gene_mechanism_dic"],
+        db_dic["gene_mechanism_col2idx"],
+    )
+    columnar_df = execute_pm2ba1bs1(
+        columnar_df, db_dic["disease_db_dic"], db_dic["disease_col2idx"], annotate
+    )
+    columnar_df = execute_ps1pm5pp5bp6(
+        columnar_df, db_dic["clinvar_db_dic"], db_dic["clinvar_col2idx"]
+    )
+    if db_dic.get("trio_is_de_novo") is not None:  # joint-call trio VCF
+        columnar_df = execute_ps2_trio(
+            columnar_df, db_dic["trio_var2idx"], db_dic["trio_is_de_novo"]
+        )
+    else:
+        columnar_df = execute_ps2(
+            columnar_df,
+            db_dic["proband_genotype_dic"],
+            db_dic["father_genotype_dic"],
+            db_dic["mother_genotype_dic"],
+        )
+    columnar_df = execute_pm4bp3(
+        columnar_df, db_dic["repeat_db_dic"], db_dic["repeat_index_dic"]
+    )
+
+    return columnar_df
@@ -0,0 +1,35 @@
+# shared fixtures for tests that run the whole ACMG package
+
+import importlib
+import importlib.util
+import os
+import pytest
+import sys
+
+ACMG_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def acmg_main() -> object:
+    """_summary_
+    Note:
+        ACMG package를 import 하여 __main__ module (python -m ACMG)을 반환한다. 각 test 파일에 복사해 둔
+        함수가 아니라, 실제 모듈 여러 개를 함께 실행하여 결과를 비교하는 test에서 사용한다.
+        (rule 모듈은 "from ..helper import *" 처럼 package 기준으로 import 하므로, 디렉토리 이름과 관계없이
+        "ACMG" package로 등록한다.)
+
+    Returns:
+        object: ACMG.__main__ module
+    """
+
+    if "ACMG" not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            "ACMG",
+            os.path.join(ACMG_DIR, "__init__.py"),
+            submodule_search_locations=[ACMG_DIR],
+        )
+        package = importlib.util.module_from_spec(spec)
+        sys.modules["ACMG"] = package
+        spec.loader.exec_module(package)
+
+    return importlib.import_module("ACMG.__main__")
@@ -0,0 +1,322 @@
+# module for bayesian ACMG scoring test
+
+import heapq
+import itertools
+import sys
+
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize(
+    "key, expected",
+    [("pvs1", "pvs"), ("ps2", "ps"), ("pm5", "pm"), ("pp3", "pp"), ("bs1", "bs"), ("bp4", "bp"), ("ba1", "ba"), ("revel", None)],
+)
+def test_get_evidence_category(key, expected):
+
+    assert expected == get_evidence_category(key)
+
+
+@pytest.mark.parametrize(
+    "evidence_score_dic, expected",
+    [
+        (
+            {"pp3": 1, "bp4": 0, "pvs1": "PVS1_S", "pm2": 1, "ba1": 0},
+            ([1, 0, 1, 1, 0, 0], ["PP3", "PVS1_S", "PM2"]),
+        ),
+        ({"pvs1": "", "ba1": 1, "bs1": 1, "bp7": 1}, ([0, 0, 0, 0, 1, 1], ["BA1", "BS1", "BP7"])),
+        ({}, ([0, 0, 0, 0, 0, 0], [])),
+    ],
+)
+def test_count_evidence(evidence_score_dic, expected):
+
+    assert expected == count_evidence(evidence_score_dic)
+
+
+def score_row(pvs, ps, pm, pp, bs, bp, prior_p=0.1, Opvs=350):
+    OP = Opvs ** (pp / 8 + pm / 4 + ps / 2 + pvs / 1 - bp / 8 - bs / 2)
+    return (OP * prior_p) / ((OP - 1) * prior_p + 1)
+
+
+@pytest.mark.parametrize("prior_p, Opvs", [(0.1, 350), (0.05, 350), (0.1, 100)])
+def test_score_evidence_counts(prior_p, Opvs):
+
+    evidence_counts = np.array(
+        [
+            [1, 0, 1, 1, 0, 0],
+            [0, 0, 0, 1, 0, 1],
+            [0, 0, 1, 0, 0, 0],
+            [0, 0, 0, 0, 1, 2],
+            [1, 1, 0, 0, 0, 0],
+            [0, 1, 1, 2, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+        ]
+    )
+    post_p, class_codes = score_evidence_counts(evidence_counts, prior_p, Opvs)
+
+    # row 별 계산과 같은 값
+    expected = [score_row(*counts, prior_p, Opvs) for counts in evidence_counts.tolist()]
+    assert expected == post_p.tolist()
+    assert np.int8 == class_codes.dtype
+
+
+def test_score_evidence_counts_class():
+
+    post_p, class_codes = score_evidence_counts(
+        np.array([[1, 0, 1, 1, 0, 0], [0, 1, 1, 1, 0, 0], [0, 0, 1, 0, 0, 0], [0, 0, 0, 0, 0, 1], [0, 0, 0, 0, 1, 2]])
+    )
+
+    assert ["Pathogenic", "Likely pathogenic", "VUS", "Likely benign", "Benign"] == [
+        PATHOGENICITY_CLASSES[code] for code in class_codes
+    ]
+    assert ([], []) == tuple(
+        values.tolist() for values in score_evidence_counts(np.zeros((0, 6), dtype=int))
+    )
+
+
+def make_result_row(var_id, feature, symbol, post_p, pathogenicity):
+    return [var_id, feature, "missense_variant", symbol, "PM2", post_p, pathogenicity, ""]
+
+
+RESULT_ROWS = [
+    make_result_row("1-100-A-G", "ENST1", "GENE1", 0.2, "VUS"),
+    make_result_row("1-100-A-G", "ENST2", "GENE1", 0.95, "Likely pathogenic"),
+    make_result_row("1-200-C-T", "ENST3", "GENE1", 0.99, "Pathogenic"),
+    make_result_row("2-300-G-A", "ENST4", "GENE2", 0.95, "Likely pathogenic"),
+    make_result_row("2-400-T-C", "ENST5", "-", 0.05, "Likely benign"),
+    make_result_row("2-500-T-G", "ENST6", "-", 0.01, "Benign"),
+]
+
+
+@pytest.mark.parametrize(
+    "min_class, expected",
+    [("Pathogenic", ["ENST3"]), ("Likely pathogenic", ["ENST2", "ENST3", "ENST4"]), ("Benign", ["ENST1", "ENST2", "ENST3", "ENST4", "ENST5", "ENST6"])],
+)
+def test_filter_min_class(min_class, expected):
+
+    assert expected == [row[1] for row in filter_min_class(iter(RESULT_ROWS), min_class)]
+
+
+@pytest.mark.parametrize(
+    "group_by, expected",
+    [("variant", ["ENST2", "ENST3", "ENST4", "ENST5", "ENST6"]), ("gene", ["ENST3", "ENST4", "ENST5", "ENST6"])],
+)
+def test_select_best_rows(group_by, expected):
+
+    assert expected == [row[1] for row in select_best_rows(iter(RESULT_ROWS), group_by)]
+
+
+def test_select_best_rows_unknown_group_by():
+
+    with pytest.raises(ValueError, match="unknown group_by"):
+        select_best_rows(iter(RESULT_ROWS), "transcript")
+
+def test_select_best_rows_top_k():
+
+    # posterior 내림차순, 같은 값은 먼저 나온 row 먼저
+    post_p_idx = RESULT_COL2IDX["ACMG_bayesian"]
+    top_rows = heapq.nlargest(
+        3, select_best_rows(iter(RESULT_ROWS), "variant"), key=lambda row: row[post_p_idx]
+    )
+
+    assert ["ENST3", "ENST2", "ENST4"] == [row[1] for row in top_rows]
+
+
+######################################################################
+
+
+resultwriter = sys.modules[__name__]
+
+# 결과 파일의 column
+RESULT_COLUMNS = [
+    "Variant_ID",
+    "Feature",
+    "Consequence",
+    "Symbol",
+    "ACMG_rule",
+    "ACMG_bayesian",
+    "Pathogenicity",
+    "Related disease_info",
+]
+
+# 결과 row (resultwriter.RESULT_COLUMNS) 에서 사용하는 column index
+RESULT_COL2IDX = {
+    col: idx for idx, col in enumerate(resultwriter.RESULT_COLUMNS)
+}
+
+# Bayesian framework 기본값
+OPVS = 350
+PRIOR_P = 0.1
+
+# evidence count matrix의 column 순서
+EVIDENCE_CATEGORIES = ["pvs", "ps", "pm", "pp", "bs", "bp"]
+
+# score_evidence_counts()의 class code 순서
+PATHOGENICITY_CLASSES = [
+    "Benign",
+    "Likely benign",
+    "VUS",
+    "Likely pathogenic",
+    "Pathogenic",
+]
+
+
+def get_evidence_category(key: str) -> str:
+    """_summary_
+    Note:
+        evidence key의 종류 (EVIDENCE_CATEGORIES 또는 "ba")를 반환한다. 해당하지 않으면 None.
+
+    Examples:
+        >>> "pvs1" -> "pvs", "ps2" -> "ps", "bp4" -> "bp", "ba1" -> "ba"
+    """
+
+    for category in EVIDENCE_CATEGORIES + ["ba"]:
+        if key.startswith(category):
+            return category
+
+    return None
+
+
+def count_evidence(evidence_score_dic: dict) -> tuple:
+    """_summary_
+    Note:
+        한 transcript의 evidence_score_dic에서 값이 있는 evidence를 종류 별로 세고, 결과 파일에 적을
+        ACMG rule 목록을 만든다. pvs1은 강도 (PVS1_S, PVS1_M)를 rule 이름으로 사용한다.
+
+    Args:
+        evidence_score_dic (dict): {"pp3": 1, "pvs1": "PVS1_S", ...}
+
+    Returns:
+        tuple(list, list): (EVIDENCE_CATEGORIES 순서의 count, ACMG rule 목록)
+
+    Examples:
+        >>> {"pvs1": "PVS1_S", "pm2": 1, "pp3": 1, "bp4": 0} -> ([1, 0, 1, 1, 0, 0], ["PVS1_S", "PM2", "PP3"])
+    """
+
+    evidence_counts = [0] * len(EVIDENCE_CATEGORIES)
+    ACMG_rules = []
+
+    for key, value in evidence_score_dic.items():
+        if not value:
+            continue
+        category = get_evidence_category(key)
+        if category is None:
+            continue
+        if category != "ba":
+            evidence_counts[EVIDENCE_CATEGORIES.index(category)] += 1
+        ACMG_rules.append(value if category == "pvs" else key.upper())  # flag_type
+
+    return evidence_counts, ACMG_rules
+
+
+def score_evidence_counts(
+    evidence_counts: np.ndarray, prior_p: float = PRIOR_P, Opvs: float = OPVS
+) -> tuple:
+    """_summary_
+    Note:
+        (transcript 수, 6) 크기의 evidence count matrix (EVIDENCE_CATEGORIES 순서)로 모든 transcript의
+        Bayesian posterior와 pathogenicity class를 한 번에 계산한다.
+
+            OP = Opvs ** (pp / 8 + pm / 4 + ps / 2 + pvs / 1 - bp / 8 - bs / 2)
+            post_p = OP * prior_p / ((OP - 1) * prior_p + 1)
+
+        post_p >= 0.99: Pathogenic, >= 0.9: Likely pathogenic, <= 0.01: Benign, <= 0.1: Likely benign,
+        그 외: VUS
+
+    Args:
+        evidence_counts (np.ndarray): evidence count matrix
+        prior_p (float): prior probability of pathogenicity
+        Opvs (float): very strong evidence의 odds of pathogenicity
+
+    Returns:
+        tuple(np.ndarray, np.ndarray): (post_p (float64), PATHOGENICITY_CLASSES의 class code (int8))
+
+    Examples:
+        >>> score_evidence_counts(np.array([[1, 0, 1, 1, 0, 0], [0, 0, 0, 1, 0, 1]]))
+            -> (array([0.9994.., 0.1]), array([4, 1], dtype=int8))
+    """
+
+    pvs, ps, pm, pp, bs, bp = np.asarray(evidence_counts, dtype=np.float64).T
+
+    # row 별 계산과 같은 순서로 더하고, 지수의 종류는 많지 않으므로 종류 별로 한 번씩 Opvs ** 지수를 계산한다.
+    # (np.power는 python의 ** 와 마지막 자리가 다를 수 있다)
+    exponents, exponent_idxs = np.unique(
+        pp / 8 + pm / 4 + ps / 2 + pvs / 1 - bp / 8 - bs / 2, return_inverse=True
+    )
+    OP = np.array([Opvs ** exponent for exponent in exponents.tolist()])[
+        exponent_idxs.reshape(-1)
+    ]
+    post_p = (OP * prior_p) / ((OP - 1) * prior_p + 1)
+
+    class_codes = np.select(
+        [post_p >= 0.99, post_p >= 0.9, post_p <= 0.01, post_p <= 0.1],
+        [4, 3, 0, 1],
+        default=2,
+    ).astype(np.int8)
+
+    return post_p, class_codes
+
+
+def filter_min_class(result_rows: object, min_class: str) -> object:
+    """_summary_
+    Note:
+        pathogenicity class가 min_class 이상 (PATHOGENICITY_CLASSES 순서)인 결과 row만 반환한다.
+
+    Examples:
+        >>> min_class = "Likely pathogenic" -> "Likely pathogenic", "Pathogenic" row만 반환
+    """
+
+    min_class_code = PATHOGENICITY_CLASSES.index(min_class)
+    class2code = {
+        pathogenicity: code for code, pathogenicity in enumerate(PATHOGENICITY_CLASSES)
+    }
+    pathogenicity_idx = RESULT_COL2IDX["Pathogenicity"]
+
+    return (
+        row
+        for row in result_rows
+        if class2code[row[pathogenicity_idx]] >= min_class_code
+    )
+
+
+def select_best_rows(result_rows: object, group_by: str) -> object:
+    """_summary_
+    Note:
+        변이 ("variant") 또는 유전자 ("gene") 별로 posterior가 가장 높은 결과 row 하나만 반환한다.
+        posterior가 같으면 먼저 나온 row를 사용한다.
+        - variant: 한 변이의 transcript들은 연속해서 나오므로, 변이 하나씩 처리한다.
+        - gene: 유전자 별 가장 높은 row만 저장한다 (유전자 수 만큼의 메모리).
+          gene_symbol이 없는 ("-") 변이는 변이 별로 고른다.
+
+    Args:
+        result_rows (object): iter_acmg_results()의 결과 row
+        group_by (str): "variant" or "gene"
+
+    Raises:
+        ValueError: group_by가 "variant", "gene"이 아닌 경우
+
+    Returns:
+        object: 결과 row
+    """
+
+    if group_by not in ("variant", "gene"):
+        raise ValueError(f"unknown group_by: {group_by} (use ['variant', 'gene'])")
+
+    var_id_idx = RESULT_COL2IDX["Variant_ID"]
+    symbol_idx = RESULT_COL2IDX["Symbol"]
+    post_p_idx = RESULT_COL2IDX["ACMG_bayesian"]
+
+    if group_by == "variant":
+        return (
+            max(rows, key=lambda row: row[post_p_idx])
+            for _, rows in itertools.groupby(result_rows, key=lambda row: row[var_id_idx])
+        )
+
+    best_row_dic = dict()  # {gene_symbol: row}
+    for row in result_rows:
+        group_key = row[symbol_idx] if row[symbol_idx] != "-" else row[var_id_idx]
+        best_row = best_row_dic.get(group_key)
+        if best_row is None or row[post_p_idx] > best_row[post_p_idx]:
+            best_row_dic[group_key] = row
+
+    return iter(best_row_dic.values())
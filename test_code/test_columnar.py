@@ -0,0 +1,1005 @@
+# module for columnar (struct-of-arrays) VariantDF test
+
+from array import array
+from collections.abc import Mapping, MutableMapping
+import contextlib
+import gc
+import gzip
+import numpy as np
+import sys
+import threading
+
+
+def make_variant_dic() -> dict:
+    var_infos_1 = ["1-69270-A-G", "1", [69270], "ENSG00000186092", "ENST00000335137",
+                   "synonymous_variant", "180", "180", "60", "S", "tcA/tcG", "OR4F5", "1",
+                   None, 0, 0, None, "LOW", "14825", ""]
+    var_infos_2 = ["1-69270-A-G", "1", [69270], "ENSG00000186092", "ENST00000641515",
+                   "missense_variant", "240", "210", "70", "S/P", "Tca/Cca", "OR4F5", "1",
+                   0.051, 2, 1000, 0.002, "MODERATE", "14825", "MANE"]
+    var_infos_3 = ["2-1000-ATG-A", "2", [1001, 1002], "ENSG00000100000", "ENST00000200000",
+                   "frameshift_variant", "-", "-", "-", "-", "-", "-", "-1",
+                   None, 0, 0, None, "HIGH", "", "YES"]
+
+    return {
+        "1-69270-A-G": {
+            "ENST00000335137": {"var_infos": var_infos_1, "evidence_score_dic": {"pp3": 0, "bp7": 1}},
+            "ENST00000641515": {"var_infos": var_infos_2, "evidence_score_dic": {"pp3": 1, "bp7": 0}},
+        },
+        "2-1000-ATG-A": {
+            "ENST00000200000": {"var_infos": var_infos_3, "evidence_score_dic": {"pvs1": "PVS1_S", "pm2": 1}},
+        },
+    }
+
+
+def test_from_variant_dic():
+
+    variant_dic = make_variant_dic()
+    columnar_df = ColumnarVariantDF.from_variant_dic(variant_dic)
+    view = columnar_df.variant_dic
+
+    assert list(variant_dic) == list(view)
+    for var_id in variant_dic:
+        assert list(variant_dic[var_id]) == list(view[var_id])
+        for var_feature, var_info_dic in variant_dic[var_id].items():
+            assert var_info_dic["var_infos"] == list(view[var_id][var_feature]["var_infos"])
+            assert var_info_dic["evidence_score_dic"] == dict(
+                view[var_id][var_feature]["evidence_score_dic"]
+            )
+    assert 3 == columnar_df.n_rows
+    assert [False, True, False] == list(columnar_df.get_evidence_mask("pp3"))
+
+
+def test_variant_dic_view_write():
+
+    columnar_df = ColumnarVariantDF.from_variant_dic(make_variant_dic())
+    df_col2idx = columnar_df.df_col2idx
+    var_info_dic = columnar_df.variant_dic["2-1000-ATG-A"]["ENST00000200000"]
+
+    # rule 모듈처럼 view에 쓰면 column에 저장
+    var_info_dic["var_infos"][df_col2idx["gnomad_af"]] = 0.3
+    var_info_dic["var_infos"][df_col2idx["gnomad_an"]] = 20
+    var_info_dic["evidence_score_dic"]["pvs1"] = ""
+    var_info_dic["evidence_score_dic"]["ba1"] = 1
+    var_info_dic = columnar_df.variant_dic["2-1000-ATG-A"]["ENST00000200000"]
+
+    assert 0.3 == var_info_dic["var_infos"][df_col2idx["gnomad_af"]]
+    assert 20 == var_info_dic["var_infos"][df_col2idx["gnomad_an"]]
+    assert None == columnar_df.variant_dic["1-69270-A-G"]["ENST00000335137"]["var_infos"][df_col2idx["revel"]]
+    assert {"pvs1": "", "pm2": 1, "ba1": 1} == dict(var_info_dic["evidence_score_dic"])
+
+
+def test_parse_variant_file(tmp_path):
+
+    vep_file = tmp_path / "proband.txt"
+    vep_file.write_text(
+        "## VEP header\n"
+        "#Uploaded_variation\tLocation\tAllele\tGene\tFeature\tFeature_type\tConsequence\t"
+        "cDNA_position\tCDS_position\tProtein_position\tAmino_acids\tCodons\tExisting_variation\tExtra\n"
+        "1-69270-A-G\t1:69270\tG\tENSG00000186092\tENST00000335137\tTranscript\tsynonymous_variant\t"
+        "180\t180\t60\tS\ttcA/tcG\t-\tIMPACT=LOW;STRAND=1;SYMBOL=OR4F5;CANONICAL=YES;MANE_SELECT=NM_001005484.2\n"
+        "2-1000-ATG-A\t2:1001-1002\t-\tENSG00000100000\tENST00000200000\tTranscript\tframeshift_variant\t"
+        "-\t-\t-\t-\t-\t-\tIMPACT=HIGH;STRAND=-1\n"
+    )
+    columnar_df = ColumnarVariantDF()
+    columnar_df.parse_variant_file(str(vep_file))
+    view = columnar_df.variant_dic
+
+    assert ["1-69270-A-G", "2-1000-ATG-A"] == list(view)
+    assert ["1-69270-A-G", "1", [69270], "ENSG00000186092", "ENST00000335137",
+            "synonymous_variant", "180", "180", "60", "S", "tcA/tcG", "OR4F5", "1",
+            None, 0, 0, None, "LOW", "", "MANE"] == list(view["1-69270-A-G"]["ENST00000335137"]["var_infos"])
+    assert [1001, 1002] == view["2-1000-ATG-A"]["ENST00000200000"]["var_infos"][2]
+    assert "" == view["2-1000-ATG-A"]["ENST00000200000"]["var_infos"][11]
+    assert {} == dict(view["2-1000-ATG-A"]["ENST00000200000"]["evidence_score_dic"])
+
+
+def test_set_evidence_array():
+
+    columnar_df = ColumnarVariantDF.from_variant_dic(make_variant_dic())
+    view = columnar_df.variant_dic
+
+    columnar_df.set_evidence_array("pm4", np.array([1, 0, 1]), np.array([False, True, True]))
+    columnar_df.set_evidence_labels("pvs1", ["", "PVS1_S", "PVS1_M"], np.array([0, 0, 2]))
+
+    assert {"pp3": 0, "bp7": 1, "pvs1": ""} == dict(view["1-69270-A-G"]["ENST00000335137"]["evidence_score_dic"])
+    assert {"pp3": 1, "bp7": 0, "pvs1": "", "pm4": 0} == dict(view["1-69270-A-G"]["ENST00000641515"]["evidence_score_dic"])
+    assert {"pvs1": "PVS1_M", "pm2": 1, "pm4": 1} == dict(view["2-1000-ATG-A"]["ENST00000200000"]["evidence_score_dic"])
+
+
+######################################################################
+
+# VariantDF.df_col2idx 와 같은 column 순서
+DF_COLUMNS = [
+    "var_id",
+    "chrom",
+    "location",
+    "gene",
+    "feature",
+    "consequence",
+    "cDNA_pos",
+    "CDS_pos",
+    "protein_pos",
+    "AA_change",
+    "codon_change",
+    "symbol",
+    "strand",
+    "revel",
+    "gnomad_ac",
+    "gnomad_an",
+    "gnomad_af",
+    "impact",
+    "hgnc_id",
+    "canonical",
+]
+# 문자열 column은 중복 없이 한 번만 저장하고(interned categories), 각 row는 번호(code)만 저장한다.
+CATEGORY_COLUMNS = DF_COLUMNS[:2] + DF_COLUMNS[3:13] + DF_COLUMNS[17:]
+INT_COLUMNS = ["gnomad_ac", "gnomad_an"]
+FLOAT_COLUMNS = ["revel", "gnomad_af"]  # None -> NaN
+
+# rule 모듈이 evidence_score_dic에 값을 저장하는 순서 (__main__.execute_acmg_rules())
+EVIDENCE_KEYS = [
+    "pp3",
+    "bp4",
+    "bp7",
+    "pp2",
+    "bp1",
+    "pvs1",
+    "pm2",
+    "ba1",
+    "bs1",
+    "ps1",
+    "pm5",
+    "pp5",
+    "bp6",
+    "ps2",
+    "pm4",
+    "bp3",
+]
+MAX_EVIDENCE_KEYS = 64  # evidence bit 수 (uint64)
+
+
+class CategoryColumn:
+    """_summary_
+    Note:
+        문자열 column. 서로 다른 문자열(categories)은 한 번만 저장하고, 각 row에는 category 번호(code)를
+        저장한다. gene, symbol, consequence 처럼 같은 값이 반복되는 column의 메모리를 크게 줄인다.
+    """
+
+    def __init__(self):
+        self.codes = array("i")
+        self.categories: list = []
+        self.cat2code: dict = dict()
+
+    def encode(self, value: str) -> int:
+        code = self.cat2code.get(value)
+        if code is None:
+            code = len(self.categories)
+            self.cat2code[value] = code
+            self.categories.append(value)
+        return code
+
+    def append(self, value: str):
+        self.codes.append(self.encode(value))
+
+    def finalize(self, order: np.ndarray):
+        self.codes = np.frombuffer(self.codes, dtype=np.int32)[order].copy()
+
+    def get(self, row: int) -> str:
+        return self.categories[self.codes[row]]
+
+    def set(self, row: int, value: str):
+        self.codes[row] = self.encode(value)
+
+
+class ColumnarVariantDF:
+    """_summary_
+    Note:
+        VariantDF와 같은 정보를 (변이, transcript) row 별 column array로 저장하는 dataframe class.
+        variant_dic 처럼 row 마다 dict, list, dict를 만들지 않으므로, 변이가 많은 경우 메모리를 크게 줄인다.
+
+        - 문자열 column (var_id, chrom, gene, feature, consequence, symbol, ..): CategoryColumn
+        - location: loc_start, loc_end (np.int64, 끝 위치가 없으면 -1)
+        - gnomad_ac, gnomad_an: np.int64 / revel, gnomad_af: np.float64 (None -> NaN)
+        - evidence: row 당 uint64 bit 두 개. evidence_set(저장 여부), evidence_true(값이 참인지)
+          0/1 이 아닌 값(pvs1 = "PVS1_S" 등)은 key 별 code array (evidence_values)에 따로 저장한다.
+
+        row는 var_id 순서대로 모여 있으며(var_offsets), 기존 rule 모듈에서 그대로 사용할 수 있도록
+        variant_dic과 같은 방식으로 읽고 쓸 수 있는 view(variant_dic)를 제공한다. view로 쓴 값은 column에
+        바로 저장된다.
+
+    Examples:
+        >>> proband_var_df = ColumnarVariantDF()
+            proband_var_df.parse_variant_file(PROBAND_VEP)
+            variant_dic = proband_var_df.variant_dic
+            variant_dic["1-69270-A-G"]["ENST00000335137"]["var_infos"][df_col2idx["revel"]] = 0.051
+            variant_dic["1-69270-A-G"]["ENST00000335137"]["evidence_score_dic"]["pp3"] = 1
+    """
+
+    def __init__(self):
+        self.df_col2idx: dict = {col: idx for idx, col in enumerate(DF_COLUMNS)}
+        self.n_rows = 0
+        self.category_columns: dict = {
+            col: CategoryColumn() for col in CATEGORY_COLUMNS
+        }
+        self.loc_start = array("q")
+        self.loc_end = array("q")
+        self.int_columns: dict = {col: array("q") for col in INT_COLUMNS}
+        self.float_columns: dict = {col: array("d") for col in FLOAT_COLUMNS}
+
+        # {(var_id, feature): row}. 같은 (var_id, feature)가 다시 나오면 덮어쓴다.
+        self.row_dic: dict = dict()
+        self.var_ids: list = []  # 변이 순서
+        self.var_offsets: np.ndarray = None  # var_ids[i] 의 row 범위
+
+        self.evidence_keys: list = list(EVIDENCE_KEYS)
+        self.key2bit: dict = {key: i for i, key in enumerate(self.evidence_keys)}
+        self.evidence_set: np.ndarray = None
+        self.evidence_true: np.ndarray = None
+        self.evidence_values: dict = dict()  # {key: (codes(np.uint8), [value, ..])}
+
+        self.view = VariantDicView(self)
+
+    # ------------------------------------------------------------------ build
+    def append_row(self, var_infos: list):
+        """var_infos (VariantDF의 var_infos 와 같은 형식) 하나를 row로 추가한다."""
+
+        df_col2idx = self.df_col2idx
+        key = (var_infos[df_col2idx["var_id"]], var_infos[df_col2idx["feature"]])
+        if key in self.row_dic:  # VariantDF 처럼 같은 transcript는 덮어쓰기
+            self.set_var_infos(self.row_dic[key], var_infos)
+            return
+
+        self.row_dic[key] = self.n_rows
+        self.n_rows += 1
+        # 한 파일에서 수백만 번 불리므로, CategoryColumn.append()를 풀어서 이미 있는 category는 바로 저장한다.
+        for col, column in self.category_columns.items():
+            value = var_infos[df_col2idx[col]]
+            code = column.cat2code.get(value)
+            if code is None:
+                code = column.encode(value)
+            column.codes.append(code)
+        location = var_infos[df_col2idx["location"]]
+        self.loc_start.append(location[0])
+        self.loc_end.append(location[1] if len(location) > 1 else -1)
+        for col, column in self.int_columns.items():
+            column.append(var_infos[df_col2idx[col]])
+        for col, column in self.float_columns.items():
+            value = var_infos[df_col2idx[col]]
+            column.append(np.nan if value is None else value)
+
+    def finalize(self):
+        """_summary_
+        Note:
+            추가한 row들을 numpy array로 변환한다. 같은 var_id의 row가 모이도록 (var_id 처음 등장 순서,
+            row 추가 순서)로 정렬하므로, variant_dic (defaultdict)의 순서와 같다.
+        """
+
+        var_id_column = self.category_columns["var_id"]
+        self.var_ids = list(var_id_column.categories)
+        var_codes = np.frombuffer(var_id_column.codes, dtype=np.int32)
+        order = np.argsort(var_codes, kind="stable")
+
+        for column in self.category_columns.values():
+            column.finalize(order)
+        self.loc_start = np.frombuffer(self.loc_start, dtype=np.int64)[order]
+        self.loc_end = np.frombuffer(self.loc_end, dtype=np.int64)[order]
+        for col in INT_COLUMNS:
+            self.int_columns[col] = np.frombuffer(
+                self.int_columns[col], dtype=np.int64
+            )[order]
+        for col in FLOAT_COLUMNS:
+            self.float_columns[col] = np.frombuffer(
+                self.float_columns[col], dtype=np.float64
+            )[order]
+
+        self.var_offsets = np.zeros(len(self.var_ids) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(var_codes, minlength=len(self.var_ids)),
+            out=self.var_offsets[1:],
+        )
+        self.var_id2idx: dict = {
+            var_id: idx for idx, var_id in enumerate(self.var_ids)
+        }
+        self.row_dic = None
+
+        self.evidence_set = np.zeros(self.n_rows, dtype=np.uint64)
+        self.evidence_true = np.zeros(self.n_rows, dtype=np.uint64)
+        self.evidence_values = dict()
+
+    def parse_variant_file(self, vep_file: str):
+        """_summary_
+        Note:
+            VEP로 annotation된 파일(tab 형식 또는 VCF, plain 또는 gz)을 한 줄씩 읽어서 column에 저장한다.
+            VariantDF.parse_variant_file()과 같은 정보를 저장하지만, 변이마다 dictionary를 만들지 않는다.
+
+        Args:
+            vep_file (str): VEP_file address (.txt, .txt.gz, .vcf, .vcf.gz)
+        """
+
+        for var_infos in dbparser.parse_vep_file(vep_file):
+            self.append_row(var_infos)
+
+        self.finalize()
+
+    @classmethod
+    def from_variant_dic(cls, variant_dic: dict) -> object:
+        """VariantDF.variant_dic을 ColumnarVariantDF로 변환한다. evidence_score_dic도 함께 저장한다."""
+
+        columnar_df = cls()
+        for var_id in variant_dic:
+            for var_feature in variant_dic[var_id]:
+                columnar_df.append_row(
+                    variant_dic[var_id][var_feature]["var_infos"]
+                )
+        columnar_df.finalize()
+
+        for var_id in variant_dic:
+            for var_feature, var_info_dic in variant_dic[var_id].items():
+                row = columnar_df.find_row(var_id, var_feature)
+                for key, value in var_info_dic["evidence_score_dic"].items():
+                    columnar_df.set_evidence(row, key, value)
+
+        return columnar_df
+
+    # ------------------------------------------------------------ row access
+    def find_row(self, var_id: str, var_feature: str) -> int:
+        var_idx = self.var_id2idx[var_id]
+        feature_column = self.category_columns["feature"]
+        code = feature_column.cat2code.get(var_feature)
+        for row in range(
+            self.var_offsets[var_idx], self.var_offsets[var_idx + 1]
+        ):
+            if feature_column.codes[row] == code:
+                return row
+        raise KeyError(var_feature)
+
+    def get_value(self, row: int, idx: int) -> object:
+        col = DF_COLUMNS[idx]
+        if col in self.category_columns:
+            return self.category_columns[col].get(row)
+        elif col == "location":
+            loc_end = self.loc_end[row]
+            if loc_end < 0:
+                return [int(self.loc_start[row])]
+            return [int(self.loc_start[row]), int(loc_end)]
+        elif col in self.int_columns:
+            return int(self.int_columns[col][row])
+        else:
+            value = self.float_columns[col][row]
+            return None if np.isnan(value) else float(value)
+
+    def set_value(self, row: int, idx: int, value: object):
+        col = DF_COLUMNS[idx]
+        if col in self.category_columns:
+            self.category_columns[col].set(row, value)
+        elif col == "location":
+            self.loc_start[row] = value[0]
+            self.loc_end[row] = value[1] if len(value) > 1 else -1
+        elif col in self.int_columns:
+            self.int_columns[col][row] = value
+        else:
+            self.float_columns[col][row] = np.nan if value is None else value
+
+    def set_var_infos(self, row: int, var_infos: list):
+        for idx, value in enumerate(var_infos):
+            self.set_value(row, idx, value)
+
+    # -------------------------------------------------------------- evidence
+    def get_evidence_bit(self, key: str) -> np.uint64:
+        if key not in self.key2bit:
+            if len(self.evidence_keys) >= MAX_EVIDENCE_KEYS:
+                raise ValueError(f"too many evidence keys: {key}")
+            self.key2bit[key] = len(self.evidence_keys)
+            self.evidence_keys.append(key)
+        return np.uint64(1 << self.key2bit[key])
+
+    def set_evidence(self, row: int, key: str, value: object):
+        """_summary_
+        Note:
+            row의 evidence key 값을 저장한다. 0/1(bool) 값은 bit로만 저장하고, 그 외의 값("PVS1_S", "" 등)은
+            key 별 code array에 저장한다. (code 0 은 bit 값을 사용한다는 의미)
+        """
+
+        bit = self.get_evidence_bit(key)
+        self.evidence_set[row] |= bit
+        if value:
+            self.evidence_true[row] |= bit
+        else:
+            self.evidence_true[row] &= ~bit
+
+        if value is True or value is False or (type(value) is int and value in (0, 1)):
+            if key in self.evidence_values:
+                self.evidence_values[key][0][row] = 0
+            return
+
+        if key not in self.evidence_values:
+            self.evidence_values[key] = (np.zeros(self.n_rows, dtype=np.uint8), [])
+        codes, values = self.evidence_values[key]
+        if value not in values:
+            values.append(value)
+        codes[row] = values.index(value) + 1
+
+    def set_evidence_array(
+        self, key: str, flags: np.ndarray, rows: np.ndarray = None
+    ):
+        """_summary_
+        Note:
+            여러 row의 evidence key 값(0/1)을 한 번에 저장한다. rows (bool array)가 주어지면 해당 row에만
+            저장하며, 나머지 row의 값은 바꾸지 않는다(key가 없던 row는 계속 없음).
+
+        Args:
+            key (str): evidence key (pp3, bp4, ..)
+            flags (np.ndarray): 모든 row에 대한 0/1 (bool) array
+            rows (np.ndarray): 값을 저장할 row (bool array). None 이면 모든 row
+        """
+
+        bit = self.get_evidence_bit(key)
+        if rows is None:
+            rows = np.ones(self.n_rows, dtype=bool)
+        flags = np.asarray(flags, dtype=bool)
+
+        self.evidence_set[rows] |= bit
+        self.evidence_true[rows & flags] |= bit
+        self.evidence_true[rows & ~flags] &= ~bit
+        if key in self.evidence_values:
+            self.evidence_values[key][0][rows] = 0
+
+    def set_evidence_labels(
+        self,
+        key: str,
+        labels: list,
+        label_idxs: np.ndarray,
+        rows: np.ndarray = None,
+    ):
+        """_summary_
+        Note:
+            여러 row의 문자열 evidence 값(pvs1 = "", "PVS1_S", "PVS1_M")을 한 번에 저장한다.
+            각 row의 값은 labels[label_idxs[row]] 이다.
+
+        Args:
+            key (str): evidence key (pvs1)
+            labels (list): ["", "PVS1_S", "PVS1_M"]
+            label_idxs (np.ndarray): 모든 row에 대한 labels의 index array
+            rows (np.ndarray): 값을 저장할 row (bool array). None 이면 모든 row
+        """
+
+        if rows is None:
+            rows = np.ones(self.n_rows, dtype=bool)
+        self.set_evidence_array(
+            key, np.array([bool(label) for label in labels])[label_idxs], rows
+        )
+
+        if key not in self.evidence_values:
+            self.evidence_values[key] = (np.zeros(self.n_rows, dtype=np.uint8), [])
+        codes, values = self.evidence_values[key]
+        for label in labels:
+            if label not in values:
+                values.append(label)
+        label_codes = np.array(
+            [values.index(label) + 1 for label in labels], dtype=np.uint8
+        )
+        codes[rows] = label_codes[label_idxs][rows]
+
+    def get_evidence(self, row: int, key: str) -> object:
+        bit_idx = self.key2bit.get(key)
+        if bit_idx is None or not (int(self.evidence_set[row]) >> bit_idx) & 1:
+            raise KeyError(key)
+        if key in self.evidence_values:
+            codes, values = self.evidence_values[key]
+            if codes[row]:
+                return values[codes[row] - 1]
+        return (int(self.evidence_true[row]) >> bit_idx) & 1
+
+    def get_evidence_keys(self, row: int) -> list:
+        evidence_set = int(self.evidence_set[row])
+        return [
+            key
+            for bit_idx, key in enumerate(self.evidence_keys)
+            if (evidence_set >> bit_idx) & 1
+        ]
+
+    def get_evidence_mask(self, key: str) -> np.ndarray:
+        """모든 row에 대해, evidence key 값이 참인지 (bool array)."""
+
+        bit = self.get_evidence_bit(key)
+        return (self.evidence_true & bit) != 0
+
+    # ------------------------------------------------------------------ view
+    @property
+    def variant_dic(self) -> object:
+        return self.view
+
+    @variant_dic.setter
+    def variant_dic(self, variant_dic: dict):
+        # rule 모듈의 "proband_var_df.variant_dic = variant_dic". view는 이미 저장되어 있음.
+        if variant_dic is self.view:
+            return
+        columnar_df = ColumnarVariantDF.from_variant_dic(variant_dic)
+        self.__dict__.update(columnar_df.__dict__)
+        self.view.columnar_df = self
+
+    def memory_usage(self) -> int:
+        """column array들이 사용하는 메모리(byte). category 문자열은 제외."""
+
+        arrays = [column.codes for column in self.category_columns.values()]
+        arrays += [self.loc_start, self.loc_end, self.var_offsets]
+        arrays += list(self.int_columns.values()) + list(self.float_columns.values())
+        arrays += [self.evidence_set, self.evidence_true]
+        arrays += [codes for codes, _ in self.evidence_values.values()]
+
+        return sum(column.nbytes for column in arrays)
+
+
+class VariantDicView(Mapping):
+    """ColumnarVariantDF를 {var_id: {feature: {"var_infos", "evidence_score_dic"}}} 처럼 읽는 view."""
+
+    def __init__(self, columnar_df: ColumnarVariantDF):
+        self.columnar_df = columnar_df
+
+    def __getitem__(self, var_id: str) -> object:
+        var_idx = self.columnar_df.var_id2idx[var_id]
+        return FeatureDicView(
+            self.columnar_df,
+            int(self.columnar_df.var_offsets[var_idx]),
+            int(self.columnar_df.var_offsets[var_idx + 1]),
+        )
+
+    def __contains__(self, var_id: object) -> bool:
+        return var_id in self.columnar_df.var_id2idx
+
+    def __iter__(self):
+        return iter(self.columnar_df.var_ids)
+
+    def __len__(self) -> int:
+        return len(self.columnar_df.var_ids)
+
+
+class FeatureDicView(Mapping):
+    """한 변이의 {feature: {"var_infos", "evidence_score_dic"}} view."""
+
+    def __init__(self, columnar_df: ColumnarVariantDF, start: int, end: int):
+        self.columnar_df = columnar_df
+        self.start = start
+        self.end = end
+
+    def __getitem__(self, var_feature: str) -> dict:
+        feature_column = self.columnar_df.category_columns["feature"]
+        code = feature_column.cat2code.get(var_feature)
+        for row in range(self.start, self.end):
+            if feature_column.codes[row] == code:
+                return {
+                    "var_infos": VarInfosView(self.columnar_df, row),
+                    "evidence_score_dic": EvidenceView(self.columnar_df, row),
+                }
+        raise KeyError(var_feature)
+
+    def __iter__(self):
+        feature_column = self.columnar_df.category_columns["feature"]
+        for row in range(self.start, self.end):
+            yield feature_column.get(row)
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+
+class VarInfosView:
+    """한 row의 var_infos list view. 값을 쓰면 column에 바로 저장된다."""
+
+    def __init__(self, columnar_df: ColumnarVariantDF, row: int):
+        self.columnar_df = columnar_df
+        self.row = row
+
+    def __getitem__(self, idx: int) -> object:
+        return self.columnar_df.get_value(self.row, idx)
+
+    def __setitem__(self, idx: int, value: object):
+        self.columnar_df.set_value(self.row, idx, value)
+
+    def __len__(self) -> int:
+        return len(DF_COLUMNS)
+
+    def __iter__(self):
+        for idx in range(len(DF_COLUMNS)):
+            yield self.columnar_df.get_value(self.row, idx)
+
+    def __eq__(self, other: object) -> bool:
+        return list(self) == list(other)
+
+
+class EvidenceView(MutableMapping):
+    """한 row의 evidence_score_dic view. 값을 쓰면 evidence bit에 바로 저장된다."""
+
+    def __init__(self, columnar_df: ColumnarVariantDF, row: int):
+        self.columnar_df = columnar_df
+        self.row = row
+
+    def __getitem__(self, key: str) -> object:
+        return self.columnar_df.get_evidence(self.row, key)
+
+    def __setitem__(self, key: str, value: object):
+        self.columnar_df.set_evidence(self.row, key, value)
+
+    def __delitem__(self, key: str):
+        bit = self.columnar_df.get_evidence_bit(key)
+        self.columnar_df.evidence_set[self.row] &= ~bit
+        self.columnar_df.evidence_true[self.row] &= ~bit
+
+    def __iter__(self):
+        return iter(self.columnar_df.get_evidence_keys(self.row))
+
+    def __len__(self) -> int:
+        return len(self.columnar_df.get_evidence_keys(self.row))
+
+
+# VEP tab 형식 파일에서 사용하는 column (VariantDF.df_col2idx 순서)
+VEP_COLUMNS = [
+    "Uploaded_variation",
+    "Location",
+    "Gene",
+    "Feature",
+    "Consequence",
+    "cDNA_position",
+    "CDS_position",
+    "Protein_position",
+    "Amino_acids",
+    "Codons",
+    "Extra",
+]
+# VEP Extra column 에서 사용하는 key
+VEP_EXTRA_KEYS = ["SYMBOL", "STRAND", "IMPACT", "HGNC_ID", "CANONICAL", "MANE_SELECT"]
+# VEP VCF 파일의 CSQ (INFO) field 에서 사용하는 column (Extra에 해당하는 key는 VEP_EXTRA_KEYS)
+VEP_CSQ_COLUMNS = [
+    "Allele",
+    "Gene",
+    "Feature",
+    "Consequence",
+    "cDNA_position",
+    "CDS_position",
+    "Protein_position",
+    "Amino_acids",
+    "Codons",
+]
+
+
+def open_text_file(filename: str) -> object:
+    """gz (gzip, bgzip) 압축 파일이면 압축을 풀면서, 그 외에는 그대로 읽는 text file object를 반환한다."""
+
+    if filename.endswith((".gz", ".bgz")):
+        return gzip.open(filename, "rt")
+
+    return open(filename)
+
+
+def parse_vep_extra(extra: str, keys: list = VEP_EXTRA_KEYS) -> dict:
+    """_summary_
+    Note:
+        VEP 결과의 Extra column ("KEY=VALUE;KEY=VALUE;..")을 모든 field로 나누지 않고, 필요한 key의
+        위치만 찾아 값을 dictionary로 반환한다. 값이 없는 key는 ""로 반환한다.
+
+    Args:
+        extra (str): Extra column. e.g. IMPACT=MODIFIER;STRAND=1;SYMBOL=SAMD11;HGNC_ID=28706
+        keys (list): 필요한 key 목록
+
+    Returns:
+        dict: {key: value}
+
+    Examples:
+        >>> "REF_ALLELE=G;IMPACT=MODIFIER;STRAND=1;SYMBOL=SAMD11;SYMBOL_SOURCE=HGNC;HGNC_ID=28706"
+            -> {"SYMBOL": "SAMD11", "STRAND": "1", "IMPACT": "MODIFIER", "HGNC_ID": "28706"}
+    """
+
+    # 앞뒤에 ";"를 붙여서, 다른 key의 일부(e.g. "SYMBOL_SOURCE=")와 혼동하지 않고 값의 끝을 항상 찾는다.
+    extra = ";" + extra + ";"
+    extra_dic = dict()
+    for key in keys:
+        start = extra.find(";" + key + "=")
+        if start == -1:
+            extra_dic[key] = ""
+        else:
+            start += len(key) + 2
+            extra_dic[key] = extra[start : extra.find(";", start)]
+
+    return extra_dic
+
+
+def get_canonical_flag(canonical: str, mane_select: str) -> str:
+    """_summary_
+    Note:
+        VEP의 CANONICAL (--canonical), MANE_SELECT (--mane) 값으로 transcript의 canonical 표시를 반환한다.
+        MANE Select transcript는 "MANE", 그 외 canonical transcript는 "YES", 나머지는 "".
+
+    Examples:
+        >>> ("YES", "NM_000350.3") -> "MANE", ("YES", "") -> "YES", ("", "") -> ""
+    """
+
+    if mane_select and mane_select != "-":
+        return "MANE"
+
+    return "YES" if canonical == "YES" else ""
+
+
+def make_vep_var_infos(var_row: list, vep_col_idxs: list) -> list:
+    """_summary_
+    Note:
+        VEP 결과 파일의 한 줄로 var_infos (VariantDF.df_col2idx 순서)를 만든다. column 위치는 header에서
+        한 번만 찾아서(vep_col_idxs) 사용한다. 변이마다 반복되는 값(염색체, 유전자, consequence 등)은
+        sys.intern()으로 하나의 문자열 객체를 공유하여 메모리를 줄인다.
+
+    Args:
+        var_row (list): splitted each file line
+        vep_col_idxs (list): VEP_COLUMNS 순서의 column index
+
+    Returns:
+        list: var_infos
+
+    Examples:
+        >>> ["1-866319-G-A", "1", [866319], "ENSG00000187634", "ENST00000341065", "intron_variant",
+             "-", "-", "-", "-", "-", "SAMD11", "1", None, 0, 0, None, "MODIFIER", "28706", ""]
+    """
+
+    (
+        var_id,
+        location,
+        gene,
+        feature,
+        consequence,
+        cDNA_pos,
+        CDS_pos,
+        protein_pos,
+        AA_change,
+        codon_change,
+        extra,
+    ) = [var_row[idx] for idx in vep_col_idxs]
+
+    chrom, location = location.split(":")
+    extra_dic = parse_vep_extra(extra)
+
+    return [
+        var_id,
+        sys.intern(chrom),
+        list(map(int, location.split("-"))),  # [1234] or [1234, 1236]
+        sys.intern(gene),
+        feature,
+        sys.intern(consequence),
+        cDNA_pos,
+        CDS_pos,
+        protein_pos,
+        AA_change,
+        codon_change,
+        sys.intern(extra_dic["SYMBOL"]),
+        sys.intern(extra_dic["STRAND"]),
+        None,  # revel
+        0,  # gnomad_ac
+        0,  # gnomad_an
+        None,  # gnomad_af
+        sys.intern(extra_dic["IMPACT"]),
+        extra_dic["HGNC_ID"],
+        get_canonical_flag(extra_dic["CANONICAL"], extra_dic["MANE_SELECT"]),
+    ]
+
+
+# gc_paused() 가 GC를 멈춘 횟수와, 처음 멈추기 전의 GC 상태 (여러 thread가 함께 사용한다)
+_GC_PAUSE_LOCK = threading.Lock()
+_gc_pause_count = 0
+_gc_was_enabled = False
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """_summary_
+    Note:
+        수백만 개의 객체를 한꺼번에 만드는 동안 순환 참조 GC를 멈춘다.
+        GC 상태는 process 전체에서 하나이므로, 여러 thread (pipeline stage)가 동시에 사용해도
+        처음 들어올 때만 GC를 멈추고 마지막으로 나갈 때 원래 상태로 되돌린다.
+    """
+
+    global _gc_pause_count, _gc_was_enabled
+
+    with _GC_PAUSE_LOCK:
+        if _gc_pause_count == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pause_count += 1
+    try:
+        yield
+    finally:
+        with _GC_PAUSE_LOCK:
+            _gc_pause_count -= 1
+            if _gc_pause_count == 0 and _gc_was_enabled:
+                gc.enable()
+
+
+def parse_vep_file(filename: str) -> list:
+    """_summary_
+    Note:
+        VEP 결과 파일(tab 형식, plain 또는 gz/bgzip 압축)을 한 줄씩 읽으며 각 변이-transcript의 var_infos를
+        반환한다. header에서 column 위치를 한 번만 찾으며, 파일 전체를 메모리에 올리지 않는다.
+        VEP로 annotation된 VCF 파일(CSQ INFO field)이면 parse_vep_vcf_file()로 읽는다.
+        읽는 동안에는 순환 참조 GC를 멈추고, 끝나면 원래 상태로 되돌린다.
+
+    Args:
+        filename (str): VEP_file address (.txt, .txt.gz, .vcf, .vcf.gz)
+
+    Yields:
+        list: var_infos (make_vep_var_infos())
+    """
+
+    # 수백만 개의 list/dict가 한꺼번에 만들어지는 동안 순환 참조 GC가 반복해서 전체 객체를 훑지 않도록,
+    # 파일을 읽는 동안에는 GC를 멈춘다(만들어지는 객체에는 순환 참조가 없다).
+    with gc_paused():
+        if is_vcf_file(filename):
+            yield from parse_vep_vcf_file(filename)
+            return
+
+        with open_text_file(filename) as infile:
+            for line in infile:
+                if line.startswith("##"):
+                    continue
+                elif line.startswith("#"):
+                    header = line.strip("#").strip().split("\t")
+                    vep_col_idxs = [header.index(col) for col in VEP_COLUMNS]
+                else:  # variation info
+                    yield make_vep_var_infos(line.strip().split("\t"), vep_col_idxs)
+
+
+def is_vcf_file(filename: str) -> bool:
+    """파일의 첫 줄이 "##fileformat=VCF" 이면 (plain 또는 gz) VCF 파일로 판단한다."""
+
+    with open_text_file(filename) as infile:
+        return infile.readline().startswith("##fileformat=VCF")
+
+
+def parse_vep_csq_header(line: str) -> list:
+    """_summary_
+    Note:
+        VEP VCF header의 CSQ INFO 설명에서 "Format: " 뒤의 field 이름들을 순서대로 반환한다.
+
+    Args:
+        line (str): ##INFO=<ID=CSQ,...> header line
+
+    Returns:
+        list: CSQ field 이름
+
+    Examples:
+        >>> '##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence annotations from Ensembl VEP.
+            Format: Allele|Consequence|IMPACT|SYMBOL">' -> ["Allele", "Consequence", "IMPACT", "SYMBOL"]
+    """
+
+    csq_format = line.split("Format: ")[1]
+    csq_format = csq_format[: csq_format.index('"')]
+
+    return csq_format.strip().split("|")
+
+
+def make_vep_allele_dic(pos: int, ref: str, alts: list) -> dict:
+    """_summary_
+    Note:
+        VCF record의 각 ALT를 VEP가 CSQ의 Allele로 쓰는 형식으로 바꾸고, tab 형식의 Location과 같은 위치를
+        함께 반환한다. VEP와 같이, 모든 allele의 첫 염기가 같고 길이가 다른 allele이 있으면 첫 염기를 떼어낸다.
+        (빈 allele은 "-", insertion의 위치는 [삽입 위치 앞, 뒤])
+
+    Args:
+        pos (int): VCF POS
+        ref (str): VCF REF
+        alts (list): VCF ALT 목록
+
+    Returns:
+        dict: {VEP allele: (ALT, location)}
+
+    Examples:
+        >>> (44202890, "G", ["GC"]) -> {"C": ("GC", [44202890, 44202891])}
+            (32921028, "CTTTCGG", ["C"]) -> {"-": ("C", [32921029, 32921034])}
+            (866319, "G", ["A"]) -> {"A": ("A", [866319])}
+    """
+
+    start = pos
+    vep_ref = ref
+    vep_alts = alts
+    if len({allele[0] for allele in alts + [ref]}) == 1 and any(
+        len(alt) != len(ref) for alt in alts
+    ):
+        start += 1
+        vep_ref = ref[1:]
+        vep_alts = [alt[1:] for alt in alts]
+
+    end = start + len(vep_ref) - 1
+    if end < start:  # insertion
+        location = [end, start]
+    elif end == start:
+        location = [start]
+    else:
+        location = [start, end]
+
+    return {
+        (vep_alt or "-"): (alt, location) for vep_alt, alt in zip(vep_alts, alts)
+    }
+
+
+def parse_vep_vcf_file(filename: str) -> list:
+    """_summary_
+    Note:
+        VEP로 annotation된 VCF 파일(plain 또는 gz/bgzip 압축)을 한 줄씩 읽으며, CSQ INFO field의
+        transcript 별 정보를 tab 형식 파일과 같은 var_infos로 반환한다. CSQ의 field 순서는 header에서
+        한 번만 찾는다.
+        CSQ header가 없는 VCF (VEP로 annotation되지 않은 파일)는 ValueError를 낸다.
+        - var_id: VCF의 ID (없으면 "chrom-pos-ref-alt")
+        - location: tab 형식의 Location과 같은 위치 (make_vep_allele_dic())
+        - consequence: "&"로 이어진 값은 tab 형식과 같이 ","로 바꾼다.
+        - 비어있는 값은 tab 형식과 같이 "-" 로 바꾼다 (SYMBOL, STRAND, IMPACT, HGNC_ID,
+          CANONICAL, MANE_SELECT는 "").
+
+    Args:
+        filename (str): VEP annotated VCF address (.vcf, .vcf.gz)
+
+    Yields:
+        list: var_infos (make_vep_var_infos() 와 같은 형식)
+    """
+
+    intern = sys.intern
+    csq_col_idxs = None
+    with open_text_file(filename) as infile:
+        for line in infile:
+            if line.startswith("##INFO=<ID=CSQ,"):
+                csq_fields = parse_vep_csq_header(line)
+                csq_col_idxs = [csq_fields.index(col) for col in VEP_CSQ_COLUMNS]
+                extra_idxs = [
+                    csq_fields.index(key) if key in csq_fields else None
+                    for key in VEP_EXTRA_KEYS
+                ]
+            if line.startswith("#"):
+                if line.startswith("#CHROM") and csq_col_idxs is None:
+                    raise ValueError(f"no VEP CSQ header (##INFO=<ID=CSQ>): {filename}")
+                continue
+
+            # CHROM POS ID REF ALT QUAL FILTER INFO (FORMAT, samples)
+            chrom, pos, var_id, ref, alt, _, _, info = line.rstrip("\n").split("\t")[:8]
+            csq = parse_vep_extra(info, ["CSQ"])["CSQ"]
+            if not csq:
+                continue
+            chrom = intern(chrom)
+            allele_dic = make_vep_allele_dic(int(pos), ref, alt.split(","))
+
+            for csq_entry in csq.split(","):
+                csq_values = csq_entry.split("|")
+                (
+                    allele,
+                    gene,
+                    feature,
+                    consequence,
+                    cDNA_pos,
+                    CDS_pos,
+                    protein_pos,
+                    AA_change,
+                    codon_change,
+                ) = [csq_values[idx] or "-" for idx in csq_col_idxs]
+                symbol, strand, impact, hgnc_id, canonical, mane_select = [
+                    "" if idx is None else csq_values[idx] for idx in extra_idxs
+                ]
+                var_alt, location = allele_dic.get(allele, (allele, [int(pos)]))
+
+                yield [
+                    var_id if var_id != "." else f"{chrom}-{pos}-{ref}-{var_alt}",
+                    chrom,
+                    list(location),
+                    intern(gene),
+                    feature,
+                    intern(consequence.replace("&", ",")),
+                    cDNA_pos,
+                    CDS_pos,
+                    protein_pos,
+                    AA_change,
+                    codon_change,
+                    intern(symbol),
+                    intern(strand),
+                    None,  # revel
+                    0,  # gnomad_ac
+                    0,  # gnomad_an
+                    None,  # gnomad_af
+                    intern(impact),
+                    hgnc_id,
+                    get_canonical_flag(canonical, mane_select),
+                ]
+
+
+dbparser = sys.modules[__name__]
@@ -0,0 +1,243 @@
+# module for on-disk cache of parsed databases test
+
+import contextlib
+import gc
+import hashlib
+import os
+import pickle
+import threading
+
+
+def count_lines(filename: str) -> dict:
+    count_lines.calls += 1
+    with open(filename) as infile:
+        return {"n_lines": len(infile.readlines())}
+
+
+def test_load_or_parse(tmp_path):
+
+    db_file = tmp_path / "disease.txt"
+    db_file.write_text("#geneSymbol\ttitle\nTBCE\tCiliary dyskinesia\n")
+    count_lines.calls = 0
+
+    # 처음에는 parsing 후 cache 저장, 두번째부터는 cache 사용
+    assert {"n_lines": 2} == load_or_parse(str(db_file), count_lines)
+    assert {"n_lines": 2} == load_or_parse(str(db_file), count_lines)
+    assert 1 == count_lines.calls
+    assert 1 == len(list(tmp_path.glob("*" + CACHE_SUFFIX)))
+
+
+def test_load_or_parse_invalidate(tmp_path):
+
+    db_file = tmp_path / "disease.txt"
+    db_file.write_text("#geneSymbol\ttitle\n")
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    count_lines.calls = 0
+
+    assert {"n_lines": 1} == load_or_parse(
+        str(db_file), count_lines, str(cache_dir)
+    )
+    # 원본 파일이 바뀌면 다시 parsing
+    db_file.write_text("#geneSymbol\ttitle\nTBCE\tCiliary dyskinesia\n")
+    assert {"n_lines": 2} == load_or_parse(
+        str(db_file), count_lines, str(cache_dir)
+    )
+    assert 2 == count_lines.calls
+    assert 1 == len(list(cache_dir.glob("*" + CACHE_SUFFIX)))
+
+
+def test_load_cache_corrupted(tmp_path):
+
+    cache_file = tmp_path / ("disease.txt" + CACHE_SUFFIX)
+    cache_file.write_bytes(b"not a pickle")
+
+    assert (False, None) == load_cache(str(cache_file), (1, "disease.txt"))
+
+
+def test_save_cache_unpicklable(tmp_path):
+
+    cache_file = str(tmp_path / "vep.dbcache")
+    # pickle 할 수 없는 data는 저장하지 않고, 임시 파일도 남기지 않는다.
+    save_cache(cache_file, ("key",), lambda: None)
+    assert [] == list(tmp_path.iterdir())
+    assert (False, None) == load_cache(cache_file, ("key",))
+
+
+######################################################################
+
+# cache 형식이나 parser 결과의 형식이 바뀌면 올려서, 이전 cache를 무효화한다.
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".dbcache"
+
+
+def make_cache_key(filename: str, tag: str) -> tuple:
+    """_summary_
+    Note:
+        원본 파일의 절대 경로, 수정 시간(mtime), 크기와 parser 이름으로 cache key를 만든다.
+        원본 파일이 바뀌면 mtime 또는 크기가 달라지므로, 이전 cache는 자동으로 사용되지 않는다.
+
+    Args:
+        filename (str): 원본 database file address
+        tag (str): parser 이름 (ACMG.helper.dbparser.parse_clinvar_db)
+
+    Returns:
+        tuple: (version, abs_path, mtime_ns, size, tag)
+    """
+
+    file_stat = os.stat(filename)
+
+    return (
+        CACHE_VERSION,
+        os.path.abspath(filename),
+        file_stat.st_mtime_ns,
+        file_stat.st_size,
+        tag,
+    )
+
+
+def get_cache_file(filename: str, tag: str, cache_dir: str = None) -> str:
+    """_summary_
+    Note:
+        cache 파일의 주소를 반환한다. cache_dir이 없으면 원본 파일과 같은 directory에 저장한다.
+        같은 파일을 여러 parser로 읽을 수 있으므로, 파일 이름에 (경로, parser)의 hash를 붙인다.
+
+    Args:
+        filename (str): 원본 database file address
+        tag (str): parser 이름
+        cache_dir (str): cache를 저장할 directory. None 이면 원본 파일의 directory
+
+    Returns:
+        str: /data/projects/ACMG/database/clinvar_parsed_single.txt.1a2b3c4d5e6f.dbcache
+    """
+
+    abs_path = os.path.abspath(filename)
+    digest = hashlib.sha1(f"{abs_path}\t{tag}".encode()).hexdigest()[:12]
+    if cache_dir is None:
+        cache_dir = os.path.dirname(abs_path)
+
+    return os.path.join(
+        cache_dir, f"{os.path.basename(abs_path)}.{digest}{CACHE_SUFFIX}"
+    )
+
+
+# gc_paused() 가 GC를 멈춘 횟수와, 처음 멈추기 전의 GC 상태 (여러 thread가 함께 사용한다)
+_GC_PAUSE_LOCK = threading.Lock()
+_gc_pause_count = 0
+_gc_was_enabled = False
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """_summary_
+    Note:
+        수백만 개의 객체를 한꺼번에 만드는 동안 순환 참조 GC를 멈춘다.
+        GC 상태는 process 전체에서 하나이므로, 여러 thread (pipeline stage)가 동시에 사용해도
+        처음 들어올 때만 GC를 멈추고 마지막으로 나갈 때 원래 상태로 되돌린다.
+    """
+
+    global _gc_pause_count, _gc_was_enabled
+
+    with _GC_PAUSE_LOCK:
+        if _gc_pause_count == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pause_count += 1
+    try:
+        yield
+    finally:
+        with _GC_PAUSE_LOCK:
+            _gc_pause_count -= 1
+            if _gc_pause_count == 0 and _gc_was_enabled:
+                gc.enable()
+
+
+def load_cache(cache_file: str, cache_key: tuple) -> tuple:
+    """_summary_
+    Note:
+        cache 파일을 읽어서, 저장된 key가 현재 key와 같으면 (True, data)를 반환한다. cache가 없거나,
+        key가 다르거나(원본 변경, 버전 변경), 파일이 손상된 경우에는 (False, None)을 반환한다.
+        큰 dictionary를 unpickle 할 때는 garbage collector가 불필요하게 자주 실행되므로 잠시 끈다.
+
+    Args:
+        cache_file (str): cache file address
+        cache_key (tuple): make_cache_key()의 결과
+
+    Returns:
+        tuple: (hit(bool), data)
+    """
+
+    if not os.path.exists(cache_file):
+        return (False, None)
+
+    try:
+        with gc_paused(), open(cache_file, "rb") as infile:
+            if pickle.load(infile) != cache_key:
+                return (False, None)
+            return (True, pickle.load(infile))
+    except Exception:  # 손상된 cache (EOFError, UnpicklingError 등)
+        return (False, None)
+
+
+def save_cache(cache_file: str, cache_key: tuple, data: object):
+    """_summary_
+    Note:
+        cache key와 data를 차례로 pickle 하여 저장한다. 여러 환자를 동시에 분석하는 경우에도 손상된
+        cache를 읽지 않도록, 임시 파일에 쓴 뒤 이름을 바꾼다(os.replace). 저장할 수 없는 경우
+        (권한, pickle 할 수 없는 data 등)에는 cache 없이 진행한다.
+
+    Args:
+        cache_file (str): cache file address
+        cache_key (tuple): make_cache_key()의 결과
+        data (object): parser 결과
+    """
+
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, "wb") as outfile:
+            pickle.dump(cache_key, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except (OSError, pickle.PicklingError, TypeError, AttributeError):
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def load_or_parse(
+    filename: str, parse_func: object, cache_dir: str = None, tag: str = None
+) -> object:
+    """_summary_
+    Note:
+        database 파일을 parse_func로 parsing 한 결과를 cache에 저장해두고, 다음 실행부터는 text를 다시
+        parsing 하지 않고 cache를 읽어서 반환한다. 원본 파일의 경로, mtime, 크기 중 하나라도 바뀌면
+        다시 parsing 하여 cache를 갱신한다.
+
+    Args:
+        filename (str): database file address
+        parse_func (object): filename 하나를 인자로 받는 parser (dbparser.parse_clinvar_db 등)
+        cache_dir (str): cache를 저장할 directory. None 이면 원본 파일의 directory
+        tag (str): cache 이름. None 이면 parse_func의 이름을 사용한다. (lambda 등 이름으로 구분할 수
+            없는 함수를 사용하는 경우 지정)
+
+    Returns:
+        object: parse_func(filename)의 결과
+
+    Examples:
+        >>> clinvar_db_dic, clinvar_col2idx = dbcache.load_or_parse(
+                CLINVAR_DB, dbparser.parse_clinvar_db
+            )
+    """
+
+    if tag is None:
+        tag = f"{parse_func.__module__}.{parse_func.__qualname__}"
+    cache_key = make_cache_key(filename, tag)
+    cache_file = get_cache_file(filename, tag, cache_dir)
+
+    hit, data = load_cache(cache_file, cache_key)
+    if hit:
+        return data
+
+    data = parse_func(filename)
+    save_cache(cache_file, cache_key, data)
+
+    return data
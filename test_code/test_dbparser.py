@@ -1,8 +1,17 @@
 # module for dasebase parsing test
 
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import gc
 import gzip
+import io
+import os
 import pytest, mock
+import struct
+import sys
+import threading
+import zlib
 
 
 @mock.patch(
@@ -18,7 +27,7 @@ import pytest, mock
         "1	865738	1-865738-A-G	A	G	2970.77	PASS	AC=1;AF=0.5;AN=2;BaseQRankSum=0.777;ClippingRankSum=0;DP=237;ExcessHet=3.0103;FS=3.944;MLEAC=1;MLEAF=0.5;MQ=60;MQRankSum=0;QD=12.59;ReadPosRankSum=-0.25;SOR=0.971;set=variant;SpliceAI=G|SAMD11|0.00|0.00|0.00|0.00|-8|2|-22|-50,G|AL645608.1|0.00|0.00|0.00|0.00|-7|-19|-17|-41	GT:AD:DP:GQ:PL	0/1:131,105:236:99:2999,0,3791\n"
         "7	135347239	7-135347239-G-GC	G	GC	2201.73	PASS	AC=1;AF=0.5;AN=2;DP=89;ExcessHet=3.0103;FS=0;MLEAC=1;MLEAF=0.5;MQ=60;QD=26.21;SOR=1.139;set=variant2;OLD_MULTIALLELIC=7:135347239:GC/G/GCC;OLD_CLUMPED=7:135347239:GC/GCC	GT:AD:DP:GQ:PL	./1:0,53:84:99:2239,924,975\n"
         "1	111436857	1-111436857-TC-GT	TC	GT	1495.77	PASS	AC=2;AF=1;AN=2;DP=34;ExcessHet=3.0103;FS=0;MLEAC=2;MLEAF=1;MQ=60;QD=23.93;SOR=2.584;set=variant;SpliceAI=GT|CD53|.|.|.|.|.|.|.|.	GT:AD:DP:GQ:PGT:PID:PL	1/1:0,34:34:99:1|1:111436857_T_G:1524,102,0\n"
-    ),
+    ).encode(),
 )
 def test_parse_spliceai_db(mock_open):
 
@@ -139,7 +148,7 @@ def test_make_spliceai_var_info_dic(row, expected):
         "85346099	NM_016341.4(PLCE1):c.3346C>T (p.Arg1116Ter) AND Nephrotic syndrome, type 3	RCV000002437	2012-08-13	2022-02-19	2006-12-01	no assertion criteria provided	0	Pathogenic	-	germline	-	34436835::17086182	-	-	Variant	VCV000002346	single nucleotide variant	17385	NM_016341.4:c.3346C>T:nonsense::NM_001165979.2:c.2422C>T:nonsense::NM_001288989.2:c.3346C>T:nonsense	NM_016341.4:c.3346C>T::NM_001288989.2:c.3346C>T::NM_001165979.2:c.2422C>T	NP_057425.3:p.Arg1116Ter::NP_001159451.1:p.Arg808Ter::NP_001275918.1:p.Arg1116Ter	NC_000010.11:g.94254256C>T::NG_015799.1:g.265268C>T	NC_000010.10:g.96014013C>T	R808*::R1116*	GRCh38	10	94254256	94254256	94254256	C	T	GRCh37	10	96014013	96014013	96014013	C	T	-	-	-	-	-	-	-	51196	PLCE1	-	rs121912602	608414.0003	Orphanet:656::MedGen:C1853124::Genetic Alliance:Nephrotic+syndrome%2C+type+3/8988::OMIM:610725::MONDO:MONDO:0012546	Nephrotic syndrome, type 3	-	SCV000022595	Pathogenic	no assertion criteria provided	17086182	OMIM	2006-12-01	2016-04-26	PLCE1	pathogenic	-	GRCh38	10	94254256	C	T	GRCh37	10	96014013	C	T	10-94254256-C-T	10-96014013-C-T\n"
         "85346098	NM_016341.4(PLCE1):c.1477C>T (p.Arg493Ter) AND Nephrotic syndrome, type 3	RCV000002436	2012-08-13	2022-02-19	2006-12-01	no assertion criteria provided	0	Pathogenic	-	germline	-	34436835::17086182	-	-	Variant	VCV000002345	single nucleotide variant	17384	NM_001165979.2:c.553C>T:nonsense::NM_001288989.2:c.1477C>T:nonsense::NM_016341.4:c.1477C>T:nonsense	NM_001165979.2:c.553C>T::NM_001288989.2:c.1477C>T::NM_016341.4:c.1477C>T	NP_001275918.1:p.Arg493Ter::NP_057425.3:p.Arg493Ter::NP_001159451.1:p.Arg185Ter	NC_000010.11:g.94132444C>T::NG_015799.1:g.143456C>T	NC_000010.10:g.95892201C>T	R493*::R185*	GRCh38	10	94132444	94132444	94132444	C	T	GRCh37	10	95892201	95892201	95892201	C	T	-	-	-	-	-	-	-	51196	PLCE1	-	rs121912601	608414.0002	Orphanet:656::MedGen:C1853124::Genetic Alliance:Nephrotic+syndrome%2C+type+3/8988::OMIM:610725::MONDO:MONDO:0012546	Nephrotic syndrome, type 3	-	SCV000022594	Pathogenic	no assertion criteria provided	17086182	OMIM	2006-12-01	2016-04-26	PLCE1	pathogenic	-	GRCh38	10	94132444	C	T	GRCh37	10	95892201	C	T	10-94132444-C-T	10-95892201-C-T\n"
         "85401547	NM_004826.4(ECEL1):c.2278T>C (p.Cys760Arg) AND Distal arthrogryposis type 5D	RCV000087050	2014-02-24	2022-02-19	2019-07-12	no assertion criteria provided	0	Pathogenic/Likely pathogenic	-	germline	-	23236030::2323603	-	-	Variant	VCV000100650	single nucleotide variant	106522	NM_001290787.2:c.2272T>C:missense variant::NM_004826.4:c.2278T>C:missense variant	NM_004826.4:c.2278T>C::NM_001290787.2:c.2272T>C	O95672:p.Cys760Arg::NP_001277716.1:p.Cys758Arg::NP_004817.2:p.Cys760Arg	NG_034065.1:g.12657T>C::NC_000002.12:g.232480203A>G	NC_000002.11:g.233344913A>G::NM_004826.2:c.2278T>C	C758R::C760R	GRCh38	2	232480203	232480203	232480203	A	G	GRCh37	2	233344913	233344913	233344913	A	G	-	-	-	-	-	-	-	9427	ECEL1	O95672#VAR_069995	rs587777129	605896.0007	OMIM:615065::MedGen:C3554415::MONDO:MONDO:0014028::Office of Rare Diseases:13059::Orphanet:329457	Distal arthrogryposis type 5D	-	SCV000119864||SCV002024449	Pathogenic||Likely pathogenic	no assertion criteria provided||no assertion criteria provided	23236030||-	OMIM||PerkinElmer Genomics	2013-04-15||2019-07-12	2015-06-11||2021-11-19	ECEL1||-	pathogenic::likely pathogenic	-	GRCh38	2	232480203	A	G	GRCh37	2	233344913	A	G	2-232480203-A-G	2-233344913-A-G\n"
-    ),
+    ).encode(),
 )
 def test_parse_clinvar_db(mock_open):
 
@@ -379,6 +388,39 @@ def test_make_clinvar_gene_info_dic(row, expected):
     assert expected == make_clinvar_gene_info_dic(row, f_col2idx)
 
 
+def test_make_gene_mechanism_dic():
+
+    clinvar_col2idx = {"pathogenicity": 0, "consequence_dic": 1, "aa_change": 2}
+    clinvar_db_dic = {
+        "BRCA2": {
+            "13-32921028-CTTTCGG-C": ["Pathogenic", {"splice donor variant": 1}, "-"],
+            "13-32950906-C-A": ["Pathogenic", {"nonsense": 2, "intron variant": 1}, "-"],
+            "13-32950910-C-T": ["Benign", {"missense variant": 1}, "-"],
+        },
+        "OAT": {
+            "10-126086520-C-G": ["Pathogenic", {"missense variant": 8, "nonsense": 1}, "-"],
+            "10-126086599-T-A": ["Likely pathogenic", {"missense variant": 1}, "-"],
+            "10-126086600-T-A": ["Pathogenic", {"intron variant": 1}, "-"],
+        },
+        "PLCE1": {
+            "10-96014013-C-T": ["Pathogenic", {"missense variant": 1}, "-"],
+            "10-95892201-C-T": ["Uncertain significance", {"missense variant": 3}, "-"],
+        },
+    }
+    expected = {
+        "BRCA2": [2, 0, 2, "null variant"],
+        "OAT": [3, 2, 0, "missense variant"],
+        "PLCE1": [1, 1, 0, ""],
+    }
+
+    gene_mechanism_dic, gene_mechanism_col2idx = make_gene_mechanism_dic(
+        clinvar_db_dic, clinvar_col2idx
+    )
+
+    assert expected == gene_mechanism_dic
+    assert 3 == gene_mechanism_col2idx["mechanism"]
+
+
 @mock.patch(
     "builtins.open",
     new_callable=mock.mock_open,
@@ -388,7 +430,7 @@ def test_make_clinvar_gene_info_dic(row, expected):
         "603554	179615	-	-	5896	ENSG00000166349	9831	Omenn syndrome	OMENN SYNDROME	RAG1	Autosomal recessive	OMIM::CGD::HPO	Pediatric	CGD	-	-	HP:0002240||HP:0001880||HP:0000007||HP:0001873||HP:0001744||HP:0001903||HP:0002716||HP:0001596||HP:0002293||HP:0001019||HP:0002014||HP:0003075||HP:0003212||HP:0001508||HP:0002090||HP:0001072||HP:0005365||HP:0004324||HP:0002028||HP:0200034||HP:0001425||HP:0005374||HP:0011123||HP:0008940||HP:0002665||HP:0000100||HP:0100806||HP:0001945||HP:0031273||HP:0005871||HP:0004385||HP:0001433||HP:0008873||HP:0000988||HP:0010976||HP:0002718||HP:0000778||HP:0004429||HP:0002841	Hepatomegaly||Eosinophilia||Autosomal recessive inheritance||Thrombocytopenia||Splenomegaly||Anemia||Lymphadenopathy||Alopecia||Alopecia of scalp||Erythroderma||Diarrhea||Hypoproteinemia||Increased circulating IgE level||Failure to thrive||Pneumonia||Thickened skin||Severe B lymphocytopenia||Increased body weight||Chronic diarrhea||Papule||Heterogeneous||Cellular immunodeficiency||Inflammatory abnormality of the skin||Generalized lymphadenopathy||Lymphoma||Nephrotic syndrome||Sepsis||Fever||Shock||Metaphyseal chondrodysplasia||Protracted diarrhea||Hepatosplenomegaly||Disproportionate short-limb short stature||Skin rash||B lymphocytopenia||Recurrent bacterial infections||Hypoplasia of the thymus||Recurrent viral infections||Recurrent fungal infections	OMIM::MANUAL::HPO::JAY_O||OMIM::MANUAL::HPO::JAY_O||OMIM::HPO||OMIM::HPO::JAY_O||OMIM::MANUAL::HPO::JAY_O||OMIM::MANUAL::HPO::JAY_O||OMIM::MANUAL::HPO::JAY_O||OMIM::MANUAL::HPO::JAY_O||OMIM::JAY_O||OMIM::MANUAL::HPO::JAY_O||OMIM::HPO::JAY_O||OMIM::HPO::JAY_O||OMIM::MANUAL::JAY_O||OMIM::MANUAL::HPO::JAY_O||OMIM::HPO::JAY_O||OMIM::MANUAL::HPO::JAY_O||OMIM::HPO::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||HPO||HPO::JAY_O||HPO::JAY_O||HPO::JAY_O||HPO::JAY_O	#	-	2248640::4115568::15696198::8450050::6243521::11313270::2010548::15731174::5809843::6326896::7608815::3879354::3679186::17476359::17476358::14328107::7050708::8776375::1986108::9630231	RAG1	OMIM::MANUAL::CGD\n"
         "-	608843	-	-	114990	ENSG00000168140	18517	-	-	VASN	-	-	-	-	-	-	-	-	-	*	-	-	VASN	OMIM\n"
         "136760	606014	ORPHA:391474	ALX3	257	ENSG00000156150	449	Frontonasal dysplasia 1	FRONTONASAL DYSPLASIA 1; FND1	ALX3	Autosomal recessive||Sporadic	OMIM::ORPHA::CGD::HPO||HPO	Neonatal	ORPHA	Unknown__Worldwide	ORPHA	HP:0006992||HP:0001156||HP:0030084||HP:0000369||HP:0040019||HP:0000286||HP:0006931||HP:0000431||HP:0007541||HP:0001274||HP:0000568||HP:0000518||HP:0005258||HP:0030024||HP:0000384||HP:0000589||HP:0009099||HP:0000327||HP:0001249||HP:0001636||HP:0002738||HP:0000349||HP:0000007||HP:0000508||HP:0000405||HP:0012385||HP:0000316||HP:0000161||HP:0004423||HP:0000175||HP:0000368||HP:0000486||HP:0000612||HP:0002084||HP:0002650||HP:0002938||HP:0004112||HP:0007370||HP:0008591||HP:0010297||HP:0011817||HP:0025247||HP:0100490||HP:0000873||HP:0040075||HP:0000846||HP:0000365||HP:0001627||HP:0000445||HP:0000463||HP:0002000||HP:0002006||HP:0025514||HP:0010761||HP:0012032||HP:0002282||HP:0001425||HP:0001426||HP:0001012||HP:0001566||HP:0011803||HP:0003745||HP:0000006||HP:0000969||HP:0000456||HP:0000455||HP:0100259||HP:0000821||HP:0000824||HP:0000202||HP:0001004||HP:0030854||HP:0000343||HP:0000527||HP:0100629||HP:0009466||HP:0001162||HP:0009473	Anterior basal encephalocele||Brachydactyly||Clinodactyly||Low-set ears||Finger clinodactyly||Epicanthus||Pericallosal lipoma||Wide nasal bridge||Frontal cutaneous lipoma||Agenesis of corpus callosum||Microphthalmia||Cataract||Pectoral muscle hypoplasia/aplasia||Pretragal ectopia||Preauricular skin tag||Coloboma||Median cleft palate||Hypoplasia of the maxilla||Intellectual disability||Tetralogy of Fallot||Hypoplastic frontal sinuses||Widow's peak||Autosomal recessive inheritance||Ptosis||Conductive hearing impairment||Camptodactyly||Hypertelorism||Median cleft lip||Cranium bifidum occultum||Cleft palate||Low-set, posteriorly rotated ears||Strabismus||Iris coloboma||Encephalocele||Scoliosis||Lumbar hyperlordosis||Midline nasal groove||Aplasia/Hypoplasia of the corpus callosum||Congenital conductive hearing impairment||Bifid tongue||Basal encephalocele||Dermoid cyst||Camptodactyly of finger||Diabetes insipidus||Hypopituitarism||Adrenal insufficiency||Hearing impairment||Abnormal heart morphology||Wide nose||Anteverted nares||Short columella||Facial cleft||Morning glory anomaly||Broad columella||Lipoma||Gray matter heterotopia||Heterogeneous||Multifactorial inheritance||Multiple lipomas||Widely-spaced maxillary central incisors||Bifid nose||Sporadic||Autosomal dominant inheritance||Edema||Bifid nasal tip||Broad nasal tip||Postaxial polydactyly||Hypothyroidism||Decreased response to growth hormone stimulation test||Oral cleft||Lymphedema||Scleral staphyloma||Long philtrum||Long eyelashes||Midline facial cleft||Radial deviation of finger||Postaxial hand polydactyly||Joint contracture of the hand	OMIM::HPO::JAY_O||OMIM::ORPHA::HPO::JAY_O||OMIM::HPO::JAY_O||OMIM::HPO::JAY_O||OMIM::ORPHA::JAY_O||OMIM::ORPHA::HPO::JAY_O||OMIM::ORPHA::HPO::JAY_O||OMIM::MANUAL::HPO::JAY_O||OMIM::HPO::JAY_O||OMIM::MANUAL::HPO::JAY_O||OMIM::ORPHA::HPO::JAY_O||OMIM::ORPHA::HPO::JAY_O||OMIM::HPO::JAY_O||OMIM::JAY_O||OMIM::ORPHA::HPO::JAY_O||OMIM::HPO::JAY_O||OMIM::HPO::JAY_O||OMIM::ORPHA::HPO::JAY_O||OMIM::MANUAL::HPO::JAY_O||OMIM::MANUAL::HPO::JAY_O||OMIM::ORPHA::HPO::JAY_O||OMIM::ORPHA::MANUAL::HPO::JAY_O||OMIM::MANUAL::HPO||OMIM::ORPHA::MANUAL::HPO::JAY_O||OMIM::MANUAL::HPO::JAY_O||OMIM::HPO::JAY_O||OMIM::ORPHA::MANUAL::HPO::JAY_O||OMIM::MANUAL::HPO::JAY_O||OMIM::ORPHA::MANUAL::HPO::JAY_O||ORPHA||ORPHA||ORPHA||ORPHA||ORPHA::MANUAL::JAY_O||ORPHA||ORPHA||ORPHA||ORPHA||ORPHA||ORPHA||ORPHA||ORPHA||ORPHA||ORPHA::MANUAL::JAY_O||ORPHA||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::HPO::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL||MANUAL||MANUAL::JAY_O||MANUAL::HPO::JAY_O||MANUAL::HPO::JAY_O||MANUAL::HPO||MANUAL||MANUAL::JAY_O||MANUAL::HPO::JAY_O||MANUAL::HPO::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||MANUAL::JAY_O||HPO::JAY_O||HPO::JAY_O||HPO::JAY_O	#	-	20106874::3560167::13206986::8362915::19365836::9689987::17963218::8741108::15127764::2738904::15384079::7363499::10564879::5444583::2840620::7762593::4003439::19409524::17955515	ALX3::FND1	OMIM::ORPHA::MANUAL::CGD\n"
-    ),
+    ).encode(),
 )
 def test_parse_disease_db(mock_open):
 
@@ -860,7 +902,7 @@ def test_make_disease_info_list(row, expected):
         "  463   1.3  0.6  1.7  chr1        10001   10468 (249240153) +  (TAACCC)n      Simple_repeat            1  463    (0)      1\n"
         " 3612  11.4 21.5  1.3  chr1        10469   11447 (249239174) C  TAR1           Satellite/telo       (399) 1712    483      2\n"
         " 2597  18.4  2.7  3.3  chr4      184488284 184488398 (6665878) C  MLT2B2         LTR/ERVL               (0)  515    402 1297781\n"
-    ),
+    ).encode(),
 )
 def test_parse_repeatmasker_db(mock_open):
 
@@ -872,6 +914,237 @@ def test_parse_repeatmasker_db(mock_open):
     assert expected == parse_repeatmasker_db("some_path.fa.out")
 
 
+@pytest.mark.parametrize(
+    "extra, expected",
+    [
+        (
+            "REF_ALLELE=G;IMPACT=MODIFIER;STRAND=1;SYMBOL=SAMD11;SYMBOL_SOURCE=HGNC;HGNC_ID=28706",
+            {"SYMBOL": "SAMD11", "STRAND": "1", "IMPACT": "MODIFIER", "HGNC_ID": "28706", "CANONICAL": "", "MANE_SELECT": ""},
+        ),
+        (
+            "IMPACT=MODIFIER;STRAND=-1;SYMBOL=AL645608.1;SYMBOL_SOURCE=Clone_based_ensembl_gene",
+            {"SYMBOL": "AL645608.1", "STRAND": "-1", "IMPACT": "MODIFIER", "HGNC_ID": "", "CANONICAL": "", "MANE_SELECT": ""},
+        ),
+        (
+            "SYMBOL_SOURCE=HGNC;HGNC_ID=5;SYMBOL=BRCA2;CANONICAL=YES;MANE_SELECT=NM_000059.4",
+            {"SYMBOL": "BRCA2", "STRAND": "", "IMPACT": "", "HGNC_ID": "5", "CANONICAL": "YES", "MANE_SELECT": "NM_000059.4"},
+        ),
+        ("-", {"SYMBOL": "", "STRAND": "", "IMPACT": "", "HGNC_ID": "", "CANONICAL": "", "MANE_SELECT": ""}),
+    ],
+)
+def test_parse_vep_extra(extra, expected):
+
+    assert expected == parse_vep_extra(extra)
+
+
+@pytest.mark.parametrize(
+    "canonical, mane_select, expected",
+    [("YES", "NM_000059.4", "MANE"), ("", "NM_000059.4", "MANE"), ("YES", "", "YES"), ("YES", "-", "YES"), ("", "", "")],
+)
+def test_get_canonical_flag(canonical, mane_select, expected):
+
+    assert expected == get_canonical_flag(canonical, mane_select)
+
+
+def test_parse_vep_file_gz(tmp_path):
+
+    vep_file = tmp_path / "proband.txt.gz"
+    with gzip.open(vep_file, "wt") as outfile:
+        outfile.write(
+            "## ENSEMBL VARIANT EFFECT PREDICTOR v104.3\n"
+            "#Uploaded_variation\tLocation\tAllele\tGene\tFeature\tFeature_type\tConsequence\tcDNA_position\tCDS_position\tProtein_position\tAmino_acids\tCodons\tExisting_variation\tExtra\n"
+            "X-44202890-G-GC\tX:44202890-44202891\tC\tENSG00000183690\tENST00000420999\tTranscript\t5_prime_UTR_variant\t28-29/2464\t-\t-\t-\t-\t-\tREF_ALLELE=-;IMPACT=MODIFIER;STRAND=-1;SYMBOL=EFHC2;SYMBOL_SOURCE=HGNC;HGNC_ID=26233;CANONICAL=YES\n"
+        )
+
+    assert [
+        [
+            "X-44202890-G-GC", "X", [44202890, 44202891], "ENSG00000183690", "ENST00000420999",
+            "5_prime_UTR_variant", "28-29/2464", "-", "-", "-", "-", "EFHC2", "-1",
+            None, 0, 0, None, "MODIFIER", "26233", "YES",
+        ]
+    ] == list(parse_vep_file(str(vep_file)))
+    assert gc.isenabled()
+
+
+def test_parse_vep_csq_header():
+
+    line = (
+        '##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence annotations from Ensembl VEP. '
+        'Format: Allele|Consequence|IMPACT|SYMBOL">\n'
+    )
+
+    assert ["Allele", "Consequence", "IMPACT", "SYMBOL"] == parse_vep_csq_header(line)
+
+
+@pytest.mark.parametrize(
+    "pos, ref, alts, expected",
+    [
+        (866319, "G", ["A"], {"A": ("A", [866319])}),
+        (44202890, "G", ["GC"], {"C": ("GC", [44202890, 44202891])}),
+        (32921028, "CTTTCGG", ["C"], {"-": ("C", [32921029, 32921034])}),
+        (100, "AT", ["GC"], {"GC": ("GC", [100, 101])}),
+        (100, "A", ["AT", "G"], {"AT": ("AT", [100]), "G": ("G", [100])}),
+        (
+            100,
+            "AT",
+            ["A", "ATT"],
+            {"-": ("A", [101]), "TT": ("ATT", [101])},
+        ),
+    ],
+)
+def test_make_vep_allele_dic(pos, ref, alts, expected):
+
+    assert expected == make_vep_allele_dic(pos, ref, alts)
+
+
+def test_parse_vep_vcf_file(tmp_path):
+
+    vcf_file = tmp_path / "proband.vcf.gz"
+    with gzip.open(vcf_file, "wt") as outfile:
+        outfile.write(
+            "##fileformat=VCFv4.2\n"
+            '##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence annotations from Ensembl VEP. '
+            "Format: Allele|Consequence|IMPACT|SYMBOL|Gene|Feature_type|Feature|cDNA_position|CDS_position|"
+            'Protein_position|Amino_acids|Codons|STRAND|HGNC_ID|CANONICAL|MANE_SELECT">\n'
+            "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tETD21-RWNY\n"
+            "X\t44202890\tX-44202890-G-GC\tG\tGC\t50\tPASS\tDP=7;CSQ="
+            "C|5_prime_UTR_variant|MODIFIER|EFHC2|ENSG00000183690|Transcript|ENST00000420999|28-29/2464|||||-1|26233|YES|,"
+            "C|intron_variant&non_coding_transcript_variant|MODIFIER|EFHC2|ENSG00000183690|Transcript|ENST00000604862||||||-1|26233||"
+            "\tGT\t0/1\n"
+            "13\t32921028\t.\tCTTTCGG\tC\t50\tPASS\tCSQ="
+            "-|frameshift_variant|HIGH|BRCA2|ENSG00000139618|Transcript|ENST00000380152|100-105/11986|50-55/10257|17-19/3418|KE/X|aaGAGa/aa|1|1101|YES|NM_000059.4"
+            "\tGT\t0/1\n"
+            "1\t100\t.\tA\tG\t50\tPASS\tDP=3\tGT\t0/1\n"
+        )
+
+    assert [
+        [
+            "X-44202890-G-GC", "X", [44202890, 44202891], "ENSG00000183690", "ENST00000420999",
+            "5_prime_UTR_variant", "28-29/2464", "-", "-", "-", "-", "EFHC2", "-1",
+            None, 0, 0, None, "MODIFIER", "26233", "YES",
+        ],
+        [
+            "X-44202890-G-GC", "X", [44202890, 44202891], "ENSG00000183690", "ENST00000604862",
+            "intron_variant,non_coding_transcript_variant", "-", "-", "-", "-", "-", "EFHC2", "-1",
+            None, 0, 0, None, "MODIFIER", "26233", "",
+        ],
+        [
+            "13-32921028-CTTTCGG-C", "13", [32921029, 32921034], "ENSG00000139618", "ENST00000380152",
+            "frameshift_variant", "100-105/11986", "50-55/10257", "17-19/3418", "KE/X", "aaGAGa/aa",
+            "BRCA2", "1", None, 0, 0, None, "HIGH", "1101", "MANE",
+        ],
+    ] == list(parse_vep_file(str(vcf_file)))
+
+
+def test_parse_vep_vcf_file_no_csq_header(tmp_path):
+
+    vcf_file = tmp_path / "proband.vcf"
+    vcf_file.write_text(
+        "##fileformat=VCFv4.2\n"
+        "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tETD21-RWNY\n"
+        "1\t100\t.\tA\tG\t50\tPASS\tDP=3\tGT\t0/1\n"
+    )
+
+    with pytest.raises(ValueError, match="no VEP CSQ header"):
+        list(parse_vep_file(str(vcf_file)))
+    assert gc.isenabled()
+
+@pytest.mark.parametrize("chunk_size", [16, 1 << 20])
+def test_record_batch_reader(tmp_path, monkeypatch, chunk_size):
+
+    db_file = tmp_path / "db.txt"
+    db_file.write_text(
+        "##fileformat=VCF\n"
+        "#CHROM\tPOS\tID\tINFO\n"
+        "1\t100\t1-100-A-G\tAC=1;AN=2\n"
+        "\n"
+        "1\t200\t1-200-C-T\tAC=2;AN=2 \r\n"
+        "#CHROM\tID\n"
+        "2\t2-300-G-A"
+    )
+    monkeypatch.setattr(sys.modules[__name__], "READ_CHUNK_SIZE", chunk_size)
+
+    reader = RecordBatchReader(str(db_file), comment="##")
+    rows = []
+    for batch in reader:
+        rows.extend((reader.col2idx["ID"], row) for row in batch)
+    # 두 번째 header 이후의 record는 새 col2idx로 읽는다.
+    assert [
+        (2, ["1", "100", "1-100-A-G", "AC=1;AN=2"]),
+        (2, ["1", "200", "1-200-C-T", "AC=2;AN=2"]),
+        (1, ["2", "2-300-G-A"]),
+    ] == rows
+
+    reader = RecordBatchReader(
+        str(db_file), header=None, comment="#", skip_lines=3, max_split=1, encoding=None
+    )
+    assert [[b"1", b"200\t1-200-C-T\tAC=2;AN=2"], [b"2", b"2-300-G-A"]] == [
+        row for batch in reader for row in batch
+    ]
+    assert gc.isenabled()
+
+
+def test_gc_paused_overlapping():
+
+    # 한 stage가 GC를 되돌리는 사이에 다른 stage가 들어와도, 마지막 stage가 나간 뒤에는 GC가 켜져 있다.
+    first, second = gc_paused(), gc_paused()
+    first.__enter__()
+    second.__enter__()
+    first.__exit__(None, None, None)
+    assert not gc.isenabled()
+    second.__exit__(None, None, None)
+    assert gc.isenabled()
+
+    def pause(_):
+        for _ in range(200):
+            with gc_paused():
+                pass
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(pause, range(8)))
+    assert gc.isenabled()
+
+    gc.disable()
+    try:
+        with gc_paused():
+            pass
+        assert not gc.isenabled()
+    finally:
+        gc.enable()
+
+@pytest.mark.parametrize("threads", [1, 3])
+def test_read_gz_chunks(tmp_path, monkeypatch, threads):
+
+    lines = [f"1\t{pos}\t.\tA\tG\t.\tPASS\tAC=1;AN={pos}\n" for pos in range(3000)]
+    data = "".join(["#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"] + lines)
+    data += "X\t1\t.\tC\tT\t.\tPASS\t" + "A" * 70000 + "\n1\t2"  # block 보다 긴 line, 줄바꿈 없는 끝
+    bgzf_file = tmp_path / "db.vcf.bgz"
+    writer = BgzfWriter(str(bgzf_file))
+    writer.write(data.encode())
+    writer.close()
+    gzip_file = tmp_path / "db.vcf.gz"
+    with gzip.open(gzip_file, "wt") as outfile:
+        outfile.write(data)
+
+    assert is_bgzf_file(str(bgzf_file)) and not is_bgzf_file(str(gzip_file))
+    monkeypatch.setattr(sys.modules[__name__], "GZ_CHUNK_BLOCKS", 2)
+    for filename in [str(bgzf_file), str(gzip_file)]:
+        chunks = list(read_gz_chunks(filename, threads))
+        # 순서가 유지되고, 마지막 chunk를 제외하면 line 경계에서 나뉜다.
+        assert len(chunks) > 2
+        assert data.encode() == b"".join(chunks)
+        assert all(chunk.endswith(b"\n") for chunk in chunks[:-1])
+        assert data.splitlines(keepends=True) == list(read_big_gz_file(filename))
+
+
+def test_inflate_bgzf_block_crc_mismatch():
+
+    block = bytearray(make_bgzf_block(b"1\t100\n"))
+    block[-8] ^= 0xFF  # CRC32
+    with pytest.raises(ValueError):
+        inflate_bgzf_block(bytes(block))
+
+
 ######################################################################
 
 
@@ -898,6 +1171,7 @@ def read_big_gz_file(filename: str) -> str:
     """_summary_
     Note:
         input gz 압축 file의 각 line 정보를 generator 형식으로, 매 호출시 반환한다.
+        압축 해제는 read_gz_chunks()로 chunk 단위로 하고, line 으로 나눈 뒤 line 마다 decode 한다.
 
     Args:
         filename (str): file address
@@ -906,13 +1180,280 @@ def read_big_gz_file(filename: str) -> str:
         line (str): 각 line의 정보를 매 호출 시 string으로 반환
     """
 
-    with gzip.open(filename, "rb") as infile:
-        for line in infile:
-            if not line:
-                break
+    for chunk in read_gz_chunks(filename):
+        for line in io.BytesIO(chunk):
             yield line.decode(encoding="utf-8")
 
 
+def inflate_bgzf_blocks(blocks: list) -> bytes:
+    """BGZF block 들의 압축을 해제하여 하나의 bytes로 반환한다. (thread pool 작업 단위)"""
+
+    return b"".join([tabix.inflate_bgzf_block(block) for block in blocks])
+
+
+def read_gz_data(filename: str, threads: int) -> bytes:
+    """_summary_
+    Note:
+        gz 파일의 압축을 해제한 data를 파일 순서대로 반환한다. line 경계와는 맞지 않는다.
+
+        BGZF (bgzip) 파일은 block 마다 독립적으로 압축되어 있으므로, 압축된 block을 GZ_CHUNK_BLOCKS 개씩
+        순서대로 읽어서 thread pool 에서 압축을 해제한다. 메모리를 제한하기 위해 thread 수의 2배 까지만
+        미리 해제하며, 결과는 제출한 순서대로 반환한다. 일반 gzip 파일은 나눌 수 없으므로 gzip 으로
+        한 번에 크게 읽는다.
+
+    Args:
+        filename (str): gz file address
+        threads (int): 압축 해제 thread 수
+
+    Yields:
+        bytes: 압축을 해제한 data
+    """
+
+    if not tabix.is_bgzf_file(filename):
+        with gzip.open(filename, "rb") as infile:
+            while True:
+                data = infile.read(GZ_CHUNK_BLOCKS * tabix.BGZF_BLOCK_SIZE)
+                if not data:
+                    break
+                yield data
+        return
+
+    with open(filename, "rb") as infile, ThreadPoolExecutor(
+        max_workers=threads
+    ) as executor:
+        pending = deque()
+        while True:
+            blocks = []
+            while len(blocks) < GZ_CHUNK_BLOCKS:
+                block = tabix.read_raw_bgzf_block(infile)
+                if not block:
+                    break
+                blocks.append(block)
+            if blocks:
+                pending.append(executor.submit(inflate_bgzf_blocks, blocks))
+            if pending and (not blocks or len(pending) >= threads * 2):
+                yield pending.popleft().result()
+            elif not blocks:
+                break
+
+
+def read_gz_chunks(filename: str, threads: int = None) -> bytes:
+    """_summary_
+    Note:
+        gz 압축 file을 line 경계로 나눈 chunk (bytes, 여러 line) 단위로 반환한다. BGZF 파일은 여러 thread에서
+        block의 압축을 해제한다 (read_gz_data()). chunk는 파일 순서대로 반환하며, 마지막 chunk를 제외하면
+        항상 줄바꿈으로 끝난다.
+
+    Args:
+        filename (str): gz file address
+        threads (int): 압축 해제 thread 수. None 이면 GZ_READ_THREADS
+
+    Yields:
+        chunk (bytes): 완전한 line 들로 이루어진 data
+    """
+
+    threads = max(1, GZ_READ_THREADS if threads is None else threads)
+
+    return split_line_chunks(read_gz_data(filename, threads))
+
+
+def split_line_chunks(data_iter: object) -> bytes:
+    """_summary_
+    Note:
+        순서대로 주어지는 data를 line 경계에서 다시 나눈다. 각 data의 마지막 줄바꿈 뒤에 남은 부분은
+        다음 data 앞에 붙인다.
+
+    Args:
+        data_iter (object): bytes data iterator (e.g. read_gz_data())
+
+    Yields:
+        chunk (bytes): 완전한 line 들로 이루어진 data. 마지막 chunk는 줄바꿈으로 끝나지 않을 수 있다.
+    """
+
+    rest = b""
+    for data in data_iter:
+        end = data.rfind(b"\n") + 1
+        if not end:  # line이 chunk 보다 긴 경우
+            rest += data
+            continue
+        if rest or end < len(data):
+            yield b"".join([rest, memoryview(data)[:end]])
+        else:
+            yield data
+        rest = data[end:]
+    if rest:
+        yield rest
+
+
+def read_chunks(filename: str) -> bytes:
+    """_summary_
+    Note:
+        file을 line 경계로 나눈 chunk (bytes, 여러 line) 단위로 반환한다. gz (gzip, bgzip) 파일은
+        read_gz_chunks()로 압축을 해제하고, 그 외에는 READ_CHUNK_SIZE 씩 읽는다.
+
+    Args:
+        filename (str): file address
+
+    Yields:
+        chunk (bytes): 완전한 line 들로 이루어진 data
+    """
+
+    if filename.endswith((".gz", ".bgz")):
+        yield from read_gz_chunks(filename)
+        return
+
+    with open(filename, "rb") as infile:
+        yield from split_line_chunks(iter(lambda: infile.read(READ_CHUNK_SIZE), b""))
+
+
+# gc_paused() 가 GC를 멈춘 횟수와, 처음 멈추기 전의 GC 상태 (여러 thread가 함께 사용한다)
+_GC_PAUSE_LOCK = threading.Lock()
+_gc_pause_count = 0
+_gc_was_enabled = False
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """_summary_
+    Note:
+        수백만 개의 객체를 한꺼번에 만드는 동안 순환 참조 GC를 멈춘다.
+        GC 상태는 process 전체에서 하나이므로, 여러 thread (pipeline stage)가 동시에 사용해도
+        처음 들어올 때만 GC를 멈추고 마지막으로 나갈 때 원래 상태로 되돌린다.
+    """
+
+    global _gc_pause_count, _gc_was_enabled
+
+    with _GC_PAUSE_LOCK:
+        if _gc_pause_count == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pause_count += 1
+    try:
+        yield
+    finally:
+        with _GC_PAUSE_LOCK:
+            _gc_pause_count -= 1
+            if _gc_pause_count == 0 and _gc_was_enabled:
+                gc.enable()
+
+
+class RecordBatchReader:
+    """_summary_
+    Note:
+        file을 chunk (read_chunks(), 약 1mb) 단위로 읽어서, 각 line을 delimiter로 나눈 record의 list (batch)를
+        반환하는 reader. 호출하는 쪽에서 line 마다 decode, strip, split, startswith 확인을 반복하지 않고,
+        chunk 마다 list comprehension 한 번으로 record를 만든다. 빈 line은 반환하지 않는다.
+
+        comment로 시작하는 line은 건너뛰고, header로 시작하는 line은 column 이름으로 읽어서 columns,
+        col2idx에 저장한다 (앞뒤의 "#"과 공백은 제거). comment, header line이 있는지는 chunk 마다 한 번에
+        검색하므로, 파일의 앞에만 있는 경우 (VCF, ClinVar 등) 나머지 chunk는 line 별로 확인하지 않는다.
+        파일 중간에 header가 다시 나오면, 그 전까지의 batch를 먼저 반환한 뒤 col2idx를 바꾼다.
+
+    Args:
+        filename (str): file address (.gz, .bgz 는 압축 해제)
+        delimiter (str): column 구분자. None 이면 공백 (str.split())
+        header (str): header line의 시작 문자열. None 이면 header 없음
+        comment (str): 건너뛸 line의 시작 문자열 (header 보다 먼저 확인). None 이면 없음
+        skip_lines (int): 파일의 처음에 건너뛸 line 수
+        max_split (int): record 마다 나눌 최대 횟수 (-1: 모두). 앞의 column만 필요한 경우, 나머지는 마지막
+            값에 남는다.
+        encoding (str): file의 encoding. None 이면 decode 하지 않고 bytes record를 반환한다.
+
+    Examples:
+        >>> reader = RecordBatchReader(SPLICEAI_DB, comment="##")
+            for batch in reader:
+                id_idx = reader.col2idx["ID"]
+                for row in batch:
+                    var_id = row[id_idx]  # 1-985445-G-GT
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        delimiter: str = "\t",
+        header: str = "#",
+        comment: str = None,
+        skip_lines: int = 0,
+        max_split: int = -1,
+        encoding: str = "utf-8",
+    ):
+        self.filename = filename
+        self.delimiter = delimiter
+        self.header = None if header is None else header.encode()
+        self.comment = None if comment is None else comment.encode()
+        self.skip_lines = skip_lines
+        self.max_split = max_split
+        self.encoding = encoding
+        self.columns: list = None
+        self.col2idx: dict = dict()
+
+    def set_header(self, line: bytes):
+        header_line = line.decode(self.encoding or "utf-8").strip().strip("#").strip()
+        self.columns = header_line.split(self.delimiter)
+        self.col2idx = {val: idx for idx, val in enumerate(self.columns)}
+
+    def split_lines(self, lines: object) -> list:
+        """line (bytes) 들을 record로 나눈다. 앞뒤의 공백 (줄바꿈 문자 포함)은 제거한다."""
+
+        encoding, max_split = self.encoding, self.max_split
+        if self.delimiter is None:  # 공백으로 나누면 앞뒤 공백은 자동으로 제거된다.
+            if encoding:
+                rows = [line.decode(encoding).split(None, max_split) for line in lines]
+            else:
+                rows = [line.split(None, max_split) for line in lines]
+            return [row for row in rows if row] if [] in rows else rows
+
+        if encoding:
+            texts = (line.decode(encoding).strip() for line in lines)
+            delimiter = self.delimiter
+        else:
+            texts = (line.strip() for line in lines)
+            delimiter = self.delimiter.encode()
+        return [text.split(delimiter, max_split) for text in texts if text]
+
+    def __iter__(self) -> list:
+        # batch 마다 수만 개의 record (list)가 한꺼번에 만들어지므로, parse_vep_file() 처럼 읽는 동안에는
+        # 순환 참조 GC를 멈추고, 끝나면 원래 상태로 되돌린다.
+        with gc_paused():
+            yield from self.read_batches()
+
+    def read_batches(self) -> list:
+        markers = [marker for marker in (self.comment, self.header) if marker]
+        skip_lines = self.skip_lines
+
+        for chunk in read_chunks(self.filename):
+            # chunk 전체를 line list로 먼저 나누지 않고, line을 하나씩 꺼내 바로 record로 나눈다.
+            # (긴 line은 cache에 남아 있는 동안 나누는 편이 빠르다)
+            lines = io.BytesIO(chunk)
+            while skip_lines and lines.readline():
+                skip_lines -= 1
+            start = lines.tell()
+
+            # comment, header line이 있는 chunk만 line 별로 확인. 첫 글자 (한 글자 검색은 빠름)가 없는
+            # chunk는 줄바꿈 + 시작 문자열을 다시 검색하지 않는다.
+            if any(
+                chunk.startswith(marker, start)
+                or (marker[:1] in chunk and b"\n" + marker in chunk)
+                for marker in markers
+            ):
+                batch_lines = []
+                for line in lines:
+                    if self.comment and line.startswith(self.comment):
+                        continue
+                    if self.header and line.startswith(self.header):
+                        if batch_lines:
+                            yield self.split_lines(batch_lines)
+                            batch_lines = []
+                        self.set_header(line)
+                        continue
+                    batch_lines.append(line)
+                lines = batch_lines
+
+            batch = self.split_lines(lines)
+            if batch:
+                yield batch
+
+
 def parse_spliceai_db(filename: str) -> dict:
     """_summary_
     Note:
@@ -938,23 +1479,17 @@ def parse_spliceai_db(filename: str) -> dict:
             }
     """
 
-    with open(filename) as infile:
+    # "##" meta line은 건너뛰고, "#CHROM" line을 header로 읽는다.
+    reader = RecordBatchReader(filename, comment="##")
 
-        spliceai_db_dic = dict()
-        # {id : { gene_symbol : [predict score]}}
-        for line in infile:
-            if line.startswith("#") and (not line.startswith("##")):
-                f_col2idx = {
-                    val: idx
-                    for idx, val in enumerate(
-                        line.strip("#").strip().split("\t")
-                    )
-                }
-            if not line.startswith("#"):  # variation info
-                row = line.strip().split("\t")
-                var_id = row[f_col2idx["ID"]]  # 1-985445-G-GT
-                predict_info_dic = make_spliceai_var_info_dic(row, f_col2idx)
-                spliceai_db_dic[var_id] = predict_info_dic
+    spliceai_db_dic = dict()
+    # {id : { gene_symbol : [predict score]}}
+    for batch in reader:  # variation info
+        f_col2idx = reader.col2idx
+        id_idx = f_col2idx["ID"]
+        for row in batch:
+            var_id = row[id_idx]  # 1-985445-G-GT
+            spliceai_db_dic[var_id] = make_spliceai_var_info_dic(row, f_col2idx)
 
     return spliceai_db_dic
 
@@ -1039,25 +1574,21 @@ def parse_revel_db(filename: str) -> tuple():  # ok
         "enst_id": 3,
     }
 
-    with open(filename) as infile:
+    reader = RecordBatchReader(filename, delimiter=",", header="chr")
 
-        revel_db_dic = dict()
-        # {id : [proedict score]}
-        for line in infile:
-            if line.startswith("chr"):
-                f_col2idx = {
-                    val: idx for idx, val in enumerate(line.strip().split(","))
-                }
-            else:  # new info
-                row = line.strip().split(",")
-                chr = row[f_col2idx["chr"]]
-                pos = row[f_col2idx["hg19_pos"]]
-                ref = row[f_col2idx["ref"]]
-                alt = row[f_col2idx["alt"]]
-                var_id = f"{chr}-{pos}-{ref}-{alt}"  # 1-985445-G-GT
+    revel_db_dic = dict()
+    # {id : [proedict score]}
+    for batch in reader:  # new info
+        f_col2idx = reader.col2idx
+        for row in batch:
+            chr = row[f_col2idx["chr"]]
+            pos = row[f_col2idx["hg19_pos"]]
+            ref = row[f_col2idx["ref"]]
+            alt = row[f_col2idx["alt"]]
+            var_id = f"{chr}-{pos}-{ref}-{alt}"  # 1-985445-G-GT
 
-                predict_infos: list = make_revel_predict_infos(row, f_col2idx)
-                revel_db_dic[var_id] = predict_infos
+            predict_infos: list = make_revel_predict_infos(row, f_col2idx)
+            revel_db_dic[var_id] = predict_infos
 
     return revel_db_dic, revel_col2idx
 
@@ -1128,27 +1659,18 @@ def parse_clinvar_db(filename: str) -> tuple:
         "aa_change": 2,
     }
 
-    with open(filename) as infile:
+    reader = RecordBatchReader(filename)
 
-        clinvar_db_dic = defaultdict(dict)
-        # { symbol: {var_id: [var_infos]}}
-        for line in infile:
-            if line.startswith("#"):
-                f_col2idx = {
-                    val: idx
-                    for idx, val in enumerate(
-                        line.strip("#").strip().split("\t")
-                    )
-                }
-            else:  # clinvar info
-                row = line.strip().split("\t")
-                gene_symbol = row[f_col2idx["variant:gene:symbol"]]
-                gene_symbols = gene_symbol.split("::")
-                clinvar_var_info_dic = make_clinvar_gene_info_dic(
-                    row, f_col2idx
-                )
-                for g_symbol in gene_symbols:
-                    clinvar_db_dic[g_symbol].update(clinvar_var_info_dic)
+    clinvar_db_dic = defaultdict(dict)
+    # { symbol: {var_id: [var_infos]}}
+    for batch in reader:  # clinvar info
+        f_col2idx = reader.col2idx
+        symbol_idx = f_col2idx["variant:gene:symbol"]
+        for row in batch:
+            gene_symbols = row[symbol_idx].split("::")
+            clinvar_var_info_dic = make_clinvar_gene_info_dic(row, f_col2idx)
+            for g_symbol in gene_symbols:
+                clinvar_db_dic[g_symbol].update(clinvar_var_info_dic)
 
     return clinvar_db_dic, clinvar_col2idx
 
@@ -1194,6 +1716,93 @@ def make_clinvar_gene_info_dic(var_row: list, file_col2idx: dict) -> dict:
     return clinvar_var_info_dic
 
 
+def make_gene_mechanism_dic(clinvar_db_dic: dict, clinvar_col2idx: dict) -> tuple:
+    """_summary_
+    Note:
+        gene_symbol을 기준으로 정리된 ClinVar dictionary에서, 각 유전자에 보고된 pathogenic 변이의 수와
+        그 중 missense, null variant가 주된 결과인 변이의 수를 세어, 유전자의 질병 원인 메커니즘을 미리
+        계산해둔다. pp2bp1, pvs1 에서 변이(transcript)마다 같은 유전자의 ClinVar 변이를 다시 세지 않고,
+        이 table에서 바로 찾는다. (기준: pp2bp1.check_gene_pathogenic_mechanism())
+
+        <병의 원인 판단 기준>
+        - Missense: pathogenic missense variant 2개 이상, pathogenic variant 중 50% 초과
+        - Null variant: pathogenic null variant 2개 이상, pathogenic variant 중 50% 초과
+        {nonsense, frameshift variant, splice donor variant, splice acceptor variant, initiatior codon variant}
+
+    Args:
+        clinvar_db_dic (dict): parse_clinvar_db()의 결과
+        clinvar_col2idx (dict): ClinVar_column index dictionary
+
+    Returns:
+        dict: { "gene symbol": [pathogenic_count, missense_count, null_count, mechanism] }
+        gene_mechanism_col2idx: dict = {"pathogenic_count": 0, "missense_count": 1, "null_count": 2,
+                                        "mechanism": 3}
+
+    Examples:
+        >>> {
+                "BRCA2": [2, 0, 2, "null variant"],
+                "OAT": [1, 1, 0, ""],
+            }
+    """
+
+    gene_mechanism_col2idx: dict = {
+        "pathogenic_count": 0,
+        "missense_count": 1,
+        "null_count": 2,
+        "mechanism": 3,
+    }
+
+    gene_mechanism_dic = dict()
+    for gene_symbol, gene_variant_dic in clinvar_db_dic.items():
+
+        pathogenic_missense_count = 0
+        pathogenic_null_count = 0
+        pathogenic_count = 0
+
+        # 각 variant_id의 pathogenicity와 variant의 종류 counting
+        for var_infos in gene_variant_dic.values():
+            var_patho = var_infos[clinvar_col2idx["pathogenicity"]]
+            var_cons_dic = var_infos[clinvar_col2idx["consequence_dic"]]
+
+            if "Pathogenic" in var_patho or "Likely pathogenic" in var_patho:
+                pathogenic_count += 1
+
+                cons_count = sum(var_cons_dic.values())
+                missense_count = var_cons_dic.get("missense variant", 0)
+                null_count = (
+                    var_cons_dic.get("nonsense", 0)
+                    + var_cons_dic.get("frameshift variant", 0)
+                    + var_cons_dic.get("splice donor variant", 0)
+                    + var_cons_dic.get("splice acceptor variant", 0)
+                    + var_cons_dic.get("initiatior codon variant", 0)
+                )
+                if missense_count > cons_count * 0.5:
+                    pathogenic_missense_count += 1
+                elif null_count > cons_count * 0.5:
+                    pathogenic_null_count += 1
+
+        # 기준에 따라 병의 원인 메커니즘 부여.
+        if (pathogenic_missense_count >= 2) and (
+            pathogenic_missense_count / pathogenic_count
+        ) > 0.5:
+            mechanism = "missense variant"
+        elif (pathogenic_null_count >= 2) and (
+            pathogenic_null_count / pathogenic_count
+        ) > 0.5:
+            mechanism = "null variant"
+        else:
+            mechanism = ""
+
+        gene_mechanism_dic[gene_symbol] = [
+            pathogenic_count,
+            pathogenic_missense_count,
+            pathogenic_null_count,
+            mechanism,
+        ]
+
+    return gene_mechanism_dic, gene_mechanism_col2idx
+
+
 def parse_disease_db(filename: str) -> tuple:
     """_summary_
     Note:
@@ -1230,26 +1839,19 @@ def parse_disease_db(filename: str) -> tuple:
         "symtoms": 4,
     }
 
-    with open(filename) as infile:
+    reader = RecordBatchReader(filename)
 
-        disease_db_dic = defaultdict(list)
-        # { symbol: [ [disease_infos] ] }
-        for line in infile:
-            if line.startswith("#"):
-                f_col2idx = {
-                    val: idx
-                    for idx, val in enumerate(
-                        line.strip("#").strip().split("\t")
-                    )
-                }
-            else:  # disease info
-                row = line.strip().split("\t")
-                gene_symbol = row[f_col2idx["geneSymbol"]]
-                gene_symbols = gene_symbol.split("::")
-                disease_infos: list = make_disease_info_list(row, f_col2idx)
+    disease_db_dic = defaultdict(list)
+    # { symbol: [ [disease_infos] ] }
+    for batch in reader:  # disease info
+        f_col2idx = reader.col2idx
+        symbol_idx = f_col2idx["geneSymbol"]
+        for row in batch:
+            gene_symbols = row[symbol_idx].split("::")
+            disease_infos: list = make_disease_info_list(row, f_col2idx)
 
-                for g_symbol in gene_symbols:
-                    disease_db_dic[g_symbol].append(disease_infos)
+            for g_symbol in gene_symbols:
+                disease_db_dic[g_symbol].append(disease_infos)
 
     return disease_db_dic, disease_col2idx
 
@@ -1322,19 +1924,17 @@ def parse_repeatmasker_db(filename: str) -> dict:
             } (start, end)는 오름차순 정렬되어 있음.
     """
 
-    with open(filename) as infile:
-
-        repeatmasker_db_dic = defaultdict(list)
-        # { chr# : [(start, end), ..]}
+    # 첫 세줄이 column 명 관련. 따로 파징하기 어려워서 3줄 건너뜀. 공백으로 나누며, 7번째 column 까지만 사용.
+    reader = RecordBatchReader(
+        filename, delimiter=None, header=None, skip_lines=3, max_split=7
+    )
 
-        # 첫 세줄이 column 명 관련. 따로 파징하기 어려워서 3줄 readline.
-        a = infile.readline()
-        b = infile.readline()
-        c = infile.readline()
+    repeatmasker_db_dic = defaultdict(list)
+    # { chr# : [(start, end), ..]}
 
-        # append position infos
-        for line in infile:
-            row = line.strip().split()
+    # append position infos
+    for batch in reader:
+        for row in batch:
             chrom = row[4]  # chr1
             start_pos = int(row[5])
             end_pos = int(row[6])
@@ -1342,3 +1942,498 @@ def parse_repeatmasker_db(filename: str) -> dict:
             repeatmasker_db_dic[chrom[3:]].append((start_pos, end_pos))
 
     return repeatmasker_db_dic
+
+
+# VEP tab 형식 파일에서 사용하는 column (VariantDF.df_col2idx 순서)
+VEP_COLUMNS = [
+    "Uploaded_variation",
+    "Location",
+    "Gene",
+    "Feature",
+    "Consequence",
+    "cDNA_position",
+    "CDS_position",
+    "Protein_position",
+    "Amino_acids",
+    "Codons",
+    "Extra",
+]
+# VEP Extra column 에서 사용하는 key
+VEP_EXTRA_KEYS = ["SYMBOL", "STRAND", "IMPACT", "HGNC_ID", "CANONICAL", "MANE_SELECT"]
+# VEP VCF 파일의 CSQ (INFO) field 에서 사용하는 column (Extra에 해당하는 key는 VEP_EXTRA_KEYS)
+VEP_CSQ_COLUMNS = [
+    "Allele",
+    "Gene",
+    "Feature",
+    "Consequence",
+    "cDNA_position",
+    "CDS_position",
+    "Protein_position",
+    "Amino_acids",
+    "Codons",
+]
+
+
+def open_text_file(filename: str) -> object:
+    """gz (gzip, bgzip) 압축 파일이면 압축을 풀면서, 그 외에는 그대로 읽는 text file object를 반환한다."""
+
+    if filename.endswith((".gz", ".bgz")):
+        return gzip.open(filename, "rt")
+
+    return open(filename)
+
+
+def parse_vep_extra(extra: str, keys: list = VEP_EXTRA_KEYS) -> dict:
+    """_summary_
+    Note:
+        VEP 결과의 Extra column ("KEY=VALUE;KEY=VALUE;..")을 모든 field로 나누지 않고, 필요한 key의
+        위치만 찾아 값을 dictionary로 반환한다. 값이 없는 key는 ""로 반환한다.
+
+    Args:
+        extra (str): Extra column. e.g. IMPACT=MODIFIER;STRAND=1;SYMBOL=SAMD11;HGNC_ID=28706
+        keys (list): 필요한 key 목록
+
+    Returns:
+        dict: {key: value}
+
+    Examples:
+        >>> "REF_ALLELE=G;IMPACT=MODIFIER;STRAND=1;SYMBOL=SAMD11;SYMBOL_SOURCE=HGNC;HGNC_ID=28706"
+            -> {"SYMBOL": "SAMD11", "STRAND": "1", "IMPACT": "MODIFIER", "HGNC_ID": "28706"}
+    """
+
+    # 앞뒤에 ";"를 붙여서, 다른 key의 일부(e.g. "SYMBOL_SOURCE=")와 혼동하지 않고 값의 끝을 항상 찾는다.
+    extra = ";" + extra + ";"
+    extra_dic = dict()
+    for key in keys:
+        start = extra.find(";" + key + "=")
+        if start == -1:
+            extra_dic[key] = ""
+        else:
+            start += len(key) + 2
+            extra_dic[key] = extra[start : extra.find(";", start)]
+
+    return extra_dic
+
+
+def get_canonical_flag(canonical: str, mane_select: str) -> str:
+    """_summary_
+    Note:
+        VEP의 CANONICAL (--canonical), MANE_SELECT (--mane) 값으로 transcript의 canonical 표시를 반환한다.
+        MANE Select transcript는 "MANE", 그 외 canonical transcript는 "YES", 나머지는 "".
+
+    Examples:
+        >>> ("YES", "NM_000350.3") -> "MANE", ("YES", "") -> "YES", ("", "") -> ""
+    """
+
+    if mane_select and mane_select != "-":
+        return "MANE"
+
+    return "YES" if canonical == "YES" else ""
+
+
+def make_vep_var_infos(var_row: list, vep_col_idxs: list) -> list:
+    """_summary_
+    Note:
+        VEP 결과 파일의 한 줄로 var_infos (VariantDF.df_col2idx 순서)를 만든다. column 위치는 header에서
+        한 번만 찾아서(vep_col_idxs) 사용한다. 변이마다 반복되는 값(염색체, 유전자, consequence 등)은
+        sys.intern()으로 하나의 문자열 객체를 공유하여 메모리를 줄인다.
+
+    Args:
+        var_row (list): splitted each file line
+        vep_col_idxs (list): VEP_COLUMNS 순서의 column index
+
+    Returns:
+        list: var_infos
+
+    Examples:
+        >>> ["1-866319-G-A", "1", [866319], "ENSG00000187634", "ENST00000341065", "intron_variant",
+             "-", "-", "-", "-", "-", "SAMD11", "1", None, 0, 0, None, "MODIFIER", "28706", ""]
+    """
+
+    (
+        var_id,
+        location,
+        gene,
+        feature,
+        consequence,
+        cDNA_pos,
+        CDS_pos,
+        protein_pos,
+        AA_change,
+        codon_change,
+        extra,
+    ) = [var_row[idx] for idx in vep_col_idxs]
+
+    chrom, location = location.split(":")
+    extra_dic = parse_vep_extra(extra)
+
+    return [
+        var_id,
+        sys.intern(chrom),
+        list(map(int, location.split("-"))),  # [1234] or [1234, 1236]
+        sys.intern(gene),
+        feature,
+        sys.intern(consequence),
+        cDNA_pos,
+        CDS_pos,
+        protein_pos,
+        AA_change,
+        codon_change,
+        sys.intern(extra_dic["SYMBOL"]),
+        sys.intern(extra_dic["STRAND"]),
+        None,  # revel
+        0,  # gnomad_ac
+        0,  # gnomad_an
+        None,  # gnomad_af
+        sys.intern(extra_dic["IMPACT"]),
+        extra_dic["HGNC_ID"],
+        get_canonical_flag(extra_dic["CANONICAL"], extra_dic["MANE_SELECT"]),
+    ]
+
+
+def parse_vep_file(filename: str) -> list:
+    """_summary_
+    Note:
+        VEP 결과 파일(tab 형식, plain 또는 gz/bgzip 압축)을 한 줄씩 읽으며 각 변이-transcript의 var_infos를
+        반환한다. header에서 column 위치를 한 번만 찾으며, 파일 전체를 메모리에 올리지 않는다.
+        VEP로 annotation된 VCF 파일(CSQ INFO field)이면 parse_vep_vcf_file()로 읽는다.
+        읽는 동안에는 순환 참조 GC를 멈추고, 끝나면 원래 상태로 되돌린다.
+
+    Args:
+        filename (str): VEP_file address (.txt, .txt.gz, .vcf, .vcf.gz)
+
+    Yields:
+        list: var_infos (make_vep_var_infos())
+    """
+
+    # 수백만 개의 list/dict가 한꺼번에 만들어지는 동안 순환 참조 GC가 반복해서 전체 객체를 훑지 않도록,
+    # 파일을 읽는 동안에는 GC를 멈춘다(만들어지는 객체에는 순환 참조가 없다).
+    with gc_paused():
+        if is_vcf_file(filename):
+            yield from parse_vep_vcf_file(filename)
+            return
+
+        with open_text_file(filename) as infile:
+            for line in infile:
+                if line.startswith("##"):
+                    continue
+                elif line.startswith("#"):
+                    header = line.strip("#").strip().split("\t")
+                    vep_col_idxs = [header.index(col) for col in VEP_COLUMNS]
+                else:  # variation info
+                    yield make_vep_var_infos(line.strip().split("\t"), vep_col_idxs)
+
+
+def is_vcf_file(filename: str) -> bool:
+    """파일의 첫 줄이 "##fileformat=VCF" 이면 (plain 또는 gz) VCF 파일로 판단한다."""
+
+    with open_text_file(filename) as infile:
+        return infile.readline().startswith("##fileformat=VCF")
+
+
+def parse_vep_csq_header(line: str) -> list:
+    """_summary_
+    Note:
+        VEP VCF header의 CSQ INFO 설명에서 "Format: " 뒤의 field 이름들을 순서대로 반환한다.
+
+    Args:
+        line (str): ##INFO=<ID=CSQ,...> header line
+
+    Returns:
+        list: CSQ field 이름
+
+    Examples:
+        >>> '##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence annotations from Ensembl VEP.
+            Format: Allele|Consequence|IMPACT|SYMBOL">' -> ["Allele", "Consequence", "IMPACT", "SYMBOL"]
+    """
+
+    csq_format = line.split("Format: ")[1]
+    csq_format = csq_format[: csq_format.index('"')]
+
+    return csq_format.strip().split("|")
+
+
+def make_vep_allele_dic(pos: int, ref: str, alts: list) -> dict:
+    """_summary_
+    Note:
+        VCF record의 각 ALT를 VEP가 CSQ의 Allele로 쓰는 형식으로 바꾸고, tab 형식의 Location과 같은 위치를
+        함께 반환한다. VEP와 같이, 모든 allele의 첫 염기가 같고 길이가 다른 allele이 있으면 첫 염기를 떼어낸다.
+        (빈 allele은 "-", insertion의 위치는 [삽입 위치 앞, 뒤])
+
+    Args:
+        pos (int): VCF POS
+        ref (str): VCF REF
+        alts (list): VCF ALT 목록
+
+    Returns:
+        dict: {VEP allele: (ALT, location)}
+
+    Examples:
+        >>> (44202890, "G", ["GC"]) -> {"C": ("GC", [44202890, 44202891])}
+            (32921028, "CTTTCGG", ["C"]) -> {"-": ("C", [32921029, 32921034])}
+            (866319, "G", ["A"]) -> {"A": ("A", [866319])}
+    """
+
+    start = pos
+    vep_ref = ref
+    vep_alts = alts
+    if len({allele[0] for allele in alts + [ref]}) == 1 and any(
+        len(alt) != len(ref) for alt in alts
+    ):
+        start += 1
+        vep_ref = ref[1:]
+        vep_alts = [alt[1:] for alt in alts]
+
+    end = start + len(vep_ref) - 1
+    if end < start:  # insertion
+        location = [end, start]
+    elif end == start:
+        location = [start]
+    else:
+        location = [start, end]
+
+    return {
+        (vep_alt or "-"): (alt, location) for vep_alt, alt in zip(vep_alts, alts)
+    }
+
+
+def parse_vep_vcf_file(filename: str) -> list:
+    """_summary_
+    Note:
+        VEP로 annotation된 VCF 파일(plain 또는 gz/bgzip 압축)을 한 줄씩 읽으며, CSQ INFO field의
+        transcript 별 정보를 tab 형식 파일과 같은 var_infos로 반환한다. CSQ의 field 순서는 header에서
+        한 번만 찾는다.
+        CSQ header가 없는 VCF (VEP로 annotation되지 않은 파일)는 ValueError를 낸다.
+        - var_id: VCF의 ID (없으면 "chrom-pos-ref-alt")
+        - location: tab 형식의 Location과 같은 위치 (make_vep_allele_dic())
+        - consequence: "&"로 이어진 값은 tab 형식과 같이 ","로 바꾼다.
+        - 비어있는 값은 tab 형식과 같이 "-" 로 바꾼다 (SYMBOL, STRAND, IMPACT, HGNC_ID,
+          CANONICAL, MANE_SELECT는 "").
+
+    Args:
+        filename (str): VEP annotated VCF address (.vcf, .vcf.gz)
+
+    Yields:
+        list: var_infos (make_vep_var_infos() 와 같은 형식)
+    """
+
+    intern = sys.intern
+    csq_col_idxs = None
+    with open_text_file(filename) as infile:
+        for line in infile:
+            if line.startswith("##INFO=<ID=CSQ,"):
+                csq_fields = parse_vep_csq_header(line)
+                csq_col_idxs = [csq_fields.index(col) for col in VEP_CSQ_COLUMNS]
+                extra_idxs = [
+                    csq_fields.index(key) if key in csq_fields else None
+                    for key in VEP_EXTRA_KEYS
+                ]
+            if line.startswith("#"):
+                if line.startswith("#CHROM") and csq_col_idxs is None:
+                    raise ValueError(f"no VEP CSQ header (##INFO=<ID=CSQ>): {filename}")
+                continue
+
+            # CHROM POS ID REF ALT QUAL FILTER INFO (FORMAT, samples)
+            chrom, pos, var_id, ref, alt, _, _, info = line.rstrip("\n").split("\t")[:8]
+            csq = parse_vep_extra(info, ["CSQ"])["CSQ"]
+            if not csq:
+                continue
+            chrom = intern(chrom)
+            allele_dic = make_vep_allele_dic(int(pos), ref, alt.split(","))
+
+            for csq_entry in csq.split(","):
+                csq_values = csq_entry.split("|")
+                (
+                    allele,
+                    gene,
+                    feature,
+                    consequence,
+                    cDNA_pos,
+                    CDS_pos,
+                    protein_pos,
+                    AA_change,
+                    codon_change,
+                ) = [csq_values[idx] or "-" for idx in csq_col_idxs]
+                symbol, strand, impact, hgnc_id, canonical, mane_select = [
+                    "" if idx is None else csq_values[idx] for idx in extra_idxs
+                ]
+                var_alt, location = allele_dic.get(allele, (allele, [int(pos)]))
+
+                yield [
+                    var_id if var_id != "." else f"{chrom}-{pos}-{ref}-{var_alt}",
+                    chrom,
+                    list(location),
+                    intern(gene),
+                    feature,
+                    intern(consequence.replace("&", ",")),
+                    cDNA_pos,
+                    CDS_pos,
+                    protein_pos,
+                    AA_change,
+                    codon_change,
+                    intern(symbol),
+                    intern(strand),
+                    None,  # revel
+                    0,  # gnomad_ac
+                    0,  # gnomad_an
+                    None,  # gnomad_af
+                    intern(impact),
+                    hgnc_id,
+                    get_canonical_flag(canonical, mane_select),
+                ]
+
+
+# gz 파일의 압축 해제에 사용하는 thread 수 (BGZF 파일만 나누어 해제할 수 있다)
+GZ_READ_THREADS = min(4, os.cpu_count() or 1)
+# 한 번에 (thread 하나가) 압축을 해제하는 BGZF block 수. block 당 최대 64kb 이므로 약 1mb
+GZ_CHUNK_BLOCKS = 16
+# 압축되지 않은 파일을 chunk 단위로 읽을 때, 한 번에 읽는 크기 (byte). chunk의 record를 한꺼번에
+# 만들어 두므로, CPU cache를 크게 벗어나지 않는 크기가 더 빠르다.
+READ_CHUNK_SIZE = 1 << 20
+# BGZF block 하나에 저장하는 최대 data 크기 (bgzip과 같음)
+BGZF_BLOCK_SIZE = 0xFF00
+# BGZF 파일의 끝을 나타내는 빈 block
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+def get_bgzf_block_size(extra: bytes) -> int:
+    """gzip extra field의 "BC" subfield 에서 block 전체 크기(BSIZE + 1)를 반환한다. 없으면 None."""
+
+    i = 0
+    while i + 4 <= len(extra):
+        si1, si2, slen = extra[i], extra[i + 1], struct.unpack(
+            "<H", extra[i + 2 : i + 4]
+        )[0]
+        if si1 == 66 and si2 == 67:  # B, C
+            return struct.unpack("<H", extra[i + 4 : i + 6])[0] + 1
+        i += 4 + slen
+
+    return None
+
+
+
+def is_bgzf_file(filename: str) -> bool:
+    """첫 block이 "BC" subfield를 가진 gzip member 이면 (bgzip 압축) True를 반환한다."""
+
+    with open(filename, "rb") as infile:
+        header = infile.read(12)
+        if len(header) < 12 or header[:3] != b"\x1f\x8b\x08" or not header[3] & 4:
+            return False
+        extra = infile.read(struct.unpack("<H", header[10:12])[0])
+
+    return get_bgzf_block_size(extra) is not None
+
+
+
+def read_raw_bgzf_block(infile: object) -> bytes:
+    """_summary_
+    Note:
+        BGZF 파일의 현재 위치에서 block 하나를 압축된 상태 그대로 읽는다. 압축 해제는 inflate_bgzf_block()으로
+        따로 하므로, 파일은 순서대로 읽으면서 압축 해제는 여러 thread에서 나누어 할 수 있다.
+
+    Args:
+        infile (object): "rb"로 열린 BGZF file object
+
+    Returns:
+        bytes: header 부터 ISIZE 까지 block 전체. 파일의 끝인 경우 b""
+    """
+
+    header = infile.read(12)
+    if not header:
+        return b""
+    if len(header) < 12 or header[:2] != b"\x1f\x8b":
+        raise ValueError(f"invalid BGZF block at offset {infile.tell() - len(header)}")
+
+    extra = infile.read(struct.unpack("<H", header[10:12])[0])
+    block_size = get_bgzf_block_size(extra)
+    if block_size is None:
+        raise ValueError("not a BGZF block (no BC field)")
+    rest = infile.read(block_size - 12 - len(extra))
+    if len(rest) < block_size - 12 - len(extra):
+        raise ValueError("truncated BGZF block")
+
+    return b"".join([header, extra, rest])
+
+
+
+def inflate_bgzf_block(block: bytes) -> bytes:
+    """_summary_
+    Note:
+        read_raw_bgzf_block()으로 읽은 block의 압축을 해제하고, CRC32와 ISIZE를 확인한다.
+        zlib은 압축 해제 중에 GIL을 놓으므로, 여러 thread에서 동시에 실행할 수 있다.
+
+    Raises:
+        ValueError: CRC32 또는 ISIZE가 맞지 않는 경우
+
+    Returns:
+        bytes: 압축을 해제한 data
+    """
+
+    xlen = struct.unpack("<H", block[10:12])[0]
+    data = zlib.decompress(block[12 + xlen : -8], -15)
+    crc32, isize = struct.unpack("<II", block[-8:])
+    if zlib.crc32(data) & 0xFFFFFFFF != crc32 or len(data) != isize:
+        raise ValueError("BGZF block CRC32/ISIZE mismatch")
+
+    return data
+
+
+
+def make_bgzf_block(data: bytes, level: int = 6) -> bytes:
+    """_summary_
+    Note:
+        data (BGZF_BLOCK_SIZE 이하)를 압축하여 BGZF block 하나를 만든다. read_bgzf_block()이 읽는 형식과 같다.
+
+    Args:
+        data (bytes): 압축할 data
+        level (int): zlib 압축 level
+
+    Returns:
+        bytes: BGZF block
+    """
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    block_size = 18 + len(cdata) + 8  # header, extra field(BC) + CDATA + CRC32, ISIZE
+
+    return b"".join(
+        [
+            struct.pack("<BBBBIBBH", 31, 139, 8, 4, 0, 0, 255, 6),
+            struct.pack("<BBHH", 66, 67, 2, block_size - 1),
+            cdata,
+            struct.pack("<II", zlib.crc32(data) & 0xFFFFFFFF, len(data)),
+        ]
+    )
+
+
+
+class BgzfWriter:
+    """_summary_
+    Note:
+        data를 BGZF_BLOCK_SIZE 크기의 block으로 나누어 BGZF (bgzip) 형식으로 저장하는 writer.
+        gzip으로도 읽을 수 있으며, tabix index를 만들 수 있다. close() 할 때 EOF block을 추가한다.
+    """
+
+    def __init__(self, filename: str, level: int = 6):
+        self.outfile = open(filename, "wb")
+        self.level = level
+        self.buffer = bytearray()
+
+    def write(self, data: bytes):
+        self.buffer += data
+        while len(self.buffer) >= BGZF_BLOCK_SIZE:
+            self.outfile.write(
+                make_bgzf_block(bytes(self.buffer[:BGZF_BLOCK_SIZE]), self.level)
+            )
+            del self.buffer[:BGZF_BLOCK_SIZE]
+
+    def close(self):
+        if self.buffer:
+            self.outfile.write(make_bgzf_block(bytes(self.buffer), self.level))
+            self.buffer = bytearray()
+        self.outfile.write(BGZF_EOF)
+        self.outfile.close()
+
+
+
+tabix = sys.modules[__name__]
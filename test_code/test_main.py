@@ -1,5 +1,16 @@
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import contextlib
+import copy
+import gc
+import gzip
+import json
+import multiprocessing
+import os
 import pytest, mock
+import sys
+import threading
 
 
 @pytest.fixture
@@ -63,6 +74,9 @@ def test_parse_variant_file(mock_open, variant_df):
                     0,
                     0,
                     None,
+                    "MODIFIER",
+                    "28706",
+                    "",
                 ],
                 "evidence_score_dic": {},
             },
@@ -85,6 +99,9 @@ def test_parse_variant_file(mock_open, variant_df):
                     0,
                     0,
                     None,
+                    "MODIFIER",
+                    "28706",
+                    "",
                 ],
                 "evidence_score_dic": {},
             },
@@ -107,6 +124,9 @@ def test_parse_variant_file(mock_open, variant_df):
                     0,
                     0,
                     None,
+                    "MODIFIER",
+                    "",
+                    "",
                 ],
                 "evidence_score_dic": {},
             },
@@ -131,6 +151,9 @@ def test_parse_variant_file(mock_open, variant_df):
                     0,
                     0,
                     None,
+                    "MODIFIER",
+                    "44124",
+                    "",
                 ],
                 "evidence_score_dic": {},
             }
@@ -155,6 +178,9 @@ def test_parse_variant_file(mock_open, variant_df):
                     0,
                     0,
                     None,
+                    "MODIFIER",
+                    "10911",
+                    "",
                 ],
                 "evidence_score_dic": {},
             }
@@ -179,6 +205,9 @@ def test_parse_variant_file(mock_open, variant_df):
                     0,
                     0,
                     None,
+                    "LOW",
+                    "7994",
+                    "",
                 ],
                 "evidence_score_dic": {},
             }
@@ -203,6 +232,9 @@ def test_parse_variant_file(mock_open, variant_df):
                     0,
                     0,
                     None,
+                    "MODIFIER",
+                    "7629",
+                    "",
                 ],
                 "evidence_score_dic": {},
             }
@@ -227,6 +259,9 @@ def test_parse_variant_file(mock_open, variant_df):
                     0,
                     0,
                     None,
+                    "MODIFIER",
+                    "9993",
+                    "",
                 ],
                 "evidence_score_dic": {},
             }
@@ -251,6 +286,9 @@ def test_parse_variant_file(mock_open, variant_df):
                     0,
                     0,
                     None,
+                    "LOW",
+                    "4169",
+                    "",
                 ],
                 "evidence_score_dic": {},
             }
@@ -275,6 +313,9 @@ def test_parse_variant_file(mock_open, variant_df):
                     0,
                     0,
                     None,
+                    "MODIFIER",
+                    "7643",
+                    "",
                 ],
                 "evidence_score_dic": {},
             }
@@ -299,6 +340,9 @@ def test_parse_variant_file(mock_open, variant_df):
                     0,
                     0,
                     None,
+                    "MODIFIER",
+                    "26233",
+                    "",
                 ],
                 "evidence_score_dic": {},
             }
@@ -346,6 +390,9 @@ def test_parse_variant_file(mock_open, variant_df):
                     0,
                     0,
                     None,
+                    "MODIFIER",
+                    "28706",
+                    "",
                 ],
                 "evidence_score_dic": {},
             },
@@ -386,6 +433,9 @@ def test_parse_variant_file(mock_open, variant_df):
                     0,
                     0,
                     None,
+                    "LOW",
+                    "7994",
+                    "",
                 ],
                 "evidence_score_dic": {},
             },
@@ -402,6 +452,71 @@ def test_make_variant_info_dic(row, expected, variant_df):
     assert expected == variant_df.make_variant_info_dic(row, f_col2idx)
 
 
+def make_transcript_info_dic(
+    feature, gene, consequence, protein_pos="-", codon_change="-", canonical="", revel=None
+):
+    var_infos = [
+        "1-69270-A-G", "1", [69270], gene, feature, consequence, "-", "-", protein_pos, "-",
+        codon_change, "OR4F5", "1", revel, 0, 0, None, "MODIFIER", "", canonical,
+    ]
+    return {"var_infos": var_infos, "evidence_score_dic": dict()}
+
+
+def test_collapse_transcripts_dedupe(variant_df):
+
+    variant_df.variant_dic = {
+        "1-69270-A-G": {
+            "T1": make_transcript_info_dic("T1", "G1", "missense_variant", "60", "tcA/tcG"),
+            "T2": make_transcript_info_dic("T2", "G1", "missense_variant", "60", "tcA/tcG"),
+            "T3": make_transcript_info_dic("T3", "G1", "intron_variant"),
+            "T4": make_transcript_info_dic("T4", "G1", "missense_variant", "60", "tcA/tcG", revel=0.7),
+            "T5": make_transcript_info_dic("T5", "G1", "intron_variant"),
+        },
+        "2-100-C-T": {"T6": make_transcript_info_dic("T6", "G2", "intron_variant")},
+    }
+    variant_df.collapse_transcripts("dedupe")
+
+    assert ["T1", "T3", "T4"] == list(variant_df.variant_dic["1-69270-A-G"])
+    assert ["T6"] == list(variant_df.variant_dic["2-100-C-T"])
+    assert {"T2": "T1", "T5": "T3"} == variant_df.collapsed_feature_dic["1-69270-A-G"][1]
+
+    for var_feature, pp3 in [("T1", 1), ("T3", 0), ("T4", 1)]:
+        variant_df.variant_dic["1-69270-A-G"][var_feature]["evidence_score_dic"]["pp3"] = pp3
+    variant_df.expand_transcripts()
+    feature_dic = variant_df.variant_dic["1-69270-A-G"]
+
+    assert ["T1", "T2", "T3", "T4", "T5"] == list(feature_dic)
+    assert [1, 1, 0, 1, 0] == [feature_dic[f]["evidence_score_dic"]["pp3"] for f in feature_dic]
+    assert "T2" == feature_dic["T2"]["var_infos"][variant_df.df_col2idx["feature"]]
+    assert feature_dic["T2"]["evidence_score_dic"] is not feature_dic["T1"]["evidence_score_dic"]
+    assert variant_df.collapsed_feature_dic is None
+
+
+def test_collapse_transcripts_canonical(variant_df):
+
+    variant_df.variant_dic = {
+        "1-69270-A-G": {
+            "T1": make_transcript_info_dic("T1", "G1", "intron_variant"),
+            "T2": make_transcript_info_dic("T2", "G1", "intron_variant", canonical="YES"),
+            "T3": make_transcript_info_dic("T3", "G1", "missense_variant", canonical="MANE"),
+            "T4": make_transcript_info_dic("T4", "G2", "intron_variant"),
+            "T5": make_transcript_info_dic("T5", "G2", "downstream_gene_variant"),
+            "T6": make_transcript_info_dic("T6", "G3", "intron_variant", canonical="YES"),
+            "T7": make_transcript_info_dic("T7", "G3", "intron_variant"),
+        },
+    }
+    variant_df.collapse_transcripts("canonical")
+    variant_df.expand_transcripts()
+
+    assert ["T3", "T4", "T5", "T6"] == list(variant_df.variant_dic["1-69270-A-G"])
+
+
+def test_collapse_transcripts_unknown_mode(variant_df):
+
+    with pytest.raises(ValueError):
+        variant_df.collapse_transcripts("mane")
+
+
 @mock.patch(
     "builtins.open",
     new_callable=mock.mock_open,
@@ -431,6 +546,263 @@ def test_parse_vcf_genotype(mock_open):
     assert expected == parse_vcf_genotype("some_path.txt", "M")
 
 
+def test_load_pipeline_config(tmp_path):
+
+    config_file = tmp_path / "trio.json"
+    config_file.write_text(
+        json.dumps(
+            {
+                "paths": {"proband_vep": "input/proband.txt", "clinvar_db": "/db/clinvar.txt"},
+                "options": {"jobs": 8},
+            }
+        )
+    )
+
+    config_dic = load_pipeline_config(str(config_file))
+    # 상대 경로는 설정 파일의 directory 기준
+    assert {
+        "proband_vep": str(tmp_path / "input" / "proband.txt"),
+        "clinvar_db": "/db/clinvar.txt",
+    } == config_dic["paths"]
+    assert {"jobs": 8} == config_dic["options"]
+
+    config_file.write_text(json.dumps({"path": {}}))
+    with pytest.raises(ValueError):
+        load_pipeline_config(str(config_file))
+
+
+def test_check_config_options():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--min-class", default=None, choices=["Pathogenic", "Likely pathogenic"])
+    parser.add_argument("--best-per", default=None, choices=["variant", "gene"])
+
+    check_config_options(parser._actions, {"jobs": 8, "min_class": "Pathogenic", "best_per": None})
+
+    with pytest.raises(ValueError, match="unknown options"):
+        check_config_options(parser._actions, {"job": 8})
+    with pytest.raises(ValueError, match="invalid choice for min_class"):
+        check_config_options(parser._actions, {"min_class": "Pathogenc"})
+    with pytest.raises(ValueError, match="invalid choice for best_per"):
+        check_config_options(parser._actions, {"best_per": "transcript"})
+
+def test_apply_path_config():
+
+    apply_path_config({"proband_vep": "/data/proband.txt"})
+    assert "/data/proband.txt" == PROBAND_VEP
+
+    with pytest.raises(ValueError):
+        apply_path_config({"gnomad": "/db/gnomad.vcf.gz"})
+
+
+def assign_test_rules(
+    proband_var_df: object, db_dic: dict, annotate: bool = True
+) -> object:
+    """execute_acmg_rules() 대신, 변이와 db_dic 값으로만 evidence를 정하는 rule (shard와 무관)."""
+
+    for var_id, var_features in proband_var_df.variant_dic.items():
+        for feature, var_infos_dic in var_features.items():
+            evidence_score_dic = var_infos_dic["evidence_score_dic"]
+            evidence_score_dic["pm2"] = int(var_id not in db_dic["gnomad_var_ids"])
+            evidence_score_dic["pp2"] = int(
+                var_infos_dic["var_infos"][3] in db_dic["missense_genes"]
+            )
+            evidence_score_dic["bp7"] = int(feature.startswith("NM_"))
+
+    return proband_var_df
+
+
+def test_execute_acmg_rules_parallel(monkeypatch):
+
+    # 염색체가 섞인 순서 (shard는 염색체 별로 나뉘므로, merge 할 때 원래 순서로 되돌려야 한다)
+    proband_var_df = VariantDF()
+    proband_var_df.variant_dic = defaultdict(dict)
+    for i in range(40):
+        chrom = ["1", "2", "1", "X", "1"][i % 5]
+        var_id = f"{chrom}-{1000 + i * 7}-A-G"
+        for feature in [f"ENST{i:011d}", f"NM_{i:06d}.1"][: 1 + i % 2]:
+            var_infos = [var_id, chrom, [1000 + i * 7], f"GENE{i % 4}", feature]
+            proband_var_df.variant_dic[var_id][feature] = {
+                "var_infos": var_infos,
+                "evidence_score_dic": {},
+            }
+    db_dic = {
+        "gnomad_var_ids": {"1-1000-A-G", "X-1021-A-G", "1-1140-A-G"},
+        "missense_genes": {"GENE1", "GENE3"},
+    }
+    monkeypatch.setattr(
+        sys.modules[__name__], "execute_acmg_rules", assign_test_rules, raising=False
+    )
+
+    # 1번 염색체는 여러 조각(genomic chunk)으로 나뉜다.
+    shard_dfs = split_variant_df(proband_var_df, 8)
+    assert 3 < len(shard_dfs)
+    assert all(
+        len({var_id.split("-")[0] for var_id in shard_df.variant_dic}) == 1
+        for shard_df in shard_dfs
+    )
+
+    serial_df = assign_test_rules(copy.deepcopy(proband_var_df), db_dic)
+    parallel_df = execute_acmg_rules_parallel(
+        copy.deepcopy(proband_var_df), db_dic, 2, annotate=False
+    )
+
+    def get_evidences(variant_df: VariantDF) -> list:
+        return [
+            (var_id, feature, var_infos_dic["evidence_score_dic"])
+            for var_id, var_features in variant_df.variant_dic.items()
+            for feature, var_infos_dic in var_features.items()
+        ]
+
+    assert list(proband_var_df.variant_dic) == list(parallel_df.variant_dic)
+    assert get_evidences(serial_df) == get_evidences(parallel_df)
+    assert {"pm2": 0, "pp2": 1, "bp7": 0} == (
+        parallel_df.variant_dic["X-1021-A-G"]["ENST00000000003"]["evidence_score_dic"]
+    )
+
+
+@pytest.mark.parametrize(
+    "revel_columns",
+    [
+        ["chr", "hg19_pos", "grch38_pos", "ref", "alt", "aaref", "aaalt", "REVEL", "Ensembl_transcriptid"],
+        ["chr", "hg19_pos", "grch38_pos", "ref", "alt", "REVEL", "Ensembl_transcriptid", "aaref", "aaalt"],
+    ],
+)
+def test_annotate_variant_df(acmg_main, tmp_path, monkeypatch, revel_columns):
+
+    gnomad_file = tmp_path / "gnomad.vcf.gz"
+    with gzip.open(gnomad_file, "wt") as outfile:
+        outfile.write(
+            "##fileformat=VCFv4.2\n"
+            "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+            "1\t100\trs1\tA\tG\t100\tPASS\tAC=5;AN=2000;AF=0.0025;rf_tp_probability=0.9\n"
+            "1\t100\trs2\tA\tT\t100\tPASS\tAC=1;AN=2000;AF=0.0005\n"
+            "1\t200\trs3\tC\tT\t100\tPASS\tAC=1;AN=1000;AF=0.001\n"
+            "1\t200\trs3\tC\tT\t100\tPASS\tAC=2;AN=1000;AF=0.002\n"  # 중복 record
+            "2\t300\t.\tG\tA\t100\tAC0\tAC=0;AN=0;rf_tp_probability=0.7\n"
+            "X\t400\t.\tT\tC\t100\tPASS\tAC=3;AN=30000;AF=1e-04\n"
+        )
+
+    revel_file = tmp_path / "revel_with_transcript_ids"
+    revel_rows = [
+        dict(chr="1", hg19_pos="100", ref="A", alt="G", aaref="T", aaalt="A", REVEL="0.512",
+             Ensembl_transcriptid="ENST00000000001;ENST00000000002"),
+        dict(chr="1", hg19_pos="100", ref="A", alt="C", aaref="T", aaalt="P", REVEL="0.3",
+             Ensembl_transcriptid="ENST00000000001"),
+        dict(chr="1", hg19_pos="200", ref="C", alt="T", aaref="R", aaalt="W", REVEL="0.07",
+             Ensembl_transcriptid="ENST00000000003"),
+        dict(chr="2", hg19_pos="300", ref="G", alt="A", aaref="A", aaalt="T", REVEL="0.9",
+             Ensembl_transcriptid="ENST00000000008;ENST00000000009"),
+    ]
+    revel_file.write_text(
+        ",".join(revel_columns) + "\n"
+        + "".join(
+            ",".join(dict(row, grch38_pos=row["hg19_pos"])[col] for col in revel_columns) + "\n"
+            for row in revel_rows
+        )
+    )
+
+    spliceai_file = tmp_path / "proband.spliceai.vcf"
+    spliceai_file.write_text(
+        "##fileformat=VCFv4.2\n"
+        '##INFO=<ID=SpliceAI,Number=.,Type=String,Description="SpliceAIv1.3.1 variant annotation. '
+        'Format: ALLELE|SYMBOL|DS_AG|DS_AL|DS_DG|DS_DL|DP_AG|DP_AL|DP_DG|DP_DL">\n'
+        "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+        "1\t100\t1-100-A-G\tA\tG\t50\tPASS\tDP=7;SpliceAI=G|GENE1|0.01|0.02|0.00|0.00|1|2|3|4\n"
+        "1\t150\t1-150-G-A\tG\tA\t50\tPASS\tSpliceAI=A|GENE1|0.90|0.00|0.00|0.00|1|2|3|4\n"
+        "1\t200\t1-200-C-T\tC\tT\t50\tPASS\tDP=3\n"
+        "X\t400\tX-400-T-C\tT\tC\t50\tPASS\tSpliceAI=C|GENE4|.|.|.|.|.|.|.|.,"
+        "C|GENE5|0.50|0.10|0.00|0.00|-1|2|-3|4\n"
+    )
+
+    monkeypatch.setattr(acmg_main.pm2ba1bs1, "GNOMAD_DB", str(gnomad_file))
+    monkeypatch.setattr(acmg_main.pm2ba1bs1, "GNOMAD_STORE", str(tmp_path / "gnomad.store"))
+    monkeypatch.setattr(acmg_main.pp3bp4bp7, "REVEL_DB", str(revel_file))
+    monkeypatch.setattr(acmg_main.pp3bp4bp7, "REVEL_STORE", str(tmp_path / "revel.store"))
+    monkeypatch.setattr(acmg_main, "SPLICEAI_DB", str(spliceai_file))
+
+    variant_dic = defaultdict(dict)
+    for var_id, features in [
+        ("X-400-T-C", ["ENST00000000004"]),
+        ("1-100-A-G", ["ENST00000000001", "ENST00000000003"]),
+        ("13-500-G-C", ["ENST00000000005"]),  # 데이터베이스에 없는 변이
+        ("1-200-C-T", ["ENST00000000003"]),
+        ("2-300-G-A", ["ENST00000000009"]),
+    ]:
+        chrom, pos = var_id.split("-")[:2]
+        for feature in features:
+            variant_dic[var_id][feature] = {
+                "var_infos": [
+                    var_id, chrom, [int(pos)], "ENSG00000000001", feature, "missense_variant",
+                    "-", "-", "-", "-", "-", "GENE1", "1", None, 0, 0, None, "MODERATE", "", "",
+                ],
+                "evidence_score_dic": dict(),
+            }
+
+    single_pass_df = acmg_main.VariantDF()
+    single_pass_df.variant_dic = copy.deepcopy(variant_dic)
+    spliceai_db_dic = acmg_main.annotate_variant_df(single_pass_df)
+
+    scan_df = acmg_main.VariantDF()
+    scan_df.variant_dic = copy.deepcopy(variant_dic)
+    acmg_main.pm2ba1bs1.add_gnomad_into_var_infos(scan_df.variant_dic, scan_df.df_col2idx)
+    acmg_main.pp3bp4bp7.add_revel_into_var_infos(scan_df.variant_dic, scan_df.df_col2idx)
+
+    assert scan_df.variant_dic == single_pass_df.variant_dic
+    assert {
+        var_id: var_info_dic
+        for var_id, var_info_dic in acmg_main.dbparser.parse_spliceai_db(str(spliceai_file)).items()
+        if var_id in variant_dic
+    } == spliceai_db_dic
+
+    # revel, gnomad_ac, gnomad_an, gnomad_af
+    assert [
+        ("1-100-A-G", "ENST00000000001", [0.512, 5, 2000, 0.0025]),
+        ("1-100-A-G", "ENST00000000003", [None, 5, 2000, 0.0025]),
+        ("1-200-C-T", "ENST00000000003", [0.07, 2, 1000, 0.002]),  # 마지막 record
+        ("2-300-G-A", "ENST00000000009", [0.9, 0, 0, None]),
+        ("X-400-T-C", "ENST00000000004", [None, 3, 30000, 1e-04]),
+        ("13-500-G-C", "ENST00000000005", [None, 0, 0, None]),
+    ] == [
+        (var_id, feature, single_pass_df.variant_dic[var_id][feature]["var_infos"][13:17])
+        for var_id, feature in [
+            ("1-100-A-G", "ENST00000000001"),
+            ("1-100-A-G", "ENST00000000003"),
+            ("1-200-C-T", "ENST00000000003"),
+            ("2-300-G-A", "ENST00000000009"),
+            ("X-400-T-C", "ENST00000000004"),
+            ("13-500-G-C", "ENST00000000005"),
+        ]
+    ]
+
+
+# input file
+PROBAND_VEP = "/data/projects/ACMG/input/proband.preprocessed_37.txt"
+CLINVAR_DB = "/data/projects/ACMG/database/clinvar_parsed_single.txt"
+
+# --config 파일의 "paths" 또는 --path NAME=FILE 로 바꿀 수 있는 파일 경로. {이름: (module namespace, 변수 이름)}
+# (rule 모듈의 gnomad, REVEL 경로는 제외)
+PATH_CONFIG_DIC = {
+    "proband_vep": (globals(), "PROBAND_VEP"),
+    "clinvar_db": (globals(), "CLINVAR_DB"),
+}
+
+# VariantDF.collapse_transcripts()
+TRANSCRIPT_COLLAPSE_MODES = ["canonical", "dedupe"]
+# rule 모듈이 읽는 transcript 별 var_infos column. 한 변이에서 이 값이 모두 같은 transcript는 같은 rule을 받는다.
+# (chrom, location, gnomad 값은 변이 별로 같다)
+DEDUPE_KEY_COLUMNS = [
+    "consequence",
+    "protein_pos",
+    "AA_change",
+    "codon_change",
+    "symbol",
+    "strand",
+    "revel",
+]
+
+
 class VariantDF:
     """_summary_
     Note:
@@ -479,8 +851,14 @@ class VariantDF:
             "gnomad_ac": 14,
             "gnomad_an": 15,
             "gnomad_af": 16,
+            "impact": 17,  # VEP IMPACT (HIGH, MODERATE, LOW, MODIFIER)
+            "hgnc_id": 18,
+            "canonical": 19,  # "MANE" (MANE Select), "YES" (VEP CANONICAL) or ""
         }
         self.variant_dic: dict = None
+        # collapse_transcripts("dedupe")로 합친 transcript
+        # {var_id: ({feature: variant_info_dic} (원래 순서), {합쳐진 feature: 남긴 feature})}
+        self.collapsed_feature_dic: dict = None
 
     def parse_variant_file(self, vep_file: str):
         """_summary_
@@ -488,16 +866,19 @@ class VariantDF:
             VEP로 annocation된 vcf 파일의 변환값을 읽은 뒤, 각 라인을 파징하여 variant들의 정보
             (ID-transcipt(feature)-infos) 가 담긴 딕셔너리를 VariantDF class의
             변수(self.variant_dic)에 저장한다. 저장된 정보(list)에 대한 index 값은 VariantDF
-            class 의 내부 변수 (self.df_col2idx)에 내재되어 있다.
+            class 의 내부 변수 (self.df_col2idx)에 내재되어 있다. VEP 결과 파일은 tab 형식 또는
+            CSQ INFO field가 있는 VCF 형식을 plain 또는 gz(bgzip) 압축 파일로 사용할 수 있으며, 파일 전체를
+            읽지 않고 한 줄씩 처리한다(dbparser.parse_vep_file()). VCF로 주어지면 VEP를 tab 형식으로 다시
+            실행할 필요가 없다.
 
         Args:
-            vep_file (str): VEP_file address
+            vep_file (str): VEP_file address (.txt, .txt.gz, .vcf, .vcf.gz)
 
         Examples:
         >>> variant_dic = {
                 "1-21929260-A-G": {
                     "NR_170901.1": {
-                        - var_infos: ["1-21929260-A-G", "1", [1234], "5909",
+                        - var_infos: ["1-21929260-A-G", "1", ["1234"], "5909",
                             "NR_170901.1","intron_variant,non_coding_transcript_variant",
                                     "-", "-", "-", "-", "-", "-1", "RAP1GAP"]
                         - evidence_score_dic: dict(bool)
@@ -505,38 +886,136 @@ class VariantDF:
                 }
             }"""
 
-        with open(vep_file) as infile:
-            # {id : {feature : { [var_infos], {evidence_score} }}}
-            variant_dic = defaultdict(dict)
-            for line in infile:
-                if line.startswith("#") and (not line.startswith("##")):
-                    f_col2idx = {
-                        val: idx
-                        for idx, val in enumerate(
-                            line.strip("#").strip().split("\t")
-                        )
+        # {id : {feature : { [var_infos], {evidence_score} }}}
+        variant_dic = defaultdict(dict)
+        var_id_idx = self.df_col2idx["var_id"]
+        feature_idx = self.df_col2idx["feature"]
+        # gz (bgzip) 압축 파일도 그대로 읽으며, 한 줄씩 처리한다.
+        for var_infos in dbparser.parse_vep_file(vep_file):
+            # "1-69270-A-G", "ENST00000335137"
+            var_key_id = var_infos[var_id_idx]
+            var_key_feature = var_infos[feature_idx]
+            variant_dic[var_key_id][var_key_feature] = {
+                "var_infos": var_infos,
+                "evidence_score_dic": dict(),
+            }
+
+        self.variant_dic = variant_dic
+
+    def collapse_transcripts(self, mode: str = "dedupe"):
+        """_summary_
+        Note:
+            rule을 할당하기 전에, 변이 별 transcript 수를 줄인다. 한 변이가 여러 transcript와 겹치면 모든
+            rule이 transcript 마다 반복되므로, 같은 결과를 받을 transcript는 한 번만 계산한다.
+            - "dedupe": rule이 읽는 값(DEDUPE_KEY_COLUMNS)이 모두 같은 transcript는 처음 나온 transcript
+              하나만 남긴다. rule 할당 후 expand_transcripts()로 합쳐진 transcript를 되살리므로, 결과 파일은
+              줄이지 않은 경우와 같다.
+            - "canonical": 변이의 유전자 별로 MANE Select transcript만 남기고, 없으면 VEP canonical
+              transcript만 남긴다. 둘 다 없는 유전자는 모든 transcript를 남긴다. 나머지 transcript는
+              결과 파일에서도 제외된다. (VEP --mane, --canonical 옵션이 필요하다)
+            revel 값은 transcript 별로 다르므로, revel, gnomad 값을 variant_infos에 추가한 뒤에 사용한다.
+
+        Args:
+            mode (str): "dedupe" or "canonical"
+
+        Raises:
+            ValueError: mode가 TRANSCRIPT_COLLAPSE_MODES에 없는 경우
+
+        Examples:
+        >>> variant_df.collapse_transcripts("dedupe")
+            variant_df = execute_acmg_rules(variant_df, db_dic, annotate=False)
+            variant_df.expand_transcripts()
+        """
+
+        if mode not in TRANSCRIPT_COLLAPSE_MODES:
+            raise ValueError(
+                f"unknown transcript collapse mode: {mode} (use {TRANSCRIPT_COLLAPSE_MODES})"
+            )
+
+        variant_dic = self.variant_dic
+        key_idxs = [self.df_col2idx[col] for col in DEDUPE_KEY_COLUMNS]
+        gene_idx = self.df_col2idx["gene"]
+        canonical_idx = self.df_col2idx["canonical"]
+        canonical_rank_dic = {"MANE": 2, "YES": 1}  # 그 외 0
+        collapsed_feature_dic = dict()
+
+        for var_id, feature_dic in variant_dic.items():
+            if len(feature_dic) < 2:
+                continue
+
+            if mode == "dedupe":
+                key2feature = dict()  # {rule에 사용하는 값: 남긴 feature}
+                dup2feature = dict()  # {합쳐진 feature: 남긴 feature}
+                for var_feature, variant_info_dic in feature_dic.items():
+                    var_infos = variant_info_dic["var_infos"]
+                    key = tuple(var_infos[idx] for idx in key_idxs)
+                    if key in key2feature:
+                        dup2feature[var_feature] = key2feature[key]
+                    else:
+                        key2feature[key] = var_feature
+                if dup2feature:
+                    collapsed_feature_dic[var_id] = (feature_dic, dup2feature)
+                    variant_dic[var_id] = {
+                        var_feature: variant_info_dic
+                        for var_feature, variant_info_dic in feature_dic.items()
+                        if var_feature not in dup2feature
                     }
-                if not line.startswith("#"):  # variation info
-                    row = line.strip().split("\t")
-                    # "1-69270-A-G", "ENST00000335137"
-                    var_key_id = row[f_col2idx["Uploaded_variation"]]
-                    var_key_feature = row[f_col2idx["Feature"]]
-                    variant_info_dic = self.make_variant_info_dic(
-                        row, f_col2idx
-                    )
-                    variant_dic[var_key_id].update(
-                        {var_key_feature: variant_info_dic}
-                    )
 
-            self.variant_dic = variant_dic
+            else:  # canonical
+                # {gene: 가장 높은 canonical 순위}
+                gene_rank_dic = defaultdict(int)
+                feature_ranks = []
+                for var_feature, variant_info_dic in feature_dic.items():
+                    var_infos = variant_info_dic["var_infos"]
+                    rank = canonical_rank_dic.get(var_infos[canonical_idx], 0)
+                    gene = var_infos[gene_idx]
+                    gene_rank_dic[gene] = max(gene_rank_dic[gene], rank)
+                    feature_ranks.append((var_feature, gene, rank))
+                variant_dic[var_id] = {
+                    var_feature: feature_dic[var_feature]
+                    for var_feature, gene, rank in feature_ranks
+                    if rank == gene_rank_dic[gene]
+                }
+
+        self.variant_dic = variant_dic
+        self.collapsed_feature_dic = collapsed_feature_dic
+
+    def expand_transcripts(self):
+        """_summary_
+        Note:
+            collapse_transcripts("dedupe")로 합친 transcript를 원래 순서대로 되살리고, 남긴 transcript에
+            할당된 evidence_score_dic을 복사한다. ("canonical"로 제외한 transcript는 되살리지 않는다)
+        """
+
+        if not self.collapsed_feature_dic:
+            return
+
+        variant_dic = self.variant_dic
+        for var_id, (feature_dic, dup2feature) in self.collapsed_feature_dic.items():
+            # 병렬 실행 시에는 rule이 할당된 variant_info_dic이 새로 만들어지므로, 현재 값을 사용한다.
+            kept_feature_dic = variant_dic[var_id]
+            variant_dic[var_id] = {
+                var_feature: kept_feature_dic[var_feature]
+                if var_feature not in dup2feature
+                else {
+                    "var_infos": feature_dic[var_feature]["var_infos"],
+                    "evidence_score_dic": dict(
+                        kept_feature_dic[dup2feature[var_feature]]["evidence_score_dic"]
+                    ),
+                }
+                for var_feature in feature_dic
+            }
+
+        self.variant_dic = variant_dic
+        self.collapsed_feature_dic = None
 
     def make_variant_info_dic(self, var_row: list, file_col2idx: dict) -> dict:
         """_summary_
         Note:
             ID-feature로 특정지어지는 variant에 대해 {"var_infos": [], "evidence_score_dict": {}}
-            로 구성된 <variant_info_dic> 을 만들어 반환한다. "symbol" 의 경우, vep 옵션에서
-            추가한 것으로, "Extra" column에 해당하여 따로 추출하였음. Revel의 경우, 추후 revel
-            score를 저장하기 위한 용도.
+            로 구성된 <variant_info_dic> 을 만들어 반환한다. "symbol", "strand", "impact", "hgnc_id",
+            "canonical"의 경우, vep 옵션에서 추가한 것으로, "Extra" column에서 필요한 key만 찾아 추출하였음
+            (dbparser.parse_vep_extra()). Revel의 경우, 추후 revel score를 저장하기 위한 용도.
 
         Args:
             var_row (list): splitted each file line
@@ -549,52 +1028,15 @@ class VariantDF:
         >>> {
                 - "var_infos": ["1-21929260-A-G", "1", ["1234"], "5909", "NR_170901.1",
                             "intron_variant,non_coding_transcript_variant",
-                            "-", "-", "-", "-", "-", "-1", "RAP1GAP"]
+                            "-", "-", "-", "-", "-", "RAP1GAP", "-1", None, 0, 0, None,
+                            "MODIFIER", "9858", ""]
                 - "evidence_score_dic": dict(bool)
             }"""
 
-        # variable initialization
         variant_info_dic = {"var_infos": None, "evidence_score_dic": dict()}
-        gene_symbol = ""
-        strand = ""
-        revel = None
-        gnomad_ac = 0
-        gnomad_an = 0
-        gnomad_af = None
-
-        # variable assignment
-        chrom, location = var_row[file_col2idx["Location"]].split(":")
-        location = list(map(int, location.split("-")))  # [1234] or [1234, 1236]
-
-        if "SYMBOL=" in var_row[file_col2idx["Extra"]]:
-            gene_symbol = (
-                var_row[file_col2idx["Extra"]].split("SYMBOL=")[1].split(";")[0]
-            )
-        if "STRAND=" in var_row[file_col2idx["Extra"]]:
-            strand = (
-                var_row[file_col2idx["Extra"]].split("STRAND=")[1].split(";")[0]
-            )
-
-        var_infos = [
-            var_row[file_col2idx["Uploaded_variation"]],
-            chrom,
-            location,
-            var_row[file_col2idx["Gene"]],
-            var_row[file_col2idx["Feature"]],
-            var_row[file_col2idx["Consequence"]],
-            var_row[file_col2idx["cDNA_position"]],
-            var_row[file_col2idx["CDS_position"]],
-            var_row[file_col2idx["Protein_position"]],
-            var_row[file_col2idx["Amino_acids"]],
-            var_row[file_col2idx["Codons"]],
-            gene_symbol,
-            strand,
-            revel,
-            gnomad_ac,
-            gnomad_an,
-            gnomad_af,
-        ]
-        variant_info_dic["var_infos"] = var_infos
+        variant_info_dic["var_infos"] = dbparser.make_vep_var_infos(
+            var_row, [file_col2idx[col] for col in dbparser.VEP_COLUMNS]
+        )
 
         return variant_info_dic
 
@@ -637,3 +1079,577 @@ def parse_vcf_genotype(vcf_file: str, family="") -> dict:
                 vcf_genotype_dic[var_id] = genotypes
 
     return vcf_genotype_dic
+
+
+def split_variant_df(proband_var_df: VariantDF, n_shards: int) -> list:
+    """_summary_
+    Note:
+        병렬 실행을 위해, VariantDF를 염색체 별로 나눈다. 각 rule은 변이마다 독립적으로 계산되므로
+        어떤 방식으로 나누어도 결과는 같다. 1번 염색체처럼 변이가 많은 염색체는 작업량이 비슷하도록
+        변이 순서를 유지한 채로 여러 조각(genomic chunk)으로 다시 나눈다.
+
+    Args:
+        proband_var_df (VariantDF): 환자의 VariantDF
+        n_shards (int): 목표 shard 수 (대략적인 값)
+
+    Returns:
+        list: [VariantDF, ..] 각 shard의 VariantDF
+    """
+
+    variant_dic = proband_var_df.variant_dic
+
+    # {chrom: [var_id, ..]}, 1-69270-A-G -> "1"
+    chrom_var_ids = defaultdict(list)
+    for var_id in variant_dic:
+        chrom_var_ids[var_id.split("-")[0]].append(var_id)
+
+    max_shard_size = max(1, -(-len(variant_dic) // max(1, n_shards)))
+
+    shard_dfs = []
+    for var_ids in chrom_var_ids.values():
+        for i in range(0, len(var_ids), max_shard_size):
+            shard_df = VariantDF()
+            shard_df.df_col2idx = proband_var_df.df_col2idx
+            shard_df.variant_dic = {
+                var_id: variant_dic[var_id]
+                for var_id in var_ids[i : i + max_shard_size]
+            }
+            shard_dfs.append(shard_df)
+
+    return shard_dfs
+
+
+def merge_variant_dfs(proband_var_df: VariantDF, shard_dfs: list) -> VariantDF:
+    """_summary_
+    Note:
+        각 shard에서 rule이 할당된 결과를 하나의 VariantDF로 합친다. 결과 파일의 순서가 순차 실행과
+        같도록, 원래 variant_dic의 변이 순서대로 다시 저장한다.
+
+    Args:
+        proband_var_df (VariantDF): 나누기 전의 VariantDF
+        shard_dfs (list): [VariantDF, ..] rule이 할당된 각 shard의 VariantDF
+
+    Returns:
+        VariantDF: 모든 shard의 결과가 합쳐진 VariantDF
+    """
+
+    shard_variant_dic = dict()
+    for shard_df in shard_dfs:
+        shard_variant_dic.update(shard_df.variant_dic)
+
+    variant_dic = defaultdict(dict)
+    for var_id in proband_var_df.variant_dic:
+        variant_dic[var_id] = shard_variant_dic[var_id]
+    proband_var_df.variant_dic = variant_dic
+
+    return proband_var_df
+
+
+# 병렬 실행 시, fork 된 각 process가 복사하지 않고 공유하는(copy-on-write) 데이터베이스
+SHARED_DB_DIC: dict = None
+
+
+def execute_acmg_rules_shard(shard_df: VariantDF) -> VariantDF:
+    """ProcessPoolExecutor의 각 process에서 실행되는 함수. 데이터베이스는 SHARED_DB_DIC을 사용한다."""
+
+    return execute_acmg_rules(shard_df, SHARED_DB_DIC, annotate=False)
+
+
+def execute_acmg_rules_parallel(
+    proband_var_df: VariantDF, db_dic: dict, jobs: int, annotate: bool = True
+) -> VariantDF:
+    """_summary_
+    Note:
+        VariantDF를 염색체(또는 genomic chunk) 별로 나누어, 각 shard의 ACMG rule 할당을 여러 process에서
+        동시에 실행한다. revel, gnomad 값은 파일을 한 번만 읽도록 나누기 전에 미리 추가한다.
+
+        데이터베이스는 process를 만들기 전에 module 변수(SHARED_DB_DIC)에 저장하여, fork 된 process들이
+        복사 없이 공유하도록(copy-on-write) 하였다. 각 process에는 shard의 variant_dic 만 전달된다.
+
+        다른 thread가 lock을 가진 상태에서 fork 하면 process가 멈출 수 있으므로, 다른 thread가 실행 중이지
+        않은 thread에서 호출해야 한다 (pipeline에서는 rules 단계를 main_thread로 실행한다).
+
+    Args:
+        proband_var_df (VariantDF): 환자의 VariantDF
+        db_dic (dict): main()에서 parsing 한 데이터베이스 및 genotype dictionary
+        jobs (int): 동시에 실행할 process 수
+        annotate (bool): revel, gnomad 값을 variant_infos에 추가할지 여부
+
+    Returns:
+        VariantDF: evidence_score_dic 이 update 된 VariantDF
+    """
+
+    global SHARED_DB_DIC
+
+    # 데이터베이스 파일(revel, gnomad)은 전체 변이에 대해 한 번만 읽는다.
+    if annotate:
+        add_gnomad_revel_into_var_infos(proband_var_df)
+
+    SHARED_DB_DIC = db_dic
+    shard_dfs = split_variant_df(proband_var_df, jobs * 4)
+    with ProcessPoolExecutor(
+        max_workers=jobs, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        shard_dfs = list(executor.map(execute_acmg_rules_shard, shard_dfs))
+    SHARED_DB_DIC = None
+
+    return merge_variant_dfs(proband_var_df, shard_dfs)
+
+
+def load_pipeline_config(config_file: str) -> dict:
+    """_summary_
+    Note:
+        실행 설정 파일(JSON)을 읽는다. "paths"는 PATH_CONFIG_DIC의 이름 별 파일 경로, "options"는
+        명령행 옵션의 기본값 (argparse dest 이름, e.g. "jobs", "single_pass")이다. 상대 경로는 설정 파일이
+        있는 directory를 기준으로 바꾼다.
+
+    Args:
+        config_file (str): config file address
+
+    Raises:
+        ValueError: 설정 파일에 알 수 없는 항목이 있는 경우
+
+    Returns:
+        dict: {"paths": {이름: 경로}, "options": {dest: 값}}
+
+    Examples:
+        >>> {
+                "paths": {"proband_vep": "input/proband.txt", "gnomad_db": "/db/gnomad.vcf.gz"},
+                "options": {"jobs": 8, "output": "result.txt.gz"}
+            }
+    """
+
+    with open(config_file) as infile:
+        config_dic = json.load(infile)
+
+    unknown_keys = set(config_dic) - {"paths", "options"}
+    if unknown_keys:
+        raise ValueError(f"unknown config sections: {sorted(unknown_keys)}")
+
+    config_dir = os.path.dirname(os.path.abspath(config_file))
+    path_dic = {
+        name: os.path.join(config_dir, filename)
+        for name, filename in config_dic.get("paths", {}).items()
+    }
+
+    return {"paths": path_dic, "options": config_dic.get("options", {})}
+
+
+def check_config_options(actions: list, option_dic: dict):
+    """_summary_
+    Note:
+        설정 파일의 options는 parser.set_defaults()로 기본값이 되므로 argparse의 choices 검사를 거치지
+        않는다. 명령행 옵션과 같이 dest 이름과 choices를 확인한다 (None은 기본값으로 둔다).
+
+    Args:
+        actions (list): argparse parser의 action (parser._actions)
+        option_dic (dict): load_pipeline_config()의 "options"
+
+    Raises:
+        ValueError: 알 수 없는 option 이거나, choices에 없는 값인 경우
+    """
+
+    action_dic = {action.dest: action for action in actions}
+    unknown_options = set(option_dic) - set(action_dic)
+    if unknown_options:
+        raise ValueError(f"unknown options: {sorted(unknown_options)}")
+
+    for dest, value in option_dic.items():
+        choices = action_dic[dest].choices
+        if choices is not None and value is not None and value not in choices:
+            raise ValueError(f"invalid choice for {dest}: {value!r} (choose from {list(choices)})")
+
+
+def apply_path_config(path_dic: dict):
+    """_summary_
+    Note:
+        {이름: 경로}로 받은 파일 경로를 PATH_CONFIG_DIC의 module 변수에 저장한다. rule 모듈은 실행할 때
+        module 변수를 읽으므로, pipeline을 만들기 전에 호출한다.
+
+    Args:
+        path_dic (dict): {"proband_vep": "/data/proband.txt", "gnomad_db": ..}
+
+    Raises:
+        ValueError: PATH_CONFIG_DIC에 없는 이름인 경우
+    """
+
+    for name, filename in path_dic.items():
+        if name not in PATH_CONFIG_DIC:
+            raise ValueError(
+                f"unknown path name: {name} (use {', '.join(PATH_CONFIG_DIC)})"
+            )
+        namespace, attr = PATH_CONFIG_DIC[name]
+        namespace[attr] = filename
+
+
+# VEP tab 형식 파일에서 사용하는 column (VariantDF.df_col2idx 순서)
+VEP_COLUMNS = [
+    "Uploaded_variation",
+    "Location",
+    "Gene",
+    "Feature",
+    "Consequence",
+    "cDNA_position",
+    "CDS_position",
+    "Protein_position",
+    "Amino_acids",
+    "Codons",
+    "Extra",
+]
+# VEP Extra column 에서 사용하는 key
+VEP_EXTRA_KEYS = ["SYMBOL", "STRAND", "IMPACT", "HGNC_ID", "CANONICAL", "MANE_SELECT"]
+# VEP VCF 파일의 CSQ (INFO) field 에서 사용하는 column (Extra에 해당하는 key는 VEP_EXTRA_KEYS)
+VEP_CSQ_COLUMNS = [
+    "Allele",
+    "Gene",
+    "Feature",
+    "Consequence",
+    "cDNA_position",
+    "CDS_position",
+    "Protein_position",
+    "Amino_acids",
+    "Codons",
+]
+
+
+def open_text_file(filename: str) -> object:
+    """gz (gzip, bgzip) 압축 파일이면 압축을 풀면서, 그 외에는 그대로 읽는 text file object를 반환한다."""
+
+    if filename.endswith((".gz", ".bgz")):
+        return gzip.open(filename, "rt")
+
+    return open(filename)
+
+
+def parse_vep_extra(extra: str, keys: list = VEP_EXTRA_KEYS) -> dict:
+    """_summary_
+    Note:
+        VEP 결과의 Extra column ("KEY=VALUE;KEY=VALUE;..")을 모든 field로 나누지 않고, 필요한 key의
+        위치만 찾아 값을 dictionary로 반환한다. 값이 없는 key는 ""로 반환한다.
+
+    Args:
+        extra (str): Extra column. e.g. IMPACT=MODIFIER;STRAND=1;SYMBOL=SAMD11;HGNC_ID=28706
+        keys (list): 필요한 key 목록
+
+    Returns:
+        dict: {key: value}
+
+    Examples:
+        >>> "REF_ALLELE=G;IMPACT=MODIFIER;STRAND=1;SYMBOL=SAMD11;SYMBOL_SOURCE=HGNC;HGNC_ID=28706"
+            -> {"SYMBOL": "SAMD11", "STRAND": "1", "IMPACT": "MODIFIER", "HGNC_ID": "28706"}
+    """
+
+    # 앞뒤에 ";"를 붙여서, 다른 key의 일부(e.g. "SYMBOL_SOURCE=")와 혼동하지 않고 값의 끝을 항상 찾는다.
+    extra = ";" + extra + ";"
+    extra_dic = dict()
+    for key in keys:
+        start = extra.find(";" + key + "=")
+        if start == -1:
+            extra_dic[key] = ""
+        else:
+            start += len(key) + 2
+            extra_dic[key] = extra[start : extra.find(";", start)]
+
+    return extra_dic
+
+
+def get_canonical_flag(canonical: str, mane_select: str) -> str:
+    """_summary_
+    Note:
+        VEP의 CANONICAL (--canonical), MANE_SELECT (--mane) 값으로 transcript의 canonical 표시를 반환한다.
+        MANE Select transcript는 "MANE", 그 외 canonical transcript는 "YES", 나머지는 "".
+
+    Examples:
+        >>> ("YES", "NM_000350.3") -> "MANE", ("YES", "") -> "YES", ("", "") -> ""
+    """
+
+    if mane_select and mane_select != "-":
+        return "MANE"
+
+    return "YES" if canonical == "YES" else ""
+
+
+def make_vep_var_infos(var_row: list, vep_col_idxs: list) -> list:
+    """_summary_
+    Note:
+        VEP 결과 파일의 한 줄로 var_infos (VariantDF.df_col2idx 순서)를 만든다. column 위치는 header에서
+        한 번만 찾아서(vep_col_idxs) 사용한다. 변이마다 반복되는 값(염색체, 유전자, consequence 등)은
+        sys.intern()으로 하나의 문자열 객체를 공유하여 메모리를 줄인다.
+
+    Args:
+        var_row (list): splitted each file line
+        vep_col_idxs (list): VEP_COLUMNS 순서의 column index
+
+    Returns:
+        list: var_infos
+
+    Examples:
+        >>> ["1-866319-G-A", "1", [866319], "ENSG00000187634", "ENST00000341065", "intron_variant",
+             "-", "-", "-", "-", "-", "SAMD11", "1", None, 0, 0, None, "MODIFIER", "28706", ""]
+    """
+
+    (
+        var_id,
+        location,
+        gene,
+        feature,
+        consequence,
+        cDNA_pos,
+        CDS_pos,
+        protein_pos,
+        AA_change,
+        codon_change,
+        extra,
+    ) = [var_row[idx] for idx in vep_col_idxs]
+
+    chrom, location = location.split(":")
+    extra_dic = parse_vep_extra(extra)
+
+    return [
+        var_id,
+        sys.intern(chrom),
+        list(map(int, location.split("-"))),  # [1234] or [1234, 1236]
+        sys.intern(gene),
+        feature,
+        sys.intern(consequence),
+        cDNA_pos,
+        CDS_pos,
+        protein_pos,
+        AA_change,
+        codon_change,
+        sys.intern(extra_dic["SYMBOL"]),
+        sys.intern(extra_dic["STRAND"]),
+        None,  # revel
+        0,  # gnomad_ac
+        0,  # gnomad_an
+        None,  # gnomad_af
+        sys.intern(extra_dic["IMPACT"]),
+        extra_dic["HGNC_ID"],
+        get_canonical_flag(extra_dic["CANONICAL"], extra_dic["MANE_SELECT"]),
+    ]
+
+
+# gc_paused() 가 GC를 멈춘 횟수와, 처음 멈추기 전의 GC 상태 (여러 thread가 함께 사용한다)
+_GC_PAUSE_LOCK = threading.Lock()
+_gc_pause_count = 0
+_gc_was_enabled = False
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """_summary_
+    Note:
+        수백만 개의 객체를 한꺼번에 만드는 동안 순환 참조 GC를 멈춘다.
+        GC 상태는 process 전체에서 하나이므로, 여러 thread (pipeline stage)가 동시에 사용해도
+        처음 들어올 때만 GC를 멈추고 마지막으로 나갈 때 원래 상태로 되돌린다.
+    """
+
+    global _gc_pause_count, _gc_was_enabled
+
+    with _GC_PAUSE_LOCK:
+        if _gc_pause_count == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pause_count += 1
+    try:
+        yield
+    finally:
+        with _GC_PAUSE_LOCK:
+            _gc_pause_count -= 1
+            if _gc_pause_count == 0 and _gc_was_enabled:
+                gc.enable()
+
+
+def parse_vep_file(filename: str) -> list:
+    """_summary_
+    Note:
+        VEP 결과 파일(tab 형식, plain 또는 gz/bgzip 압축)을 한 줄씩 읽으며 각 변이-transcript의 var_infos를
+        반환한다. header에서 column 위치를 한 번만 찾으며, 파일 전체를 메모리에 올리지 않는다.
+        VEP로 annotation된 VCF 파일(CSQ INFO field)이면 parse_vep_vcf_file()로 읽는다.
+        읽는 동안에는 순환 참조 GC를 멈추고, 끝나면 원래 상태로 되돌린다.
+
+    Args:
+        filename (str): VEP_file address (.txt, .txt.gz, .vcf, .vcf.gz)
+
+    Yields:
+        list: var_infos (make_vep_var_infos())
+    """
+
+    # 수백만 개의 list/dict가 한꺼번에 만들어지는 동안 순환 참조 GC가 반복해서 전체 객체를 훑지 않도록,
+    # 파일을 읽는 동안에는 GC를 멈춘다(만들어지는 객체에는 순환 참조가 없다).
+    with gc_paused():
+        if is_vcf_file(filename):
+            yield from parse_vep_vcf_file(filename)
+            return
+
+        with open_text_file(filename) as infile:
+            for line in infile:
+                if line.startswith("##"):
+                    continue
+                elif line.startswith("#"):
+                    header = line.strip("#").strip().split("\t")
+                    vep_col_idxs = [header.index(col) for col in VEP_COLUMNS]
+                else:  # variation info
+                    yield make_vep_var_infos(line.strip().split("\t"), vep_col_idxs)
+
+
+def is_vcf_file(filename: str) -> bool:
+    """파일의 첫 줄이 "##fileformat=VCF" 이면 (plain 또는 gz) VCF 파일로 판단한다."""
+
+    with open_text_file(filename) as infile:
+        return infile.readline().startswith("##fileformat=VCF")
+
+
+def parse_vep_csq_header(line: str) -> list:
+    """_summary_
+    Note:
+        VEP VCF header의 CSQ INFO 설명에서 "Format: " 뒤의 field 이름들을 순서대로 반환한다.
+
+    Args:
+        line (str): ##INFO=<ID=CSQ,...> header line
+
+    Returns:
+        list: CSQ field 이름
+
+    Examples:
+        >>> '##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence annotations from Ensembl VEP.
+            Format: Allele|Consequence|IMPACT|SYMBOL">' -> ["Allele", "Consequence", "IMPACT", "SYMBOL"]
+    """
+
+    csq_format = line.split("Format: ")[1]
+    csq_format = csq_format[: csq_format.index('"')]
+
+    return csq_format.strip().split("|")
+
+
+def make_vep_allele_dic(pos: int, ref: str, alts: list) -> dict:
+    """_summary_
+    Note:
+        VCF record의 각 ALT를 VEP가 CSQ의 Allele로 쓰는 형식으로 바꾸고, tab 형식의 Location과 같은 위치를
+        함께 반환한다. VEP와 같이, 모든 allele의 첫 염기가 같고 길이가 다른 allele이 있으면 첫 염기를 떼어낸다.
+        (빈 allele은 "-", insertion의 위치는 [삽입 위치 앞, 뒤])
+
+    Args:
+        pos (int): VCF POS
+        ref (str): VCF REF
+        alts (list): VCF ALT 목록
+
+    Returns:
+        dict: {VEP allele: (ALT, location)}
+
+    Examples:
+        >>> (44202890, "G", ["GC"]) -> {"C": ("GC", [44202890, 44202891])}
+            (32921028, "CTTTCGG", ["C"]) -> {"-": ("C", [32921029, 32921034])}
+            (866319, "G", ["A"]) -> {"A": ("A", [866319])}
+    """
+
+    start = pos
+    vep_ref = ref
+    vep_alts = alts
+    if len({allele[0] for allele in alts + [ref]}) == 1 and any(
+        len(alt) != len(ref) for alt in alts
+    ):
+        start += 1
+        vep_ref = ref[1:]
+        vep_alts = [alt[1:] for alt in alts]
+
+    end = start + len(vep_ref) - 1
+    if end < start:  # insertion
+        location = [end, start]
+    elif end == start:
+        location = [start]
+    else:
+        location = [start, end]
+
+    return {
+        (vep_alt or "-"): (alt, location) for vep_alt, alt in zip(vep_alts, alts)
+    }
+
+
+def parse_vep_vcf_file(filename: str) -> list:
+    """_summary_
+    Note:
+        VEP로 annotation된 VCF 파일(plain 또는 gz/bgzip 압축)을 한 줄씩 읽으며, CSQ INFO field의
+        transcript 별 정보를 tab 형식 파일과 같은 var_infos로 반환한다. CSQ의 field 순서는 header에서
+        한 번만 찾는다.
+        CSQ header가 없는 VCF (VEP로 annotation되지 않은 파일)는 ValueError를 낸다.
+        - var_id: VCF의 ID (없으면 "chrom-pos-ref-alt")
+        - location: tab 형식의 Location과 같은 위치 (make_vep_allele_dic())
+        - consequence: "&"로 이어진 값은 tab 형식과 같이 ","로 바꾼다.
+        - 비어있는 값은 tab 형식과 같이 "-" 로 바꾼다 (SYMBOL, STRAND, IMPACT, HGNC_ID,
+          CANONICAL, MANE_SELECT는 "").
+
+    Args:
+        filename (str): VEP annotated VCF address (.vcf, .vcf.gz)
+
+    Yields:
+        list: var_infos (make_vep_var_infos() 와 같은 형식)
+    """
+
+    intern = sys.intern
+    csq_col_idxs = None
+    with open_text_file(filename) as infile:
+        for line in infile:
+            if line.startswith("##INFO=<ID=CSQ,"):
+                csq_fields = parse_vep_csq_header(line)
+                csq_col_idxs = [csq_fields.index(col) for col in VEP_CSQ_COLUMNS]
+                extra_idxs = [
+                    csq_fields.index(key) if key in csq_fields else None
+                    for key in VEP_EXTRA_KEYS
+                ]
+            if line.startswith("#"):
+                if line.startswith("#CHROM") and csq_col_idxs is None:
+                    raise ValueError(f"no VEP CSQ header (##INFO=<ID=CSQ>): {filename}")
+                continue
+
+            # CHROM POS ID REF ALT QUAL FILTER INFO (FORMAT, samples)
+            chrom, pos, var_id, ref, alt, _, _, info = line.rstrip("\n").split("\t")[:8]
+            csq = parse_vep_extra(info, ["CSQ"])["CSQ"]
+            if not csq:
+                continue
+            chrom = intern(chrom)
+            allele_dic = make_vep_allele_dic(int(pos), ref, alt.split(","))
+
+            for csq_entry in csq.split(","):
+                csq_values = csq_entry.split("|")
+                (
+                    allele,
+                    gene,
+                    feature,
+                    consequence,
+                    cDNA_pos,
+                    CDS_pos,
+                    protein_pos,
+                    AA_change,
+                    codon_change,
+                ) = [csq_values[idx] or "-" for idx in csq_col_idxs]
+                symbol, strand, impact, hgnc_id, canonical, mane_select = [
+                    "" if idx is None else csq_values[idx] for idx in extra_idxs
+                ]
+                var_alt, location = allele_dic.get(allele, (allele, [int(pos)]))
+
+                yield [
+                    var_id if var_id != "." else f"{chrom}-{pos}-{ref}-{var_alt}",
+                    chrom,
+                    list(location),
+                    intern(gene),
+                    feature,
+                    intern(consequence.replace("&", ",")),
+                    cDNA_pos,
+                    CDS_pos,
+                    protein_pos,
+                    AA_change,
+                    codon_change,
+                    intern(symbol),
+                    intern(strand),
+                    None,  # revel
+                    0,  # gnomad_ac
+                    0,  # gnomad_an
+                    None,  # gnomad_af
+                    intern(impact),
+                    hgnc_id,
+                    get_canonical_flag(canonical, mane_select),
+                ]
+
+
+dbparser = sys.modules[__name__]
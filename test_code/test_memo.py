@@ -0,0 +1,144 @@
+# module for LRU memoization test
+
+from collections import OrderedDict
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def clear_memo_stats():
+    MEMO_STATS_DIC.clear()
+
+
+def test_lru_memo_hit_miss():
+
+    calls = []
+
+    def add(a, b):
+        calls.append((a, b))
+        return a + b
+
+    add_memo = LruMemo("add")
+
+    assert 3 == add_memo.get((1, 2), add, 1, 2)
+    assert 3 == add_memo.get((1, 2), add, 1, 2)
+    assert 7 == add_memo.get((3, 4), add, 3, 4)
+    assert [(1, 2), (3, 4)] == calls
+    assert {"hits": 1, "misses": 2} == MEMO_STATS_DIC["add"]
+
+
+def test_lru_memo_evicts_least_recently_used():
+
+    square_memo = LruMemo("square", maxsize=2)
+    for key in [1, 2, 1, 3]:  # 2가 가장 오래 사용되지 않았다.
+        square_memo.get(key, lambda x: x * x, key)
+
+    assert [1, 3] == list(square_memo.cache)
+    assert 2 == len(square_memo)
+
+
+def test_lru_memo_maxsize_zero():
+
+    square_memo = LruMemo("square", maxsize=0)
+    square_memo.get(2, lambda x: x * x, 2)
+    square_memo.get(2, lambda x: x * x, 2)
+
+    assert 0 == len(square_memo)
+    assert {"hits": 0, "misses": 2} == MEMO_STATS_DIC["square"]
+
+
+def test_format_memo_stats():
+
+    first_memo = LruMemo("pp2bp1")
+    first_memo.get("BRCA2", str.lower, "BRCA2")
+    second_memo = LruMemo("pp2bp1")  # 같은 이름은 counter를 함께 사용
+    for _ in range(3):
+        second_memo.get("BRCA2", str.lower, "BRCA2")
+
+    assert "pp2bp1: hits=2 misses=2 hit_rate=50.0%" == format_memo_stats()
+
+    reset_memo_stats()
+    assert "pp2bp1: hits=0 misses=0 hit_rate=0.0%" == format_memo_stats()
+
+
+######################################################################
+
+
+# LruMemo 하나에 저장하는 최대 결과 수 (0 이면 저장하지 않는다)
+MEMO_MAXSIZE = 65536
+
+# {name: {"hits": int, "misses": int}}. 같은 이름의 LruMemo는 counter를 함께 사용한다 (누적).
+MEMO_STATS_DIC: dict = dict()
+
+
+class LruMemo:
+    """_summary_
+    Note:
+        rule 함수의 결과를 입력값 key로 저장해 두었다가, 같은 key가 다시 나오면 함수를 다시 실행하지 않고
+        저장된 결과를 반환하는 LRU cache. 최대 maxsize 개의 결과만 저장하며, 가장 오래 사용하지 않은 결과부터
+        지운다. 사용한 횟수(hits)와 실행한 횟수(misses)는 이름 별로 MEMO_STATS_DIC에 누적한다.
+
+        rule 함수는 database dictionary 처럼 hash 할 수 없는 값을 함께 받으므로, 결과를 결정하는 값만으로
+        key를 만들어서 사용한다. 같은 database로 실행하는 동안에만 사용해야 한다 (rule 모듈의 execute() 마다
+        새로 만든다).
+
+    Examples:
+        >>> pp2bp1_memo = LruMemo("pp2bp1")
+            pp2, bp1 = pp2bp1_memo.get(
+                gene_symbol, assign_pp2bp1_rule, gene_symbol, clinvar_db_dic, clinvar_col2idx
+            )
+    """
+
+    def __init__(self, name: str, maxsize: int = None):
+        self.name = name
+        self.maxsize = MEMO_MAXSIZE if maxsize is None else maxsize
+        self.cache = OrderedDict()
+        self.stats: dict = MEMO_STATS_DIC.setdefault(name, {"hits": 0, "misses": 0})
+
+    def get(self, key: object, func: object, *args) -> object:
+        """key의 저장된 결과를 반환한다. 없으면 func(*args)를 실행하여 저장한 뒤 반환한다."""
+
+        cache = self.cache
+        if key in cache:
+            self.stats["hits"] += 1
+            cache.move_to_end(key)
+            return cache[key]
+
+        self.stats["misses"] += 1
+        value = func(*args)
+        if self.maxsize > 0:
+            cache[key] = value
+            if len(cache) > self.maxsize:
+                cache.popitem(last=False)
+
+        return value
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+
+def format_memo_stats() -> str:
+    """_summary_
+    Note:
+        이름 별 LruMemo 사용 횟수를 한 줄씩 반환한다.
+
+    Examples:
+        >>> "pp2bp1: hits=10231 misses=412 hit_rate=96.1%"
+    """
+
+    lines = []
+    for name, stats in MEMO_STATS_DIC.items():
+        total = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / total * 100 if total else 0.0
+        lines.append(
+            f"{name}: hits={stats['hits']} misses={stats['misses']} hit_rate={hit_rate:.1f}%"
+        )
+
+    return "\n".join(lines)
+
+
+def reset_memo_stats():
+    """MEMO_STATS_DIC의 counter를 0으로 되돌린다."""
+
+    for stats in MEMO_STATS_DIC.values():
+        stats["hits"] = 0
+        stats["misses"] = 0
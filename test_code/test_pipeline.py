@@ -0,0 +1,519 @@
+# module for running pipeline stages as a dependency graph test
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import contextlib
+import gc
+import hashlib
+import os
+import pickle
+import pytest
+import sys
+import threading
+
+
+def make_stage_func(name: str, calls: list, deps: list = ()) -> object:
+    def stage_func(results: dict) -> str:
+        calls.append(name)
+        return name + "".join(results[dep] for dep in deps)
+
+    return stage_func
+
+
+def test_sort_stages():
+
+    stage_dic = {
+        "write": Stage("write", None, deps=["rules"]),
+        "rules": Stage("rules", None, deps=["load_vep", "annotate"]),
+        "annotate": Stage("annotate", None, deps=["load_vep"]),
+        "load_vep": Stage("load_vep", None),
+    }
+
+    assert ["load_vep", "annotate", "rules", "write"] == sort_stages(stage_dic)
+
+
+def test_sort_stages_error():
+
+    with pytest.raises(ValueError):  # 없는 단계
+        sort_stages({"rules": Stage("rules", None, deps=["load_vep"])})
+    with pytest.raises(ValueError):  # 순환
+        sort_stages(
+            {
+                "a": Stage("a", None, deps=["b"]),
+                "b": Stage("b", None, deps=["a"]),
+            }
+        )
+
+
+def test_run_stages():
+
+    calls = []
+    stage_dic = {
+        "a": Stage("a", make_stage_func("a", calls)),
+        "b": Stage("b", make_stage_func("b", calls)),
+        "c": Stage("c", make_stage_func("c", calls, ["a", "b"]), deps=["a", "b"]),
+        "d": Stage("d", make_stage_func("d", calls)),
+    }
+
+    # 기본 targets: 다른 단계가 사용하지 않는 단계 (c, d)
+    results = run_stages(stage_dic)
+    assert "cab" == results["c"]
+    assert ["a", "b", "c", "d"] == sorted(calls)
+
+    # targets의 앞 단계만 실행
+    calls.clear()
+    assert {"a": "a"} == run_stages(stage_dic, ["a"])
+    assert ["a"] == calls
+
+    with pytest.raises(ValueError):
+        run_stages(stage_dic, ["e"])
+
+
+def test_run_stages_concurrent():
+
+    # 서로 의존하지 않는 두 단계는 동시에 실행된다 (barrier를 함께 통과).
+    barrier = threading.Barrier(2, timeout=5)
+
+    def scan(results: dict) -> int:
+        return barrier.wait()
+
+    stage_dic = {
+        "annotate_gnomad": Stage("annotate_gnomad", scan),
+        "annotate_revel": Stage("annotate_revel", scan),
+    }
+
+    assert [0, 1] == sorted(run_stages(stage_dic, max_workers=2).values())
+
+
+def test_run_stages_main_thread():
+
+    # main_thread 단계는 다른 단계와 worker thread가 모두 끝난 뒤, 호출한 thread에서 실행된다.
+    calls = []
+    n_threads = threading.active_count()
+
+    def rules(results: dict) -> tuple:
+        calls.append("rules")
+        return (threading.current_thread(), threading.active_count())
+
+    stage_dic = {
+        "a": Stage("a", make_stage_func("a", calls)),
+        "b": Stage("b", make_stage_func("b", calls)),
+        "rules": Stage("rules", rules, deps=["a"], main_thread=True),
+        "write": Stage("write", make_stage_func("write", calls, ["a"]), deps=["rules"]),
+    }
+
+    results = run_stages(stage_dic, max_workers=2)
+    assert (threading.current_thread(), n_threads) == results["rules"]
+    assert ["rules", "write"] == calls[2:]
+    assert "writea" == results["write"]
+    assert n_threads == threading.active_count()
+
+
+def test_run_stages_checkpoint(tmp_path):
+
+    vep_file = tmp_path / "proband.txt"
+    vep_file.write_text("1-69270-A-G\n")
+    checkpoint_dir = str(tmp_path / "checkpoint")
+    calls = []
+
+    def make_stage_dic(params: tuple) -> dict:
+        return {
+            "a": Stage(
+                "a", make_stage_func("a", calls), input_files=[str(vep_file)]
+            ),
+            "b": Stage(
+                "b", make_stage_func("b", calls, ["a"]), deps=["a"], checkpoint=True
+            ),
+            "c": Stage(
+                "c", make_stage_func("c", calls, ["b"]), deps=["b"], params=params
+            ),
+        }
+
+    results = run_stages(make_stage_dic(()), checkpoint_dir=checkpoint_dir)
+    assert "cba" == results["c"]
+    assert ["a", "b", "c"] == calls
+
+    # checkpoint가 있는 b와, b만 사용하는 a는 다시 실행하지 않는다.
+    calls.clear()
+    results = run_stages(make_stage_dic(("x",)), checkpoint_dir=checkpoint_dir)
+    assert "cba" == results["c"]
+    assert ["c"] == calls
+
+    # 입력 파일이 바뀌면 a, b도 다시 실행한다.
+    vep_file.write_text("1-69270-A-G\n1-69511-A-G\n")
+    calls.clear()
+    run_stages(make_stage_dic(("x",)), checkpoint_dir=checkpoint_dir)
+    assert ["a", "b", "c"] == calls
+
+
+
+def test_make_stage_keys_store(tmp_path):
+
+    store_dir = tmp_path / "gnomad_store"
+    store_dir.mkdir()
+    (store_dir / "pos.npy").write_bytes(b"1" * 16)
+    meta_file = store_dir / "meta.json"
+    meta_file.write_text('{"source_key": ["gnomad", 1, 2]}')
+
+    def make_keys() -> dict:
+        return make_stage_keys(
+            {
+                "store_dir": Stage("store_dir", None, input_files=[str(store_dir)]),
+                "store_meta": Stage("store_meta", None, input_files=[str(meta_file)]),
+            }
+        )
+
+    stage_keys = make_keys()
+    # store를 다시 만들면 (같은 이름의 파일을 덮어쓰기) directory의 key는 그대로이고, meta.json의 key가 바뀐다.
+    (store_dir / "pos.npy").write_bytes(b"2" * 32)
+    meta_file.write_text('{"source_key": ["gnomad", 10, 20]}')
+    new_stage_keys = make_keys()
+    assert stage_keys["store_dir"] == new_stage_keys["store_dir"]
+    assert stage_keys["store_meta"] != new_stage_keys["store_meta"]
+
+######################################################################
+
+# checkpoint 파일 이름: {stage}.checkpoint
+CHECKPOINT_SUFFIX = ".checkpoint"
+
+
+class Stage:
+    """_summary_
+    Note:
+        pipeline의 한 단계. func는 앞 단계들의 결과 dictionary ({stage 이름: 결과})를 받아서 이 단계의 결과를
+        반환한다. deps에 적힌 단계가 모두 끝난 뒤에 실행된다.
+
+        checkpoint가 True이면, 결과를 checkpoint 파일로 저장해 두고 다음 실행에서 입력 파일(input_files),
+        설정값(params), 앞 단계들의 key가 모두 같으면 다시 실행하지 않고 파일을 읽는다. 뒤 단계가 결과를 직접
+        수정하는 경우에도, checkpoint는 뒤 단계를 시작하기 전에 저장된다.
+
+        main_thread가 True 이면, 다른 단계가 모두 끝나고 thread pool을 닫은 뒤에 run_stages()를 호출한
+        thread에서 실행한다. 다른 thread가 없는 상태에서 process를 fork 해야 하는 단계(e.g. --jobs의
+        ProcessPoolExecutor)에 사용한다.
+
+    Examples:
+        >>> Stage("load_vep", lambda results: parse_vep(PROBAND_VEP), input_files=[PROBAND_VEP], checkpoint=True)
+            Stage("rules", execute_rules, deps=["load_vep", "load_clinvar"], params=("dedupe",))
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: object,
+        deps: list = (),
+        input_files: list = (),
+        params: tuple = (),
+        checkpoint: bool = False,
+        main_thread: bool = False,
+    ):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.input_files = list(input_files)
+        self.params = tuple(params)
+        self.checkpoint = checkpoint
+        self.main_thread = main_thread
+
+
+def sort_stages(stage_dic: dict) -> list:
+    """_summary_
+    Note:
+        단계들을 의존 관계 순서(topological order)로 정렬한다. 순서가 정해지지 않는 단계들은 stage_dic 순서를
+        따른다.
+
+    Args:
+        stage_dic (dict): {stage 이름: Stage}
+
+    Raises:
+        ValueError: 없는 단계에 의존하거나, 의존 관계에 순환이 있는 경우
+
+    Returns:
+        list: [stage 이름, ..]
+    """
+
+    for stage in stage_dic.values():
+        for dep in stage.deps:
+            if dep not in stage_dic:
+                raise ValueError(f"stage {stage.name} depends on unknown stage {dep}")
+
+    sorted_names = []
+    done = set()
+    while len(sorted_names) < len(stage_dic):
+        ready_names = [
+            name
+            for name, stage in stage_dic.items()
+            if name not in done and all(dep in done for dep in stage.deps)
+        ]
+        if not ready_names:
+            raise ValueError(
+                f"stage dependency cycle: {sorted(set(stage_dic) - done)}"
+            )
+        sorted_names.extend(ready_names)
+        done.update(ready_names)
+
+    return sorted_names
+
+
+def make_stage_keys(stage_dic: dict) -> dict:
+    """_summary_
+    Note:
+        단계 별 key를 만든다. 입력 파일의 경로, 수정 시간, 크기 (dbcache.make_cache_key()), 설정값과 앞 단계들의
+        key로 만들므로, 입력이나 설정이 바뀌면 그 단계와 뒤 단계들의 key가 모두 바뀐다.
+
+    Returns:
+        dict: {stage 이름: key (hex string)}
+    """
+
+    stage_keys = dict()
+    for name in sort_stages(stage_dic):
+        stage = stage_dic[name]
+        file_keys = [
+            dbcache.make_cache_key(filename, name)
+            if os.path.exists(filename)
+            else (filename, None)
+            for filename in stage.input_files
+        ]
+        key_text = repr(
+            (name, file_keys, stage.params, [stage_keys[dep] for dep in stage.deps])
+        )
+        stage_keys[name] = hashlib.sha1(key_text.encode()).hexdigest()
+
+    return stage_keys
+
+
+def get_checkpoint_file(checkpoint_dir: str, name: str) -> str:
+    """checkpoint 파일 주소를 반환한다. e.g. {checkpoint_dir}/rules.checkpoint"""
+
+    return os.path.join(checkpoint_dir, f"{name}{CHECKPOINT_SUFFIX}")
+
+
+def select_stages(
+    stage_dic: dict, targets: list, stage_keys: dict, checkpoint_dir: str = None
+) -> tuple:
+    """_summary_
+    Note:
+        targets를 만들기 위해 실행할 단계와 checkpoint에서 읽을 단계를 고른다. checkpoint가 유효한 단계는
+        읽기만 하므로, 그 단계의 앞 단계들은 (다른 단계에서 필요하지 않으면) 실행하지 않는다.
+
+    Returns:
+        tuple(list, dict): ([실행할 stage 이름, ..] (실행 순서), {읽을 stage 이름: checkpoint 결과})
+    """
+
+    run_names = set()
+    loaded_dic = dict()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name in run_names or name in loaded_dic:
+            continue
+        stage = stage_dic[name]
+        if stage.checkpoint and checkpoint_dir is not None:
+            hit, data = dbcache.load_cache(
+                get_checkpoint_file(checkpoint_dir, name), stage_keys[name]
+            )
+            if hit:
+                loaded_dic[name] = data
+                continue
+        run_names.add(name)
+        pending.extend(stage.deps)
+
+    return [name for name in sort_stages(stage_dic) if name in run_names], loaded_dic
+
+
+def run_stages(
+    stage_dic: dict,
+    targets: list = None,
+    max_workers: int = 4,
+    checkpoint_dir: str = None,
+) -> dict:
+    """_summary_
+    Note:
+        targets 단계와 그 앞 단계들을 의존 관계에 따라 실행한다. 앞 단계가 모두 끝난 단계는
+        바로 시작하므로, 서로 의존하지 않는 단계들(e.g. gnomAD, REVEL annotation)은 thread pool에서 동시에
+        실행된다. checkpoint_dir이 주어지면 checkpoint 단계의 결과를 저장하고, 다음 실행에서 입력과 설정이
+        같으면 다시 실행하지 않는다 (select_stages()). main_thread 단계는 실행 중인 단계가 없을 때 thread
+        pool을 닫고 (worker thread 종료) 이 함수를 호출한 thread에서 실행한다.
+
+    Args:
+        stage_dic (dict): {stage 이름: Stage}
+        targets (list): 결과가 필요한 stage 이름. None 이면 다른 단계가 사용하지 않는 마지막 단계들
+        max_workers (int): 동시에 실행할 단계 수
+        checkpoint_dir (str): checkpoint directory. None 이면 checkpoint를 사용하지 않는다.
+
+    Raises:
+        ValueError: 없는 단계를 targets로 지정한 경우
+
+    Returns:
+        dict: {stage 이름: 결과} (실행하거나 checkpoint에서 읽은 단계)
+    """
+
+    if targets is None:  # 다른 단계가 사용하지 않는 마지막 단계들 (e.g. write)
+        dep_names = {dep for stage in stage_dic.values() for dep in stage.deps}
+        targets = [name for name in stage_dic if name not in dep_names]
+    for name in targets:
+        if name not in stage_dic:
+            raise ValueError(f"unknown stage: {name} (use {list(stage_dic)})")
+
+    stage_keys = make_stage_keys(stage_dic)
+    run_names, results = select_stages(stage_dic, targets, stage_keys, checkpoint_dir)
+    if checkpoint_dir is not None:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def save_result(name: str, stage_result: object):
+        if stage_dic[name].checkpoint and checkpoint_dir is not None:
+            dbcache.save_cache(
+                get_checkpoint_file(checkpoint_dir, name), stage_keys[name], stage_result
+            )
+        results[name] = stage_result
+
+    running = dict()  # {future: stage 이름}
+    executor = None
+    try:
+        while run_names or running:
+            ready_names = [
+                name
+                for name in run_names
+                if all(dep in results for dep in stage_dic[name].deps)
+            ]
+            # 앞 단계가 모두 끝난 단계를 시작한다.
+            for name in ready_names:
+                if not stage_dic[name].main_thread:
+                    if executor is None:
+                        executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+                    run_names.remove(name)
+                    running[executor.submit(stage_dic[name].func, results)] = name
+
+            if not running:  # main_thread 단계만 남은 경우, worker thread를 모두 종료한 뒤 실행
+                name = ready_names[0]
+                if executor is not None:
+                    executor.shutdown()
+                    executor = None
+                run_names.remove(name)
+                save_result(name, stage_dic[name].func(results))
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                # 실패한 단계의 exception은 그대로 전달
+                save_result(name, future.result())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return results
+
+
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".dbcache"
+
+
+def make_cache_key(filename: str, tag: str) -> tuple:
+    """_summary_
+    Note:
+        원본 파일의 절대 경로, 수정 시간(mtime), 크기와 parser 이름으로 cache key를 만든다.
+        원본 파일이 바뀌면 mtime 또는 크기가 달라지므로, 이전 cache는 자동으로 사용되지 않는다.
+
+    Args:
+        filename (str): 원본 database file address
+        tag (str): parser 이름 (ACMG.helper.dbparser.parse_clinvar_db)
+
+    Returns:
+        tuple: (version, abs_path, mtime_ns, size, tag)
+    """
+
+    file_stat = os.stat(filename)
+
+    return (
+        CACHE_VERSION,
+        os.path.abspath(filename),
+        file_stat.st_mtime_ns,
+        file_stat.st_size,
+        tag,
+    )
+
+
+# gc_paused() 가 GC를 멈춘 횟수와, 처음 멈추기 전의 GC 상태 (여러 thread가 함께 사용한다)
+_GC_PAUSE_LOCK = threading.Lock()
+_gc_pause_count = 0
+_gc_was_enabled = False
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """_summary_
+    Note:
+        수백만 개의 객체를 한꺼번에 만드는 동안 순환 참조 GC를 멈춘다.
+        GC 상태는 process 전체에서 하나이므로, 여러 thread (pipeline stage)가 동시에 사용해도
+        처음 들어올 때만 GC를 멈추고 마지막으로 나갈 때 원래 상태로 되돌린다.
+    """
+
+    global _gc_pause_count, _gc_was_enabled
+
+    with _GC_PAUSE_LOCK:
+        if _gc_pause_count == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pause_count += 1
+    try:
+        yield
+    finally:
+        with _GC_PAUSE_LOCK:
+            _gc_pause_count -= 1
+            if _gc_pause_count == 0 and _gc_was_enabled:
+                gc.enable()
+
+
+def load_cache(cache_file: str, cache_key: tuple) -> tuple:
+    """_summary_
+    Note:
+        cache 파일을 읽어서, 저장된 key가 현재 key와 같으면 (True, data)를 반환한다. cache가 없거나,
+        key가 다르거나(원본 변경, 버전 변경), 파일이 손상된 경우에는 (False, None)을 반환한다.
+        큰 dictionary를 unpickle 할 때는 garbage collector가 불필요하게 자주 실행되므로 잠시 끈다.
+
+    Args:
+        cache_file (str): cache file address
+        cache_key (tuple): make_cache_key()의 결과
+
+    Returns:
+        tuple: (hit(bool), data)
+    """
+
+    if not os.path.exists(cache_file):
+        return (False, None)
+
+    try:
+        with gc_paused(), open(cache_file, "rb") as infile:
+            if pickle.load(infile) != cache_key:
+                return (False, None)
+            return (True, pickle.load(infile))
+    except Exception:  # 손상된 cache (EOFError, UnpicklingError 등)
+        return (False, None)
+
+
+def save_cache(cache_file: str, cache_key: tuple, data: object):
+    """_summary_
+    Note:
+        cache key와 data를 차례로 pickle 하여 저장한다. 여러 환자를 동시에 분석하는 경우에도 손상된
+        cache를 읽지 않도록, 임시 파일에 쓴 뒤 이름을 바꾼다(os.replace). 저장할 수 없는 경우
+        (권한, pickle 할 수 없는 data 등)에는 cache 없이 진행한다.
+
+    Args:
+        cache_file (str): cache file address
+        cache_key (tuple): make_cache_key()의 결과
+        data (object): parser 결과
+    """
+
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, "wb") as outfile:
+            pickle.dump(cache_key, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except (OSError, pickle.PicklingError, TypeError, AttributeError):
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+
+dbcache = sys.modules[__name__]
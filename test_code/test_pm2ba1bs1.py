@@ -2,9 +2,27 @@
 # Population data, vs normal people variants
 
 import pytest, mock
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+import array
+import contextlib
+import copy
+import gc
+import gzip
+import io
+import json
+import os
+import struct
+import sys
+import threading
+import warnings
+import zlib
+
+import numpy as np
 
 
 GNOMAD_DB = "/data/projects/ACMG/database/gnomad.exomes.r2.1.1.sites.vcf.gz"
+GNOMAD_STORE = "/data/projects/ACMG/database/gnomad.exomes.r2.1.1.sites.store"
 
 
 @pytest.fixture
@@ -208,10 +226,10 @@ def variant_dic():
     return variant_dic
 
 
-@mock.patch(
-    "builtins.open",
-    new_callable=mock.mock_open,
-    read_data=(
+def test_add_gnomad_into_var_infos(tmp_path, monkeypatch, variant_dic, df_col2idx):
+
+    gnomad_file = tmp_path / "gnomad.vcf"
+    gnomad_file.write_text(
         '##INFO=<ID=controls_nhomalt_popmax,Number=A,Type=Integer,Description="Count of homozygous individuals in the population with the maximum allele frequency in the controls subset">\n'
         "##contig=<ID=Y,length=59373566,assembly=gnomAD_GRCh37>\n"
         "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
@@ -220,9 +238,9 @@ def variant_dic():
         "1	955647	rs1194105483	C	T	709.35	PASS	AC=1;AN=83836;AF=1.19281e-05;rf_tp_probability=4.21673e-01;FS=3.60300e+00;InbreedingCo\n"
         "1	970679	rs777369292	T	C	8511.30	PASS	AC=3;AN=250896;AF=1.19571e-05;rf_tp_probability=7.91696e-01;FS=\n"
         "1	970680	rs746480380	C	T	4074.49	PASS	AC=0;AN=0;rf_tp_probability=7.78117e-01;FS=1.27600e+00;Inb\n"
-    ),
-)
-def test_add_gnomad_into_var_infos(mock_open, variant_dic, df_col2idx):
+    )
+    monkeypatch.setattr(sys.modules[__name__], "GNOMAD_DB", str(gnomad_file))
+    monkeypatch.setattr(sys.modules[__name__], "GNOMAD_STORE", str(tmp_path / "store"))
 
     expected = {
         "1-138980-G-C": {
@@ -321,9 +339,156 @@ def test_add_gnomad_into_var_infos(mock_open, variant_dic, df_col2idx):
         },
     }
 
-    assert expected == add_gnomad_into_var_infos(
-        "some_path.txt", variant_dic, df_col2idx
+    assert expected == add_gnomad_into_var_infos(variant_dic, df_col2idx)
+
+
+def test_execute_without_annotate(
+    tmp_path, monkeypatch, variant_dic, df_col2idx, disease_db_dic
+):
+
+    gnomad_file = tmp_path / "gnomad.vcf"
+    gnomad_file.write_text(
+        "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+        "1\t138980\t.\tG\tC\t11050.36\tPASS\tAC=40000;AN=134554;AF=2.97278e-01\n"
+        "1\t970680\t.\tC\tT\t4074.49\tPASS\tAC=1;AN=2000;AF=5.00000e-04\n"
     )
+    monkeypatch.setattr(sys.modules[__name__], "GNOMAD_DB", str(gnomad_file))
+    monkeypatch.setattr(sys.modules[__name__], "GNOMAD_STORE", str(tmp_path / "store"))
+    disease_col2idx = {
+        "title": 0,
+        "inheritance": 1,
+        "onsetAges": 2,
+        "symtoms_id": 3,
+        "symtoms": 4,
+    }
+    annotated_df = execute(
+        mock.Mock(variant_dic=copy.deepcopy(variant_dic), df_col2idx=df_col2idx),
+        disease_db_dic,
+        disease_col2idx,
+    )
+    assert 1 == annotated_df.variant_dic["1-138980-G-C"]["ENST00000417324"][
+        "evidence_score_dic"
+    ]["ba1"]
+
+    # main()에서 gnomad 값을 미리 추가한 경우 (annotate=False): 파일을 다시 읽지 않고 같은 결과
+    monkeypatch.setattr(
+        sys.modules[__name__], "GNOMAD_DB", str(tmp_path / "missing.vcf")
+    )
+    for var_id, var_features in variant_dic.items():
+        for var_feature, var_infos_dic in var_features.items():
+            var_infos_dic["var_infos"] = list(
+                annotated_df.variant_dic[var_id][var_feature]["var_infos"]
+            )
+    proband_var_df = execute(
+        mock.Mock(variant_dic=variant_dic, df_col2idx=df_col2idx),
+        disease_db_dic,
+        disease_col2idx,
+        annotate=False,
+    )
+    assert annotated_df.variant_dic == proband_var_df.variant_dic
+
+
+def test_scan_gnomad(tmp_path, monkeypatch):
+
+    gnomad_file = tmp_path / "gnomad.vcf.gz"
+    with gzip.open(gnomad_file, "wt") as outfile:
+        outfile.write(
+            "##contig=<ID=Y,length=59373566,assembly=gnomAD_GRCh37>\n"
+            "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+            "1\t138980\trs796175332\tG\tC\t11050.36\tPASS\tAC=2;AN=134554;AF=1.48639e-05;FS=0\n"
+            "1\t139253\trs1193670589\tG\tC\t1651.52\tPASS\tAC=1;AN=133560;AF=7.48727e-06\n"
+            "1\t138980\trs796175332\tG\tC\t4074.49\tPASS\tAC=0;AN=0;FS=1.27600e+00\n"
+        )
+    monkeypatch.setattr(sys.modules[__name__], "GNOMAD_DB", str(gnomad_file))
+    monkeypatch.setattr(sys.modules[__name__], "GNOMAD_STORE", str(tmp_path / "store"))
+
+    # variant_dic을 수정하지 않고, 환자 변이의 값만 파일 순서대로 반환
+    gnomad_records = scan_gnomad({"1-138980-G-C", "1-69511-A-G"})
+    assert [
+        ("1-138980-G-C", (2, 134554, 1.48639e-05)),
+        ("1-138980-G-C", (0, 0, None)),
+    ] == gnomad_records
+
+    # 뒤의 record로 덮어쓰되, None 인 AF는 앞의 값을 유지한다.
+    df_col2idx = {"gnomad_ac": 0, "gnomad_an": 1, "gnomad_af": 2}
+    variant_dic = {"1-138980-G-C": {"ENST00000417324": {"var_infos": [0, 0, None]}}}
+    merge_gnomad_records(variant_dic, gnomad_records, df_col2idx)
+    assert [0, 0, 1.48639e-05] == variant_dic["1-138980-G-C"]["ENST00000417324"][
+        "var_infos"
+    ]
+
+
+def test_scan_vcf_position_keys():
+
+    long_chrom = b"HLA-DRB1*15:01:01:02"  # VCF_KEY_WINDOW 보다 긴 CHROM
+    chunk = (
+        b"#CHROM\tPOS\tID\tREF\tALT\n"
+        b"1\t138980\t.\tG\tC\n"
+        b"\n"
+        b"chrX\tabc\t.\tA\tT\n"
+        b"chr11\t5248232\t.\tT\tA\n" + long_chrom + b"\t31\t.\tA\tG"
+    )
+    line_starts, line_ends, keys = scan_vcf_position_keys(chunk)
+
+    assert [b"1\t138980\t.\tG\tC", b"", long_chrom + b"\t31\t.\tA\tG"] == [
+        chunk[line_starts[i] : line_ends[i]] for i in (1, 2, 5)
+    ]
+    assert [
+        -1,
+        (make_raw_chrom_code(b"1") << 32) | 138980,
+        -1,
+        -1,
+        (make_raw_chrom_code(b"chr11") << 32) | 5248232,
+        (make_raw_chrom_code(long_chrom) << 32) | 31,
+    ] == keys.tolist()
+
+
+def test_scan_gnomad_by_store(tmp_path, monkeypatch):
+
+    gnomad_file = tmp_path / "gnomad.vcf.gz"
+    with gzip.open(gnomad_file, "wt") as outfile:
+        outfile.write(
+            "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+            "1\t138980\trs796175332\tG\tC\t11050.36\tPASS\tAC=2;AN=134554;AF=1.48639e-05\n"
+            "1\t138980\trs796175332\tG\tA\t11050.36\tPASS\tAC=7;AN=134554;AF=5.20237e-05\n"
+            "1\t139253\trs1193670589\tG\tC\t1651.52\tPASS\tAC=1;AN=133560;AF=7.48727e-06\n"
+            "1\t138980\trs796175332\tG\tC\t4074.49\tPASS\tAC=0;AN=0\n"
+            "X\t2699555\t.\tC\tCA\t20.1\tPASS\tAC=3;AN=1000;AF=3.00000e-03\n"
+        )
+    store_dir = str(tmp_path / "store")
+    build_gnomad_store(str(gnomad_file), store_dir)
+    monkeypatch.setattr(sys.modules[__name__], "GNOMAD_DB", str(gnomad_file))
+    monkeypatch.setattr(sys.modules[__name__], "GNOMAD_STORE", store_dir)
+
+    var_ids = {
+        "1-138980-G-C",  # 같은 변이가 두 번: 마지막 record 사용
+        "1-138980-G-A",  # multi-allelic (같은 위치, 다른 alt)
+        "1-138980-G-T",  # 같은 위치, store에 없는 alt
+        "X-2699555-C-CA",
+        "22-16050075-A-G",  # store에 없는 염색체
+    }
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert is_store_current(store_dir, str(gnomad_file), "gnomad")
+        store_records = scan_gnomad(var_ids)
+    assert {
+        "1-138980-G-C": (0, 0, None),
+        "1-138980-G-A": (7, 134554, 5.20237e-05),
+        "X-2699555-C-CA": (3, 1000, 3.00000e-03),
+    } == dict(store_records)
+    assert dict(scan_gnomad_by_positions(var_ids, str(gnomad_file))) == dict(
+        store_records
+    )
+
+    # store를 만든 뒤 gnomad 파일이 바뀌면, 경고 후 파일을 검색한다.
+    with gzip.open(gnomad_file, "wt") as outfile:
+        outfile.write(
+            "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+            "1\t138980\trs796175332\tG\tA\t11050.36\tPASS\tAC=9;AN=134554;AF=6.68877e-05\n"
+        )
+    os.utime(gnomad_file, ns=(1, 1))
+    with pytest.warns(UserWarning, match="gnomad store"):
+        assert [("1-138980-G-A", (9, 134554, 6.68877e-05))] == scan_gnomad(var_ids)
 
 
 @pytest.mark.parametrize(
@@ -383,12 +548,45 @@ def test_assign_pm2bs1_rule(an, af, gene_symbol, disease_db_dic, expected):
     )
 
 
+@pytest.mark.parametrize(
+    "gene_symbol, expected",
+    [("RAG2", "AD"), ("RAG1", "AR"), ("ALX3", "XR"), ("VASN", "YD"), ("INO80", ""), ("BRCA2", "")],
+)
+def test_get_gene_inheritence(gene_symbol, disease_db_dic, expected):
+
+    disease_col2idx: dict = {
+        "title": 0,
+        "inheritance": 1,
+        "onsetAges": 2,
+        "symtoms_id": 3,
+        "symtoms": 4,
+    }
+
+    assert expected == get_gene_inheritence(
+        gene_symbol, disease_db_dic, disease_col2idx
+    )
+
+
+@pytest.mark.parametrize(
+    "gnomad_info, expected",
+    [
+        (
+            "AC=2;AN=134554;AF=1.48639e-05;rf_tp_probability=2.14504e-01;",
+            (2, 134554, 1.48639e-05),
+        ),
+        ("AC=0;AN=0;rf_tp_probability=7.78117e-01;FS=1.27600e+00;Inb", (0, 0, None)),
+        ("AC=3;AN=250896;AF=1.19571e-05", (3, 250896, 1.19571e-05)),
+    ],
+)
+def test_parse_gnomad_info(gnomad_info, expected):
+
+    assert expected == parse_gnomad_info(gnomad_info)
+
+
 #######################
 
 
-def add_gnomad_into_var_infos(
-    file: str, variant_dic: dict, df_col2idx: dict
-) -> dict:
+def add_gnomad_into_var_infos(variant_dic: dict, df_col2idx: dict) -> dict:
     """_summary_
     Note:
         gnomad.gz db의 용량이 매우 크므로(약 60~70gb), 다른 데이터베이스처럼 따로 저장하지 않고,
@@ -401,6 +599,11 @@ def add_gnomad_into_var_infos(
         있는지 확인한다. AN 값이 0인 경우, AF 값은 존재하지 않으므로, AF의 여부를 먼저 확인한 뒤, variant_id에
         해당하는 모든 variant_id-feature 에 gnomad_ac, an, af 값을 업데이트 한다. Default 값으로 None을 부여함.
 
+        gnomad 파일에 tabix index(.tbi/.csi)가 있는 경우에는 전체 파일을 읽지 않고, 환자 변이 위치만
+        검색한다(scan_gnomad_by_index()). npstore로 미리 변환한 gnomad store가 있는 경우에는
+        store를 memory-map 하여 검색한다(scan_gnomad_by_store()). 찾은 값은 따로 모은 뒤 한 번에
+        추가한다(scan_gnomad(), merge_gnomad_records()).
+
     Args:
         variant_dic (dict): class VariantDF.variant_dic
         df_col2idx (dict): DF column index dictionary
@@ -418,58 +621,7 @@ def add_gnomad_into_var_infos(
             '25/39', 'V/I', 'Gta/Ata', 'LMBR1L', 0.051, 240, 100000, 0.241109]
     """
 
-    # gnomad 각 라인 파징
-    with open(file) as infile:
-        for line in infile:
-            if line.startswith("#") and (not line.startswith("##")):
-                f_col2idx = {
-                    val: idx
-                    for idx, val in enumerate(
-                        line.strip("#").strip().split("\t")
-                    )
-                }
-                continue
-            if not line.startswith("#"):  # new gnomad variation
-                row = line.strip().split("\t")
-                chr = row[f_col2idx["CHROM"]]
-                pos = row[f_col2idx["POS"]]
-                ref = row[f_col2idx["REF"]]
-                alt = row[f_col2idx["ALT"]]
-                var_id = f"{chr}-{pos}-{ref}-{alt}"  # 1-985445-G-GT
-
-                # 환자 변이 정보에 gnomad ratio를 할당
-                if var_id in variant_dic:
-                    # ac, an, af 할당하는 과정. AN = 0 인 경우, AF가 없음.
-                    gnomad_ac = (
-                        row[f_col2idx["INFO"]].split("AC=")[1].split(";")[0]
-                    )
-                    gnomad_an = (
-                        row[f_col2idx["INFO"]].split("AN=")[1].split(";")[0]
-                    )
-                    if "AF=" in row[f_col2idx["INFO"]]:
-                        gnomad_af = (
-                            row[f_col2idx["INFO"]].split("AF=")[1].split(";")[0]
-                        )
-                    else:
-                        gnomad_af = None
-                    # 각 transcript 정보 리스트에 저장.
-                    for var_feature in variant_dic[var_id]:
-                        if gnomad_ac:
-                            variant_dic[var_id][var_feature]["var_infos"][
-                                df_col2idx["gnomad_ac"]
-                            ] = int(gnomad_ac)
-
-                        if gnomad_an:
-                            variant_dic[var_id][var_feature]["var_infos"][
-                                df_col2idx["gnomad_an"]
-                            ] = int(gnomad_an)
-
-                        if gnomad_af:
-                            variant_dic[var_id][var_feature]["var_infos"][
-                                df_col2idx["gnomad_af"]
-                            ] = float(gnomad_af)
-
-    return variant_dic
+    return merge_gnomad_records(variant_dic, scan_gnomad(variant_dic), df_col2idx)
 
 
 def assign_ba1_rule(gnomad_an: int, gnomad_af: float) -> int:
@@ -566,6 +718,71 @@ def compare_with_disease_inheritence(
     return (pm2, bs1)
 
 
+def get_gene_inheritence(
+    gene_symbol: str, disease_db_dic: dict, disease_col2idx: dict
+) -> str:
+    """_summary_
+    Note:
+        Gene_symbol을 키워드로 유전자-질병정보 dictionary의 정보를 확인하여, 해당 유전자의 inheritence를
+        반환한다. 각 유전자에 대한 질병 정보는, 여러 보고들을 포함하기 때문에 inheritence 정보가 다른 경우가 있다.
+        그 경우, 각각의 수를 세어서 dominant인지 recessive인지 비율로 기준을 정한다. 만약, X-linked 질환이
+        있다면, X-linked 질환을 우선으로 판정한다.
+
+    Args:
+        gene_symbol (str): gene_symbol
+        disease_db_dic (dict): 각 gene_symbol에 해당하는 질병들을 정리한 dictionary
+        disease_col2idx (dict): disease_db_dic의 각 column을 index로 변환하는 dictionary
+
+    Returns:
+        str: "AD", "AR", "XD", "XR", "YD" or "" (질병 정보 또는 inheritence 정보가 없는 경우)
+    """
+
+    if not disease_db_dic.get(gene_symbol):
+        return ""
+
+    AD_count, AR_count = 0, 0
+    XD_count, XR_count = 0, 0
+    Y_count = 0
+
+    # 같은 유전자에 여러 질병과, 여러 inheritence가 있는 경우, 모든 AD, AR counting
+    for each_disease_infos in disease_db_dic[gene_symbol]:
+        AD_count += each_disease_infos[disease_col2idx["inheritance"]].count(
+            "Autosomal dominant"
+        )
+
+        AR_count += each_disease_infos[disease_col2idx["inheritance"]].count(
+            "Autosomal recessive"
+        )
+
+        XD_count += each_disease_infos[disease_col2idx["inheritance"]].count(
+            "X-linked dominant"
+        )
+
+        XR_count += each_disease_infos[disease_col2idx["inheritance"]].count(
+            "X-linked recessive"
+        )
+
+        Y_count += each_disease_infos[disease_col2idx["inheritance"]].count(
+            "Y-linked"
+        )
+
+    # 보고된 비율이 더 많은 쪽을 inheritence로 설정.
+    # 같은 수인 경우 dominant로 설정하며, X-linked, Y-linked 우선.
+    if (XD_count + XR_count) > 0:
+        if XD_count >= XR_count:
+            return "XD"
+        else:
+            return "XR"
+    elif Y_count > 0:
+        return "YD"
+    elif AD_count == 0 and AR_count == 0:
+        return ""
+    elif AD_count >= AR_count:
+        return "AD"
+    else:
+        return "AR"
+
+
 def assign_pm2bs1_rule(
     gnomad_an: int,
     gnomad_af: float,
@@ -576,9 +793,7 @@ def assign_pm2bs1_rule(
     """_summary_
     Note:
         Gene_symbol을 키워드로 유전자-질병정보 dictionary의 정보를 확인하여, 해당 유전자의 inheritence를
-        확인한다. 각 유전자에 대한 질병 정보는, 여러 보고들을 포함하기 때문에 inheritence 정보가 다른 경우가 있다.
-        그 경우, 각각의 수를 세어서 dominant인지 recessive인지 비율로 기준을 정한다. 만약, X-linked 질환이
-        있다면, X-linked 질환을 우선으로 판정한다. 이후, inhertence에 따라 기준을 정해서 gnomad의 AF 정보를
+        확인한다(get_gene_inheritence()). 이후, inhertence에 따라 기준을 정해서 gnomad의 AF 정보를
         바탕으로 pm2, bs1 rule을 부여한다(compare_with_disease_inheritence()).
 
         disease_db_dic: {
@@ -592,8 +807,8 @@ def assign_pm2bs1_rule(
         gnomad_an (int): 특정 변이를 검사한 일반인 총 수
         gnomad_af (float): 특정 변이에 대해 일반인에서의 비율 (AC/AN)
         gene_symbol (str): gene_symbol
-        clinvar_db_dic (dict): gene_symbol 기준으로 정리된 clinvar_db
-        clinvar_col2idx (dict): column index dictionary
+        disease_db_dic (dict): 각 gene_symbol에 해당하는 질병들을 정리한 dictionary
+        disease_col2idx (dict): disease_db_dic의 각 column을 index로 변환하는 dictionary
 
     Returns:
         tuple(int, int): (pm2, bs1)
@@ -602,50 +817,8 @@ def assign_pm2bs1_rule(
 
     pm2, bs1 = 0, 0
 
-    if disease_db_dic.get(gene_symbol):
-
-        AD_count, AR_count = 0, 0
-        XD_count, XR_count = 0, 0
-        Y_count = 0
-
-        # 같은 유전자에 여러 질병과, 여러 inheritence가 있는 경우, 모든 AD, AR counting
-        for each_disease_infos in disease_db_dic[gene_symbol]:
-            AD_count += each_disease_infos[
-                disease_col2idx["inheritance"]
-            ].count("Autosomal dominant")
-
-            AR_count += each_disease_infos[
-                disease_col2idx["inheritance"]
-            ].count("Autosomal recessive")
-
-            XD_count += each_disease_infos[
-                disease_col2idx["inheritance"]
-            ].count("X-linked dominant")
-
-            XR_count += each_disease_infos[
-                disease_col2idx["inheritance"]
-            ].count("X-linked recessive")
-
-            Y_count += each_disease_infos[disease_col2idx["inheritance"]].count(
-                "Y-linked"
-            )
-
-        # 보고된 비율이 더 많은 쪽을 inheritence로 설정.
-        # 같은 수인 경우 dominant로 설정하며, X-linked 우선.
-        if (XD_count + XR_count) > 0:
-            if XD_count >= XR_count:
-                inheritence = "XD"
-            else:
-                inheritence = "XR"
-        elif Y_count > 0:
-            inheritence = "YD"
-        elif AD_count == 0 and AR_count == 0:
-            return (pm2, bs1)
-        elif AD_count >= AR_count:
-            inheritence = "AD"
-        else:
-            inheritence = "AR"
-
+    inheritence = get_gene_inheritence(gene_symbol, disease_db_dic, disease_col2idx)
+    if inheritence:
         # pm2, bs1 할당
         pm2, bs1 = compare_with_disease_inheritence(
             gnomad_an, gnomad_af, inheritence
@@ -655,7 +828,10 @@ def assign_pm2bs1_rule(
 
 
 def execute(
-    proband_var_df: object, disease_db_dic: dict, disease_col2idx: dict
+    proband_var_df: object,
+    disease_db_dic: dict,
+    disease_col2idx: dict,
+    annotate: bool = True,
 ) -> object:
     """_summary_
     Note: ACMG rule 중에서, pm2/ba1/bs1 에 해당하는 룰을 구현한 모듈이다. 각각의 rule에 대한 설명은 다음과 같다.
@@ -688,11 +864,15 @@ def execute(
         pm2, bs1 rule을 부여한다(assign_pm2bs1_rule()). 이 때, gene symbol이 없으면 해당하는 disease를 확인할 수
         없으므로, gene_symbol이 있는 경우에만 본 함수를 수행한다. 본 함수에 사용한 cut off 값은 여러 레퍼런스를 참고하여
         결정하였다. 이 때, 질환마다 동일한 기준을 적용하였다. (각 함수 설명 참고)
+        같은 유전자의 여러 transcript는 (gnomad_an, gnomad_af, gene_symbol)이 같으므로, 결과를 LRU cache
+        (memo.LruMemo)에 저장해 두고 다시 사용한다.
 
     Args:
         proband_var_df (object): Class VariantDF <- VEP file
         disease_db_dic (dict): 각 gene_symbol에 해당하는 질병들을 정리한 dictionary. 여러개의 질병은 []로 구분.
         disease_col2idx (dict): disease_db_dic의 각 column을 index로 변환하는 dictionary
+        annotate (bool): False 이면 gnomad 값을 variant_infos에 추가하는 과정을 생략한다.
+            (main() 에서 미리 추가한 뒤, 염색체 별로 나누어 병렬 실행하는 경우)
 
     Returns:
         object: proband_variant_DF의 variant_dic["evidnece_score_dic"]이 update된 object.
@@ -706,7 +886,9 @@ def execute(
 
     df_col2idx = proband_var_df.df_col2idx
     variant_dic = proband_var_df.variant_dic
-    variant_dic = add_gnomad_into_var_infos(variant_dic, df_col2idx)
+    if annotate:  # 이미 gnomad 값이 추가된 경우 생략
+        variant_dic = add_gnomad_into_var_infos(variant_dic, df_col2idx)
+    pm2bs1_memo = memo.LruMemo("pm2bs1")  # {(gnomad_an, gnomad_af, gene_symbol): (pm2, bs1)}
 
     for var_id in variant_dic:
         for var_feature in variant_dic[var_id]:
@@ -729,7 +911,9 @@ def execute(
 
                 if gene_symbol != "-":
                     if not ba1:  # ba1이 이미 할당된 경우, pm2, bs1 not assigned
-                        pm2, bs1 = assign_pm2bs1_rule(
+                        pm2, bs1 = pm2bs1_memo.get(
+                            (gnomad_an, gnomad_af, gene_symbol),
+                            assign_pm2bs1_rule,
                             gnomad_an,
                             gnomad_af,
                             gene_symbol,
@@ -746,3 +930,1061 @@ def execute(
     proband_var_df.variant_dic = variant_dic
 
     return proband_var_df
+
+
+def parse_gnomad_info(gnomad_info: str) -> tuple:
+    """_summary_
+    Note:
+        gnomad INFO 란에서 AC, AN, AF 값을 찾아 반환한다. AN 값이 0인 경우, AF 값은 존재하지 않으므로
+        AF의 여부를 먼저 확인한다. 값이 없는 항목은 None 으로 반환한다.
+
+    Args:
+        gnomad_info (str): AC=3;AN=2000;AF=0.0015;...
+
+    Returns:
+        tuple: (ac, an, af)
+
+    Examples:
+        >>> "AC=2;AN=134554;AF=1.48639e-05;rf_tp_probability=2.14504e-01;" -> (2, 134554, 1.48639e-05)
+            "AC=0;AN=0;rf_tp_probability=7.78117e-01;" -> (0, 0, None)
+    """
+
+    # ac, an, af 할당하는 과정. AN = 0 인 경우, AF가 없음.
+    gnomad_ac = gnomad_info.split("AC=")[1].split(";")[0]
+    gnomad_an = gnomad_info.split("AN=")[1].split(";")[0]
+    if "AF=" in gnomad_info:
+        gnomad_af = gnomad_info.split("AF=")[1].split(";")[0]
+    else:
+        gnomad_af = None
+
+    return (
+        int(gnomad_ac) if gnomad_ac else None,
+        int(gnomad_an) if gnomad_an else None,
+        float(gnomad_af) if gnomad_af else None,
+    )
+
+
+def scan_gnomad(var_ids: object) -> list:
+    """_summary_
+    Note:
+        gnomad 파일에서 환자 변이의 (ac, an, af) 값을 찾아 파일 순서대로 반환한다. variant_dic을 수정하지 않고
+        결과를 따로 모으므로, REVEL 검색(pp3bp4bp7.scan_revel())과 다른 thread에서 동시에 실행한 뒤
+        merge_gnomad_records()로 합칠 수 있다.
+
+        GNOMAD_DB로 미리 만들어둔 store가 있으면 store에서 검색하고(scan_gnomad_by_store()), tabix index가
+        있으면 환자 변이 위치만 검색한다(scan_gnomad_by_index()). 둘 다 없으면 전체 파일을 읽으면서, 환자
+        변이 위치에 해당하는 줄만 parsing 한다(scan_gnomad_by_positions()). store가 다른 파일 (또는 바뀌기
+        전의 GNOMAD_DB)로 만들어진 경우에는 경고를 출력하고 store를 사용하지 않는다.
+
+    Args:
+        var_ids (object): 환자 var_id 목록 (variant_dic, set 등 in 으로 검색할 수 있는 object)
+
+    Returns:
+        list: [(var_id, (ac, an, af)), ..]
+    """
+
+    if npstore.is_store_current(GNOMAD_STORE, GNOMAD_DB, "gnomad"):
+        return scan_gnomad_by_store(var_ids, GNOMAD_STORE)
+    if tabix.find_tabix_index(GNOMAD_DB):
+        return scan_gnomad_by_index(var_ids, GNOMAD_DB)
+
+    return scan_gnomad_by_positions(var_ids, GNOMAD_DB)
+
+
+def scan_gnomad_by_positions(var_ids: object, gnomad_file: str) -> list:
+    """_summary_
+    Note:
+        index 없이 gnomad 파일 전체를 chunk 단위로 읽되, 환자 변이 위치에 해당하는 line만 parsing 한다.
+        환자 변이의 (염색체, 위치)로 정렬된 위치 key 배열을 만들어 두고, chunk의 각 line에서는 CHROM, POS만
+        numpy로 읽어 key를 만든 뒤 (npstore.scan_vcf_position_keys()) np.searchsorted로 한 번에 검색한다.
+        위치가 같은 line만 decode 하여 나누고, var_id (ref, alt 포함)가 같은지 확인한다.
+
+        gnomAD VCF는 고정된 column 순서(CHROM, POS, ID, REF, ALT, ..)를 가지므로, header는 INFO column의
+        위치를 찾는 데만 사용한다.
+
+    Args:
+        var_ids (object): 환자 var_id 목록 (variant_dic, set 등)
+        gnomad_file (str): gnomad vcf(.gz) file address
+
+    Returns:
+        list: [(var_id, (ac, an, af)), ..]
+    """
+
+    query_keys = []
+    for var_id in var_ids:
+        chrom, pos = var_id.split("-")[:2]
+        if chrom and pos.isdigit():
+            query_keys.append(
+                (npstore.make_raw_chrom_code(chrom.encode()) << 32) | int(pos)
+            )
+    query_keys = np.unique(np.array(query_keys, dtype=np.int64))
+
+    gnomad_records = []
+    if not len(query_keys):
+        return gnomad_records
+
+    info_idx = 7
+    for chunk in dbparser.read_chunks(gnomad_file):
+        # header line ("#CHROM ..")이 있는 chunk (파일의 처음)
+        if b"#" in chunk and (chunk.startswith(b"#") or b"\n#" in chunk):
+            for line in chunk.split(b"\n"):
+                if line.startswith(b"#") and not line.startswith(b"##"):
+                    header = line.decode().strip("#").strip().split("\t")
+                    info_idx = header.index("INFO")
+
+        line_starts, line_ends, keys = npstore.scan_vcf_position_keys(chunk)
+        key_idx = np.minimum(np.searchsorted(query_keys, keys), len(query_keys) - 1)
+        for i in np.flatnonzero(query_keys[key_idx] == keys):
+            row = chunk[line_starts[i] : line_ends[i]].decode().strip().split("\t")
+            var_id = f"{row[0]}-{row[1]}-{row[3]}-{row[4]}"
+
+            # 환자 변이 정보에 gnomad ratio를 할당
+            if var_id in var_ids:
+                gnomad_records.append((var_id, parse_gnomad_info(row[info_idx])))
+
+    return gnomad_records
+
+
+def scan_gnomad_by_store(var_ids: object, gnomad_store_dir: str) -> list:
+    """_summary_
+    Note:
+        npstore.build_gnomad_store()로 미리 만들어 둔 gnomad store (정렬된 위치 key, AC, AN, AF column)를
+        memory-map 으로 읽고, 환자의 모든 변이를 한 번에 검색(np.searchsorted)하여 gnomad_ac, an, af 값을
+        찾는다. INFO 문자열을 parsing 하지 않으므로, 전체 파일을 읽는 것보다 훨씬 빠르다.
+
+    Args:
+        var_ids (object): 환자 var_id 목록 (variant_dic, set 등)
+        gnomad_store_dir (str): gnomad store directory address
+
+    Returns:
+        list: [(var_id, (ac, an, af)), ..]
+    """
+
+    gnomad_store = npstore.load_store(gnomad_store_dir)
+    gnomad_dic = npstore.query_gnomad_store(gnomad_store, list(var_ids))
+
+    return list(gnomad_dic.items())
+
+
+def merge_gnomad_records(
+    variant_dic: dict, gnomad_records: list, df_col2idx: dict
+) -> dict:
+    """_summary_
+    Note:
+        scan_gnomad()로 찾은 값을 순서대로 variant_infos의 gnomad_ac, an, af 항목에 저장한다. 같은 변이의
+        record가 여러 개이면, 파일을 읽으면서 바로 저장하는 것과 같도록 뒤의 값으로 덮어쓴다 (None 제외).
+
+    Args:
+        variant_dic (dict): class VariantDF.variant_dic
+        gnomad_records (list): [(var_id, (ac, an, af)), ..]
+        df_col2idx (dict): DF column index dictionary
+
+    Returns:
+        dict: gnomad 값이 update된 variant_dic
+    """
+
+    for var_id, gnomad_values in gnomad_records:
+        update_gnomad_var_infos(variant_dic, var_id, gnomad_values, df_col2idx)
+
+    return variant_dic
+
+
+def update_gnomad_var_infos(
+    variant_dic: dict, var_id: str, gnomad_values: tuple, df_col2idx: dict
+):
+    """_summary_
+    Note:
+        variant_id에 해당하는 모든 variant_id-feature의 var_infos에 gnomad ac, an, af 값을 저장한다.
+        값이 None 인 항목은 default 값을 유지한다.
+
+    Args:
+        variant_dic (dict): class VariantDF.variant_dic
+        var_id (str): 1-985445-G-GT
+        gnomad_values (tuple): (ac, an, af)
+        df_col2idx (dict): DF column index dictionary
+    """
+
+    gnomad_ac, gnomad_an, gnomad_af = gnomad_values
+    # 각 transcript 정보 리스트에 저장.
+    for var_feature in variant_dic[var_id]:
+        var_infos = variant_dic[var_id][var_feature]["var_infos"]
+        if gnomad_ac is not None:
+            var_infos[df_col2idx["gnomad_ac"]] = gnomad_ac
+        if gnomad_an is not None:
+            var_infos[df_col2idx["gnomad_an"]] = gnomad_an
+        if gnomad_af is not None:
+            var_infos[df_col2idx["gnomad_af"]] = gnomad_af
+
+
+STORE_VERSION = 1
+
+
+def save_store(out_dir: str, columns: dict, meta: dict):
+    """_summary_
+    Note:
+        column 별 numpy array를 out_dir 에 각각 .npy 파일로 저장하고, 염색체 이름 등 부가 정보는
+        meta.json 에 저장한다. 저장된 store는 load_store()로 memory-map 하여 읽는다.
+
+    Args:
+        out_dir (str): store directory address
+        columns (dict): {"column_name": np.ndarray}
+        meta (dict): {"chroms": ["1", "2", ..], ...}
+    """
+
+    os.makedirs(out_dir, exist_ok=True)
+    for col_name, values in columns.items():
+        np.save(os.path.join(out_dir, f"{col_name}.npy"), values)
+
+    meta = dict(meta, version=STORE_VERSION, columns=list(columns))
+    with open(os.path.join(out_dir, "meta.json"), "w") as outfile:
+        json.dump(meta, outfile)
+
+
+def load_store(store_dir: str) -> dict:
+    """_summary_
+    Note:
+        save_store()로 저장된 store를 memory-map 으로 읽는다. 실제 data는 검색 시에 필요한 부분만
+        disk에서 읽히며, 여러 process가 동시에 읽더라도 page cache를 공유한다.
+
+    Args:
+        store_dir (str): store directory address
+
+    Returns:
+        dict: {"meta": {..}, "chrom2code": {"1": 0, ..}, "column_name": np.memmap, ..}
+    """
+
+    with open(os.path.join(store_dir, "meta.json")) as infile:
+        meta = json.load(infile)
+    if meta.get("version") != STORE_VERSION:
+        raise ValueError(f"unsupported store version: {store_dir}")
+
+    store = {
+        "meta": meta,
+        "chrom2code": {chrom: idx for idx, chrom in enumerate(meta["chroms"])},
+    }
+    for col_name in meta["columns"]:
+        store[col_name] = np.load(
+            os.path.join(store_dir, f"{col_name}.npy"), mmap_mode="r"
+        )
+
+    return store
+
+
+def make_source_key(source_file: str, db: str) -> list:
+    """_summary_
+    Note:
+        store를 만든 원본 파일의 key. dbcache.make_cache_key()와 같이 절대 경로, 수정 시간(mtime), 크기로
+        만들며, meta.json 에 "source_key"로 저장한다 (json 이므로 list).
+
+    Returns:
+        list: [cache_version, abs_path, mtime_ns, size, "npstore.gnomad"]
+    """
+
+    return list(dbcache.make_cache_key(source_file, f"npstore.{db}"))
+
+
+def is_store_current(store_dir: str, source_file: str, db: str) -> bool:
+    """_summary_
+    Note:
+        store_dir에 source_file로 만든 store가 있으면 True를 반환한다. meta.json 에 저장된 원본 파일의 key
+        (make_source_key())가 현재 source_file의 key와 다르면 (다른 파일, 또는 store를 만든 뒤 바뀐 파일)
+        경고를 출력하고 False를 반환하므로, 오래된 store의 값을 사용하지 않고 원본 파일을 검색한다.
+        원본 파일 없이 store만 있는 경우에는, 같은 경로의 파일로 만든 store 이면 사용한다.
+
+    Args:
+        store_dir (str): store directory address
+        source_file (str): 원본 database file address (GNOMAD_DB 등)
+        db (str): "gnomad" or "revel"
+
+    Returns:
+        bool: store를 사용할 수 있으면 True
+    """
+
+    if not os.path.isdir(store_dir):
+        return False
+
+    try:
+        with open(os.path.join(store_dir, "meta.json")) as infile:
+            meta = json.load(infile)
+    except (OSError, ValueError):
+        meta = dict()
+
+    source_key = meta.get("source_key")
+    if meta.get("version") != STORE_VERSION or meta.get("db") != db or not source_key:
+        is_current = False
+    elif os.path.exists(source_file):
+        is_current = source_key == make_source_key(source_file, db)
+    else:
+        is_current = source_key[1] == os.path.abspath(source_file)
+
+    if not is_current:
+        warnings.warn(
+            f"{db} store {store_dir} was not built from the current {source_file}; "
+            "ignoring the store (rebuild it with python -m ACMG.helper.npstore "
+            f"build-{db})"
+        )
+
+    return is_current
+
+
+def reorder_varlen_column(offsets, values, order) -> tuple:
+    """_summary_
+    Note:
+        가변 길이 문자열 column (이어붙인 bytes 와 각 record의 시작 위치 offsets)을 order 순으로
+        재배열한다.
+
+    Returns:
+        tuple: (new_offsets, new_values)
+    """
+
+    lengths = np.diff(offsets)[order]
+    new_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    gather_idx = np.repeat(
+        offsets[:-1][order] - new_offsets[:-1], lengths
+    ) + np.arange(new_offsets[-1], dtype=np.int64)
+
+    return (new_offsets, values[gather_idx])
+
+
+def sort_store_columns(keys, columns: dict, varlen_columns: dict) -> dict:
+    """_summary_
+    Note:
+        key 순으로 모든 column을 정렬한다. 가변 길이 문자열 column ("alleles" 등)도 같은 순서로
+        재배열하여 "{name}_offsets", "{name}" column으로 저장한다. 같은 key 안에서는 원래 파일의
+        순서를 유지한다(stable sort).
+
+    Args:
+        keys (np.ndarray): make_position_key()로 만든 위치 key
+        columns (dict): {"column_name": np.ndarray}
+        varlen_columns (dict): {"column_name": (offsets(np.ndarray), values(np.ndarray))}
+
+    Returns:
+        dict: {"key": sorted keys, "column_name": sorted values, ..}
+    """
+
+    order = np.argsort(keys, kind="stable")
+    sorted_columns = {"key": keys[order]}
+    for col_name, values in columns.items():
+        sorted_columns[col_name] = values[order]
+    for col_name, (offsets, values) in varlen_columns.items():
+        (
+            sorted_columns[f"{col_name}_offsets"],
+            sorted_columns[col_name],
+        ) = reorder_varlen_column(offsets, values, order)
+
+    return sorted_columns
+
+
+def get_varlen_value(store: dict, col_name: str, record_idx: int) -> str:
+    """가변 길이 문자열 column에서 record_idx 번째 값을 str로 반환한다."""
+
+    offsets = store[f"{col_name}_offsets"]
+    start, end = offsets[record_idx], offsets[record_idx + 1]
+
+    return store[col_name][start:end].tobytes().decode()
+
+
+def search_store(store: dict, var_ids: list) -> dict:
+    """_summary_
+    Note:
+        var_id (chrom-pos-ref-alt) 목록을 store에서 한 번에 검색한다. 위치 key는 정렬되어 있으므로
+        np.searchsorted로 각 변이 위치에 해당하는 record 범위를 찾고, 범위 안에서 ref-alt가 같은 record를
+        찾는다(한 위치에 보통 1~3개의 allele만 존재).
+
+    Args:
+        store (dict): load_store()로 읽은 store
+        var_ids (list): ["1-985445-G-GT", ..]
+
+    Returns:
+        dict: {var_id: [record index, ..]} (store에 있는 변이만 포함, 파일 순서)
+    """
+
+    chrom2code = store["chrom2code"]
+    query_ids, chrom_codes, positions = [], [], []
+    for var_id in var_ids:
+        chrom, pos = var_id.split("-")[:2]
+        if chrom in chrom2code and pos.isdigit():
+            query_ids.append(var_id)
+            chrom_codes.append(chrom2code[chrom])
+            positions.append(int(pos))
+
+    hit_dic = dict()
+    if not query_ids:
+        return hit_dic
+
+    query_keys = make_position_key(chrom_codes, positions)
+    lefts = np.searchsorted(store["key"], query_keys, side="left")
+    rights = np.searchsorted(store["key"], query_keys, side="right")
+
+    for i in np.flatnonzero(rights > lefts):
+        var_id = query_ids[i]
+        # "ref-alt" 부분. 1-985445-G-GT -> "G-GT"
+        query_allele = var_id.split("-", 2)[2]
+        for record_idx in range(lefts[i], rights[i]):
+            if get_varlen_value(store, "alleles", record_idx) == query_allele:
+                hit_dic.setdefault(var_id, []).append(int(record_idx))
+
+    return hit_dic
+
+
+# scan_vcf_position_keys()에서 CHROM, POS를 찾는 line 앞부분의 크기 (byte)
+VCF_KEY_WINDOW = 16
+
+
+def make_position_key(chrom_codes, positions):
+    """(염색체 code, 위치)를 하나의 정렬 가능한 int64 key로 변환한다. code << 32 | pos"""
+
+    return (np.asarray(chrom_codes, dtype=np.int64) << 32) | np.asarray(
+        positions, dtype=np.int64
+    )
+
+
+def make_raw_chrom_code(chrom: bytes) -> int:
+    """_summary_
+    Note:
+        염색체 이름 (bytes)의 길이와 마지막 두 글자로 code를 만든다 (scan_vcf_position_keys()와 같은 방식).
+        e.g. b"1" -> (1, 0, "1"), b"chr11" -> (5, "1", "1"). 서로 다른 이름이 같은 code를 가질 수 있으므로
+        (e.g. GL000192.1, GL000202.1), code로 찾은 record는 var_id로 다시 확인해야 한다.
+    """
+
+    prev = chrom[-2] if len(chrom) > 1 else 0
+
+    return (len(chrom) << 16) | (prev << 8) | chrom[-1]
+
+
+def scan_vcf_position_keys(chunk: bytes) -> tuple:
+    """_summary_
+    Note:
+        VCF chunk (완전한 line 들, dbparser.read_chunks())의 각 line에서 CHROM, POS만 읽어, line 마다
+        make_position_key() 형식의 위치 key (make_raw_chrom_code() << 32 | pos)를 numpy로 한 번에 만든다.
+        line을 나누거나 decode 하지 않고, line의 앞 VCF_KEY_WINDOW byte 에서 두 tab의 위치를 찾으므로,
+        환자 변이 위치가 아닌 대부분의 line은 몇 번의 정수 연산만으로 건너뛸 수 있다. CHROM, POS가 이보다
+        긴 line은 따로 나누어 읽는다. header ("#"), 빈 line, POS가 숫자가 아닌 line의 key는 -1 이다.
+
+    Args:
+        chunk (bytes): VCF data
+
+    Returns:
+        tuple: (line_starts, line_ends, keys) (np.ndarray). line i = chunk[line_starts[i]:line_ends[i]]
+    """
+
+    data = np.frombuffer(chunk, dtype=np.uint8)
+    line_ends = np.flatnonzero(data == 10)
+    if not chunk.endswith(b"\n"):
+        line_ends = np.append(line_ends, len(data))
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1)).astype(np.int64)
+    keys = np.full(len(line_starts), -1, dtype=np.int64)
+
+    # line 마다 앞 VCF_KEY_WINDOW byte (line 밖은 줄바꿈으로 채움)
+    offsets = line_starts[:, None] + np.arange(VCF_KEY_WINDOW)
+    window = np.where(
+        offsets < line_ends[:, None], data[np.minimum(offsets, len(data) - 1)], 10
+    )
+    is_tab = window == 9
+    tab1 = is_tab.argmax(axis=1)
+    is_tab[np.arange(len(tab1)), tab1] = False
+    tab2 = is_tab.argmax(axis=1)
+
+    # CHROM \t POS \t 가 window 안에 있는 line
+    found = (tab2 > tab1) & (window[:, 0] != ord("#"))
+    pos_lengths = tab2 - tab1 - 1
+    positions = np.zeros(len(line_starts), dtype=np.int64)
+    is_digit = found & (tab1 > 0) & (pos_lengths > 0)
+    for k in range(int(pos_lengths[found].max()) if found.any() else 0):
+        has_digit = k < pos_lengths
+        digits = window[np.arange(len(tab1)), np.minimum(tab1 + 1 + k, VCF_KEY_WINDOW - 1)]
+        digits = digits.astype(np.int64) - 48
+        is_digit &= ~has_digit | ((digits >= 0) & (digits <= 9))
+        positions = np.where(has_digit, positions * 10 + digits, positions)
+
+    # CHROM: make_raw_chrom_code()
+    rows = np.arange(len(tab1))
+    prev = np.where(tab1 > 1, window[rows, np.maximum(tab1 - 2, 0)], 0).astype(np.int64)
+    last = window[rows, np.maximum(tab1 - 1, 0)].astype(np.int64)
+    chrom_codes = (tab1.astype(np.int64) << 16) | (prev << 8) | last
+    keys[is_digit] = make_position_key(chrom_codes[is_digit], positions[is_digit])
+
+    # window 보다 긴 CHROM, POS (드묾)
+    for i in np.flatnonzero(~found & (window[:, 0] != ord("#")) & (window[:, 0] != 10)):
+        row = chunk[line_starts[i] : line_ends[i]].split(b"\t", 2)
+        if len(row) > 2 and row[0] and row[1].isdigit():
+            keys[i] = (make_raw_chrom_code(row[0]) << 32) | int(row[1])
+
+    return (line_starts, line_ends, keys)
+
+
+def build_gnomad_store(gnomad_file: str, out_dir: str):
+    """_summary_
+    Note:
+        gnomad sites vcf (약 60~70gb)를 한 번 읽어서, 변이 위치와 AC, AN, AF 값만 column 별 numpy array로
+        저장한다. INFO 란의 나머지 정보는 저장하지 않으므로, 매 실행마다 큰 INFO 문자열을 parsing 할 필요가 없다.
+        AN 값이 0 이어서 AF 값이 없는 경우에는 NaN을 저장한다.
+        meta.json 에는 원본 파일의 key (make_source_key())를 저장하여, 원본 파일이 바뀌면 store를 사용하지
+        않는다 (is_store_current()).
+
+        - key (int64): 염색체 code << 32 | pos, 오름차순 정렬
+        - ac, an (int32), af (float64)
+        - alleles (uint8), alleles_offsets (int64): "ref-alt" 문자열을 이어붙인 bytes 와 각 record의 시작 위치
+
+    Args:
+        gnomad_file (str): gnomad vcf.gz file address
+        out_dir (str): store directory address
+    """
+
+    chroms: list = []
+    chrom2code: dict = dict()
+    keys, acs, ans = array.array("q"), array.array("i"), array.array("i")
+    afs = array.array("d")
+    allele_offsets = array.array("q", [0])
+    alleles = bytearray()
+
+    # CHROM POS ID REF ALT QUAL FILTER INFO
+    for batch in dbparser.RecordBatchReader(
+        gnomad_file, header=None, comment="#", max_split=8
+    ):
+        for row in batch:
+            chrom, pos, ref, alt, info = row[0], row[1], row[3], row[4], row[7]
+            if chrom not in chrom2code:
+                chrom2code[chrom] = len(chroms)
+                chroms.append(chrom)
+
+            keys.append((chrom2code[chrom] << 32) | int(pos))
+            acs.append(int(info.split("AC=")[1].split(";")[0]))
+            ans.append(int(info.split("AN=")[1].split(";")[0]))
+            if "AF=" in info:
+                gnomad_af = info.split("AF=")[1].split(";")[0]
+                afs.append(float(gnomad_af) if gnomad_af else np.nan)
+            else:
+                afs.append(np.nan)
+
+            alleles += f"{ref}-{alt}".encode()
+            allele_offsets.append(len(alleles))
+
+    columns = sort_store_columns(
+        np.frombuffer(keys, dtype=np.int64),
+        {
+            "ac": np.frombuffer(acs, dtype=np.int32),
+            "an": np.frombuffer(ans, dtype=np.int32),
+            "af": np.frombuffer(afs, dtype=np.float64),
+        },
+        {
+            "alleles": (
+                np.frombuffer(allele_offsets, dtype=np.int64),
+                np.frombuffer(bytes(alleles), dtype=np.uint8),
+            )
+        },
+    )
+
+    save_store(
+        out_dir,
+        columns,
+        {
+            "source": os.path.abspath(gnomad_file),
+            "source_key": make_source_key(gnomad_file, "gnomad"),
+            "chroms": chroms,
+            "db": "gnomad",
+        },
+    )
+
+
+def query_gnomad_store(store: dict, var_ids: list) -> dict:
+    """_summary_
+    Note:
+        gnomad store에서 환자의 변이 목록에 해당하는 AC, AN, AF 값을 한 번에 검색한다. 같은 변이가
+        여러 번 있는 경우, 원래 파일을 순서대로 읽을 때와 같이 마지막 record의 값을 사용한다.
+
+    Args:
+        store (dict): load_store()로 읽은 gnomad store
+        var_ids (list): ["1-985445-G-GT", ..]
+
+    Returns:
+        dict: {var_id: (ac, an, af)}. af 값이 없으면 None
+
+    Examples:
+        >>> {"1-138980-G-C": (2, 134554, 1.48639e-05), "1-970680-C-T": (0, 0, None)}
+    """
+
+    gnomad_dic = dict()
+    for var_id, record_idxs in search_store(store, var_ids).items():
+        record_idx = record_idxs[-1]
+        gnomad_af = float(store["af"][record_idx])
+        gnomad_dic[var_id] = (
+            int(store["ac"][record_idx]),
+            int(store["an"][record_idx]),
+            None if np.isnan(gnomad_af) else gnomad_af,
+        )
+
+    return gnomad_dic
+
+
+# gz 파일의 압축 해제에 사용하는 thread 수 (BGZF 파일만 나누어 해제할 수 있다)
+GZ_READ_THREADS = min(4, os.cpu_count() or 1)
+# 한 번에 (thread 하나가) 압축을 해제하는 BGZF block 수. block 당 최대 64kb 이므로 약 1mb
+GZ_CHUNK_BLOCKS = 16
+# 압축되지 않은 파일을 chunk 단위로 읽을 때, 한 번에 읽는 크기 (byte). chunk의 record를 한꺼번에
+# 만들어 두므로, CPU cache를 크게 벗어나지 않는 크기가 더 빠르다.
+READ_CHUNK_SIZE = 1 << 20
+# BGZF block 하나에 저장하는 최대 data 크기 (bgzip과 같음)
+BGZF_BLOCK_SIZE = 0xFF00
+
+
+def read_gz_chunks(filename: str, threads: int = None) -> bytes:
+    """_summary_
+    Note:
+        gz 압축 file을 line 경계로 나눈 chunk (bytes, 여러 line) 단위로 반환한다. BGZF 파일은 여러 thread에서
+        block의 압축을 해제한다 (read_gz_data()). chunk는 파일 순서대로 반환하며, 마지막 chunk를 제외하면
+        항상 줄바꿈으로 끝난다.
+
+    Args:
+        filename (str): gz file address
+        threads (int): 압축 해제 thread 수. None 이면 GZ_READ_THREADS
+
+    Yields:
+        chunk (bytes): 완전한 line 들로 이루어진 data
+    """
+
+    threads = max(1, GZ_READ_THREADS if threads is None else threads)
+
+    return split_line_chunks(read_gz_data(filename, threads))
+
+
+def read_gz_data(filename: str, threads: int) -> bytes:
+    """_summary_
+    Note:
+        gz 파일의 압축을 해제한 data를 파일 순서대로 반환한다. line 경계와는 맞지 않는다.
+
+        BGZF (bgzip) 파일은 block 마다 독립적으로 압축되어 있으므로, 압축된 block을 GZ_CHUNK_BLOCKS 개씩
+        순서대로 읽어서 thread pool 에서 압축을 해제한다. 메모리를 제한하기 위해 thread 수의 2배 까지만
+        미리 해제하며, 결과는 제출한 순서대로 반환한다. 일반 gzip 파일은 나눌 수 없으므로 gzip 으로
+        한 번에 크게 읽는다.
+
+    Args:
+        filename (str): gz file address
+        threads (int): 압축 해제 thread 수
+
+    Yields:
+        bytes: 압축을 해제한 data
+    """
+
+    if not tabix.is_bgzf_file(filename):
+        with gzip.open(filename, "rb") as infile:
+            while True:
+                data = infile.read(GZ_CHUNK_BLOCKS * tabix.BGZF_BLOCK_SIZE)
+                if not data:
+                    break
+                yield data
+        return
+
+    with open(filename, "rb") as infile, ThreadPoolExecutor(
+        max_workers=threads
+    ) as executor:
+        pending = deque()
+        while True:
+            blocks = []
+            while len(blocks) < GZ_CHUNK_BLOCKS:
+                block = tabix.read_raw_bgzf_block(infile)
+                if not block:
+                    break
+                blocks.append(block)
+            if blocks:
+                pending.append(executor.submit(inflate_bgzf_blocks, blocks))
+            if pending and (not blocks or len(pending) >= threads * 2):
+                yield pending.popleft().result()
+            elif not blocks:
+                break
+
+
+def inflate_bgzf_blocks(blocks: list) -> bytes:
+    """BGZF block 들의 압축을 해제하여 하나의 bytes로 반환한다. (thread pool 작업 단위)"""
+
+    return b"".join([tabix.inflate_bgzf_block(block) for block in blocks])
+
+
+def split_line_chunks(data_iter: object) -> bytes:
+    """_summary_
+    Note:
+        순서대로 주어지는 data를 line 경계에서 다시 나눈다. 각 data의 마지막 줄바꿈 뒤에 남은 부분은
+        다음 data 앞에 붙인다.
+
+    Args:
+        data_iter (object): bytes data iterator (e.g. read_gz_data())
+
+    Yields:
+        chunk (bytes): 완전한 line 들로 이루어진 data. 마지막 chunk는 줄바꿈으로 끝나지 않을 수 있다.
+    """
+
+    rest = b""
+    for data in data_iter:
+        end = data.rfind(b"\n") + 1
+        if not end:  # line이 chunk 보다 긴 경우
+            rest += data
+            continue
+        if rest or end < len(data):
+            yield b"".join([rest, memoryview(data)[:end]])
+        else:
+            yield data
+        rest = data[end:]
+    if rest:
+        yield rest
+
+
+def read_chunks(filename: str) -> bytes:
+    """_summary_
+    Note:
+        file을 line 경계로 나눈 chunk (bytes, 여러 line) 단위로 반환한다. gz (gzip, bgzip) 파일은
+        read_gz_chunks()로 압축을 해제하고, 그 외에는 READ_CHUNK_SIZE 씩 읽는다.
+
+    Args:
+        filename (str): file address
+
+    Yields:
+        chunk (bytes): 완전한 line 들로 이루어진 data
+    """
+
+    if filename.endswith((".gz", ".bgz")):
+        yield from read_gz_chunks(filename)
+        return
+
+    with open(filename, "rb") as infile:
+        yield from split_line_chunks(iter(lambda: infile.read(READ_CHUNK_SIZE), b""))
+
+
+# gc_paused() 가 GC를 멈춘 횟수와, 처음 멈추기 전의 GC 상태 (여러 thread가 함께 사용한다)
+_GC_PAUSE_LOCK = threading.Lock()
+_gc_pause_count = 0
+_gc_was_enabled = False
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """_summary_
+    Note:
+        수백만 개의 객체를 한꺼번에 만드는 동안 순환 참조 GC를 멈춘다.
+        GC 상태는 process 전체에서 하나이므로, 여러 thread (pipeline stage)가 동시에 사용해도
+        처음 들어올 때만 GC를 멈추고 마지막으로 나갈 때 원래 상태로 되돌린다.
+    """
+
+    global _gc_pause_count, _gc_was_enabled
+
+    with _GC_PAUSE_LOCK:
+        if _gc_pause_count == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pause_count += 1
+    try:
+        yield
+    finally:
+        with _GC_PAUSE_LOCK:
+            _gc_pause_count -= 1
+            if _gc_pause_count == 0 and _gc_was_enabled:
+                gc.enable()
+
+
+class RecordBatchReader:
+    """_summary_
+    Note:
+        file을 chunk (read_chunks(), 약 1mb) 단위로 읽어서, 각 line을 delimiter로 나눈 record의 list (batch)를
+        반환하는 reader. 호출하는 쪽에서 line 마다 decode, strip, split, startswith 확인을 반복하지 않고,
+        chunk 마다 list comprehension 한 번으로 record를 만든다. 빈 line은 반환하지 않는다.
+
+        comment로 시작하는 line은 건너뛰고, header로 시작하는 line은 column 이름으로 읽어서 columns,
+        col2idx에 저장한다 (앞뒤의 "#"과 공백은 제거). comment, header line이 있는지는 chunk 마다 한 번에
+        검색하므로, 파일의 앞에만 있는 경우 (VCF, ClinVar 등) 나머지 chunk는 line 별로 확인하지 않는다.
+        파일 중간에 header가 다시 나오면, 그 전까지의 batch를 먼저 반환한 뒤 col2idx를 바꾼다.
+
+    Args:
+        filename (str): file address (.gz, .bgz 는 압축 해제)
+        delimiter (str): column 구분자. None 이면 공백 (str.split())
+        header (str): header line의 시작 문자열. None 이면 header 없음
+        comment (str): 건너뛸 line의 시작 문자열 (header 보다 먼저 확인). None 이면 없음
+        skip_lines (int): 파일의 처음에 건너뛸 line 수
+        max_split (int): record 마다 나눌 최대 횟수 (-1: 모두). 앞의 column만 필요한 경우, 나머지는 마지막
+            값에 남는다.
+        encoding (str): file의 encoding. None 이면 decode 하지 않고 bytes record를 반환한다.
+
+    Examples:
+        >>> reader = RecordBatchReader(SPLICEAI_DB, comment="##")
+            for batch in reader:
+                id_idx = reader.col2idx["ID"]
+                for row in batch:
+                    var_id = row[id_idx]  # 1-985445-G-GT
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        delimiter: str = "\t",
+        header: str = "#",
+        comment: str = None,
+        skip_lines: int = 0,
+        max_split: int = -1,
+        encoding: str = "utf-8",
+    ):
+        self.filename = filename
+        self.delimiter = delimiter
+        self.header = None if header is None else header.encode()
+        self.comment = None if comment is None else comment.encode()
+        self.skip_lines = skip_lines
+        self.max_split = max_split
+        self.encoding = encoding
+        self.columns: list = None
+        self.col2idx: dict = dict()
+
+    def set_header(self, line: bytes):
+        header_line = line.decode(self.encoding or "utf-8").strip().strip("#").strip()
+        self.columns = header_line.split(self.delimiter)
+        self.col2idx = {val: idx for idx, val in enumerate(self.columns)}
+
+    def split_lines(self, lines: object) -> list:
+        """line (bytes) 들을 record로 나눈다. 앞뒤의 공백 (줄바꿈 문자 포함)은 제거한다."""
+
+        encoding, max_split = self.encoding, self.max_split
+        if self.delimiter is None:  # 공백으로 나누면 앞뒤 공백은 자동으로 제거된다.
+            if encoding:
+                rows = [line.decode(encoding).split(None, max_split) for line in lines]
+            else:
+                rows = [line.split(None, max_split) for line in lines]
+            return [row for row in rows if row] if [] in rows else rows
+
+        if encoding:
+            texts = (line.decode(encoding).strip() for line in lines)
+            delimiter = self.delimiter
+        else:
+            texts = (line.strip() for line in lines)
+            delimiter = self.delimiter.encode()
+        return [text.split(delimiter, max_split) for text in texts if text]
+
+    def __iter__(self) -> list:
+        # batch 마다 수만 개의 record (list)가 한꺼번에 만들어지므로, parse_vep_file() 처럼 읽는 동안에는
+        # 순환 참조 GC를 멈추고, 끝나면 원래 상태로 되돌린다.
+        with gc_paused():
+            yield from self.read_batches()
+
+    def read_batches(self) -> list:
+        markers = [marker for marker in (self.comment, self.header) if marker]
+        skip_lines = self.skip_lines
+
+        for chunk in read_chunks(self.filename):
+            # chunk 전체를 line list로 먼저 나누지 않고, line을 하나씩 꺼내 바로 record로 나눈다.
+            # (긴 line은 cache에 남아 있는 동안 나누는 편이 빠르다)
+            lines = io.BytesIO(chunk)
+            while skip_lines and lines.readline():
+                skip_lines -= 1
+            start = lines.tell()
+
+            # comment, header line이 있는 chunk만 line 별로 확인. 첫 글자 (한 글자 검색은 빠름)가 없는
+            # chunk는 줄바꿈 + 시작 문자열을 다시 검색하지 않는다.
+            if any(
+                chunk.startswith(marker, start)
+                or (marker[:1] in chunk and b"\n" + marker in chunk)
+                for marker in markers
+            ):
+                batch_lines = []
+                for line in lines:
+                    if self.comment and line.startswith(self.comment):
+                        continue
+                    if self.header and line.startswith(self.header):
+                        if batch_lines:
+                            yield self.split_lines(batch_lines)
+                            batch_lines = []
+                        self.set_header(line)
+                        continue
+                    batch_lines.append(line)
+                lines = batch_lines
+
+            batch = self.split_lines(lines)
+            if batch:
+                yield batch
+
+
+def get_bgzf_block_size(extra: bytes) -> int:
+    """gzip extra field의 "BC" subfield 에서 block 전체 크기(BSIZE + 1)를 반환한다. 없으면 None."""
+
+    i = 0
+    while i + 4 <= len(extra):
+        si1, si2, slen = extra[i], extra[i + 1], struct.unpack(
+            "<H", extra[i + 2 : i + 4]
+        )[0]
+        if si1 == 66 and si2 == 67:  # B, C
+            return struct.unpack("<H", extra[i + 4 : i + 6])[0] + 1
+        i += 4 + slen
+
+    return None
+
+
+def is_bgzf_file(filename: str) -> bool:
+    """첫 block이 "BC" subfield를 가진 gzip member 이면 (bgzip 압축) True를 반환한다."""
+
+    with open(filename, "rb") as infile:
+        header = infile.read(12)
+        if len(header) < 12 or header[:3] != b"\x1f\x8b\x08" or not header[3] & 4:
+            return False
+        extra = infile.read(struct.unpack("<H", header[10:12])[0])
+
+    return get_bgzf_block_size(extra) is not None
+
+
+def read_raw_bgzf_block(infile: object) -> bytes:
+    """_summary_
+    Note:
+        BGZF 파일의 현재 위치에서 block 하나를 압축된 상태 그대로 읽는다. 압축 해제는 inflate_bgzf_block()으로
+        따로 하므로, 파일은 순서대로 읽으면서 압축 해제는 여러 thread에서 나누어 할 수 있다.
+
+    Args:
+        infile (object): "rb"로 열린 BGZF file object
+
+    Returns:
+        bytes: header 부터 ISIZE 까지 block 전체. 파일의 끝인 경우 b""
+    """
+
+    header = infile.read(12)
+    if not header:
+        return b""
+    if len(header) < 12 or header[:2] != b"\x1f\x8b":
+        raise ValueError(f"invalid BGZF block at offset {infile.tell() - len(header)}")
+
+    extra = infile.read(struct.unpack("<H", header[10:12])[0])
+    block_size = get_bgzf_block_size(extra)
+    if block_size is None:
+        raise ValueError("not a BGZF block (no BC field)")
+    rest = infile.read(block_size - 12 - len(extra))
+    if len(rest) < block_size - 12 - len(extra):
+        raise ValueError("truncated BGZF block")
+
+    return b"".join([header, extra, rest])
+
+
+def inflate_bgzf_block(block: bytes) -> bytes:
+    """_summary_
+    Note:
+        read_raw_bgzf_block()으로 읽은 block의 압축을 해제하고, CRC32와 ISIZE를 확인한다.
+        zlib은 압축 해제 중에 GIL을 놓으므로, 여러 thread에서 동시에 실행할 수 있다.
+
+    Raises:
+        ValueError: CRC32 또는 ISIZE가 맞지 않는 경우
+
+    Returns:
+        bytes: 압축을 해제한 data
+    """
+
+    xlen = struct.unpack("<H", block[10:12])[0]
+    data = zlib.decompress(block[12 + xlen : -8], -15)
+    crc32, isize = struct.unpack("<II", block[-8:])
+    if zlib.crc32(data) & 0xFFFFFFFF != crc32 or len(data) != isize:
+        raise ValueError("BGZF block CRC32/ISIZE mismatch")
+
+    return data
+
+
+TABIX_INDEX_SUFFIXES = (".tbi", ".csi")
+
+
+def find_tabix_index(filename: str) -> str:
+    """_summary_
+    Note:
+        bgzip으로 압축된 파일과 같은 위치에 있는 tabix index (.tbi 또는 .csi) 파일의 주소를 반환한다.
+        index 파일이 없는 경우에는 None을 반환한다.
+
+    Args:
+        filename (str): bgzip 압축 file address
+
+    Returns:
+        str: index file address or None
+    """
+
+    for suffix in TABIX_INDEX_SUFFIXES:
+        if os.path.exists(filename + suffix):
+            return filename + suffix
+
+    return None
+
+
+# cache 형식이나 parser 결과의 형식이 바뀌면 올려서, 이전 cache를 무효화한다.
+CACHE_VERSION = 1
+
+
+def make_cache_key(filename: str, tag: str) -> tuple:
+    """_summary_
+    Note:
+        원본 파일의 절대 경로, 수정 시간(mtime), 크기와 parser 이름으로 cache key를 만든다.
+        원본 파일이 바뀌면 mtime 또는 크기가 달라지므로, 이전 cache는 자동으로 사용되지 않는다.
+
+    Args:
+        filename (str): 원본 database file address
+        tag (str): parser 이름 (ACMG.helper.dbparser.parse_clinvar_db)
+
+    Returns:
+        tuple: (version, abs_path, mtime_ns, size, tag)
+    """
+
+    file_stat = os.stat(filename)
+
+    return (
+        CACHE_VERSION,
+        os.path.abspath(filename),
+        file_stat.st_mtime_ns,
+        file_stat.st_size,
+        tag,
+    )
+
+
+dbparser = sys.modules[__name__]
+tabix = sys.modules[__name__]
+npstore = sys.modules[__name__]
+dbcache = sys.modules[__name__]
+
+
+memo = sys.modules[__name__]
+
+# LruMemo 하나에 저장하는 최대 결과 수 (0 이면 저장하지 않는다)
+MEMO_MAXSIZE = 65536
+
+# {name: {"hits": int, "misses": int}}. 같은 이름의 LruMemo는 counter를 함께 사용한다 (누적).
+MEMO_STATS_DIC: dict = dict()
+
+
+class LruMemo:
+    """_summary_
+    Note:
+        rule 함수의 결과를 입력값 key로 저장해 두었다가, 같은 key가 다시 나오면 함수를 다시 실행하지 않고
+        저장된 결과를 반환하는 LRU cache. 최대 maxsize 개의 결과만 저장하며, 가장 오래 사용하지 않은 결과부터
+        지운다. 사용한 횟수(hits)와 실행한 횟수(misses)는 이름 별로 MEMO_STATS_DIC에 누적한다.
+
+        rule 함수는 database dictionary 처럼 hash 할 수 없는 값을 함께 받으므로, 결과를 결정하는 값만으로
+        key를 만들어서 사용한다. 같은 database로 실행하는 동안에만 사용해야 한다 (rule 모듈의 execute() 마다
+        새로 만든다).
+
+    Examples:
+        >>> pp2bp1_memo = LruMemo("pp2bp1")
+            pp2, bp1 = pp2bp1_memo.get(
+                gene_symbol, assign_pp2bp1_rule, gene_symbol, clinvar_db_dic, clinvar_col2idx
+            )
+    """
+
+    def __init__(self, name: str, maxsize: int = None):
+        self.name = name
+        self.maxsize = MEMO_MAXSIZE if maxsize is None else maxsize
+        self.cache = OrderedDict()
+        self.stats: dict = MEMO_STATS_DIC.setdefault(name, {"hits": 0, "misses": 0})
+
+    def get(self, key: object, func: object, *args) -> object:
+        """key의 저장된 결과를 반환한다. 없으면 func(*args)를 실행하여 저장한 뒤 반환한다."""
+
+        cache = self.cache
+        if key in cache:
+            self.stats["hits"] += 1
+            cache.move_to_end(key)
+            return cache[key]
+
+        self.stats["misses"] += 1
+        value = func(*args)
+        if self.maxsize > 0:
+            cache[key] = value
+            if len(cache) > self.maxsize:
+                cache.popitem(last=False)
+
+        return value
+
+    def __len__(self) -> int:
+        return len(self.cache)
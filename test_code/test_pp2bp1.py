@@ -2,6 +2,8 @@
 # Disease mechanism, missense mutation
 
 import pytest
+from collections import OrderedDict
+import sys
 
 
 @pytest.fixture
@@ -270,6 +272,24 @@ def test_assign_pp2bp1_rule(
     )
 
 
+def test_assign_pp2bp1_rule_mechanism_table(clinvar_db_dic, clinvar_col2idx):
+
+    # 미리 계산된 메커니즘 table을 사용해도 ClinVar를 직접 세는 경우와 같은 결과
+    gene_mechanism_dic, gene_mechanism_col2idx = make_gene_mechanism_dic(
+        clinvar_db_dic, clinvar_col2idx
+    )
+    for gene_symbol in list(clinvar_db_dic) + ["TTN"]:
+        assert assign_pp2bp1_rule(
+            gene_symbol, clinvar_db_dic, clinvar_col2idx
+        ) == assign_pp2bp1_rule(
+            gene_symbol,
+            clinvar_db_dic,
+            clinvar_col2idx,
+            gene_mechanism_dic,
+            gene_mechanism_col2idx,
+        )
+
+
 ##################################################
 
 
@@ -367,17 +387,24 @@ def check_gene_pathogenic_mechanism(
 
 
 def assign_pp2bp1_rule(
-    gene_symbol: str, clinvar_db_dic: dict, clinvar_col2idx: dict
+    gene_symbol: str,
+    clinvar_db_dic: dict,
+    clinvar_col2idx: dict,
+    gene_mechanism_dic: dict = None,
+    gene_mechanism_col2idx: dict = None,
 ) -> tuple:
     """_summary_
     Note:
         각 variant가 missense variant인 경우, 관련된 유전자-질병의 원인을 확인하여
-        "missense"면 pp2, 'null variant" 면 bp1을 부여한다.
+        "missense"면 pp2, 'null variant" 면 bp1을 부여한다. 미리 계산된 유전자 별 메커니즘
+        table(dbparser.make_gene_mechanism_dic())이 있으면 ClinVar를 다시 세지 않고 table에서 찾는다.
 
     Args:
         gene_symbol (str): gene_symbol
         clinvar_db_dic (dict): gene_symbol 기준으로 정리된 clinvar_db
         clinvar_col2idx (dict): column index dictionary
+        gene_mechanism_dic (dict): 유전자 별 메커니즘 table
+        gene_mechanism_col2idx (dict): 메커니즘 table column index dictionary
 
     Returns:
         tuple(int, int): (pp2, bp1)
@@ -387,9 +414,14 @@ def assign_pp2bp1_rule(
     pp2, bp1 = 0, 0
     if clinvar_db_dic.get(gene_symbol):
 
-        patho_mechanism: str = check_gene_pathogenic_mechanism(
-            clinvar_db_dic[gene_symbol], clinvar_col2idx
-        )
+        if gene_mechanism_dic is not None:
+            patho_mechanism: str = gene_mechanism_dic[gene_symbol][
+                gene_mechanism_col2idx["mechanism"]
+            ]
+        else:
+            patho_mechanism: str = check_gene_pathogenic_mechanism(
+                clinvar_db_dic[gene_symbol], clinvar_col2idx
+            )
         if patho_mechanism == "missense variant":
             pp2 = 1
         elif patho_mechanism == "null variant":
@@ -401,7 +433,11 @@ def assign_pp2bp1_rule(
 
 
 def execute(
-    proband_var_df: object, clinvar_db_dic: dict, clinvar_col2idx: dict
+    proband_var_df: object,
+    clinvar_db_dic: dict,
+    clinvar_col2idx: dict,
+    gene_mechanism_dic: dict = None,
+    gene_mechanism_col2idx: dict = None,
 ) -> object:
     """_summary_
     Note: ACMG rule 중에서, pp2/bp1 에 해당하는 룰을 구현한 모듈이다. 각각의 rule에 대한 설명은 다음과 같다.
@@ -426,12 +462,17 @@ def execute(
         해당 유전자에서 발생하는 질병의 원인이 missense variant인지, null variant인지 계산한다
         (check_gene_pathogenic_mechanism()). 만약, 해당 유전자에서 주로 pathogenic 한 변이가 보고되고,
         missense 변이가 일반적인 원인이면 pp2를 부여하며, null variant가 질병의 주된 원인이라면 bp1을 부여한다
-        (assign_pp2bp1_rule()).
+        (assign_pp2bp1_rule()). 유전자 별 메커니즘은 ClinVar를 읽을 때 한 번만 계산해둔 table을 사용한다.
+        (dbparser.make_gene_mechanism_dic(). 주어지지 않으면 여기서 한 번 계산한다.)
+        같은 유전자의 transcript들은 결과가 같으므로, gene_symbol 별 결과를 LRU cache(memo.LruMemo)에
+        저장해 두고 다시 사용한다.
 
     Args:
         proband_var_df (object): Class VariantDF <- VEP file
         clinvar_db_dic (dict): ClinVar 데이터베이스를 미리 가공한 dictionary
         clinvar_col2idx (dict): Clinvar_db_dic-index dictionary
+        gene_mechanism_dic (dict): 유전자 별 메커니즘 table
+        gene_mechanism_col2idx (dict): 메커니즘 table column index dictionary
 
     Returns:
         object: proband_variant_DF의 variant_dic["evidnece_score_dic"]이 update된 object.
@@ -439,6 +480,11 @@ def execute(
 
     df_col2idx = proband_var_df.df_col2idx
     variant_dic = proband_var_df.variant_dic
+    if gene_mechanism_dic is None:
+        gene_mechanism_dic, gene_mechanism_col2idx = dbparser.make_gene_mechanism_dic(
+            clinvar_db_dic, clinvar_col2idx
+        )
+    pp2bp1_memo = memo.LruMemo("pp2bp1")  # {gene_symbol: (pp2, bp1)}
 
     for var_id in variant_dic:
         for var_feature in variant_dic[var_id]:
@@ -449,8 +495,14 @@ def execute(
                     df_col2idx["symbol"]
                 ]
                 if gene_symbol != "-":  # gene_symbol이 없는 경우, 비교 불가.
-                    pp2, bp1 = assign_pp2bp1_rule(
-                        gene_symbol, clinvar_db_dic, clinvar_col2idx
+                    pp2, bp1 = pp2bp1_memo.get(
+                        gene_symbol,
+                        assign_pp2bp1_rule,
+                        gene_symbol,
+                        clinvar_db_dic,
+                        clinvar_col2idx,
+                        gene_mechanism_dic,
+                        gene_mechanism_col2idx,
                     )
 
             variant_dic[var_id][var_feature]["evidence_score_dic"]["pp2"] = pp2
@@ -459,3 +511,148 @@ def execute(
     proband_var_df.variant_dic = variant_dic
 
     return proband_var_df
+
+
+memo = sys.modules[__name__]
+
+# LruMemo 하나에 저장하는 최대 결과 수 (0 이면 저장하지 않는다)
+MEMO_MAXSIZE = 65536
+
+# {name: {"hits": int, "misses": int}}. 같은 이름의 LruMemo는 counter를 함께 사용한다 (누적).
+MEMO_STATS_DIC: dict = dict()
+
+
+class LruMemo:
+    """_summary_
+    Note:
+        rule 함수의 결과를 입력값 key로 저장해 두었다가, 같은 key가 다시 나오면 함수를 다시 실행하지 않고
+        저장된 결과를 반환하는 LRU cache. 최대 maxsize 개의 결과만 저장하며, 가장 오래 사용하지 않은 결과부터
+        지운다. 사용한 횟수(hits)와 실행한 횟수(misses)는 이름 별로 MEMO_STATS_DIC에 누적한다.
+
+        rule 함수는 database dictionary 처럼 hash 할 수 없는 값을 함께 받으므로, 결과를 결정하는 값만으로
+        key를 만들어서 사용한다. 같은 database로 실행하는 동안에만 사용해야 한다 (rule 모듈의 execute() 마다
+        새로 만든다).
+
+    Examples:
+        >>> pp2bp1_memo = LruMemo("pp2bp1")
+            pp2, bp1 = pp2bp1_memo.get(
+                gene_symbol, assign_pp2bp1_rule, gene_symbol, clinvar_db_dic, clinvar_col2idx
+            )
+    """
+
+    def __init__(self, name: str, maxsize: int = None):
+        self.name = name
+        self.maxsize = MEMO_MAXSIZE if maxsize is None else maxsize
+        self.cache = OrderedDict()
+        self.stats: dict = MEMO_STATS_DIC.setdefault(name, {"hits": 0, "misses": 0})
+
+    def get(self, key: object, func: object, *args) -> object:
+        """key의 저장된 결과를 반환한다. 없으면 func(*args)를 실행하여 저장한 뒤 반환한다."""
+
+        cache = self.cache
+        if key in cache:
+            self.stats["hits"] += 1
+            cache.move_to_end(key)
+            return cache[key]
+
+        self.stats["misses"] += 1
+        value = func(*args)
+        if self.maxsize > 0:
+            cache[key] = value
+            if len(cache) > self.maxsize:
+                cache.popitem(last=False)
+
+        return value
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+
+dbparser = sys.modules[__name__]
+
+
+def make_gene_mechanism_dic(clinvar_db_dic: dict, clinvar_col2idx: dict) -> tuple:
+    """_summary_
+    Note:
+        gene_symbol을 기준으로 정리된 ClinVar dictionary에서, 각 유전자에 보고된 pathogenic 변이의 수와
+        그 중 missense, null variant가 주된 결과인 변이의 수를 세어, 유전자의 질병 원인 메커니즘을 미리
+        계산해둔다. pp2bp1, pvs1 에서 변이(transcript)마다 같은 유전자의 ClinVar 변이를 다시 세지 않고,
+        이 table에서 바로 찾는다. (기준: pp2bp1.check_gene_pathogenic_mechanism())
+
+        <병의 원인 판단 기준>
+        - Missense: pathogenic missense variant 2개 이상, pathogenic variant 중 50% 초과
+        - Null variant: pathogenic null variant 2개 이상, pathogenic variant 중 50% 초과
+        {nonsense, frameshift variant, splice donor variant, splice acceptor variant, initiatior codon variant}
+
+    Args:
+        clinvar_db_dic (dict): parse_clinvar_db()의 결과
+        clinvar_col2idx (dict): ClinVar_column index dictionary
+
+    Returns:
+        dict: { "gene symbol": [pathogenic_count, missense_count, null_count, mechanism] }
+        gene_mechanism_col2idx: dict = {"pathogenic_count": 0, "missense_count": 1, "null_count": 2,
+                                        "mechanism": 3}
+
+    Examples:
+        >>> {
+                "BRCA2": [2, 0, 2, "null variant"],
+                "OAT": [1, 1, 0, ""],
+            }
+    """
+
+    gene_mechanism_col2idx: dict = {
+        "pathogenic_count": 0,
+        "missense_count": 1,
+        "null_count": 2,
+        "mechanism": 3,
+    }
+
+    gene_mechanism_dic = dict()
+    for gene_symbol, gene_variant_dic in clinvar_db_dic.items():
+
+        pathogenic_missense_count = 0
+        pathogenic_null_count = 0
+        pathogenic_count = 0
+
+        # 각 variant_id의 pathogenicity와 variant의 종류 counting
+        for var_infos in gene_variant_dic.values():
+            var_patho = var_infos[clinvar_col2idx["pathogenicity"]]
+            var_cons_dic = var_infos[clinvar_col2idx["consequence_dic"]]
+
+            if "Pathogenic" in var_patho or "Likely pathogenic" in var_patho:
+                pathogenic_count += 1
+
+                cons_count = sum(var_cons_dic.values())
+                missense_count = var_cons_dic.get("missense variant", 0)
+                null_count = (
+                    var_cons_dic.get("nonsense", 0)
+                    + var_cons_dic.get("frameshift variant", 0)
+                    + var_cons_dic.get("splice donor variant", 0)
+                    + var_cons_dic.get("splice acceptor variant", 0)
+                    + var_cons_dic.get("initiatior codon variant", 0)
+                )
+                if missense_count > cons_count * 0.5:
+                    pathogenic_missense_count += 1
+                elif null_count > cons_count * 0.5:
+                    pathogenic_null_count += 1
+
+        # 기준에 따라 병의 원인 메커니즘 부여.
+        if (pathogenic_missense_count >= 2) and (
+            pathogenic_missense_count / pathogenic_count
+        ) > 0.5:
+            mechanism = "missense variant"
+        elif (pathogenic_null_count >= 2) and (
+            pathogenic_null_count / pathogenic_count
+        ) > 0.5:
+            mechanism = "null variant"
+        else:
+            mechanism = ""
+
+        gene_mechanism_dic[gene_symbol] = [
+            pathogenic_count,
+            pathogenic_missense_count,
+            pathogenic_null_count,
+            mechanism,
+        ]
+
+    return gene_mechanism_dic, gene_mechanism_col2idx
@@ -2,8 +2,21 @@
 # Predictive data, computational evidence
 
 import pytest, mock
+import array
+import contextlib
+import copy
+import gc
+import io
+import json
+import os
+import sys
+import threading
+import warnings
+
+import numpy as np
 
 REVEL_DB = "/data/projects/ACMG/database/revel_with_transcript_ids"
+REVEL_STORE = "/data/projects/ACMG/database/revel_with_transcript_ids.store"
 
 
 @pytest.fixture
@@ -150,10 +163,10 @@ def variant_dic():
     return variant_dic
 
 
-@mock.patch(
-    "builtins.open",
-    new_callable=mock.mock_open,
-    read_data=(
+def test_add_revel_into_var_infos(tmp_path, monkeypatch, variant_dic, df_col2idx):
+
+    revel_file = tmp_path / "revel.csv"
+    revel_file.write_text(
         "chr,hg19_pos,grch38_pos,ref,alt,aaref,aaalt,REVEL,Ensembl_transcriptid\n"
         "1,35142,35142,G,A,T,M,0.027,ENST00000417324\n"
         "1,35142,35142,G,C,T,R,0.035,ENST00000417324\n"
@@ -164,9 +177,9 @@ def variant_dic():
         "1,69614,69614,C,T,P,L,0.107,ENST00000534990;ENST00000335137\n"
         "1,69616,69616,A,G,R,G,0.066,ENST00000534990;ENST00000335137\n"
         "1,69616,69616,A,T,R,W,0.091,ENST00000534990;ENST00000335137\n"
-    ),
-)
-def test_add_revel_into_var_infos(mock_open, variant_dic, df_col2idx):
+    )
+    monkeypatch.setattr(sys.modules[__name__], "REVEL_DB", str(revel_file))
+    monkeypatch.setattr(sys.modules[__name__], "REVEL_STORE", str(tmp_path / "store"))
 
     expected = {
         "1-35142-G-A": {
@@ -263,9 +276,137 @@ def test_add_revel_into_var_infos(mock_open, variant_dic, df_col2idx):
         },
     }
 
-    assert expected == add_revel_into_var_infos(
-        "some_path.txt", variant_dic, df_col2idx
+    assert expected == add_revel_into_var_infos(variant_dic, df_col2idx)
+
+
+def test_execute_without_annotate(
+    tmp_path, monkeypatch, variant_dic, df_col2idx, spliceai_db_dic
+):
+
+    revel_file = tmp_path / "revel.csv"
+    revel_file.write_text(
+        "chr,hg19_pos,grch38_pos,ref,alt,aaref,aaalt,REVEL,Ensembl_transcriptid\n"
+        "1,35142,35142,G,A,T,M,0.93,ENST00000417324\n"
+        "1,69614,69614,C,T,P,L,0.107,ENST00000534990;ENST00000335137\n"
     )
+    monkeypatch.setattr(sys.modules[__name__], "REVEL_DB", str(revel_file))
+    monkeypatch.setattr(sys.modules[__name__], "REVEL_STORE", str(tmp_path / "store"))
+    annotated_df = execute(
+        mock.Mock(variant_dic=copy.deepcopy(variant_dic), df_col2idx=df_col2idx),
+        spliceai_db_dic,
+    )
+    assert 1 == annotated_df.variant_dic["1-35142-G-A"]["ENST00000417324"][
+        "evidence_score_dic"
+    ]["pp3"]
+
+    # main()에서 revel 값을 미리 추가한 경우 (annotate=False): 파일을 다시 읽지 않고 같은 결과
+    monkeypatch.setattr(sys.modules[__name__], "REVEL_DB", str(tmp_path / "missing.csv"))
+    for var_id, var_features in variant_dic.items():
+        for var_feature, var_infos_dic in var_features.items():
+            var_infos_dic["var_infos"] = list(
+                annotated_df.variant_dic[var_id][var_feature]["var_infos"]
+            )
+    proband_var_df = execute(
+        mock.Mock(variant_dic=variant_dic, df_col2idx=df_col2idx),
+        spliceai_db_dic,
+        annotate=False,
+    )
+    assert annotated_df.variant_dic == proband_var_df.variant_dic
+
+
+def test_scan_revel(tmp_path, monkeypatch):
+
+    revel_file = tmp_path / "revel.csv"
+    revel_file.write_text(
+        "chr,hg19_pos,grch38_pos,ref,alt,aaref,aaalt,REVEL,Ensembl_transcriptid\n"
+        "1,35142,35142,G,A,T,M,0.027,ENST00000417324\n"
+        "1,35142,35142,G,C,T,R,0.035,ENST00000417324\n"
+        "1,69614,69614,C,T,P,L,0.107,ENST00000534990;ENST00000335137\n"
+    )
+    monkeypatch.setattr(sys.modules[__name__], "REVEL_DB", str(revel_file))
+    monkeypatch.setattr(sys.modules[__name__], "REVEL_STORE", str(tmp_path / "store"))
+
+    revel_records = scan_revel({"1-35142-G-A", "1-69614-C-T"})
+    assert [
+        ("1-35142-G-A", 0.027, ["ENST00000417324"]),
+        ("1-69614-C-T", 0.107, ["ENST00000534990", "ENST00000335137"]),
+    ] == revel_records
+
+    # REVEL transcript 목록에 있는 feature에만 저장
+    variant_dic = {
+        "1-69614-C-T": {
+            "ENST00000335137": {"var_infos": [None]},
+            "NM_001005484.1": {"var_infos": [None]},
+        }
+    }
+    merge_revel_records(variant_dic, revel_records[1:], {"revel": 0})
+    assert [0.107] == variant_dic["1-69614-C-T"]["ENST00000335137"]["var_infos"]
+    assert [None] == variant_dic["1-69614-C-T"]["NM_001005484.1"]["var_infos"]
+
+
+def test_scan_revel_by_store(tmp_path, monkeypatch):
+
+    revel_file = tmp_path / "revel.csv"
+    revel_file.write_text(
+        "chr,hg19_pos,grch38_pos,ref,alt,aaref,aaalt,REVEL,Ensembl_transcriptid\n"
+        "1,69614,69614,C,T,P,L,0.107,ENST00000534990;ENST00000335137\n"
+        "1,35142,35142,G,A,T,M,0.027,ENST00000417324\n"
+        "1,35142,35142,G,C,T,R,0.035,ENST00000417324\n"
+        "1,.,35200,G,A,T,M,0.5,ENST00000417324\n"
+        "1,69614,69614,C,T,P,L,0.113,ENST00000641515\n"
+    )
+    monkeypatch.setattr(sys.modules[__name__], "REVEL_DB", str(revel_file))
+    monkeypatch.setattr(sys.modules[__name__], "REVEL_STORE", str(tmp_path / "store"))
+
+    var_ids = {"1-35142-G-A", "1-69614-C-T", "2-69614-C-T"}
+    scan_records = scan_revel(var_ids)
+    build_revel_store(str(revel_file), str(tmp_path / "store"))
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        store_records = scan_revel(var_ids)
+
+    # store는 위치 순이지만, 같은 변이의 record는 파일 순서를 유지한다.
+    assert sorted(scan_records) == sorted(store_records)
+    assert [
+        ("1-69614-C-T", 0.107, ["ENST00000534990", "ENST00000335137"]),
+        ("1-69614-C-T", 0.113, ["ENST00000641515"]),
+    ] == [record for record in store_records if record[0] == "1-69614-C-T"]
+
+    # ";"로 나뉜 transcript 목록에 있는 feature에만, 두 방법 모두 같은 값을 저장
+    def make_variant_dic():
+        return {
+            "1-35142-G-A": {"ENST00000417324": {"var_infos": [None]}},
+            "1-69614-C-T": {
+                "ENST00000335137": {"var_infos": [None]},
+                "ENST00000641515": {"var_infos": [None]},
+                "ENST0000033513": {"var_infos": [None]},
+                "NM_001005484.1": {"var_infos": [None]},
+            },
+            "2-69614-C-T": {"ENST00000335137": {"var_infos": [None]}},
+        }
+
+    scan_variant_dic = merge_revel_records(
+        make_variant_dic(), scan_records, {"revel": 0}
+    )
+    store_variant_dic = merge_revel_records(
+        make_variant_dic(), store_records, {"revel": 0}
+    )
+    assert scan_variant_dic == store_variant_dic
+    assert {
+        "ENST00000335137": {"var_infos": [0.107]},
+        "ENST00000641515": {"var_infos": [0.113]},
+        "ENST0000033513": {"var_infos": [None]},
+        "NM_001005484.1": {"var_infos": [None]},
+    } == store_variant_dic["1-69614-C-T"]
+    assert [0.027] == store_variant_dic["1-35142-G-A"]["ENST00000417324"]["var_infos"]
+
+    # store를 만든 뒤 REVEL 파일이 바뀌면, 경고 후 파일을 검색한다.
+    revel_file.write_text(
+        "chr,hg19_pos,grch38_pos,ref,alt,aaref,aaalt,REVEL,Ensembl_transcriptid\n"
+        "1,35142,35142,G,A,T,M,0.9,ENST00000417324\n"
+    )
+    with pytest.warns(UserWarning, match="revel store"):
+        assert [("1-35142-G-A", 0.9, ["ENST00000417324"])] == scan_revel(var_ids)
 
 
 @pytest.mark.parametrize(
@@ -844,9 +985,7 @@ def test_ppredict_others_pathogenicity(
 #############################################################
 
 
-def add_revel_into_var_infos(
-    file: str, variant_dic: dict, df_col2idx: dict
-) -> dict:
+def add_revel_into_var_infos(variant_dic: dict, df_col2idx: dict) -> dict:
     """_summary_
     Note:
         REVEL db의 용량이 매우 크므로, 따로 저장하지 않고, REVEL score값을 variant_infos
@@ -860,6 +999,11 @@ def add_revel_into_var_infos(
         이때, vep annotation된 variant의 feature는 RefSeq과 Ensembl transcriptID가 모두 존재하지만,
         REVEL은 Ensembl_transcript id만 존재한다. 따라서, 별도의 RefSeq-Ensembl의 대응과정을 거치지 않고,
         Ensembl에 해당하는 Variant 들만 REVEL score를 부여하였다. 그 외에는, default 값으로 None을 부여함.
+        transcript id는 REVEL의 Ensembl_transcriptid 목록과 정확히 일치하는 경우에만 score를 부여한다.
+
+        npstore로 미리 변환한 REVEL store가 있는 경우에는, 전체 파일을 읽지 않고 store를 memory-map 하여
+        환자의 변이를 한 번에 검색한다(scan_revel_by_store()). 찾은 값은 따로 모은 뒤 한 번에
+        추가한다(scan_revel(), merge_revel_records()).
 
     Args:
         variant_dic (dict): class VariantDF.variant_dic
@@ -878,32 +1022,7 @@ def add_revel_into_var_infos(
             '25/39', 'V/I', 'Gta/Ata', 'LMBR1L', 0.051]
     """
 
-    with open(file) as infile:
-        for line in infile:
-            if line.startswith("chr"):
-                f_col2idx = {
-                    val: idx for idx, val in enumerate(line.strip().split(","))
-                }
-                continue
-            else:  # new variation
-                row = line.strip().split(",")
-                chr = row[f_col2idx["chr"]]
-                pos = row[f_col2idx["hg19_pos"]]
-                ref = row[f_col2idx["ref"]]
-                alt = row[f_col2idx["alt"]]
-                var_id = f"{chr}-{pos}-{ref}-{alt}"  # 1-985445-G-GT
-
-            if var_id in variant_dic:
-                for var_feature in variant_dic[var_id]:
-                    # if has same transcipt_id w/ REVEL
-                    if var_feature in row[f_col2idx["Ensembl_transcriptid"]]:
-                        variant_dic[var_id][var_feature]["var_infos"][
-                            df_col2idx["revel"]
-                        ] = float(row[f_col2idx["REVEL"]])
-                    else:
-                        pass  # default == None
-
-    return variant_dic
+    return merge_revel_records(variant_dic, scan_revel(variant_dic), df_col2idx)
 
 
 def is_missense_var(var_infos_dic: dict, df_col2idx: dict) -> bool:
@@ -1082,7 +1201,9 @@ def is_synonymous_var(var_infos_dic: dict, df_col2idx: dict) -> bool:
         return False
 
 
-def execute(proband_var_df: object, spliceai_db_dic: dict) -> object:
+def execute(
+    proband_var_df: object, spliceai_db_dic: dict, annotate: bool = True
+) -> object:
     """_summary_
     Note: ACMG rule 중에서, pp3/bp4/bp7 에 해당하는 룰을 구현한 모듈이다. 각각의 rule에 대한 설명은 다음과 같다.
 
@@ -1124,6 +1245,8 @@ def execute(proband_var_df: object, spliceai_db_dic: dict) -> object:
     Args:
         proband_var_df (object): Class VariantDF <- VEP file
         spliceai_db_dic (dict): 환자의 각 variant에 대하여 spliceai로 미리 계산된 예측값 dictionary
+        annotate (bool): False 이면 revel 값을 variant_infos에 추가하는 과정을 생략한다.
+            (main() 에서 미리 추가한 뒤, 염색체 별로 나누어 병렬 실행하는 경우)
 
     Returns:
         object: proband_variant_DF의 variant_dic["evidnece_score_dic"]이 update된 object.
@@ -1135,7 +1258,8 @@ def execute(proband_var_df: object, spliceai_db_dic: dict) -> object:
 
     df_col2idx = proband_var_df.df_col2idx
     variant_dic = proband_var_df.variant_dic
-    variant_dic = add_revel_into_var_infos(variant_dic, df_col2idx)
+    if annotate:  # 이미 revel 값이 추가된 경우 생략
+        variant_dic = add_revel_into_var_infos(variant_dic, df_col2idx)
 
     for var_id in variant_dic:
         for var_feature in variant_dic[var_id]:
@@ -1166,3 +1290,681 @@ def execute(proband_var_df: object, spliceai_db_dic: dict) -> object:
     proband_var_df.variant_dic = variant_dic
 
     return proband_var_df
+
+
+def scan_revel(var_ids: object) -> list:
+    """_summary_
+    Note:
+        REVEL 파일에서 환자 변이의 (revel score, Ensembl transcript id 목록)을 찾아 파일 순서대로 반환한다.
+        variant_dic을 수정하지 않고 결과를 따로 모으므로, gnomad 검색(pm2ba1bs1.scan_gnomad())과 다른
+        thread에서 동시에 실행한 뒤 merge_revel_records()로 합칠 수 있다. REVEL_DB로 미리 만들어둔 store가
+        있으면 store에서 검색하고(scan_revel_by_store()), 없으면 전체 파일을 chunk 단위로 읽는다
+        (dbparser.RecordBatchReader). store가 다른 파일 (또는 바뀌기 전의 REVEL_DB)로 만들어진 경우에는
+        경고를 출력하고 store를 사용하지 않는다.
+
+    Args:
+        var_ids (object): 환자 var_id 목록 (variant_dic, set 등 in 으로 검색할 수 있는 object)
+
+    Returns:
+        list: [(var_id, revel_score, [enst_id, ..]), ..]
+    """
+
+    if npstore.is_store_current(REVEL_STORE, REVEL_DB, "revel"):
+        return scan_revel_by_store(var_ids, REVEL_STORE)
+
+    reader = dbparser.RecordBatchReader(REVEL_DB, delimiter=",", header="chr")
+
+    revel_records = []
+    for batch in reader:
+        f_col2idx = reader.col2idx
+        chrom_idx, pos_idx, ref_idx, alt_idx, score_idx, enst_idx = [
+            f_col2idx[col]
+            for col in ["chr", "hg19_pos", "ref", "alt", "REVEL", "Ensembl_transcriptid"]
+        ]
+
+        # new variation
+        for row in batch:
+            var_id = f"{row[chrom_idx]}-{row[pos_idx]}-{row[ref_idx]}-{row[alt_idx]}"
+
+            if var_id in var_ids:
+                revel_records.append(
+                    (var_id, float(row[score_idx]), row[enst_idx].split(";"))
+                )
+
+    return revel_records
+
+
+def scan_revel_by_store(var_ids: object, revel_store_dir: str) -> list:
+    """_summary_
+    Note:
+        npstore.build_revel_store()로 미리 만들어 둔 REVEL store (위치 순으로 정렬된 column)를
+        memory-map 으로 읽고, 환자의 모든 변이를 한 번에 검색한다. 같은 변이에 여러 record가 있는 경우,
+        파일 순서대로 반환한다.
+
+    Args:
+        var_ids (object): 환자 var_id 목록 (variant_dic, set 등)
+        revel_store_dir (str): REVEL store directory address
+
+    Returns:
+        list: [(var_id, revel_score, [enst_id, ..]), ..]
+    """
+
+    revel_store = npstore.load_store(revel_store_dir)
+    revel_dic = npstore.query_revel_store(revel_store, list(var_ids))
+
+    return [
+        (var_id, revel_score, enst_ids)
+        for var_id, revel_records in revel_dic.items()
+        for revel_score, enst_ids in revel_records
+    ]
+
+
+def merge_revel_records(
+    variant_dic: dict, revel_records: list, df_col2idx: dict
+) -> dict:
+    """_summary_
+    Note:
+        scan_revel()로 찾은 값을 순서대로 variant_infos의 revel 항목에 저장한다.
+
+    Args:
+        variant_dic (dict): class VariantDF.variant_dic
+        revel_records (list): [(var_id, revel_score, [enst_id, ..]), ..]
+        df_col2idx (dict): DF column index dictionary
+
+    Returns:
+        dict: revel 값이 update된 variant_dic
+    """
+
+    for var_id, revel_score, enst_ids in revel_records:
+        update_revel_var_infos(variant_dic, var_id, revel_score, enst_ids, df_col2idx)
+
+    return variant_dic
+
+
+def update_revel_var_infos(
+    variant_dic: dict,
+    var_id: str,
+    revel_score: float,
+    enst_ids: list,
+    df_col2idx: dict,
+):
+    """_summary_
+    Note:
+        var_id의 각 feature 중에서, REVEL의 Ensembl transcript id 목록에 있는 feature에만 revel 값을
+        저장한다. 그 외에는 default 값(None)을 유지한다.
+
+    Args:
+        variant_dic (dict): class VariantDF.variant_dic
+        var_id (str): 1-35142-G-A
+        revel_score (float): REVEL score
+        enst_ids (list): ["ENST00000534990", "ENST00000335137"]
+        df_col2idx (dict): DF column index dictionary
+    """
+
+    for var_feature in variant_dic[var_id]:
+        # if has same transcipt_id w/ REVEL
+        if var_feature in enst_ids:
+            variant_dic[var_id][var_feature]["var_infos"][
+                df_col2idx["revel"]
+            ] = revel_score
+
+
+STORE_VERSION = 1
+
+
+def save_store(out_dir: str, columns: dict, meta: dict):
+    """_summary_
+    Note:
+        column 별 numpy array를 out_dir 에 각각 .npy 파일로 저장하고, 염색체 이름 등 부가 정보는
+        meta.json 에 저장한다. 저장된 store는 load_store()로 memory-map 하여 읽는다.
+
+    Args:
+        out_dir (str): store directory address
+        columns (dict): {"column_name": np.ndarray}
+        meta (dict): {"chroms": ["1", "2", ..], ...}
+    """
+
+    os.makedirs(out_dir, exist_ok=True)
+    for col_name, values in columns.items():
+        np.save(os.path.join(out_dir, f"{col_name}.npy"), values)
+
+    meta = dict(meta, version=STORE_VERSION, columns=list(columns))
+    with open(os.path.join(out_dir, "meta.json"), "w") as outfile:
+        json.dump(meta, outfile)
+
+
+def load_store(store_dir: str) -> dict:
+    """_summary_
+    Note:
+        save_store()로 저장된 store를 memory-map 으로 읽는다. 실제 data는 검색 시에 필요한 부분만
+        disk에서 읽히며, 여러 process가 동시에 읽더라도 page cache를 공유한다.
+
+    Args:
+        store_dir (str): store directory address
+
+    Returns:
+        dict: {"meta": {..}, "chrom2code": {"1": 0, ..}, "column_name": np.memmap, ..}
+    """
+
+    with open(os.path.join(store_dir, "meta.json")) as infile:
+        meta = json.load(infile)
+    if meta.get("version") != STORE_VERSION:
+        raise ValueError(f"unsupported store version: {store_dir}")
+
+    store = {
+        "meta": meta,
+        "chrom2code": {chrom: idx for idx, chrom in enumerate(meta["chroms"])},
+    }
+    for col_name in meta["columns"]:
+        store[col_name] = np.load(
+            os.path.join(store_dir, f"{col_name}.npy"), mmap_mode="r"
+        )
+
+    return store
+
+
+def make_source_key(source_file: str, db: str) -> list:
+    """_summary_
+    Note:
+        store를 만든 원본 파일의 key. dbcache.make_cache_key()와 같이 절대 경로, 수정 시간(mtime), 크기로
+        만들며, meta.json 에 "source_key"로 저장한다 (json 이므로 list).
+
+    Returns:
+        list: [cache_version, abs_path, mtime_ns, size, "npstore.gnomad"]
+    """
+
+    return list(dbcache.make_cache_key(source_file, f"npstore.{db}"))
+
+
+def is_store_current(store_dir: str, source_file: str, db: str) -> bool:
+    """_summary_
+    Note:
+        store_dir에 source_file로 만든 store가 있으면 True를 반환한다. meta.json 에 저장된 원본 파일의 key
+        (make_source_key())가 현재 source_file의 key와 다르면 (다른 파일, 또는 store를 만든 뒤 바뀐 파일)
+        경고를 출력하고 False를 반환하므로, 오래된 store의 값을 사용하지 않고 원본 파일을 검색한다.
+        원본 파일 없이 store만 있는 경우에는, 같은 경로의 파일로 만든 store 이면 사용한다.
+
+    Args:
+        store_dir (str): store directory address
+        source_file (str): 원본 database file address (GNOMAD_DB 등)
+        db (str): "gnomad" or "revel"
+
+    Returns:
+        bool: store를 사용할 수 있으면 True
+    """
+
+    if not os.path.isdir(store_dir):
+        return False
+
+    try:
+        with open(os.path.join(store_dir, "meta.json")) as infile:
+            meta = json.load(infile)
+    except (OSError, ValueError):
+        meta = dict()
+
+    source_key = meta.get("source_key")
+    if meta.get("version") != STORE_VERSION or meta.get("db") != db or not source_key:
+        is_current = False
+    elif os.path.exists(source_file):
+        is_current = source_key == make_source_key(source_file, db)
+    else:
+        is_current = source_key[1] == os.path.abspath(source_file)
+
+    if not is_current:
+        warnings.warn(
+            f"{db} store {store_dir} was not built from the current {source_file}; "
+            "ignoring the store (rebuild it with python -m ACMG.helper.npstore "
+            f"build-{db})"
+        )
+
+    return is_current
+
+
+def make_position_key(chrom_codes, positions):
+    """(염색체 code, 위치)를 하나의 정렬 가능한 int64 key로 변환한다. code << 32 | pos"""
+
+    return (np.asarray(chrom_codes, dtype=np.int64) << 32) | np.asarray(
+        positions, dtype=np.int64
+    )
+
+
+def reorder_varlen_column(offsets, values, order) -> tuple:
+    """_summary_
+    Note:
+        가변 길이 문자열 column (이어붙인 bytes 와 각 record의 시작 위치 offsets)을 order 순으로
+        재배열한다.
+
+    Returns:
+        tuple: (new_offsets, new_values)
+    """
+
+    lengths = np.diff(offsets)[order]
+    new_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    gather_idx = np.repeat(
+        offsets[:-1][order] - new_offsets[:-1], lengths
+    ) + np.arange(new_offsets[-1], dtype=np.int64)
+
+    return (new_offsets, values[gather_idx])
+
+
+def sort_store_columns(keys, columns: dict, varlen_columns: dict) -> dict:
+    """_summary_
+    Note:
+        key 순으로 모든 column을 정렬한다. 가변 길이 문자열 column ("alleles" 등)도 같은 순서로
+        재배열하여 "{name}_offsets", "{name}" column으로 저장한다. 같은 key 안에서는 원래 파일의
+        순서를 유지한다(stable sort).
+
+    Args:
+        keys (np.ndarray): make_position_key()로 만든 위치 key
+        columns (dict): {"column_name": np.ndarray}
+        varlen_columns (dict): {"column_name": (offsets(np.ndarray), values(np.ndarray))}
+
+    Returns:
+        dict: {"key": sorted keys, "column_name": sorted values, ..}
+    """
+
+    order = np.argsort(keys, kind="stable")
+    sorted_columns = {"key": keys[order]}
+    for col_name, values in columns.items():
+        sorted_columns[col_name] = values[order]
+    for col_name, (offsets, values) in varlen_columns.items():
+        (
+            sorted_columns[f"{col_name}_offsets"],
+            sorted_columns[col_name],
+        ) = reorder_varlen_column(offsets, values, order)
+
+    return sorted_columns
+
+
+def get_varlen_value(store: dict, col_name: str, record_idx: int) -> str:
+    """가변 길이 문자열 column에서 record_idx 번째 값을 str로 반환한다."""
+
+    offsets = store[f"{col_name}_offsets"]
+    start, end = offsets[record_idx], offsets[record_idx + 1]
+
+    return store[col_name][start:end].tobytes().decode()
+
+
+def search_store(store: dict, var_ids: list) -> dict:
+    """_summary_
+    Note:
+        var_id (chrom-pos-ref-alt) 목록을 store에서 한 번에 검색한다. 위치 key는 정렬되어 있으므로
+        np.searchsorted로 각 변이 위치에 해당하는 record 범위를 찾고, 범위 안에서 ref-alt가 같은 record를
+        찾는다(한 위치에 보통 1~3개의 allele만 존재).
+
+    Args:
+        store (dict): load_store()로 읽은 store
+        var_ids (list): ["1-985445-G-GT", ..]
+
+    Returns:
+        dict: {var_id: [record index, ..]} (store에 있는 변이만 포함, 파일 순서)
+    """
+
+    chrom2code = store["chrom2code"]
+    query_ids, chrom_codes, positions = [], [], []
+    for var_id in var_ids:
+        chrom, pos = var_id.split("-")[:2]
+        if chrom in chrom2code and pos.isdigit():
+            query_ids.append(var_id)
+            chrom_codes.append(chrom2code[chrom])
+            positions.append(int(pos))
+
+    hit_dic = dict()
+    if not query_ids:
+        return hit_dic
+
+    query_keys = make_position_key(chrom_codes, positions)
+    lefts = np.searchsorted(store["key"], query_keys, side="left")
+    rights = np.searchsorted(store["key"], query_keys, side="right")
+
+    for i in np.flatnonzero(rights > lefts):
+        var_id = query_ids[i]
+        # "ref-alt" 부분. 1-985445-G-GT -> "G-GT"
+        query_allele = var_id.split("-", 2)[2]
+        for record_idx in range(lefts[i], rights[i]):
+            if get_varlen_value(store, "alleles", record_idx) == query_allele:
+                hit_dic.setdefault(var_id, []).append(int(record_idx))
+
+    return hit_dic
+
+
+def build_revel_store(revel_file: str, out_dir: str):
+    """_summary_
+    Note:
+        REVEL database (revel_with_transcript_ids, 약 7gb csv)를 한 번 읽어서, 위치 순으로 정렬된
+        column 별 numpy array로 저장한다. hg19 위치가 없는 변이(".")는 저장하지 않는다.
+        gnomad store와 같이 meta.json 에 원본 파일의 key를 저장한다 (is_store_current()).
+
+        ##chr,hg19_pos,grch38_pos,ref,alt,aaref,aaalt,REVEL,Ensembl_transcriptid
+        # 1,35142,35142,G,A,T,M,0.027,ENST00000417324
+
+        - key (int64): 염색체 code << 32 | hg19_pos, 오름차순 정렬
+        - score (float64): REVEL score
+        - alleles, alleles_offsets: "ref-alt" 문자열
+        - transcripts, transcripts_offsets: "ENST00000417324;ENST00000335137" 문자열
+
+    Args:
+        revel_file (str): REVEL csv file address
+        out_dir (str): store directory address
+    """
+
+    chroms: list = []
+    chrom2code: dict = dict()
+    keys, scores = array.array("q"), array.array("d")
+    allele_offsets, transcript_offsets = array.array("q", [0]), array.array("q", [0])
+    alleles, transcripts = bytearray(), bytearray()
+
+    reader = dbparser.RecordBatchReader(revel_file, delimiter=",", header="chr")
+    for batch in reader:
+        f_col2idx = reader.col2idx
+        chrom_idx, pos_idx, ref_idx, alt_idx, score_idx, enst_idx = [
+            f_col2idx[col]
+            for col in ["chr", "hg19_pos", "ref", "alt", "REVEL", "Ensembl_transcriptid"]
+        ]
+        for row in batch:
+            chrom, pos = row[chrom_idx], row[pos_idx]
+            if not pos.isdigit():  # hg19 위치가 없는 변이
+                continue
+            if chrom not in chrom2code:
+                chrom2code[chrom] = len(chroms)
+                chroms.append(chrom)
+
+            keys.append((chrom2code[chrom] << 32) | int(pos))
+            scores.append(float(row[score_idx]))
+            alleles += f"{row[ref_idx]}-{row[alt_idx]}".encode()
+            allele_offsets.append(len(alleles))
+            transcripts += row[enst_idx].encode()
+            transcript_offsets.append(len(transcripts))
+
+    columns = sort_store_columns(
+        np.frombuffer(keys, dtype=np.int64),
+        {"score": np.frombuffer(scores, dtype=np.float64)},
+        {
+            "alleles": (
+                np.frombuffer(allele_offsets, dtype=np.int64),
+                np.frombuffer(bytes(alleles), dtype=np.uint8),
+            ),
+            "transcripts": (
+                np.frombuffer(transcript_offsets, dtype=np.int64),
+                np.frombuffer(bytes(transcripts), dtype=np.uint8),
+            ),
+        },
+    )
+
+    save_store(
+        out_dir,
+        columns,
+        {
+            "source": os.path.abspath(revel_file),
+            "source_key": make_source_key(revel_file, "revel"),
+            "chroms": chroms,
+            "db": "revel",
+        },
+    )
+
+
+def query_revel_store(store: dict, var_ids: list) -> dict:
+    """_summary_
+    Note:
+        REVEL store에서 환자의 변이 목록에 해당하는 REVEL score와 Ensembl transcript id 목록을
+        한 번에 검색한다. 같은 변이에 대해 여러 record가 있을 수 있으므로 파일 순서대로 모두 반환한다.
+
+    Args:
+        store (dict): load_store()로 읽은 REVEL store
+        var_ids (list): ["1-35142-G-A", ..]
+
+    Returns:
+        dict: {var_id: [(revel_score, [enst_ids]), ..]}
+
+    Examples:
+        >>> {"1-69728-T-C": [(0.035, ["ENST00000534990", "ENST00000335137"])]}
+    """
+
+    revel_dic = dict()
+    for var_id, record_idxs in search_store(store, var_ids).items():
+        revel_dic[var_id] = [
+            (
+                float(store["score"][record_idx]),
+                get_varlen_value(store, "transcripts", record_idx).split(";"),
+            )
+            for record_idx in record_idxs
+        ]
+
+    return revel_dic
+
+
+# 압축되지 않은 파일을 chunk 단위로 읽을 때, 한 번에 읽는 크기 (byte). chunk의 record를 한꺼번에
+# 만들어 두므로, CPU cache를 크게 벗어나지 않는 크기가 더 빠르다.
+READ_CHUNK_SIZE = 1 << 20
+
+
+def split_line_chunks(data_iter: object) -> bytes:
+    """_summary_
+    Note:
+        순서대로 주어지는 data를 line 경계에서 다시 나눈다. 각 data의 마지막 줄바꿈 뒤에 남은 부분은
+        다음 data 앞에 붙인다.
+
+    Args:
+        data_iter (object): bytes data iterator (e.g. read_gz_data())
+
+    Yields:
+        chunk (bytes): 완전한 line 들로 이루어진 data. 마지막 chunk는 줄바꿈으로 끝나지 않을 수 있다.
+    """
+
+    rest = b""
+    for data in data_iter:
+        end = data.rfind(b"\n") + 1
+        if not end:  # line이 chunk 보다 긴 경우
+            rest += data
+            continue
+        if rest or end < len(data):
+            yield b"".join([rest, memoryview(data)[:end]])
+        else:
+            yield data
+        rest = data[end:]
+    if rest:
+        yield rest
+
+
+def read_chunks(filename: str) -> bytes:
+    """_summary_
+    Note:
+        file을 line 경계로 나눈 chunk (bytes, 여러 line) 단위로 반환한다. gz (gzip, bgzip) 파일은
+        read_gz_chunks()로 압축을 해제하고, 그 외에는 READ_CHUNK_SIZE 씩 읽는다.
+
+    Args:
+        filename (str): file address
+
+    Yields:
+        chunk (bytes): 완전한 line 들로 이루어진 data
+    """
+
+    if filename.endswith((".gz", ".bgz")):
+        yield from read_gz_chunks(filename)
+        return
+
+    with open(filename, "rb") as infile:
+        yield from split_line_chunks(iter(lambda: infile.read(READ_CHUNK_SIZE), b""))
+
+
+# gc_paused() 가 GC를 멈춘 횟수와, 처음 멈추기 전의 GC 상태 (여러 thread가 함께 사용한다)
+_GC_PAUSE_LOCK = threading.Lock()
+_gc_pause_count = 0
+_gc_was_enabled = False
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """_summary_
+    Note:
+        수백만 개의 객체를 한꺼번에 만드는 동안 순환 참조 GC를 멈춘다.
+        GC 상태는 process 전체에서 하나이므로, 여러 thread (pipeline stage)가 동시에 사용해도
+        처음 들어올 때만 GC를 멈추고 마지막으로 나갈 때 원래 상태로 되돌린다.
+    """
+
+    global _gc_pause_count, _gc_was_enabled
+
+    with _GC_PAUSE_LOCK:
+        if _gc_pause_count == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pause_count += 1
+    try:
+        yield
+    finally:
+        with _GC_PAUSE_LOCK:
+            _gc_pause_count -= 1
+            if _gc_pause_count == 0 and _gc_was_enabled:
+                gc.enable()
+
+
+class RecordBatchReader:
+    """_summary_
+    Note:
+        file을 chunk (read_chunks(), 약 1mb) 단위로 읽어서, 각 line을 delimiter로 나눈 record의 list (batch)를
+        반환하는 reader. 호출하는 쪽에서 line 마다 decode, strip, split, startswith 확인을 반복하지 않고,
+        chunk 마다 list comprehension 한 번으로 record를 만든다. 빈 line은 반환하지 않는다.
+
+        comment로 시작하는 line은 건너뛰고, header로 시작하는 line은 column 이름으로 읽어서 columns,
+        col2idx에 저장한다 (앞뒤의 "#"과 공백은 제거). comment, header line이 있는지는 chunk 마다 한 번에
+        검색하므로, 파일의 앞에만 있는 경우 (VCF, ClinVar 등) 나머지 chunk는 line 별로 확인하지 않는다.
+        파일 중간에 header가 다시 나오면, 그 전까지의 batch를 먼저 반환한 뒤 col2idx를 바꾼다.
+
+    Args:
+        filename (str): file address (.gz, .bgz 는 압축 해제)
+        delimiter (str): column 구분자. None 이면 공백 (str.split())
+        header (str): header line의 시작 문자열. None 이면 header 없음
+        comment (str): 건너뛸 line의 시작 문자열 (header 보다 먼저 확인). None 이면 없음
+        skip_lines (int): 파일의 처음에 건너뛸 line 수
+        max_split (int): record 마다 나눌 최대 횟수 (-1: 모두). 앞의 column만 필요한 경우, 나머지는 마지막
+            값에 남는다.
+        encoding (str): file의 encoding. None 이면 decode 하지 않고 bytes record를 반환한다.
+
+    Examples:
+        >>> reader = RecordBatchReader(SPLICEAI_DB, comment="##")
+            for batch in reader:
+                id_idx = reader.col2idx["ID"]
+                for row in batch:
+                    var_id = row[id_idx]  # 1-985445-G-GT
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        delimiter: str = "\t",
+        header: str = "#",
+        comment: str = None,
+        skip_lines: int = 0,
+        max_split: int = -1,
+        encoding: str = "utf-8",
+    ):
+        self.filename = filename
+        self.delimiter = delimiter
+        self.header = None if header is None else header.encode()
+        self.comment = None if comment is None else comment.encode()
+        self.skip_lines = skip_lines
+        self.max_split = max_split
+        self.encoding = encoding
+        self.columns: list = None
+        self.col2idx: dict = dict()
+
+    def set_header(self, line: bytes):
+        header_line = line.decode(self.encoding or "utf-8").strip().strip("#").strip()
+        self.columns = header_line.split(self.delimiter)
+        self.col2idx = {val: idx for idx, val in enumerate(self.columns)}
+
+    def split_lines(self, lines: object) -> list:
+        """line (bytes) 들을 record로 나눈다. 앞뒤의 공백 (줄바꿈 문자 포함)은 제거한다."""
+
+        encoding, max_split = self.encoding, self.max_split
+        if self.delimiter is None:  # 공백으로 나누면 앞뒤 공백은 자동으로 제거된다.
+            if encoding:
+                rows = [line.decode(encoding).split(None, max_split) for line in lines]
+            else:
+                rows = [line.split(None, max_split) for line in lines]
+            return [row for row in rows if row] if [] in rows else rows
+
+        if encoding:
+            texts = (line.decode(encoding).strip() for line in lines)
+            delimiter = self.delimiter
+        else:
+            texts = (line.strip() for line in lines)
+            delimiter = self.delimiter.encode()
+        return [text.split(delimiter, max_split) for text in texts if text]
+
+    def __iter__(self) -> list:
+        # batch 마다 수만 개의 record (list)가 한꺼번에 만들어지므로, parse_vep_file() 처럼 읽는 동안에는
+        # 순환 참조 GC를 멈추고, 끝나면 원래 상태로 되돌린다.
+        with gc_paused():
+            yield from self.read_batches()
+
+    def read_batches(self) -> list:
+        markers = [marker for marker in (self.comment, self.header) if marker]
+        skip_lines = self.skip_lines
+
+        for chunk in read_chunks(self.filename):
+            # chunk 전체를 line list로 먼저 나누지 않고, line을 하나씩 꺼내 바로 record로 나눈다.
+            # (긴 line은 cache에 남아 있는 동안 나누는 편이 빠르다)
+            lines = io.BytesIO(chunk)
+            while skip_lines and lines.readline():
+                skip_lines -= 1
+            start = lines.tell()
+
+            # comment, header line이 있는 chunk만 line 별로 확인. 첫 글자 (한 글자 검색은 빠름)가 없는
+            # chunk는 줄바꿈 + 시작 문자열을 다시 검색하지 않는다.
+            if any(
+                chunk.startswith(marker, start)
+                or (marker[:1] in chunk and b"\n" + marker in chunk)
+                for marker in markers
+            ):
+                batch_lines = []
+                for line in lines:
+                    if self.comment and line.startswith(self.comment):
+                        continue
+                    if self.header and line.startswith(self.header):
+                        if batch_lines:
+                            yield self.split_lines(batch_lines)
+                            batch_lines = []
+                        self.set_header(line)
+                        continue
+                    batch_lines.append(line)
+                lines = batch_lines
+
+            batch = self.split_lines(lines)
+            if batch:
+                yield batch
+
+
+# cache 형식이나 parser 결과의 형식이 바뀌면 올려서, 이전 cache를 무효화한다.
+CACHE_VERSION = 1
+
+
+def make_cache_key(filename: str, tag: str) -> tuple:
+    """_summary_
+    Note:
+        원본 파일의 절대 경로, 수정 시간(mtime), 크기와 parser 이름으로 cache key를 만든다.
+        원본 파일이 바뀌면 mtime 또는 크기가 달라지므로, 이전 cache는 자동으로 사용되지 않는다.
+
+    Args:
+        filename (str): 원본 database file address
+        tag (str): parser 이름 (ACMG.helper.dbparser.parse_clinvar_db)
+
+    Returns:
+        tuple: (version, abs_path, mtime_ns, size, tag)
+    """
+
+    file_stat = os.stat(filename)
+
+    return (
+        CACHE_VERSION,
+        os.path.abspath(filename),
+        file_stat.st_mtime_ns,
+        file_stat.st_size,
+        tag,
+    )
+
+
+dbparser = sys.modules[__name__]
+npstore = sys.modules[__name__]
+dbcache = sys.modules[__name__]
@@ -1,7 +1,10 @@
 # Module for PS1, PM5, PP5, BP6
 # reference data of ClinVar
 
+from bisect import bisect_left, bisect_right
 import pytest
+from collections import OrderedDict
+import sys
 
 DNA_codon_pair = """TTT F      CTT L      ATT I      GTT V
 TTC F      CTC L      ATC I      GTC V
@@ -404,6 +407,29 @@ def test_check_same_variant_in_clinvar(
     )
 
 
+def test_build_clinvar_position_index(clinvar_db_dic, clinvar_col2idx):
+
+    clinvar_gene_var_dic = {
+        "13-32950906-C-A": ["Pathogenic", {"missense variant": 2}, "K570N"],
+        "13-32950901-CA-GT": ["Likely pathogenic", {"missense variant": 1}, "S568C"],
+        "13-32950910-C-T": ["Benign", {"missense variant": 1}, "-"],
+        "13-32950903-CT-C": ["Pathogenic", {"frameshift variant": 1}, "-"],
+        "X-100-a-g": ["Pathogenic/Likely pathogenic", {"missense variant": 1}, "-"],
+        "-": ["Pathogenic", {"-": 1}, "-"],
+    }
+    expected = {
+        "13": ([32950901, 32950906], ["GT", "A"]),
+        "X": ([100], ["G"]),
+    }
+
+    assert expected == build_clinvar_position_index(
+        clinvar_gene_var_dic, clinvar_col2idx
+    )
+    assert {"10": ([50678369], ["CA"])} == build_clinvar_position_index(
+        clinvar_db_dic["Gene3"], clinvar_col2idx
+    )
+
+
 ###########################################
 
 
@@ -428,11 +454,71 @@ def is_missense_var(var_infos_dic: dict, df_col2idx: dict) -> bool:
         return False
 
 
+def build_clinvar_position_index(
+    clinvar_gene_var_dic: dict, clinvar_col2idx: dict
+) -> dict:
+    """_summary_
+    Note:
+        한 유전자의 ClinVar 변이들을 염색체 별로 위치 순 정렬한 index를 만든다. ps1, pm5 판정에는
+        pathogenic(likely pathogenic 포함)으로 보고된, ref와 alt 길이가 같은 변이만 사용되므로 이 변이들만
+        저장하며, var_id의 위치와 alt 염기는 미리 parsing 해둔다. 코돈 주변(±3) 변이 검색은 전체 변이를
+        탐색하지 않고 정렬된 위치에서 이진 탐색(bisect)으로 찾는다.
+
+    Args:
+        clinvar_gene_var_dic (dict): gene_symbol에 해당하는 ClinVar dictionary
+        clinvar_col2idx (dict): Clinvar_db_dic-index dictionary
+
+    Returns:
+        dict: {chrom: ([pos, ..], [alt_nuc, ..])} 위치 순으로 정렬
+
+    Examples:
+        >>> {
+                "13-32950906-C-A": ["Pathogenic", {"missense variant": 2}, "K570N"],
+                "13-32950901-CA-GT": ["Likely pathogenic", {"missense variant": 1}, "S568C"],
+                "13-32950910-C-T": ["Benign", {"missense variant": 1}, "-"],
+            }
+            -> {"13": ([32950901, 32950906], ["GT", "A"])}
+    """
+
+    chrom_var_dic = dict()  # {chrom: [(pos, alt_nuc)]}
+    for clinvar_var_id, var_infos in clinvar_gene_var_dic.items():
+
+        if clinvar_var_id == "-":
+            continue
+        # e.g. clinvar_id information 13-32950906-CA-AT
+        cv_chrom, cv_chr_pos, cv_ref_nuc, cv_alt_nuc = clinvar_var_id.split("-")
+
+        # missense가 아닌경우 제외
+        if len(cv_ref_nuc) != len(cv_alt_nuc):
+            continue
+        # pathogenic 으로 보고되지 않은 경우 제외
+        cv_var_patho = var_infos[clinvar_col2idx["pathogenicity"]]
+        if not (
+            "Pathogenic" in cv_var_patho or "Likely pathogenic" in cv_var_patho
+        ):
+            continue
+
+        chrom_var_dic.setdefault(cv_chrom, []).append(
+            (int(cv_chr_pos), cv_alt_nuc.upper())
+        )
+
+    clinvar_position_index = dict()
+    for cv_chrom, cv_vars in chrom_var_dic.items():
+        cv_vars.sort()
+        clinvar_position_index[cv_chrom] = (
+            [cv_chr_pos for cv_chr_pos, _ in cv_vars],
+            [cv_alt_nuc for _, cv_alt_nuc in cv_vars],
+        )
+
+    return clinvar_position_index
+
+
 def check_amino_acid_change_in_clinvar(
     proband_var_infos: list,
     df_col2idx: dict,
     clinvar_gene_var_dic: dict,
     clinvar_col2idx: dict,
+    clinvar_position_index: dict = None,
 ):
     """_summary_
     Note:
@@ -460,15 +546,17 @@ def check_amino_acid_change_in_clinvar(
         다음으로, ClinVar에서 해당 변이와 같은 위치, 혹은 비슷한 위치에 있는 변이를 검색한다. 이 때,
         보고된 변이가 SNV가 아니라 여러개의 서열이 바뀌어 있을 수 있으므로, 해당 코돈 구간보다 최대 3만큼 넓은
         범위를 탐색한다. 탐색이 되었다면, 마찬가지로 해당변이도 인덱스-염기 dictionary를 만든다.
+        검색은 유전자의 ClinVar 위치 index(build_clinvar_position_index())에서 이진 탐색으로 수행한다.
 
         마지막으로, 변이가 포함된 코돈 영역에 해당하는 clinvar 변이가 있다면, 염기를 치환한 뒤 아미노산으로 변경한다.
         만약, pathogenic으로 보고된 경우, 환자의 바뀐 아미노산와 같다면 ps1을, 다르다면 pm5를 부여한다.
 
     Args:
-        proband_var_infos (list): proband_variant information list
+        proband_var_df (object): Class VariantDF <- VEP file
         df_col2idx (dict): DF column index dictionary
         clinvar_db_dic (dict): ClinVar 데이터베이스를 미리 가공한 dictionary
         clinvar_col2idx (dict): Clinvar_db_dic-index dictionary
+        clinvar_position_index (dict): clinvar_gene_var_dic의 위치 index. 없으면 새로 만든다.
 
     Returns:
         tuple: (ps1, pm5)
@@ -524,40 +612,34 @@ def check_amino_acid_change_in_clinvar(
         ref_nuc_idx_dic[first_codon_start + i] = pb_ref_codon[i].upper()
 
     # Clinvar_dic 에서 환자 근처에 있는 데이터 찾기. 해당 gene_symbol에 대한 정보만 있음.
-    for clinvar_var_id, var_infos in clinvar_gene_var_dic.items():
-
-        if clinvar_var_id == "-":
-            continue
-        # e.g. clinvar_id information 13-32950906-CA-AT
-        cv_chrom, cv_chr_pos, cv_ref_nuc, cv_alt_nuc = clinvar_var_id.split("-")
-        cv_chr_pos = int(cv_chr_pos)  # 변이 시작 위치
-        cv_var_len = len(cv_ref_nuc)  # missense, indel 변이의 길이
+    if clinvar_position_index is None:
+        clinvar_position_index = build_clinvar_position_index(
+            clinvar_gene_var_dic, clinvar_col2idx
+        )
+    if pb_chrom not in clinvar_position_index:
+        return (ps1, pm5)
+    cv_positions, cv_alt_nucs = clinvar_position_index[pb_chrom]
 
-        # missense가 아닌경우 제외
-        if len(cv_ref_nuc) != len(cv_alt_nuc):
-            continue
+    # variant가 포함된 코돈 구간을 기준으로, +-3 영역까지 포함된 clinvar data 선정
+    start_idx = bisect_left(cv_positions, first_codon_start - 3)
+    end_idx = bisect_right(cv_positions, last_codon_end + 3)
 
+    for cv_chr_pos, cv_alt_nuc in zip(
+        cv_positions[start_idx:end_idx], cv_alt_nucs[start_idx:end_idx]
+    ):
         # clinvar 변이의 위치정보 저장. e.g. {1000: 'A', 1001: 'A', .. ,1005: 'T'}
         cv_nuc_idx_dic = dict()
-        for i in range(cv_var_len):
-            cv_nuc_idx_dic[cv_chr_pos + i] = cv_alt_nuc[i].upper()
+        for i in range(len(cv_alt_nuc)):
+            cv_nuc_idx_dic[cv_chr_pos + i] = cv_alt_nuc[i]
 
-        # variant가 포함된 코돈 구간을 기준으로, +-3 영역까지 포함된 clinvar data 선정
-        # 그후, 환자의 변이가 포함된 ref 코돈을 clinvar data로 치환한다.
+        # 환자의 변이가 포함된 ref 코돈을 clinvar data로 치환한다.
         cv_altered_codons = list()
-        if pb_chrom == cv_chrom:
-            # 변이가 포함된 코돈 영역에 대한 Clinvar data check 후 ref codon 치환
-            if first_codon_start - 3 <= cv_chr_pos <= last_codon_end + 3:
-                for i in range(codon_len):
-                    position = first_codon_start + i
-                    if cv_nuc_idx_dic.get(position):
-                        cv_altered_codons.append(cv_nuc_idx_dic[position])
-                    else:
-                        cv_altered_codons.append(ref_nuc_idx_dic[position])
+        for i in range(codon_len):
+            position = first_codon_start + i
+            if cv_nuc_idx_dic.get(position):
+                cv_altered_codons.append(cv_nuc_idx_dic[position])
             else:
-                continue
-        else:
-            continue
+                cv_altered_codons.append(ref_nuc_idx_dic[position])
         # e.g. "GAC", "GACAAT"
         cv_altered_codon: str = "".join(cv_altered_codons)
 
@@ -579,33 +661,11 @@ def check_amino_acid_change_in_clinvar(
         # clinvar 변이로 치환한 뒤, reference AA와 같은 경우
         if pb_ref_aa == cv_alt_aa:
             pass
-        else:
-            cv_var_patho = var_infos[clinvar_col2idx["pathogenicity"]]
-            # amino acid is changed, and if pathogenic
-
-            if (
-                "Pathogenic" in cv_var_patho
-                or "Likely pathogenic" in cv_var_patho
-            ):
-                if pb_alt_aa == cv_alt_aa:
-                    ps1 = 1
-                else:
-                    pm5 = 1
-
-        """
-        print(
-            proband_var_id,
-            pb_ref_codon,
-            pb_alt_codon,
-            clinvar_var_id,
-            cv_altered_codon,
-            strand,
-            pb_ref_aa,
-            pb_alt_aa,
-            var_infos[clinvar_col2idx["aa_change"]],
-            cv_alt_aa,
-        )
-        """
+        else:  # amino acid is changed (pathogenic 변이만 index에 있음)
+            if pb_alt_aa == cv_alt_aa:
+                ps1 = 1
+            else:
+                pm5 = 1
 
     return (ps1, pm5)
 
@@ -686,6 +746,10 @@ def execute(
         만약, 해당변이의 전사체가 missense variant가 아니라면, 해당 변이가 clinvar에 보고된 변이인지 조사한다.
         (check_same_variant_in_clinvar()). 만약, 해당 변이가 clinvar에 보고되어 있고 pathogenic 하다면
         pp5를, benign 하다면 bp6를 부여한다.
+        한 변이의 여러 transcript는 같은 입력으로 두 함수를 반복해서 실행하므로, 결과를 LRU cache
+        (memo.LruMemo)에 저장해 두고 다시 사용한다.
+        - check_amino_acid_change_in_clinvar(): (gene_symbol, var_id, codon_change, AA_change, strand)
+        - check_same_variant_in_clinvar(): (var_id, gene_symbol)
 
     Args:
         proband_var_df (object): Class VariantDF <- VEP file
@@ -698,6 +762,10 @@ def execute(
 
     df_col2idx = proband_var_df.df_col2idx
     variant_dic = proband_var_df.variant_dic
+    # {gene_symbol: clinvar_position_index}. 유전자 별로 한 번만 만든다.
+    clinvar_index_dic = dict()
+    ps1pm5_memo = memo.LruMemo("ps1pm5")
+    pp5bp6_memo = memo.LruMemo("pp5bp6")
 
     for var_id in variant_dic:
         for var_feature in variant_dic[var_id]:
@@ -709,15 +777,36 @@ def execute(
             if is_missense_var(variant_dic[var_id][var_feature], df_col2idx):
                 if (gene_symbol != "-") and (clinvar_db_dic.get(gene_symbol)):
                     # gene_symbol이 없는 경우, 비교의미 없음.
-                    ps1, pm5 = check_amino_acid_change_in_clinvar(
-                        variant_dic[var_id][var_feature]["var_infos"],
+                    if gene_symbol not in clinvar_index_dic:
+                        clinvar_index_dic[
+                            gene_symbol
+                        ] = build_clinvar_position_index(
+                            clinvar_db_dic[gene_symbol], clinvar_col2idx
+                        )
+                    var_infos = variant_dic[var_id][var_feature]["var_infos"]
+                    ps1, pm5 = ps1pm5_memo.get(
+                        (
+                            gene_symbol,
+                            var_id,
+                            var_infos[df_col2idx["codon_change"]],
+                            var_infos[df_col2idx["AA_change"]],
+                            var_infos[df_col2idx["strand"]],
+                        ),
+                        check_amino_acid_change_in_clinvar,
+                        var_infos,
                         df_col2idx,
                         clinvar_db_dic[gene_symbol],
                         clinvar_col2idx,
+                        clinvar_index_dic[gene_symbol],
                     )
             else:  # 동일한 염기 서열 변화가 있는지 조사. gene_symbol 과 무관. 염기의 유무만 판단
-                pp5, bp6 = check_same_variant_in_clinvar(
-                    var_id, gene_symbol, clinvar_db_dic, clinvar_col2idx
+                pp5, bp6 = pp5bp6_memo.get(
+                    (var_id, gene_symbol),
+                    check_same_variant_in_clinvar,
+                    var_id,
+                    gene_symbol,
+                    clinvar_db_dic,
+                    clinvar_col2idx,
                 )
 
             variant_dic[var_id][var_feature]["evidence_score_dic"]["ps1"] = ps1
@@ -728,3 +817,58 @@ def execute(
     proband_var_df.variant_dic = variant_dic
 
     return proband_var_df
+
+
+memo = sys.modules[__name__]
+
+# LruMemo 하나에 저장하는 최대 결과 수 (0 이면 저장하지 않는다)
+MEMO_MAXSIZE = 65536
+
+# {name: {"hits": int, "misses": int}}. 같은 이름의 LruMemo는 counter를 함께 사용한다 (누적).
+MEMO_STATS_DIC: dict = dict()
+
+
+class LruMemo:
+    """_summary_
+    Note:
+        rule 함수의 결과를 입력값 key로 저장해 두었다가, 같은 key가 다시 나오면 함수를 다시 실행하지 않고
+        저장된 결과를 반환하는 LRU cache. 최대 maxsize 개의 결과만 저장하며, 가장 오래 사용하지 않은 결과부터
+        지운다. 사용한 횟수(hits)와 실행한 횟수(misses)는 이름 별로 MEMO_STATS_DIC에 누적한다.
+
+        rule 함수는 database dictionary 처럼 hash 할 수 없는 값을 함께 받으므로, 결과를 결정하는 값만으로
+        key를 만들어서 사용한다. 같은 database로 실행하는 동안에만 사용해야 한다 (rule 모듈의 execute() 마다
+        새로 만든다).
+
+    Examples:
+        >>> pp2bp1_memo = LruMemo("pp2bp1")
+            pp2, bp1 = pp2bp1_memo.get(
+                gene_symbol, assign_pp2bp1_rule, gene_symbol, clinvar_db_dic, clinvar_col2idx
+            )
+    """
+
+    def __init__(self, name: str, maxsize: int = None):
+        self.name = name
+        self.maxsize = MEMO_MAXSIZE if maxsize is None else maxsize
+        self.cache = OrderedDict()
+        self.stats: dict = MEMO_STATS_DIC.setdefault(name, {"hits": 0, "misses": 0})
+
+    def get(self, key: object, func: object, *args) -> object:
+        """key의 저장된 결과를 반환한다. 없으면 func(*args)를 실행하여 저장한 뒤 반환한다."""
+
+        cache = self.cache
+        if key in cache:
+            self.stats["hits"] += 1
+            cache.move_to_end(key)
+            return cache[key]
+
+        self.stats["misses"] += 1
+        value = func(*args)
+        if self.maxsize > 0:
+            cache[key] = value
+            if len(cache) > self.maxsize:
+                cache.popitem(last=False)
+
+        return value
+
+    def __len__(self) -> int:
+        return len(self.cache)
@@ -1,7 +1,8 @@
 # Module for PVS1
 # 질병의 원인으로 알려진 유전자의 Null variants (nonsense, frameshift, splicing site, exon deletion etc..)
 
-import pytest
+import pytest, mock
+import sys
 
 
 @pytest.fixture
@@ -235,6 +236,80 @@ def test_check_disease_cause_is_null(gene_symbol, expected, clinvar_db_dic):
     )
 
 
+@pytest.mark.parametrize(
+    "protein_pos, expected",
+    [("77/97", "PVS1_S"), ("88/97", "PVS1_M"), ("987-988/4911", "PVS1_S"), ("4900-4901/4911", "PVS1_M")],
+)
+def test_assign_pvs1_strength(protein_pos, expected):
+
+    assert expected == assign_pvs1_strength(protein_pos)
+
+
+def make_var_infos(var_id: str, consequence: str, protein_pos: str, symbol: str):
+
+    chrom, pos = var_id.split("-")[:2]
+
+    return {
+        "var_infos": [
+            var_id, chrom, [int(pos)], "-", "-", consequence, "-", "-",
+            protein_pos, "-", "-", symbol, "1", None, 0, 0, None,
+        ],
+        "evidence_score_dic": {},
+    }
+
+
+def test_execute_mechanism_table(df_col2idx, clinvar_db_dic):
+
+    clinvar_col2idx: dict = {
+        "pathogenicity": 0,
+        "consequence_dic": 1,
+        "aa_change": 2,
+    }
+    disease_db_dic = {
+        "PLCE1": [["Nephrotic syndrome", ["Autosomal recessive"]]],
+        "ECEL1": [["Arthrogryposis, distal, type 5D", ["Autosomal recessive"]]],
+    }
+    disease_col2idx = {"title": 0, "inheritance": 1}
+    variant_infos = [
+        ("10-96014000-C-T", "stop_gained", "423/2302", "PLCE1", "PVS1_S"),
+        ("10-96014001-CA-C", "frameshift_variant", "2300/2302", "PLCE1", "PVS1_M"),
+        ("10-96014002-C-T", "intron_variant", "-", "PLCE1", ""),
+        ("2-233344900-G-A", "stop_gained", "700/775", "ECEL1", "PVS1_M"),
+        ("10-126086500-C-T", "stop_gained", "10/439", "OAT", ""),
+        ("1-100-C-T", "stop_gained", "10/100", "-", ""),
+    ]
+
+    evidence_dics = []
+    for gene_mechanism in [
+        (None, None),  # execute()에서 계산
+        make_gene_mechanism_dic(clinvar_db_dic, clinvar_col2idx),
+    ]:
+        variant_dic = {
+            var_id: {
+                "ENST0": make_var_infos(var_id, consequence, protein_pos, symbol)
+            }
+            for var_id, consequence, protein_pos, symbol, _ in variant_infos
+        }
+        proband_var_df = execute(
+            mock.Mock(variant_dic=variant_dic, df_col2idx=df_col2idx),
+            clinvar_db_dic,
+            clinvar_col2idx,
+            disease_db_dic,
+            disease_col2idx,
+            *gene_mechanism,
+        )
+        evidence_dics.append(
+            {
+                var_id: var_features["ENST0"]["evidence_score_dic"]["pvs1"]
+                for var_id, var_features in proband_var_df.variant_dic.items()
+            }
+        )
+
+    # 미리 계산된 메커니즘 table을 사용해도 table 없이 실행한 경우와 같은 결과
+    expected = {var_id: pvs1 for var_id, _, _, _, pvs1 in variant_infos}
+    assert expected == evidence_dics[0] == evidence_dics[1]
+
+
 #########################################################
 
 
@@ -344,12 +419,40 @@ def check_disease_inheritence(gene_disease_infos: list, disease_col2idx: dict):
         return "Autosomal recessive"
 
 
+def assign_pvs1_strength(protein_pos: str) -> str:
+    """_summary_
+    Note:
+        변이가 protein의 앞쪽 90% 안에서 생긴 경우 PVS1_S(strong), 그 외에는 PVS1_M(moderate)을 반환한다.
+
+    Args:
+        protein_pos (str): Protein_position. e.g. 77/97, 987-988/4911
+
+    Returns:
+        str: "PVS1_S" or "PVS1_M"
+    """
+
+    # e.g. 77/97, 987-988/4911
+    var_pos, protein_len = protein_pos.split("/")
+    var_pos = var_pos.split("-")[0]
+
+    # variant remove 기준: 90%
+    try:
+        if (int(var_pos) / int(protein_len)) < 0.9:
+            return "PVS1_S"
+        else:
+            return "PVS1_M"
+    except TypeError:  # '-'
+        return "PVS1_M"
+
+
 def execute(
     proband_var_df: object,
     clinvar_db_dic: dict,
     clinvar_col2idx: dict,
     disease_db_dic: dict,
     disease_col2idx: dict,
+    gene_mechanism_dic: dict = None,
+    gene_mechanism_col2idx: dict = None,
 ) -> object:
     """_summary_
     Note: ACMG rule 중에서, pvs1 에 해당하는 룰을 구현한 모듈이다. 각각의 rule에 대한 설명은 다음과 같다.
@@ -383,6 +486,8 @@ def execute(
         일치하는 ClinVar 데이터들을 조사하여, 해당 유전자에서 발생하는 질병의 원인이 null variant인지 계산한다
         (check_disease_cause_is_null()). 만약, 해당 유전자에서 주로 pathogenic 한 null 변이가 보고었다면,
         유전형태를 파악하고(반영x), protein에서 변이가 생긴 위치에 따라 (기준 90%) pvs1 을 차등부여한다.
+        유전자 별 메커니즘은 ClinVar를 읽을 때 한 번만 계산해둔 table을 사용한다.
+        (dbparser.make_gene_mechanism_dic(). 주어지지 않으면 여기서 한 번 계산한다.)
 
     Args:
         proband_var_df (object): Class VariantDF <- VEP file
@@ -390,6 +495,8 @@ def execute(
         clinvar_col2idx (dict): Clinvar_db_dic-index dictionary
         disease_db_dic (dict): Disease 데이터베이스를 미리 가공한 dictionary
         disease_col2idx (dict): Disease_db_list-index dictionary
+        gene_mechanism_dic (dict): 유전자 별 메커니즘 table
+        gene_mechanism_col2idx (dict): 메커니즘 table column index dictionary
 
     Returns:
         object: proband_variant_DF의 variant_dic["evidnece_score_dic"]이 update된 object.
@@ -401,6 +508,10 @@ def execute(
 
     df_col2idx = proband_var_df.df_col2idx
     variant_dic = proband_var_df.variant_dic
+    if gene_mechanism_dic is None:
+        gene_mechanism_dic, gene_mechanism_col2idx = dbparser.make_gene_mechanism_dic(
+            clinvar_db_dic, clinvar_col2idx
+        )
 
     for var_id in variant_dic:
         for var_feature in variant_dic[var_id]:
@@ -412,29 +523,23 @@ def execute(
                 ]
                 if gene_symbol != "-":  # gene_symbol이 없는 경우, 비교 불가.
                     if clinvar_db_dic.get(gene_symbol):
-                        if check_disease_cause_is_null(
-                            clinvar_db_dic[gene_symbol], clinvar_col2idx
+                        # check_disease_cause_is_null() 결과와 같음.
+                        if (
+                            gene_mechanism_dic[gene_symbol][
+                                gene_mechanism_col2idx["mechanism"]
+                            ]
+                            == "null variant"
                         ):
                             check_disease_inheritence(  # 추후 필요하면 사용
                                 disease_db_dic[gene_symbol], disease_col2idx
                             )
 
                             # check whether variant remove 10% of protein.
-                            protein_pos = variant_dic[var_id][var_feature][
-                                "var_infos"
-                            ][df_col2idx["protein_pos"]]
-                            # e.g. 77/97, 987-988/4911
-                            var_pos, protein_len = protein_pos.split("/")
-                            var_pos = var_pos.split("-")[0]
-
-                            # variant remove 기준: 90%
-                            try:
-                                if (int(var_pos) / int(protein_len)) < 0.9:
-                                    pvs1 = "PVS1_S"
-                                else:
-                                    pvs1 = "PVS1_M"
-                            except TypeError:  # '-'
-                                pvs1 = "PVS1_M"
+                            pvs1 = assign_pvs1_strength(
+                                variant_dic[var_id][var_feature]["var_infos"][
+                                    df_col2idx["protein_pos"]
+                                ]
+                            )
 
             variant_dic[var_id][var_feature]["evidence_score_dic"][
                 "pvs1"
@@ -443,3 +548,93 @@ def execute(
     proband_var_df.variant_dic = variant_dic
 
     return proband_var_df
+
+
+dbparser = sys.modules[__name__]
+
+
+def make_gene_mechanism_dic(clinvar_db_dic: dict, clinvar_col2idx: dict) -> tuple:
+    """_summary_
+    Note:
+        gene_symbol을 기준으로 정리된 ClinVar dictionary에서, 각 유전자에 보고된 pathogenic 변이의 수와
+        그 중 missense, null variant가 주된 결과인 변이의 수를 세어, 유전자의 질병 원인 메커니즘을 미리
+        계산해둔다. pp2bp1, pvs1 에서 변이(transcript)마다 같은 유전자의 ClinVar 변이를 다시 세지 않고,
+        이 table에서 바로 찾는다. (기준: pp2bp1.check_gene_pathogenic_mechanism())
+
+        <병의 원인 판단 기준>
+        - Missense: pathogenic missense variant 2개 이상, pathogenic variant 중 50% 초과
+        - Null variant: pathogenic null variant 2개 이상, pathogenic variant 중 50% 초과
+        {nonsense, frameshift variant, splice donor variant, splice acceptor variant, initiatior codon variant}
+
+    Args:
+        clinvar_db_dic (dict): parse_clinvar_db()의 결과
+        clinvar_col2idx (dict): ClinVar_column index dictionary
+
+    Returns:
+        dict: { "gene symbol": [pathogenic_count, missense_count, null_count, mechanism] }
+        gene_mechanism_col2idx: dict = {"pathogenic_count": 0, "missense_count": 1, "null_count": 2,
+                                        "mechanism": 3}
+
+    Examples:
+        >>> {
+                "BRCA2": [2, 0, 2, "null variant"],
+                "OAT": [1, 1, 0, ""],
+            }
+    """
+
+    gene_mechanism_col2idx: dict = {
+        "pathogenic_count": 0,
+        "missense_count": 1,
+        "null_count": 2,
+        "mechanism": 3,
+    }
+
+    gene_mechanism_dic = dict()
+    for gene_symbol, gene_variant_dic in clinvar_db_dic.items():
+
+        pathogenic_missense_count = 0
+        pathogenic_null_count = 0
+        pathogenic_count = 0
+
+        # 각 variant_id의 pathogenicity와 variant의 종류 counting
+        for var_infos in gene_variant_dic.values():
+            var_patho = var_infos[clinvar_col2idx["pathogenicity"]]
+            var_cons_dic = var_infos[clinvar_col2idx["consequence_dic"]]
+
+            if "Pathogenic" in var_patho or "Likely pathogenic" in var_patho:
+                pathogenic_count += 1
+
+                cons_count = sum(var_cons_dic.values())
+                missense_count = var_cons_dic.get("missense variant", 0)
+                null_count = (
+                    var_cons_dic.get("nonsense", 0)
+                    + var_cons_dic.get("frameshift variant", 0)
+                    + var_cons_dic.get("splice donor variant", 0)
+                    + var_cons_dic.get("splice acceptor variant", 0)
+                    + var_cons_dic.get("initiatior codon variant", 0)
+                )
+                if missense_count > cons_count * 0.5:
+                    pathogenic_missense_count += 1
+                elif null_count > cons_count * 0.5:
+                    pathogenic_null_count += 1
+
+        # 기준에 따라 병의 원인 메커니즘 부여.
+        if (pathogenic_missense_count >= 2) and (
+            pathogenic_missense_count / pathogenic_count
+        ) > 0.5:
+            mechanism = "missense variant"
+        elif (pathogenic_null_count >= 2) and (
+            pathogenic_null_count / pathogenic_count
+        ) > 0.5:
+            mechanism = "null variant"
+        else:
+            mechanism = ""
+
+        gene_mechanism_dic[gene_symbol] = [
+            pathogenic_count,
+            pathogenic_missense_count,
+            pathogenic_null_count,
+            mechanism,
+        ]
+
+    return gene_mechanism_dic, gene_mechanism_col2idx
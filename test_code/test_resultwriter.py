@@ -0,0 +1,290 @@
+# module for ACMG result writer test
+
+import gzip
+import struct
+import sys
+import zlib
+import pytest
+
+
+def test_format_disease_info():
+
+    diseases = [
+        ["Ciliary dyskinesia, primary, 14", ["Autosomal recessive"], ["Pediatric"], ["HP:0000001"], ["a"]],
+        ["Encephalopathy", ["Autosomal recessive", "Autosomal dominant"], ["Infancy"], [""], [""]],
+        ["Encephalopathy", ["Autosomal recessive", "Autosomal dominant"], ["Neonatal"], [""], [""]],
+        ["Unknown inheritance", [""], [""], [""], [""]],
+    ]
+
+    assert (
+        "Ciliary dyskinesia, primary, 14 (Autosomal recessive)"
+        "||Encephalopathy (Autosomal recessive/Autosomal dominant)"
+        "||Unknown inheritance"
+    ) == format_disease_info(diseases, {"title": 0, "inheritance": 1})
+    assert "" == format_disease_info([], {"title": 0, "inheritance": 1})
+
+
+@pytest.mark.parametrize("filename", ["ACMG_result.txt", "ACMG_result.txt.gz"])
+def test_tsv_result_writer(tmp_path, filename):
+
+    result_file = str(tmp_path / filename)
+    rows = [
+        [f"1-{pos}-A-G", "ENST00000335137", "missense_variant", "OR4F5", "PP3||PM2", 0.5, "VUS", ""]
+        for pos in range(25)
+    ]
+    with open_result_writer(result_file, batch_size=10) as writer:
+        for row in rows:
+            writer.write_row(row)
+        assert 5 == len(writer.rows)  # 10개 씩 저장하고 남은 row
+
+    opener = gzip.open if filename.endswith(".gz") else open
+    with opener(result_file, "rt") as infile:
+        lines = infile.read().splitlines()
+
+    assert "#" + "\t".join(RESULT_COLUMNS) == lines[0]
+    assert ["\t".join(map(str, row)) for row in rows] == lines[1:]
+
+
+def test_bgzf_writer(tmp_path):
+
+    bgzf_file = str(tmp_path / "data.gz")
+    data = b"".join(b"%d\tline\n" % i for i in range(30000))
+    writer = BgzfWriter(bgzf_file)
+    writer.write(data[:100])
+    writer.write(data[100:])
+    writer.close()
+
+    with open(bgzf_file, "rb") as infile:
+        raw = infile.read()
+    assert raw.endswith(BGZF_EOF)
+    assert len(raw) > len(BGZF_EOF) * 2  # 여러 block
+    assert data == gzip.decompress(raw)
+
+
+def test_parquet_result_writer(tmp_path):
+
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    result_file = str(tmp_path / "ACMG_result.parquet")
+    with open_result_writer(result_file, batch_size=2) as writer:
+        for pos in range(5):
+            writer.write_row([f"1-{pos}-A-G", "ENST1", "missense_variant", "OR4F5", "PP3", 0.5, "VUS", ""])
+
+    table = pyarrow_parquet.read_table(result_file)
+    assert RESULT_COLUMNS == table.column_names
+    assert [0.5] * 5 == table.column("ACMG_bayesian").to_pylist()
+
+
+######################################################################
+
+
+# BGZF block 하나에 저장하는 최대 data 크기 (bgzip과 같음)
+BGZF_BLOCK_SIZE = 0xFF00
+# BGZF 파일의 끝을 나타내는 빈 block
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+def make_bgzf_block(data: bytes, level: int = 6) -> bytes:
+    """_summary_
+    Note:
+        data (BGZF_BLOCK_SIZE 이하)를 압축하여 BGZF block 하나를 만든다. read_bgzf_block()이 읽는 형식과 같다.
+
+    Args:
+        data (bytes): 압축할 data
+        level (int): zlib 압축 level
+
+    Returns:
+        bytes: BGZF block
+    """
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    block_size = 18 + len(cdata) + 8  # header, extra field(BC) + CDATA + CRC32, ISIZE
+
+    return b"".join(
+        [
+            struct.pack("<BBBBIBBH", 31, 139, 8, 4, 0, 0, 255, 6),
+            struct.pack("<BBHH", 66, 67, 2, block_size - 1),
+            cdata,
+            struct.pack("<II", zlib.crc32(data) & 0xFFFFFFFF, len(data)),
+        ]
+    )
+
+
+class BgzfWriter:
+    """_summary_
+    Note:
+        data를 BGZF_BLOCK_SIZE 크기의 block으로 나누어 BGZF (bgzip) 형식으로 저장하는 writer.
+        gzip으로도 읽을 수 있으며, tabix index를 만들 수 있다. close() 할 때 EOF block을 추가한다.
+    """
+
+    def __init__(self, filename: str, level: int = 6):
+        self.outfile = open(filename, "wb")
+        self.level = level
+        self.buffer = bytearray()
+
+    def write(self, data: bytes):
+        self.buffer += data
+        while len(self.buffer) >= BGZF_BLOCK_SIZE:
+            self.outfile.write(
+                make_bgzf_block(bytes(self.buffer[:BGZF_BLOCK_SIZE]), self.level)
+            )
+            del self.buffer[:BGZF_BLOCK_SIZE]
+
+    def close(self):
+        if self.buffer:
+            self.outfile.write(make_bgzf_block(bytes(self.buffer), self.level))
+            self.buffer = bytearray()
+        self.outfile.write(BGZF_EOF)
+        self.outfile.close()
+
+
+tabix = sys.modules[__name__]
+
+# 결과 파일의 column
+RESULT_COLUMNS = [
+    "Variant_ID",
+    "Feature",
+    "Consequence",
+    "Symbol",
+    "ACMG_rule",
+    "ACMG_bayesian",
+    "Pathogenicity",
+    "Related disease_info",
+]
+# 한 번에 저장하는 row 수
+RESULT_BATCH_SIZE = 10000
+
+
+def format_disease_info(diseases: list, disease_col2idx: dict) -> str:
+    """_summary_
+    Note:
+        유전자에 관련된 질병 정보 (dbparser.parse_disease_db()의 disease_infos list)를 "title (inheritance)"
+        형식으로 줄여서 "||"로 이어 반환한다. 같은 질병은 한 번만 적고, 증상 목록은 제외한다.
+
+    Args:
+        diseases (list): [ ["title", ["inheritance"], ["onsetAges"], symtoms_id, symtoms] ]
+        disease_col2idx (dict): disease_db_dic column index dictionary
+
+    Returns:
+        str: 질병 정보
+
+    Examples:
+        >>> [["Ciliary dyskinesia, primary, 14", ["Autosomal recessive"], ["Pediatric"], [""], [""]]]
+            -> "Ciliary dyskinesia, primary, 14 (Autosomal recessive)"
+    """
+
+    disease_infos = []
+    for disease in diseases:
+        title = disease[disease_col2idx["title"]]
+        inheritances = "/".join(
+            inheritance
+            for inheritance in disease[disease_col2idx["inheritance"]]
+            if inheritance
+        )
+        disease_infos.append(f"{title} ({inheritances})" if inheritances else title)
+
+    return "||".join(dict.fromkeys(disease_infos))
+
+
+class TsvResultWriter:
+    """_summary_
+    Note:
+        결과 row를 모아두었다가 batch_size 마다 한 번에 tab 형식으로 저장하는 writer.
+        파일 이름이 .gz, .bgz 로 끝나면 BGZF (bgzip) 형식으로 압축하여 저장한다.
+
+    Examples:
+        >>> with TsvResultWriter("ACMG_result.txt.gz") as writer:
+                writer.write_row(["1-69270-A-G", "ENST00000335137", ..])
+    """
+
+    def __init__(self, filename: str, batch_size: int = RESULT_BATCH_SIZE):
+        if filename.endswith((".gz", ".bgz")):
+            self.outfile = tabix.BgzfWriter(filename)
+        else:
+            self.outfile = open(filename, "wb")
+        self.batch_size = batch_size
+        self.rows: list = []
+        self.outfile.write(("#" + "\t".join(RESULT_COLUMNS) + "\n").encode())
+
+    def write_row(self, row: list):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        lines = ["\t".join(map(str, row)) + "\n" for row in self.rows]
+        self.outfile.write("".join(lines).encode())
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.outfile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ParquetResultWriter(TsvResultWriter):
+    """_summary_
+    Note:
+        결과 row를 모아두었다가 batch_size 마다 Parquet row group 하나로 저장하는 writer.
+        pyarrow가 필요하다. ACMG_bayesian은 float, 나머지 column은 문자열로 저장한다.
+    """
+
+    def __init__(self, filename: str, batch_size: int = RESULT_BATCH_SIZE):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as error:
+            raise ImportError("Parquet output requires pyarrow") from error
+
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema(
+            [
+                (col, pyarrow.float64() if col == "ACMG_bayesian" else pyarrow.string())
+                for col in RESULT_COLUMNS
+            ]
+        )
+        self.outfile = pyarrow.parquet.ParquetWriter(filename, self.schema)
+        self.batch_size = batch_size
+        self.rows: list = []
+
+    def flush(self):
+        if not self.rows:
+            return
+        columns = [list(values) for values in zip(*self.rows)]
+        self.outfile.write_table(
+            self.pyarrow.Table.from_arrays(
+                [
+                    self.pyarrow.array(values, type=field.type)
+                    for values, field in zip(columns, self.schema)
+                ],
+                schema=self.schema,
+            )
+        )
+        self.rows = []
+
+
+def open_result_writer(filename: str, batch_size: int = RESULT_BATCH_SIZE) -> object:
+    """_summary_
+    Note:
+        파일 이름에 따라 결과 writer를 반환한다.
+        - .parquet: ParquetResultWriter
+        - .gz, .bgz: BGZF 압축 TsvResultWriter
+        - 그 외: TsvResultWriter
+
+    Args:
+        filename (str): output file address
+        batch_size (int): 한 번에 저장하는 row 수
+
+    Returns:
+        object: write_row(), close()를 가진 writer
+    """
+
+    if filename.endswith(".parquet"):
+        return ParquetResultWriter(filename, batch_size)
+
+    return TsvResultWriter(filename, batch_size)
@@ -0,0 +1,358 @@
+# module for vectorized ACMG rule evaluation test
+
+from collections import defaultdict
+import copy
+import numpy as np
+import pytest
+
+
+class CategoryColumn:
+    def __init__(self, values: list):
+        self.categories = list(dict.fromkeys(values))
+        self.codes = np.array([self.categories.index(value) for value in values])
+
+
+def test_make_category_mask():
+
+    column = CategoryColumn(
+        ["missense_variant", "intron_variant", "missense_variant,splice_region_variant", "intron_variant"]
+    )
+
+    assert [True, False, True, False] == list(
+        make_category_mask(column, lambda consequence: "missense_variant" in consequence)
+    )
+
+
+@pytest.mark.parametrize(
+    "is_missense, is_synonymous, revel, spliceai, expected",
+    [
+        (True, False, 0.52, 0.1, (1, 0, 0)),
+        (True, False, 0.12, np.nan, (0, 1, 0)),
+        (True, False, 0.1, 0.6, (1, 0, 0)),
+        (True, False, np.nan, 0.1, (0, 1, 0)),
+        (True, False, 0.0, np.nan, (0, 0, 0)),  # REVEL 0 은 값이 없는 것으로 판단
+        (True, False, np.nan, np.nan, (0, 0, 0)),
+        (False, True, 0.9, 0.1, (0, 1, 1)),
+        (False, True, np.nan, 0.5, (1, 0, 0)),
+        (False, False, np.nan, 0.2, (0, 1, 0)),
+        (False, True, np.nan, np.nan, (0, 0, 0)),
+    ],
+)
+def test_assign_pp3bp4bp7_masks(is_missense, is_synonymous, revel, spliceai, expected):
+
+    pp3, bp4, bp7 = assign_pp3bp4bp7_masks(
+        np.array([is_missense]), np.array([is_synonymous]), np.array([revel]), np.array([spliceai])
+    )
+
+    assert expected == (pp3[0], bp4[0], bp7[0])
+
+
+@pytest.mark.parametrize(
+    "an, af, inheritence, expected",
+    [
+        (100, 0.6, "AD", (0, 0, 0)),
+        (1000, 0.06, "AD", (0, 1, 0)),
+        (10001, 0.00001, "AD", (1, 0, 0)),
+        (10001, 0.0001, "AD", (0, 0, 0)),
+        (10001, 0.0005, "YD", (0, 0, 1)),
+        (10001, 0.00005, "AR", (1, 0, 0)),
+        (10001, 0.0005, "XR", (0, 0, 0)),
+        (10001, 0.005, "AR", (0, 0, 1)),
+        (10001, 0.00001, "", (0, 0, 0)),
+    ],
+)
+def test_assign_pm2ba1bs1_masks(an, af, inheritence, expected):
+
+    pm2, ba1, bs1 = assign_pm2ba1bs1_masks(
+        np.array([an]), np.array([af]), np.array([inheritence], dtype=object)
+    )
+
+    assert expected == (pm2[0], ba1[0], bs1[0])
+
+
+def make_var_infos(
+    var_id: str,
+    feature: str,
+    consequence: str,
+    symbol: str,
+    protein_pos: str = "-",
+    AA_change: str = "-",
+    codon_change: str = "-",
+    revel: float = None,
+    gnomad: tuple = (0, 0, None),
+    location: list = None,
+) -> list:
+    # VariantDF.df_col2idx 순서 (dbparser.make_vep_var_infos())
+    chrom, pos = var_id.split("-")[:2]
+    gnomad_ac, gnomad_an, gnomad_af = gnomad
+
+    return [
+        var_id, chrom, location or [int(pos)], f"ENSG_{symbol}", feature, consequence,
+        "-", "-", protein_pos, AA_change, codon_change, symbol, "1",
+        revel, gnomad_ac, gnomad_an, gnomad_af, "MODERATE", "", "",
+    ]
+
+
+@pytest.fixture
+def rule_variant_dic():
+
+    # (var_id, feature, consequence, symbol, kwargs)
+    rows = [
+        # SCN1A: ClinVar missense 메커니즘, AR
+        ("2-1000-A-G", "ENST_S1", "missense_variant", "SCN1A",  # ps1, pp3, pp2, pm2
+         dict(protein_pos="10/2000", AA_change="T/A", codon_change="Aca/Gca", revel=0.7, gnomad=(3, 50000, 0.00006))),
+        ("2-1000-A-G", "ENST_S2", "missense_variant,splice_region_variant", "SCN1A",  # bp4 (SpliceAI < 0.5)
+         dict(protein_pos="10/1990", AA_change="T/A", codon_change="Aca/Gca", revel=0.2, gnomad=(3, 50000, 0.00006))),
+        ("2-2001-C-A", "ENST_S1", "missense_variant", "SCN1A",  # pm5, pp3 (SpliceAI), AN < 1000
+         dict(protein_pos="20/2000", AA_change="P/Q", codon_change="cCg/cAg", gnomad=(10, 500, 0.02))),
+        ("2-3000-G-A", "ENST_S1", "splice_region_variant,intron_variant", "SCN1A",  # pp5, SpliceAI None
+         dict(gnomad=(0, 0, None))),
+        ("2-4000-T-C", "ENST_S1", "missense_variant", "SCN1A",  # REVEL 0 (값 없음)
+         dict(protein_pos="40/2000", AA_change="V/A", codon_change="gTg/gCg", revel=0.0, gnomad=(25, 50000, 0.0005))),
+        # BRCA2: ClinVar null 메커니즘, AD
+        ("13-100-C-T", "ENST_B1", "stop_gained", "BRCA2",  # PVS1_S, pp5, pm2
+         dict(protein_pos="100/3418", AA_change="Q/*", codon_change="Cag/Tag", gnomad=(1, 100000, 0.00001))),
+        ("13-300-CA-C", "ENST_B1", "frameshift_variant", "BRCA2",  # PVS1_M, ba1, bs1
+         dict(protein_pos="3300-3301/3418", gnomad=(5000, 60000, 0.08), location=[301])),
+        ("13-400-G-T", "ENST_B1", "missense_variant", "BRCA2",  # bp1, bp4, AF 0 (값 없음)
+         dict(protein_pos="130/3418", AA_change="A/S", codon_change="Gcc/Tcc", revel=0.4, gnomad=(0, 30000, 0.0))),
+        ("13-500-C-G", "ENST_B1", "synonymous_variant", "BRCA2",  # bp4, bp7, bp6
+         dict(protein_pos="160/3418", AA_change="L", codon_change="ctC/ctG", gnomad=(40, 60000, 0.0007))),
+        ("13-500-C-G", "ENST_B2", "upstream_gene_variant", "-",
+         dict(gnomad=(40, 60000, 0.0007))),
+        ("13-700-A-AGGG", "ENST_B1", "inframe_insertion", "BRCA2",  # bp3 (반복서열)
+         dict(protein_pos="230-231/3418", location=[700, 701])),
+        ("13-900-ATTT-A", "ENST_B1", "inframe_deletion", "BRCA2",  # pm4
+         dict(protein_pos="300-301/3418", location=[901, 903])),
+        ("13-1100-T-C", "ENST_B1", "stop_lost", "BRCA2",  # pm4
+         dict(protein_pos="3418/3418", AA_change="*/Q", codon_change="Tag/Cag")),
+        # DMD: ClinVar 없음, XR
+        ("X-200-A-G", "ENST_D1", "start_lost", "DMD",  # pvs1 "", bs1
+         dict(protein_pos="1/3685", AA_change="M/T", codon_change="aTg/aCg", gnomad=(40, 20000, 0.002))),
+        ("X-300-G-T", "ENST_D1", "missense_variant", "DMD",  # bp4
+         dict(protein_pos="50/3685", AA_change="G/C", codon_change="Ggt/Tgt", revel=0.3)),
+        ("X-300-G-T", "ENST_D2", "missense_variant", "-",
+         dict(protein_pos="50/3600", AA_change="G/C", codon_change="Ggt/Tgt")),
+    ]
+
+    variant_dic = dict()
+    for var_id, feature, consequence, symbol, kwargs in rows:
+        variant_dic.setdefault(var_id, dict())[feature] = {
+            "var_infos": make_var_infos(var_id, feature, consequence, symbol, **kwargs),
+            "evidence_score_dic": dict(),
+        }
+
+    return variant_dic
+
+
+@pytest.fixture
+def rule_db_dic(acmg_main):
+
+    dbparser = acmg_main.dbparser
+
+    clinvar_col2idx = {"pathogenicity": 0, "consequence_dic": 1, "aa_change": 2}
+    clinvar_db_dic = {
+        "SCN1A": {
+            "2-1000-A-G": ["Pathogenic", {"missense variant": 1}, "T10A"],
+            "2-2000-C-T": ["Likely pathogenic", {"missense variant": 1}, "P20S"],
+            "2-3000-G-A": ["Pathogenic", {"splice donor variant": 1}, "-"],
+        },
+        "BRCA2": {
+            "13-100-C-T": ["Pathogenic", {"nonsense": 1}, "Q100*"],
+            "13-250-G-A": ["Pathogenic", {"frameshift variant": 1}, "-"],
+            "13-500-C-G": ["Benign", {"synonymous variant": 1}, "L160L"],
+        },
+    }
+    gene_mechanism_dic, gene_mechanism_col2idx = dbparser.make_gene_mechanism_dic(
+        clinvar_db_dic, clinvar_col2idx
+    )
+
+    disease_col2idx = {"title": 0, "inheritance": 1, "onsetAges": 2, "symtoms_id": 3, "symtoms": 4}
+    disease_db_dic = defaultdict(list)
+    for gene_symbol, inheritance in [
+        ("SCN1A", "Autosomal recessive"),
+        ("BRCA2", "Autosomal dominant"),
+        ("DMD", "X-linked recessive"),
+    ]:
+        disease_db_dic[gene_symbol].append(
+            [f"{gene_symbol} disease", [inheritance], ["Infancy"], ["HP:0000001"], ["All"]]
+        )
+
+    repeat_db_dic = {"13": [(650, 750), (2000, 2100)]}
+
+    return {
+        "spliceai_db_dic": {
+            "2-1000-A-G": {"SCN1A": [0.1, 0.0, 0.0, 0.0]},
+            "2-2001-C-A": {"SCN1A": [0.0, 0.6, 0.0, 0.0]},
+            "2-3000-G-A": {"SCN1A": None},
+            "13-500-C-G": {"BRCA2": [0.1, 0.0, 0.0, 0.0]},
+        },
+        "clinvar_db_dic": clinvar_db_dic,
+        "clinvar_col2idx": clinvar_col2idx,
+        "gene_mechanism_dic": gene_mechanism_dic,
+        "gene_mechanism_col2idx": gene_mechanism_col2idx,
+        "disease_db_dic": disease_db_dic,
+        "disease_col2idx": disease_col2idx,
+        "repeat_db_dic": repeat_db_dic,
+        "repeat_index_dic": acmg_main.pm4bp3.make_repeat_index_dic(repeat_db_dic),
+        "proband_genotype_dic": {
+            "2-1000-A-G": "0/1",
+            "13-100-C-T": "0/1",
+            "13-500-C-G": "1/1",
+            "X-200-A-G": "0/1",
+            "1-999-A-G": "0/1",  # VEP 결과에 없는 변이
+        },
+        "father_genotype_dic": {"13-500-C-G": "0/1"},
+        "mother_genotype_dic": {"2-1000-A-G": "0/1"},
+        "trio_var2idx": None,
+        "trio_is_de_novo": None,
+    }
+
+
+@pytest.mark.parametrize("trio", [False, True])
+def test_execute_matches_execute_acmg_rules(acmg_main, rule_variant_dic, rule_db_dic, trio):
+
+    if trio:  # joint-call trio VCF (ps2.call_de_novo() 결과)
+        rule_db_dic["trio_var2idx"] = {"2-1000-A-G": 0, "13-100-C-T": 1, "X-300-G-T": 2, "1-999-A-G": 3}
+        rule_db_dic["trio_is_de_novo"] = np.array([False, True, True, False])
+
+    proband_var_df = acmg_main.VariantDF()
+    proband_var_df.variant_dic = copy.deepcopy(rule_variant_dic)
+    proband_var_df = acmg_main.execute_acmg_rules(proband_var_df, rule_db_dic, annotate=False)
+
+    columnar_df = acmg_main.vectorized.execute(
+        acmg_main.columnar.ColumnarVariantDF.from_variant_dic(rule_variant_dic),
+        rule_db_dic,
+        annotate=False,
+    )
+
+    fired_keys = set()
+    for var_id, feature_dic in proband_var_df.variant_dic.items():
+        for var_feature, var_info_dic in feature_dic.items():
+            evidence_items = list(var_info_dic["evidence_score_dic"].items())
+            columnar_items = list(
+                columnar_df.variant_dic[var_id][var_feature]["evidence_score_dic"].items()
+            )
+            assert (var_id, var_feature, evidence_items) == (var_id, var_feature, columnar_items)
+            fired_keys.update(key for key, value in evidence_items if value)
+
+    # fixture가 모든 rule을 한 번 이상 할당하는지 확인
+    assert {
+        "pp3", "bp4", "bp7", "pp2", "bp1", "pvs1", "pm2", "ba1", "bs1",
+        "ps1", "pm5", "pp5", "bp6", "ps2", "pm4", "bp3",
+    } == fired_keys
+
+
+######################################################################
+
+DOMINANT_INHERITENCES = ["AD", "XD", "YD"]
+RECESSIVE_INHERITENCES = ["AR", "XR"]
+
+
+def make_category_mask(column: object, predicate: object) -> np.ndarray:
+    """_summary_
+    Note:
+        문자열 column(CategoryColumn)의 서로 다른 값(categories)마다 한 번씩만 predicate를 계산한 뒤,
+        각 row의 category 번호로 펼쳐서 row 단위 bool array를 만든다.
+
+    Args:
+        column (object): columnar.CategoryColumn
+        predicate (object): category 문자열 하나를 받아 bool을 반환하는 함수
+
+    Returns:
+        np.ndarray: row 단위 bool array
+
+    Examples:
+        >>> make_category_mask(
+                columnar_df.category_columns["consequence"],
+                lambda consequence: "missense_variant" in consequence,
+            )
+    """
+
+    category_mask = np.fromiter(
+        (bool(predicate(category)) for category in column.categories),
+        dtype=bool,
+        count=len(column.categories),
+    )
+
+    return category_mask[column.codes]
+
+
+def assign_pp3bp4bp7_masks(
+    is_missense: np.ndarray,
+    is_synonymous: np.ndarray,
+    revel_scores: np.ndarray,
+    spliceai_scores: np.ndarray,
+) -> tuple:
+    """_summary_
+    Note:
+        pp3bp4bp7.execute()와 같은 기준으로 pp3, bp4, bp7을 계산한다.
+        - missense: REVEL >= 0.5 이면 pp3. 그 외에는 SpliceAI가 있으면 SpliceAI로 (>= 0.5: pp3, < 0.5: bp4),
+          없으면 REVEL (< 0.5: bp4)로 판단한다.
+        - 그 외: SpliceAI로만 판단하며, bp4 이면서 synonymous variant 이면 bp7.
+        REVEL 값이 없거나 0인 경우(NaN, 0.0)는 REVEL 값이 없는 것으로 본다.
+
+    Args:
+        is_missense (np.ndarray): missense variant 여부
+        is_synonymous (np.ndarray): synonymous variant 여부
+        revel_scores (np.ndarray): REVEL score (없으면 NaN)
+        spliceai_scores (np.ndarray): SpliceAI score (없으면 NaN)
+
+    Returns:
+        tuple: (pp3, bp4, bp7) bool array
+
+    Examples:
+        >>> (missense, revel, spliceAI) = (True, 0.52, 0.1) -> pp3
+            (missense, revel, spliceAI) = (True, 0.12, NaN) -> bp4
+            (missense, revel, spliceAI) = (True, 0.1, 0.6) -> pp3
+            (synonymous, revel, spliceAI) = (False, NaN, 0.1) -> bp4, bp7
+    """
+
+    has_revel = ~np.isnan(revel_scores) & (revel_scores != 0)
+    has_spliceai = ~np.isnan(spliceai_scores)
+
+    revel_pp3 = is_missense & has_revel & (revel_scores >= 0.5)
+    pp3 = revel_pp3 | (has_spliceai & (spliceai_scores >= 0.5))
+    bp4 = ~revel_pp3 & np.where(
+        has_spliceai, spliceai_scores < 0.5, is_missense & has_revel
+    )
+    bp7 = ~is_missense & bp4 & is_synonymous
+
+    return (pp3, bp4, bp7)
+
+
+def assign_pm2ba1bs1_masks(
+    gnomad_ans: np.ndarray, gnomad_afs: np.ndarray, inheritences: np.ndarray
+) -> tuple:
+    """_summary_
+    Note:
+        pm2ba1bs1.execute()와 같은 기준으로 ba1, pm2, bs1을 계산한다. (AF 값이 있는 row에만 의미가 있음)
+        - ba1: AN >= 1000, AF >= 5%
+        - pm2/bs1: ba1이 아니고, AN >= 1000 이며, inheritence에 따라
+            - dominant (AD, XD, YD): pm2 = AF < 0.002%, bs1 = AF > 0.02%
+            - recessive (AR, XR): pm2 = AF < 0.01%, bs1 = AF > 0.1%
+
+    Args:
+        gnomad_ans (np.ndarray): gnomad AN
+        gnomad_afs (np.ndarray): gnomad AF (없으면 NaN)
+        inheritences (np.ndarray): row 별 inheritence ("AD", "AR", .., "": 질병 정보 없음)
+
+    Returns:
+        tuple: (pm2, ba1, bs1) bool array
+    """
+
+    is_enough_an = gnomad_ans >= 1000
+    ba1 = is_enough_an & (gnomad_afs >= 0.05)
+
+    is_dominant = np.isin(inheritences, DOMINANT_INHERITENCES)
+    is_recessive = np.isin(inheritences, RECESSIVE_INHERITENCES)
+    pm2_cutoffs = np.where(is_dominant, 0.00002, 0.0001)
+    bs1_cutoffs = np.where(is_dominant, 0.0002, 0.001)
+
+    is_target = is_enough_an & ~ba1 & (is_dominant | is_recessive)
+    pm2 = is_target & (gnomad_afs < pm2_cutoffs)
+    bs1 = is_target & ~pm2 & (gnomad_afs > bs1_cutoffs)
+
+    return (pm2, ba1, bs1)
+
+